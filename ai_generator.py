@@ -7,16 +7,45 @@ Generates educational content based on module data and student context.
 import os
 import json
 import re
+import time
+from types import SimpleNamespace
 from typing import Dict, List, Any, Optional
 from groq import Groq
 from cache_manager import get_cached_lesson, save_lesson_to_cache
 
 
+class OfflineLLMClient:
+    """Stand-in for the Groq client for load tests and offline development.
+
+    Answers chat.completions.create() with the JSON lesson template embedded
+    in the prompt, after an optional simulated latency, so the generator's
+    parsing and caching run exactly as with a real model.
+    """
+
+    def __init__(self, latency_sec: float = 0.0):
+        self.latency_sec = latency_sec
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, messages: List[Dict[str, str]], **kwargs) -> Any:
+        if self.latency_sec:
+            time.sleep(self.latency_sec)
+        prompt = messages[-1]["content"]
+        match = re.search(r'\{.*\}', prompt, re.DOTALL)
+        content = f"Вот урок:\n{match.group()}" if match else "{}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
 class AILessonGenerator:
     """AI-powered lesson generator using Groq."""
 
     def __init__(self):
-        """Initialize Groq client."""
+        """Initialize Groq client (or the offline stand-in when AI_OFFLINE is set)."""
+        if os.environ.get("AI_OFFLINE", "").lower() in ("1", "true", "yes"):
+            latency_ms = float(os.environ.get("AI_OFFLINE_LATENCY_MS", 0))
+            self.client = OfflineLLMClient(latency_ms / 1000.0)
+            self.model = "offline"
+            return
+
         api_key = os.environ.get("GROQ_API_KEY")
         if not api_key:
             raise ValueError("GROQ_API_KEY environment variable is required")
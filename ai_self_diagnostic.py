@@ -13,6 +13,10 @@ AI проводит диагностику сам с собой:
 2. Адаптивную диагностику в действии
 3. Реалистичные паттерны ответов ученика
 4. Полностью автономную систему диагностики
+
+Если задана БД (DB_NAME), сессии сохраняются в diagnostic_session и
+diagnostic_item_result (PostgresSessionStore); с DIAGNOSTIC_STUDENT_ID
+(student.id) незавершённая сессия этого ученика продолжается.
 """
 
 import json
@@ -21,6 +25,26 @@ import os
 import random
 from typing import Dict, List, Any, Optional
 from smart_diagnostic_system import SmartDiagnosticSystem, DifficultyLevel
+from diagnostic_session_store import create_session_store
+
+
+def get_db_connection():
+    """Get database connection from environment variables."""
+    import psycopg2
+    return psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=os.getenv('DB_PORT', '5432'),
+        database=os.getenv('DB_NAME', 'ayaal_teacher'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', '')
+    )
+
+
+def create_diagnostic_system() -> SmartDiagnosticSystem:
+    """Система диагностики с сохранением сессий в БД, если она задана, иначе только в памяти."""
+    if os.getenv('DB_NAME'):
+        return SmartDiagnosticSystem(create_session_store(get_db_connection))
+    return SmartDiagnosticSystem(create_session_store())
 
 
 def print_separator(title: str):
@@ -39,8 +63,8 @@ class AISelfDiagnostic:
     2. Ученик - отвечает на вопросы (иногда правильно, иногда нет)
     """
 
-    def __init__(self, groq_api_key: str):
-        self.system = SmartDiagnosticSystem()
+    def __init__(self, groq_api_key: str, system: Optional[SmartDiagnosticSystem] = None):
+        self.system = system or create_diagnostic_system()
         self.api_key = groq_api_key
         self.conversation_history = []
         self.student_personality = self._generate_student_personality()
@@ -445,7 +469,8 @@ class AISelfDiagnostic:
             "time_spent_sec": self._get_realistic_response_time(age, question_type)
         }
 
-    def run_self_diagnostic(self, subjects: List[str] = ["Mathematics", "English"]):
+    def run_self_diagnostic(self, subjects: List[str] = ["Mathematics", "English"],
+                            student_id: Optional[str] = None):
         """
         Запускает AI самодиагностику.
 
@@ -459,16 +484,20 @@ class AISelfDiagnostic:
         # Инициализация профиля ученика
         print_separator("🎯 ИНИЦИАЛИЗАЦИЯ ПРОФИЛЯ")
 
-        student_id = f"ai_student_{int(time.time())}"
-        profile = self.system.initialize_student_profile(
-            student_id=student_id,
-            age=self.student_personality['age'],
-            subjects=subjects
-        )
-
-        print(f"   ✅ Создан профиль для {self.student_personality['name']}")
+        student_id = student_id or f"ai_student_{int(time.time())}"
+        profile = self.system.resume_session(student_id)
+        if profile is not None:
+            subjects = list(profile.subjects)
+            print(f"   🔁 Продолжаем сохранённую сессию ученика {student_id}")
+        else:
+            profile = self.system.initialize_student_profile(
+                student_id=student_id,
+                age=self.student_personality['age'],
+                subjects=subjects
+            )
+            print(f"   ✅ Создан профиль для {self.student_personality['name']}")
         print(f"   📚 Предметы: {', '.join(subjects)}")
-        levels_str = [f'{subj}: {data["current_level"]}' for subj, data in profile.subjects.items()]
+        levels_str = [f'{subj}: {data.current_level.value}' for subj, data in profile.subjects.items()]
         print(f"   🎯 Начальные уровни: {levels_str}")
 
         # Процесс диагностики
@@ -519,8 +548,7 @@ class AISelfDiagnostic:
                         student_id=student_id,
                         question_id=question.id,
                         answer={"answer": student_response['answer']},
-                        time_spent_sec=student_response['time_spent_sec'],
-                        profile=profile
+                        time_spent_sec=student_response['time_spent_sec']
                     )
 
                     is_correct = result['is_correct']
@@ -672,7 +700,7 @@ def main():
     ai_diagnostic = AISelfDiagnostic(api_key)
 
     # Запускаем самодиагностику
-    ai_diagnostic.run_self_diagnostic(["Mathematics", "English"])
+    ai_diagnostic.run_self_diagnostic(["Mathematics", "English"], os.getenv('DIAGNOSTIC_STUDENT_ID'))
 
 
 if __name__ == "__main__":
@@ -32,8 +32,14 @@ from validation import (
     validate_api_request_generate_lesson,
     validate_api_request_next_lesson,
     validate_api_request_submission,
-    validate_lesson_json,
-    validate_database_integrity
+    validate_api_request_telemetry,
+    validate_api_request_mastery_query,
+    validate_api_request_cohort,
+    validate_api_request_progress_query,
+    validate_api_request_next_modules,
+    validate_api_request_module_search,
+    validate_idempotency_key,
+    validate_lesson_json
 )
 from cache_manager import get_cache_stats, clear_lesson_cache
 from mastery_calculator import (
@@ -44,6 +50,37 @@ from mastery_calculator import (
     MasteryCalculatorV2,
     MasteryConfig
 )
+from telemetry_ingest import AttemptEvent, create_telemetry_buffer, events_from_request
+from audit_log import create_audit_log
+from submission_records import fetch_submission_history
+from cohort_analytics import (
+    fetch_cohort_rows, fetch_module_objectives, cohort_rollup, STRUGGLING_THRESHOLD, STRUGGLING_LIMIT
+)
+from daily_progress import record_submission as record_daily_progress, fetch_daily_progress
+from schema_registry import registry as schema_registry
+from curriculum_store import open_curriculum
+from prerequisite_graph import PrerequisiteGraph
+from module_search import ModuleSearchIndex, search_modules, SEARCH_LIMIT, SEARCH_MAX
+from db_integrity import (
+    create_integrity_monitor,
+    load_report as load_integrity_report
+)
+import statement_counter
+import submission_idempotency
+from learning_state_store import (
+    LEARNING_STATE_COLUMNS,
+    mastery_from_row,
+    counters_from_row,
+    insert_learning_state,
+    update_learning_state,
+    fetch_mastery_summary,
+    fetch_mastery_page,
+    fetch_module_mastery,
+    decode_mastery_cursor,
+    MASTERY_PAGE_SIZE,
+    MASTERY_PAGE_MAX,
+    COMPLETED_MASTERY
+)
 
 # Try to import AI generator
 try:
@@ -58,6 +95,37 @@ except ImportError:
     AI_AVAILABLE = False
 
 
+# Compile lesson/diagnostic schemas once, before the first request
+schema_registry.warm()
+
+# Module metadata is read from the compiled curriculum (curriculum_store.py):
+# one mmap shared by all workers, rebuilt here if the JSON sources changed.
+try:
+    curriculum = open_curriculum()
+except Exception as e:
+    print(f"Warning: compiled curriculum not available, module metadata comes from the database: {e}")
+    curriculum = None
+
+# Prerequisite graph for next-module recommendations (prerequisite_graph.py)
+prerequisite_graph = PrerequisiteGraph.from_curriculum(curriculum) if curriculum is not None else None
+if prerequisite_graph is not None and prerequisite_graph.cycles:
+    print(f"Warning: prerequisite cycles in the curriculum: {prerequisite_graph.cycles}")
+if prerequisite_graph is not None and prerequisite_graph.unknown:
+    print(f"Warning: modules locked by unknown prerequisites: {prerequisite_graph.unknown}")
+
+# Module search: Postgres full-text (migration 015) or the in-memory index
+# built from the curriculum, which also serves when the database query fails
+MODULE_SEARCH_SOURCE = os.getenv('MODULE_SEARCH_SOURCE', 'db')
+module_search_index = ModuleSearchIndex.from_curriculum(curriculum) if curriculum is not None else None
+
+NEXT_MODULES_LIMIT = 10
+NEXT_MODULES_MAX = 100
+
+
+# Load testing: count SQL statements per request (X-DB-Statements header)
+COUNT_STATEMENTS = os.getenv('API_COUNT_STATEMENTS', '').lower() in ('1', 'true', 'yes')
+
+
 def get_db_connection():
     """Get database connection."""
     return psycopg2.connect(
@@ -65,10 +133,49 @@ def get_db_connection():
         port=os.getenv('DB_PORT', '5432'),
         database=os.getenv('DB_NAME', 'ayaal_teacher'),
         user=os.getenv('DB_USER', 'gp'),
-        password=os.getenv('DB_PASSWORD', '')
+        password=os.getenv('DB_PASSWORD', ''),
+        connection_factory=statement_counter.CountingConnection if COUNT_STATEMENTS else None
     )
 
 
+if COUNT_STATEMENTS:
+    @app.before_request
+    def _start_statement_count():
+        statement_counter.start()
+
+    @app.after_request
+    def _report_statement_count(response):
+        count = statement_counter.stop()
+        if count is not None:
+            response.headers[statement_counter.STATEMENTS_HEADER] = str(count)
+        return response
+
+
+# Interactive telemetry is buffered in memory and written to attempt with COPY
+# by a background thread, so it never adds DB round trips to request handling.
+telemetry_buffer = create_telemetry_buffer(
+    get_db_connection,
+    max_buffer=int(os.getenv('TELEMETRY_MAX_BUFFER', 50000)),
+    batch_size=int(os.getenv('TELEMETRY_BATCH_SIZE', 1000)),
+    flush_interval=float(os.getenv('TELEMETRY_FLUSH_INTERVAL', 1.0))
+)
+
+# Audit events (registration, enrollment, submissions, mastery updates) are
+# written to audit_log the same way, after the handler has committed.
+audit = create_audit_log(
+    get_db_connection,
+    max_buffer=int(os.getenv('AUDIT_MAX_BUFFER', 100000)),
+    batch_size=int(os.getenv('AUDIT_BATCH_SIZE', 500)),
+    flush_interval=float(os.getenv('AUDIT_FLUSH_INTERVAL', 2.0))
+)
+
+# Integrity checks run in the background and only look at rows newer than the
+# stored watermark; /api/validate/database serves the last stored report.
+integrity_monitor = create_integrity_monitor(
+    get_db_connection,
+    interval=float(os.getenv('INTEGRITY_CHECK_INTERVAL', 300))
+)
+
 
 
 
@@ -181,6 +288,8 @@ def register_parent():
             conn.commit()
         conn.close()
 
+        audit.record(user_id, 'register', 'app_user', user_id, {"role": "parent", "locale": locale})
+
         return jsonify({
             "user_id": str(user_id), 
             "role": "parent",
@@ -244,6 +353,10 @@ def add_child():
             conn.commit()
         conn.close()
 
+        audit.record(parent_user_id, 'create', 'student', student_id, {
+            "grade_hint": grade_hint, "relation": relation
+        })
+
         return jsonify({
             "student_id": str(student_id),
             "child_name": child_name,
@@ -254,6 +367,39 @@ def add_child():
         return jsonify({"error": str(e)}), 500
 
 
+def get_module_metadata(module_code):
+    """Module fields used for lesson generation, from the compiled curriculum or else the database."""
+    module = curriculum.module(module_code) if curriculum is not None else None
+    if module is not None:
+        info = curriculum.module_info(module_code)
+        return {
+            "code": module['id'],
+            "title": module.get('title'),
+            "subject": info['subject_title'],
+            "stage": info['stage_title'] or module.get('stage'),
+            "objectives_jsonb": module.get('objectives', []),
+            "lesson_policy_jsonb": module.get('lesson_policy', {}),
+            "assessment_blueprint_jsonb": module.get('assessment_blueprint', {}),
+            "recommended_hours": module.get('recommended_hours')
+        }
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT m.code, m.title, s.title as subject, st.title as stage,
+                       m.objectives_jsonb, m.lesson_policy_jsonb, m.assessment_blueprint_jsonb,
+                       m.recommended_hours
+                FROM module m
+                JOIN subject s ON m.subject_id = s.id
+                JOIN stage st ON m.stage_id = st.id
+                WHERE m.code = %s
+            """, (module_code,))
+            return cur.fetchone()
+    finally:
+        conn.close()
+
+
 @app.route('/api/lessons/generate', methods=['POST'])
 def generate_lesson():
     """Generate a lesson for a module."""
@@ -274,24 +420,9 @@ def generate_lesson():
         locale = data.get('locale', 'ru')
         use_ai = data.get('use_ai', False)  # New parameter to enable AI generation
 
-        # Get module data from database
-        conn = get_db_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT m.code, m.title, s.title as subject, st.title as stage,
-                       m.objectives_jsonb, m.lesson_policy_jsonb, m.assessment_blueprint_jsonb,
-                       m.recommended_hours
-                FROM module m
-                JOIN subject s ON m.subject_id = s.id
-                JOIN stage st ON m.stage_id = st.id
-                WHERE m.code = %s
-            """, (module_code,))
-
-            module_data = cur.fetchone()
-            if not module_data:
-                return jsonify({"error": f"Module {module_code} not found"}), 404
-
-        conn.close()
+        module_data = get_module_metadata(module_code)
+        if not module_data:
+            return jsonify({"error": f"Module {module_code} not found"}), 404
 
         # Generate lesson based on type and AI preference
         if use_ai and AI_AVAILABLE:
@@ -352,8 +483,20 @@ def create_submission():
         if not is_valid:
             return jsonify({"error": f"Invalid request: {message}"}), 400
 
+        # Retries with the same key replay the first response
+        idempotency_key = request.headers.get(submission_idempotency.IDEMPOTENCY_HEADER) or data.get('idempotency_key')
+        if idempotency_key and not validate_idempotency_key(idempotency_key):
+            return jsonify({"error": "Invalid request: idempotency key must be 1-255 characters"}), 400
+        request_hash = submission_idempotency.request_hash(data) if idempotency_key else None
+
         conn = get_db_connection()
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            if idempotency_key:
+                stored = submission_idempotency.find_stored_response(cur, data['student_id'], idempotency_key)
+                if stored:
+                    conn.close()
+                    return _replay_submission(stored, request_hash)
+
             # Get module_id and student_id
             cur.execute("""
                 SELECT m.id as module_id, s.id as student_id, m.lesson_policy_jsonb
@@ -371,6 +514,15 @@ def create_submission():
             if not all(key in ids for key in ['module_id', 'student_id']):
                 return jsonify({"error": f"Invalid data structure: {ids}"}), 500
 
+            if idempotency_key and not submission_idempotency.claim_key(
+                cur, ids['student_id'], idempotency_key, request_hash
+            ):
+                # A concurrent retry committed first
+                conn.rollback()
+                stored = submission_idempotency.find_stored_response(cur, data['student_id'], idempotency_key)
+                conn.close()
+                return _replay_submission(stored, request_hash)
+
             # Insert submission
             cur.execute("""
                 INSERT INTO submission (
@@ -386,39 +538,8 @@ def create_submission():
 
             submission = cur.fetchone()
 
-            # Also create attempt record if it's an interactive task
-            if data.get('interactive_id'):
-                cur.execute("""
-                    INSERT INTO attempt (
-                        student_id, module_id, lesson_id, interactive_id,
-                        payload_jsonb, score
-                    ) VALUES (%s, %s, %s, %s, %s, %s)
-                """, (
-                    ids['student_id'], ids['module_id'], data['lesson_id'],
-                    data['interactive_id'], json.dumps(data.get('answer_jsonb', {})),
-                    data.get('score')
-                ))
-
-            # Получить историю ответов для расчета mastery
-            cur.execute("""
-                SELECT
-                    s.score,
-                    s.created_at,
-                    s.lesson_id,
-                    CASE
-                        WHEN s.lesson_id LIKE '%concept%' THEN 'concept'
-                        WHEN s.lesson_id LIKE '%guided%' THEN 'guided'
-                        WHEN s.lesson_id LIKE '%independent%' THEN 'independent'
-                        WHEN s.lesson_id LIKE '%assessment%' THEN 'assessment'
-                        ELSE 'unknown'
-                    END as lesson_type
-                FROM submission s
-                WHERE s.student_id = %s AND s.module_id = %s
-                ORDER BY s.created_at DESC
-                LIMIT 20
-            """, (ids['student_id'], ids['module_id']))
-
-            submissions_history = cur.fetchall()
+            # Получить историю ответов для расчета mastery (компактные записи, tuple-курсор)
+            submissions_history = fetch_submission_history(conn, ids['student_id'], ids['module_id'])
 
             # Определить тип урока из lesson_id
             lesson_id = data.get('lesson_id', '')
@@ -438,13 +559,13 @@ def create_submission():
             score = data.get('score', 0.0)
             difficulty = data.get('difficulty', 'medium')
 
-            lesson_mastery = calculate_lesson_mastery_v2(
+            lesson_mastery, _ = calculate_lesson_mastery_v2(
                 submissions_history, lesson_type, time_spent, score, difficulty
             )
 
             # Получить текущее состояние learning_state
-            cur.execute("""
-                SELECT mastery_jsonb, counters_jsonb
+            cur.execute(f"""
+                SELECT {LEARNING_STATE_COLUMNS}
                 FROM learning_state
                 WHERE student_id = %s AND module_id = %s
             """, (ids['student_id'], ids['module_id']))
@@ -455,8 +576,8 @@ def create_submission():
             current_counters = {}
 
             if learning_state:
-                current_mastery = learning_state['mastery_jsonb'] or {}
-                current_counters = learning_state['counters_jsonb'] or {}
+                current_mastery = mastery_from_row(learning_state)
+                current_counters = counters_from_row(learning_state)
             else:
                 # Создать новое состояние обучения
                 current_mastery = {}
@@ -474,51 +595,127 @@ def create_submission():
                 current_counters[lesson_type] = 1
 
             # Определить следующий рекомендуемый урок
-            lesson_policy_mix = ids['lesson_policy_jsonb'] or {}
+            lesson_policy_mix = (ids['lesson_policy_jsonb'] or {}).get('mix', {})
             next_lesson_type, recommendation_reason = next_lesson_recommendation_v2(
                 updated_mastery, lesson_policy_mix, current_counters
             )
 
             # Обновить или создать learning_state
             if learning_state:
-                cur.execute("""
-                    UPDATE learning_state
-                    SET mastery_jsonb = %s, counters_jsonb = %s,
-                        next_recommended = %s, updated_at = now()
-                    WHERE student_id = %s AND module_id = %s
-                """, (
-                    json.dumps(updated_mastery), json.dumps(current_counters),
-                    next_lesson_type, ids['student_id'], ids['module_id']
-                ))
+                update_learning_state(
+                    cur, ids['student_id'], ids['module_id'],
+                    updated_mastery, current_counters, next_lesson_type
+                )
             else:
-                cur.execute("""
-                    INSERT INTO learning_state (
-                        student_id, module_id, current_lesson_type,
-                        mastery_jsonb, counters_jsonb, next_recommended
-                    ) VALUES (%s, %s, %s, %s, %s, %s)
-                """, (
-                    ids['student_id'], ids['module_id'], lesson_type,
-                    json.dumps(updated_mastery), json.dumps(current_counters),
-                    next_lesson_type
-                ))
+                insert_learning_state(
+                    cur, ids['student_id'], ids['module_id'], lesson_type,
+                    updated_mastery, current_counters, next_lesson_type
+                )
+
+            # Дневная сводка прогресса (student_daily_progress)
+            record_daily_progress(
+                cur, ids['student_id'], ids['module_id'], submission['created_at'],
+                data.get('score'), time_spent, updated_mastery.get('overall', 0)
+            )
 
-            conn.commit()
+            # Получить описание уровня освоения
+            mastery_description = get_mastery_description(updated_mastery.get('overall', 0))
+
+            response = {
+                "success": True,
+                "submission_id": str(submission['id']),
+                "created_at": submission['created_at'].isoformat(),
+                "lesson_mastery": lesson_mastery,
+                "overall_mastery": updated_mastery.get('overall', 0),
+                "mastery_description": mastery_description,
+                "next_recommended": next_lesson_type,
+                "recommendation_reason": recommendation_reason,
+                "mastery_details": updated_mastery
+            }
 
-        # Получить описание уровня освоения
-        mastery_description = get_mastery_description(updated_mastery.get('overall', 0))
+            if idempotency_key:
+                submission_idempotency.store_response(
+                    cur, ids['student_id'], idempotency_key, submission, response
+                )
 
-        return jsonify({
-            "success": True,
-            "submission_id": str(submission['id']),
-            "created_at": submission['created_at'].isoformat(),
-            "lesson_mastery": lesson_mastery,
-            "overall_mastery": updated_mastery.get('overall', 0),
-            "mastery_description": mastery_description,
-            "next_recommended": next_lesson_type,
-            "recommendation_reason": recommendation_reason,
-            "mastery_details": updated_mastery
+            conn.commit()
+        conn.close()
+
+        # Also record an attempt if it's an interactive task (buffered, only once the submission is committed)
+        if data.get('interactive_id'):
+            telemetry_buffer.offer([AttemptEvent(
+                user_id=data['student_id'],
+                module_code=data['module_code'],
+                lesson_id=data['lesson_id'],
+                interactive_id=data['interactive_id'],
+                payload=data.get('answer_jsonb', {}),
+                score=data.get('score'),
+                created_at=submission['created_at']
+            )])
+
+        audit.record(data['student_id'], 'create', 'submission', submission['id'], {
+            "module_code": data['module_code'], "lesson_id": data['lesson_id'],
+            "task_id": data['task_id'], "kind": data['kind'], "score": data.get('score')
+        })
+        audit.record(data['student_id'], 'update', 'learning_state', f"{ids['student_id']}:{ids['module_id']}", {
+            "overall": [current_mastery.get('overall', 0), updated_mastery.get('overall', 0)],
+            lesson_type: [current_mastery.get(lesson_type, 0), updated_mastery.get(lesson_type, 0)],
+            "next_recommended": next_lesson_type
         })
 
+        return jsonify(response)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def _replay_submission(stored, request_hash):
+    """Response for a retried submission whose idempotency key is already used."""
+    if not stored or stored['response_jsonb'] is None:
+        return jsonify({"error": "Submission with this idempotency key is still in progress"}), 409
+    if stored['request_hash'] != request_hash:
+        return jsonify({"error": "Idempotency key was already used with a different request"}), 422
+    return jsonify(stored['response_jsonb']), 200, {"Idempotent-Replayed": "true"}
+
+
+@app.route('/api/telemetry/attempts', methods=['POST'])
+def ingest_attempt_telemetry():
+    """Accept a batch of interactive events for the attempt table."""
+    try:
+        data = request.get_json()
+
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+
+        # Validate input data
+        is_valid, message = validate_api_request_telemetry(data)
+        if not is_valid:
+            return jsonify({"error": f"Invalid request: {message}"}), 400
+
+        events = events_from_request(data)
+        if not telemetry_buffer.offer(events):
+            return jsonify({"error": "Telemetry buffer is full, retry later"}), 429, {"Retry-After": "1"}
+
+        return jsonify({"accepted": len(events)}), 202
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/telemetry/stats', methods=['GET'])
+def get_telemetry_stats_endpoint():
+    """Get telemetry buffer statistics."""
+    try:
+        return jsonify(telemetry_buffer.get_stats()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/audit/stats', methods=['GET'])
+def get_audit_stats_endpoint():
+    """Get audit log queue statistics."""
+    try:
+        return jsonify(audit.get_stats()), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -544,11 +741,7 @@ def get_next_lesson():
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
             # Get learning state
             cur.execute("""
-                SELECT ls.*, m.code as module_code,
-                       ls.mastery_jsonb->>'overall' as overall_mastery,
-                       ls.mastery_jsonb->>'concept' as concept_mastery,
-                       ls.mastery_jsonb->>'guided' as guided_mastery,
-                       ls.mastery_jsonb->>'independent' as independent_mastery
+                SELECT ls.*, m.code as module_code
                 FROM learning_state ls
                 JOIN module m ON ls.module_id = m.id
                 JOIN student s ON ls.student_id = s.id
@@ -582,28 +775,20 @@ def get_next_lesson():
                     'total_submissions': 0
                 }
 
-                cur.execute("""
-                    INSERT INTO learning_state (
-                        student_id, module_id, current_lesson_type,
-                        mastery_jsonb, counters_jsonb, next_recommended
-                    ) VALUES (%s, %s, %s, %s, %s, %s)
-                    RETURNING *
-                """, (
-                    module_data['student_id'], module_data['module_id'], 'concept',
-                    json.dumps(initial_mastery), json.dumps({}), 'concept'
-                ))
-
-                ls = cur.fetchone()
+                ls = insert_learning_state(
+                    cur, module_data['student_id'], module_data['module_id'], 'concept',
+                    initial_mastery, {}, 'concept'
+                )
                 lesson_policy = module_data['lesson_policy_jsonb'] or {}
             else:
                 lesson_policy = ls.get('lesson_policy_jsonb') or {}
 
             # Использовать новую систему расчета следующего урока
-            current_mastery = ls['mastery_jsonb'] or {}
-            current_counters = ls['counters_jsonb'] or {}
+            current_mastery = mastery_from_row(ls)
+            current_counters = counters_from_row(ls)
 
             # Преобразовать lesson_policy в нужный формат
-            lesson_policy_dict = lesson_policy if isinstance(lesson_policy, dict) else {}
+            lesson_policy_dict = lesson_policy.get('mix', {}) if isinstance(lesson_policy, dict) else {}
 
             next_type, reason = next_lesson_recommendation_v2(
                 current_mastery, lesson_policy_dict, current_counters
@@ -646,87 +831,181 @@ def get_next_lesson():
 
 @app.route('/api/mastery/<student_id>', methods=['GET'])
 def get_student_mastery(student_id):
-    """Get mastery statistics for a student."""
+    """Get mastery statistics for a student.
+
+    Query parameters: subject and stage codes filter the modules; limit and
+    cursor page through them (most recently updated first); summary_only=true
+    returns just the aggregated summary. The summary comes with the first page
+    only, subsequent pages (cursor given) carry modules alone.
+    """
     try:
+        is_valid, message = validate_api_request_mastery_query(student_id, request.args, MASTERY_PAGE_MAX)
+        if not is_valid:
+            return jsonify({"error": f"Invalid request: {message}"}), 400
+
+        subject_code = request.args.get('subject')
+        stage_code = request.args.get('stage')
+        cursor = request.args.get('cursor')
+        limit = int(request.args.get('limit', MASTERY_PAGE_SIZE))
+        summary_only = request.args.get('summary_only', 'false').lower() in ('1', 'true')
+        if cursor:
+            try:
+                decode_mastery_cursor(cursor)
+            except ValueError as e:
+                return jsonify({"error": f"Invalid request: {e}"}), 400
+
+        result = {"student_id": student_id}
         conn = get_db_connection()
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # Получить все состояния обучения ученика
-            cur.execute("""
-                SELECT
-                    ls.mastery_jsonb,
-                    ls.counters_jsonb,
-                    ls.next_recommended,
-                    ls.updated_at,
-                    m.code as module_code,
-                    m.title as module_title,
-                    s.title as subject_title,
-                    st.title as stage_title
-                FROM learning_state ls
-                JOIN module m ON ls.module_id = m.id
-                JOIN subject s ON m.subject_id = s.id
-                JOIN stage st ON m.stage_id = st.id
-                JOIN student stud ON ls.student_id = stud.id
-                JOIN app_user u ON stud.user_id = u.id
-                WHERE u.id = %s
-                ORDER BY ls.updated_at DESC
-            """, (student_id,))
-
-            learning_states = cur.fetchall()
-
-            if not learning_states:
-                return jsonify({
-                    "student_id": student_id,
-                    "modules": [],
-                    "summary": {
-                        "total_modules": 0,
-                        "average_mastery": 0,
-                        "completed_modules": 0
-                    }
-                })
-
-            # Обработать данные
-            modules_data = []
-            total_mastery = 0
-            completed_modules = 0
-
-            for state in learning_states:
-                mastery = state['mastery_jsonb'] or {}
-                overall_mastery = mastery.get('overall', 0)
-                total_mastery += overall_mastery
-
-                if overall_mastery >= 0.8:  # Считаем завершенным
-                    completed_modules += 1
-
-                mastery_description = get_mastery_description(overall_mastery)
-
-                modules_data.append({
-                    "module_code": state['module_code'],
-                    "module_title": state['module_title'],
-                    "subject": state['subject_title'],
-                    "stage": state['stage_title'],
-                    "mastery": mastery,
-                    "mastery_description": mastery_description,
-                    "counters": state['counters_jsonb'] or {},
-                    "next_recommended": state['next_recommended'],
-                    "last_updated": state['updated_at'].isoformat() if state['updated_at'] else None
-                })
-
-            summary = {
-                "total_modules": len(modules_data),
-                "average_mastery": round(total_mastery / len(modules_data), 3),
-                "completed_modules": completed_modules
-            }
+            if not cursor:
+                result["summary"] = fetch_mastery_summary(cur, student_id, subject_code, stage_code)
+            if summary_only:
+                conn.close()
+                return jsonify(result)
+
+            # Страница модулей: keyset по module_id
+            learning_states, next_cursor = fetch_mastery_page(
+                cur, student_id, limit, cursor, subject_code, stage_code
+            )
+        conn.close()
+
+        modules_data = []
+        for state in learning_states:
+            mastery = mastery_from_row(state)
+            modules_data.append({
+                "module_code": state['module_code'],
+                "module_title": state['module_title'],
+                "subject": state['subject_title'],
+                "stage": state['stage_title'],
+                "mastery": mastery,
+                "mastery_description": get_mastery_description(mastery['overall']),
+                "counters": counters_from_row(state),
+                "next_recommended": state['next_recommended'],
+                "last_updated": state['updated_at'].isoformat() if state['updated_at'] else None
+            })
+
+        result["modules"] = modules_data
+        result["next_cursor"] = next_cursor
+        return jsonify(result)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/students/<student_id>/next-modules', methods=['GET'])
+def get_next_modules(student_id):
+    """Modules unlocked for a student, i.e. every prerequisite mastered.
+
+    A module counts as mastered when its learning_state overall mastery
+    reaches ?threshold= (default COMPLETED_MASTERY). ?subject= and ?stage=
+    codes restrict the recommendations, not what counts as mastered;
+    ?limit= caps the list.
+    """
+    if prerequisite_graph is None:
+        return jsonify({"error": "Compiled curriculum is not available"}), 503
+    try:
+        is_valid, message = validate_api_request_next_modules(student_id, request.args, NEXT_MODULES_MAX)
+        if not is_valid:
+            return jsonify({"error": f"Invalid request: {message}"}), 400
+
+        threshold = float(request.args.get('threshold', COMPLETED_MASTERY))
+        limit = int(request.args.get('limit', NEXT_MODULES_LIMIT))
+        subject_code = request.args.get('subject')
+        stage_code = request.args.get('stage')
+        candidates = None
+        if subject_code or stage_code:
+            candidates = prerequisite_graph.mask(curriculum.select(subject=subject_code, stage=stage_code))
+
+        conn = get_db_connection()
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            mastery = fetch_module_mastery(cur, student_id)
+        conn.close()
+
+        recommended, totals = prerequisite_graph.recommend(mastery, threshold, candidates, limit)
+        for item in recommended:
+            module = curriculum.module(item['module_code'])
+            item['module_title'] = module.get('title')
+            item['subject'] = curriculum.module_info(item['module_code'])['subject_code']
+            item['stage'] = module.get('stage')
+
+        return jsonify({
+            "student_id": student_id,
+            "curriculum_version": prerequisite_graph.version,
+            "threshold": threshold,
+            "recommended": recommended,
+            **totals
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/progress/<student_id>/daily', methods=['GET'])
+def get_daily_progress(student_id):
+    """Daily progress trend from student_daily_progress.
+
+    Query parameters: module_code (per-module days with closing mastery;
+    without it days are summed over modules), from and to (YYYY-MM-DD, inclusive).
+    """
+    try:
+        is_valid, message = validate_api_request_progress_query(student_id, request.args)
+        if not is_valid:
+            return jsonify({"error": f"Invalid request: {message}"}), 400
+
+        module_code = request.args.get('module_code')
+        since = request.args.get('from')
+        until = request.args.get('to')
+
+        conn = get_db_connection()
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            days = fetch_daily_progress(cur, student_id, module_code, since, until)
+        conn.close()
 
         return jsonify({
             "student_id": student_id,
-            "modules": modules_data,
-            "summary": summary
+            "module_code": module_code,
+            "days": days
         })
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/analytics/cohort', methods=['POST'])
+def get_cohort_analytics():
+    """Mastery rollups for a class or cohort.
+
+    The cohort is a list of student_ids (app_user ids), the students actively
+    enrolled in subject_code/stage_code, or both. Returns per-module mastery
+    distributions, an objective heatmap and struggling students.
+    """
+    try:
+        data = request.get_json()
+
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+
+        is_valid, message = validate_api_request_cohort(data)
+        if not is_valid:
+            return jsonify({"error": f"Invalid request: {message}"}), 400
+
+        conn = get_db_connection()
+        with conn.cursor() as cur:
+            rows = fetch_cohort_rows(cur, data.get('student_ids'), data.get('subject_code'), data.get('stage_code'))
+            modules = fetch_module_objectives(cur, sorted(set(rows.module_codes.tolist())))
+        conn.close()
+
+        result = cohort_rollup(
+            rows, modules,
+            struggling_threshold=float(data.get('struggling_threshold', STRUGGLING_THRESHOLD)),
+            struggling_limit=data.get('struggling_limit', STRUGGLING_LIMIT),
+        )
+        return jsonify(result)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
@@ -740,30 +1019,46 @@ def health_check():
 
 @app.route('/api/validate/database', methods=['GET'])
 def validate_database():
-    """Validate database integrity."""
+    """Serve the latest stored integrity report; checks only ever run in the background monitor."""
     try:
         conn = get_db_connection()
-        report = validate_database_integrity(conn)
-        conn.close()
+        try:
+            with conn.cursor() as cur:
+                report = load_integrity_report(cur)
+        finally:
+            conn.close()
+        # ?refresh=1 или ещё нет отчёта: проверку запускает монитор, не этот запрос
+        if report is None or request.args.get('refresh') == '1':
+            integrity_monitor.trigger()
+            return jsonify({
+                "status": "pending",
+                "message": "Integrity check scheduled, retry later"
+            }), 202
 
-        if "error" in report:
-            return jsonify({"status": "error", "message": report["error"]}), 500
+        counts = report["counts"]
+        meta = {
+            "checked_at": report["checked_at"],
+            "checks": report["checks"],
+            "monitor": integrity_monitor.get_stats()
+        }
 
         # Check if there are any issues
-        issues = {k: v for k, v in report.items() if v > 0}
+        issues = {k: v for k, v in counts.items() if v > 0}
 
         if issues:
             return jsonify({
                 "status": "issues_found",
                 "message": "Database integrity issues detected",
                 "issues": issues,
-                "full_report": report
+                "full_report": counts,
+                **meta
             }), 200
         else:
             return jsonify({
                 "status": "valid",
                 "message": "Database integrity is valid",
-                "report": report
+                "report": counts,
+                **meta
             }), 200
 
     except Exception as e:
@@ -779,7 +1074,7 @@ def validate_lesson_endpoint():
         if not data:
             return jsonify({"error": "No data provided"}), 400
 
-        is_valid, message = validate_lesson_json(data)
+        is_valid, message = validate_lesson_json(data, request.args.get('schema', 'generated_lesson'))
 
         return jsonify({
             "valid": is_valid,
@@ -847,6 +1142,102 @@ def get_modules_endpoint():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/api/modules/search', methods=['GET'])
+def search_modules_endpoint():
+    """Search modules by title, description and objective descriptions.
+
+    Query parameters: q (words, the last ones may be prefixes), subject and
+    stage codes, limit, and source=db|index to pick the backend (default
+    MODULE_SEARCH_SOURCE). A failing database query falls back to the index.
+    """
+    try:
+        is_valid, message = validate_api_request_module_search(request.args, SEARCH_MAX)
+        if not is_valid:
+            return jsonify({"error": f"Invalid request: {message}"}), 400
+
+        query = request.args['q']
+        subject_code = request.args.get('subject')
+        stage_code = request.args.get('stage')
+        limit = int(request.args.get('limit', SEARCH_LIMIT))
+        source = request.args.get('source', MODULE_SEARCH_SOURCE)
+        if module_search_index is None:
+            source = 'db'
+
+        results = None
+        if source == 'db':
+            try:
+                conn = get_db_connection()
+                try:
+                    with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                        results = search_modules(cur, query, subject_code, stage_code, limit)
+                finally:
+                    conn.close()
+            except psycopg2.Error as e:
+                if module_search_index is None:
+                    raise
+                print(f"Warning: module search falls back to the in-memory index: {e}")
+                source = 'index'
+        if results is None:
+            results = module_search_index.search(query, subject_code, stage_code, limit)
+
+        return jsonify({
+            "query": query,
+            "source": source,
+            "modules": results,
+            "total": len(results)
+        }), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/curriculum/modules', methods=['GET'])
+def get_curriculum_modules():
+    """Modules of the compiled curriculum, filtered by ?subject=, ?stage= and ?objective= codes."""
+    if curriculum is None:
+        return jsonify({"error": "Compiled curriculum is not available"}), 503
+    try:
+        codes = curriculum.select(
+            subject=request.args.get('subject'),
+            stage=request.args.get('stage'),
+            objective=request.args.get('objective')
+        )
+        modules = []
+        for code in codes:
+            module = curriculum.module(code)
+            info = curriculum.module_info(code)
+            modules.append({
+                "code": code,
+                "title": module.get('title'),
+                "subject": info['subject_code'],
+                "stage": module.get('stage'),
+                "prerequisites": module.get('prerequisites', []),
+                "recommended_hours": module.get('recommended_hours')
+            })
+        return jsonify({
+            "version": curriculum.version,
+            "modules": modules,
+            "total": len(modules)
+        }), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/curriculum/modules/<module_code>', methods=['GET'])
+def get_curriculum_module(module_code):
+    """One module as defined in the curriculum JSON."""
+    if curriculum is None:
+        return jsonify({"error": "Compiled curriculum is not available"}), 503
+    module = curriculum.module(module_code)
+    if module is None:
+        return jsonify({"error": f"Module {module_code} not found"}), 404
+    return jsonify({
+        "version": curriculum.version,
+        "module": module,
+        **curriculum.module_info(module_code)
+    }), 200
+
+
 # ---------- Registration endpoints ----------
 
 @app.route('/api/register/student', methods=['POST'])
@@ -889,6 +1280,8 @@ def register_student():
             
             conn.commit()
             conn.close()
+
+            audit.record(user_id, 'register', 'app_user', user_id, {"role": "student", "locale": locale})
             
             return jsonify({
                 "user_id": str(user_id),
@@ -1106,25 +1499,20 @@ def enroll_student():
             
             if first_module:
                 # Create initial learning state
-                cur.execute("""
-                    INSERT INTO learning_state (student_id, module_id, current_lesson_type, mastery_jsonb, counters_jsonb, next_recommended)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                """, (
-                    student_id, 
-                    first_module['id'], 
-                    'concept',
-                    '{"overall":0,"concept":0,"guided":0,"independent":0,"assessment":0}',
-                    '{"concept":0,"guided":0,"independent":0,"assessment":0}',
-                    'concept'
-                ))
-                
-                learning_state_id = cur.fetchone()['id']
+                learning_state_id = insert_learning_state(
+                    cur, student_id, first_module['id'], 'concept', {}, {}, 'concept'
+                )['id']
             else:
                 learning_state_id = None
             
             conn.commit()
             conn.close()
+
+            audit.record(None, 'create', 'enrollment', enrollment_id, {
+                "student_id": student_id, "subject_code": subject_code, "stage_code": stage_code,
+                "curriculum_version": curriculum_version,
+                "first_module": first_module['code'] if first_module else None
+            })
             
             return jsonify({
                 "enrollment_id": str(enrollment_id),
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Write-behind audit logging into audit_log (migration 004).
+
+Handlers call audit_log.record(...) after their own commit; the event goes
+into a bounded in-process queue and a background writer COPYs it in
+batches, so auditing adds no database round trips to the request. When the
+queue is full the event is dropped and counted rather than blocking. A
+batch that fails to write is not dropped: it goes back to the head of the
+queue and is retried with backoff until the writer is closed.
+"""
+
+import io
+import csv
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from batch_writer import BatchWriter, register_shutdown_drain
+
+
+class AuditEvent(NamedTuple):
+    """One audited action on an entity."""
+
+    actor_user_id: Optional[str]   # app_user.id, None for anonymous/system actions
+    action: str
+    entity: str
+    entity_id: str
+    diff: Dict[str, Any]
+    created_at: datetime
+
+
+COPY_AUDIT_SQL = """
+    COPY audit_log (actor_user_id, action, entity, entity_id, diff_jsonb, created_at)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+
+def _normalize_actor(actor_user_id: Any) -> Optional[str]:
+    """Return the actor id as a canonical uuid string, or None if it is not one."""
+    if not actor_user_id:
+        return None
+    try:
+        return str(uuid.UUID(str(actor_user_id)))
+    except ValueError:
+        return None
+
+
+class AuditLog(BatchWriter):
+    """Bounded audit queue flushed to audit_log by a background writer."""
+
+    thread_name = "audit-writer"
+    # compliance data: retry failed batches rather than discard them
+    requeue_failed = True
+
+    def record(
+        self,
+        actor_user_id: Any,
+        action: str,
+        entity: str,
+        entity_id: Any,
+        diff: Optional[Dict[str, Any]] = None,
+    ) -> bool:
+        """Queue one audit event. Never raises; returns False if it was dropped."""
+        try:
+            event = AuditEvent(
+                actor_user_id=_normalize_actor(actor_user_id),
+                action=action,
+                entity=entity,
+                entity_id=str(entity_id),
+                diff=diff or {},
+                created_at=datetime.now(timezone.utc),
+            )
+            return self.offer([event])
+        except Exception as e:
+            print(f"Warning: Failed to queue audit event {action} {entity}: {e}")
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get audit queue statistics (queue depth and dropped events included)."""
+        stats = super().get_stats()
+        stats['queue_depth'] = stats['buffered']
+        stats['dropped'] = stats['rejected'] + stats['failed']
+        return stats
+
+    def _write_rows(self, cur, batch: List[AuditEvent]) -> int:
+        # actor_user_id is a FK: an unknown actor must not fail the whole batch
+        actors = list({e.actor_user_id for e in batch if e.actor_user_id})
+        known = set()
+        if actors:
+            cur.execute("SELECT id::text FROM app_user WHERE id = ANY(%s::uuid[])", (actors,))
+            known = {row[0] for row in cur.fetchall()}
+
+        buf = io.StringIO()
+        csv.writer(buf).writerows(
+            (
+                e.actor_user_id if e.actor_user_id in known else None,
+                e.action, e.entity, e.entity_id,
+                json.dumps(e.diff, ensure_ascii=False, default=str),
+                e.created_at.isoformat(),
+            )
+            for e in batch
+        )
+        buf.seek(0)
+        cur.copy_expert(COPY_AUDIT_SQL, buf)
+        return len(batch)
+
+
+def create_audit_log(connect: Callable[[], Any], **kwargs) -> AuditLog:
+    """Create an audit log that drains itself on interpreter shutdown."""
+    return register_shutdown_drain(AuditLog(connect, **kwargs))
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Bounded in-memory queue drained into Postgres by a background thread.
+
+Shared by the write-behind pipelines (telemetry into attempt, audit_log):
+request handlers only append to the queue, and a daemon writer flushes it
+in batches when a batch fills up or the flush interval elapses. The queue
+is bounded, so a slow or unavailable database turns into rejected events
+instead of unbounded memory growth or blocked requests.
+
+A batch that fails to write is counted as failed and discarded, which is
+fine for telemetry. Writers with requeue_failed (the audit log) put it back
+at the head of the queue instead and retry with exponential backoff; only
+what is still queued when the writer is closed counts as failed.
+"""
+
+import time
+import atexit
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+
+class BatchWriter:
+    """Base class: subclasses implement _write_rows(cur, batch) -> rows written."""
+
+    thread_name = "batch-writer"
+    # Stat that counts events the writer skipped on purpose (e.g. unknown ids)
+    skipped_stat = 'skipped'
+    # Put a failed batch back at the head of the queue instead of discarding it
+    requeue_failed = False
+    retry_backoff = 0.5
+    max_retry_backoff = 30.0
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        max_buffer: int = 50000,
+        batch_size: int = 1000,
+        flush_interval: float = 1.0,
+    ):
+        """Initialize buffer; the writer thread starts on first use."""
+        self._connect = connect
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._conn = None
+        self._retry_delay = 0.0
+        self._stats = {
+            'accepted': 0,
+            'rejected': 0,
+            'written': 0,
+            self.skipped_stat: 0,
+            'failed': 0,
+            'retried': 0,
+            'batches': 0,
+            'last_flush_ms': 0.0,
+        }
+
+    # ---- Producer side ----
+
+    def offer(self, events: List[Any]) -> bool:
+        """Queue a batch of events. Returns False (nothing queued) if the buffer is full."""
+        with self._cond:
+            if len(self._queue) + len(events) > self.max_buffer:
+                self._stats['rejected'] += len(events)
+                return False
+            self._queue.extend(events)
+            self._stats['accepted'] += len(events)
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+        self._ensure_started()
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get buffer statistics."""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['buffered'] = len(self._queue)
+        stats['max_buffer'] = self.max_buffer
+        stats['writer_alive'] = bool(self._thread and self._thread.is_alive())
+        return stats
+
+    # ---- Writer side ----
+
+    def _ensure_started(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+
+    def _take_batch(self) -> List[Any]:
+        batch = []
+        while self._queue and len(batch) < self.batch_size:
+            batch.append(self._queue.popleft())
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._stopping or len(self._queue) >= self.batch_size,
+                    timeout=self.flush_interval,
+                )
+            stopping = self._write_next()
+            if stopping:
+                break
+            if self._retry_delay:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._stopping, timeout=self._retry_delay)
+
+    def _write_next(self) -> bool:
+        """Take and write one batch; True once the writer is stopping and the queue is empty.
+
+        The batch is taken under the write lock, so batches are written in
+        queue order even when flush() runs next to the writer thread. A
+        stopping writer also gives up when a batch was put back: close()
+        makes the last attempt.
+        """
+        with self._write_lock:
+            with self._cond:
+                batch = self._take_batch()
+            ok = self._write_locked(batch) if batch else True
+            with self._cond:
+                return self._stopping and (not self._queue or not ok)
+
+    def flush(self) -> None:
+        """Write everything buffered right now (and wait for a batch being written), in the calling thread."""
+        while True:
+            with self._write_lock:
+                with self._cond:
+                    batch = self._take_batch()
+                if not batch or not self._write_locked(batch):
+                    return
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop the writer after draining the buffer (retrying failed batches until timeout)."""
+        deadline = time.monotonic() + timeout
+        thread = self._thread
+        if thread and thread.is_alive():
+            with self._cond:
+                self._stopping = True
+                self._cond.notify()
+            thread.join(timeout)
+        self.flush()
+        while self._queue and time.monotonic() + self._retry_delay < deadline:
+            time.sleep(self._retry_delay)
+            self.flush()
+        with self._cond:
+            lost = len(self._queue)
+            self._queue.clear()
+            self._stats['failed'] += lost
+        if lost:
+            print(f"Warning: {self.thread_name} closed with {lost} events not written")
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def _get_conn(self):
+        if self._conn is None or getattr(self._conn, 'closed', 0):
+            self._conn = self._connect()
+        return self._conn
+
+    def _write_locked(self, batch: List[Any]) -> bool:
+        """Write a batch in one transaction; False if it failed and was put back in the queue."""
+        start = time.perf_counter()
+        try:
+            conn = self._get_conn()
+            with conn.cursor() as cur:
+                written = self._write_rows(cur, batch)
+            conn.commit()
+        except Exception as e:
+            print(f"Warning: {self.thread_name} failed to write {len(batch)} events: {e}")
+            if self._conn is not None:
+                try:
+                    self._conn.rollback()
+                except Exception:
+                    self._conn = None
+            with self._cond:
+                if not self.requeue_failed:
+                    self._stats['failed'] += len(batch)
+                    return True
+                # May overfill max_buffer by one batch; offer() rejects until it drains
+                self._queue.extendleft(reversed(batch))
+                self._stats['retried'] += len(batch)
+                self._retry_delay = min(max(self._retry_delay * 2, self.retry_backoff), self.max_retry_backoff)
+            return False
+
+        self._retry_delay = 0.0
+        with self._cond:
+            self._stats['written'] += written
+            self._stats[self.skipped_stat] += len(batch) - written
+            self._stats['batches'] += 1
+            self._stats['last_flush_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        return True
+
+    def _write_rows(self, cur, batch: List[Any]) -> int:
+        raise NotImplementedError
+
+
+def register_shutdown_drain(writer: BatchWriter) -> BatchWriter:
+    """Drain the writer on interpreter shutdown."""
+    atexit.register(writer.close)
+    return writer
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks: mastery, validation, lesson cache, compiled curriculum,
+prerequisite graph, module search and fallback lesson hot paths.
+
+Every benchmark runs on fixtures built from a fixed seed, so two runs of the
+same commit measure the same work. Results are per-call timings (best and
+median of several repeats); they can be saved as a baseline JSON file and
+later runs compared against it, failing when a benchmark got slower than the
+threshold. No database or network is needed.
+
+Usage:
+    python benchmarks/bench_hot_paths.py                       # run and print
+    python benchmarks/bench_hot_paths.py --save benchmarks/baselines/hot_paths.json
+    python benchmarks/bench_hot_paths.py --compare benchmarks/baselines/hot_paths.json [--threshold 0.15]
+    python benchmarks/bench_hot_paths.py --filter mastery --quick
+"""
+
+import os
+import sys
+import json
+import random
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import timeit
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# ai_generator builds a Groq client at import time; the fallback builders never call it
+os.environ.setdefault('GROQ_API_KEY', 'benchmark-offline')
+
+from mastery_calculator import MasteryCalculatorV2
+from submission_records import records_from_dicts
+from cache_manager import LessonCache
+from ai_generator import AILessonGenerator
+from validation import (
+    validate_lesson_json,
+    validate_api_request_generate_lesson,
+    validate_api_request_next_lesson,
+    validate_api_request_submission,
+    validate_api_request_telemetry,
+)
+from schema_registry import registry as schema_registry
+from curriculum_lint import DEFAULT_CURRICULUM_DIR, discover
+from curriculum_store import CompiledCurriculum, compile_curriculum
+from prerequisite_graph import PrerequisiteGraph
+from module_search import ModuleSearchIndex
+
+
+BASELINE_FORMAT = 1
+SEED = 20240601
+STUDENT_ID = '6f1c2a4e-8b3d-4e5f-9a7b-1c2d3e4f5a6b'
+MODULE_CODE = 'module_math_numbers_primary'
+LESSON_TYPES = ('concept', 'guided', 'independent', 'assessment')
+CACHE_PAYLOAD_BLOCKS = {'small': 2, 'medium': 40, 'large': 600}
+
+
+# ---------- Fixtures ----------
+
+def make_history(rng, n=20):
+    """Newest-first submission history like create_submission reads it."""
+    t = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    rows = []
+    for _ in range(n):
+        t += timedelta(seconds=rng.randint(3600, 3 * 86400))
+        rows.append({'score': round(rng.random(), 2), 'created_at': t, 'lesson_type': rng.choice(LESSON_TYPES)})
+    return rows[::-1]
+
+
+def make_lesson(rng, blocks):
+    """Lesson JSON with the given number of blocks (mixed block types)."""
+    body = []
+    for i in range(blocks):
+        if i % 3 == 2:
+            body.append({'type': 'interactive', 'content': {
+                'type': 'mcq',
+                'question': f'Вопрос {i}: сколько будет {rng.randint(1, 9)} + {rng.randint(1, 9)}?',
+                'options': [str(rng.randint(2, 18)) for _ in range(4)],
+                'correct': rng.randint(0, 3),
+                'explanation': 'Сложите числа по порядку.',
+            }})
+        else:
+            body.append({'type': ('theory', 'example')[i % 2], 'content': {
+                'title': f'Раздел {i}',
+                'text': ' '.join(rng.choice(('число', 'счёт', 'пример', 'сумма', 'разряд')) for _ in range(60)),
+            }})
+    return {'id': f'lesson_{MODULE_CODE}_concept_01', 'type': 'concept', 'title': 'Числа и счёт',
+            'locale': 'ru', 'blocks': body}
+
+
+def make_requests(rng):
+    return {
+        'generate': {'module_code': MODULE_CODE, 'lesson_type': 'guided', 'student_id': STUDENT_ID, 'locale': 'ru'},
+        'next': {'module_code': MODULE_CODE, 'student_id': STUDENT_ID},
+        'submission': {'student_id': STUDENT_ID, 'module_code': MODULE_CODE, 'lesson_id': 'lesson_guided_01',
+                       'task_id': 't1', 'kind': 'practice', 'score': 0.75,
+                       'answer_jsonb': {'answers': [rng.randint(0, 3) for _ in range(10)]},
+                       'idempotency_key': 'bench-key-0001'},
+        'telemetry': {'student_id': STUDENT_ID, 'module_code': MODULE_CODE, 'events': [
+            {'lesson_id': 'lesson_guided_01', 'interactive_id': f'w{i}', 'payload': {'step': i},
+             'score': round(rng.random(), 2), 'created_at': '2025-03-01T10:00:00Z'}
+            for i in range(100)
+        ]},
+    }
+
+
+MODULE_DATA = {'code': MODULE_CODE, 'title': 'Numbers and Counting', 'subject': 'Mathematics', 'stage': 'Primary'}
+
+
+# ---------- Benchmarks ----------
+
+def build_benchmarks(tmp_root):
+    """name -> zero-argument callable; fixtures are built here, outside the timed code."""
+    rng = random.Random(SEED)
+    calc = MasteryCalculatorV2()
+    history = make_history(rng)
+    records = records_from_dicts(history)
+    mastery = {'concept': 0.62, 'guided': 0.48, 'independent': 0.21, 'assessment': 0.0,
+               'overall': 0.36, 'total_submissions': 14}
+    counters = {'concept': 5, 'guided': 6, 'independent': 3, 'assessment': 0}
+    mix = {'concept': 0.3, 'guided': 0.3, 'independent': 0.25, 'assessment': 0.15}
+    requests = make_requests(rng)
+    lesson_small, lesson_large = make_lesson(rng, 3), make_lesson(rng, 60)
+    diagnostic = schema_registry.get('diagnostic')
+    with open(os.path.join(os.path.dirname(__file__), '..', 'templates', 'diagnostic_sample_10yo.json'),
+              encoding='utf-8') as f:
+        diagnostic_sample = json.load(f)
+
+    benches = {
+        'mastery.lesson_mastery[dict-20]': lambda: calc.lesson_mastery(history, 'guided', 420, 0.8),
+        'mastery.lesson_mastery[records-20]': lambda: calc.lesson_mastery(records, 'guided', 420, 0.8),
+        'mastery.update_mastery_ema': lambda: calc.update_mastery_ema(mastery, 'guided', 0.71, 14),
+        'mastery.recommend_next_lesson_type': lambda: calc.recommend_next_lesson_type(mastery, mix, counters),
+        'validation.validate_lesson_json[3-blocks]': lambda: validate_lesson_json(lesson_small),
+        'validation.validate_lesson_json[60-blocks]': lambda: validate_lesson_json(lesson_large),
+        'validation.request_generate_lesson': lambda: validate_api_request_generate_lesson(requests['generate']),
+        'validation.request_next_lesson': lambda: validate_api_request_next_lesson(requests['next']),
+        'validation.request_submission': lambda: validate_api_request_submission(requests['submission']),
+        'validation.request_telemetry[100-events]': lambda: validate_api_request_telemetry(requests['telemetry']),
+        'validation.schema_diagnostic[sample]': lambda: diagnostic.validate(diagnostic_sample),
+    }
+
+    # compiled curriculum: map + first lookup vs parsing the JSON tree
+    artifact = os.path.join(tmp_root, 'curriculum.bin')
+    compile_curriculum(DEFAULT_CURRICULUM_DIR, artifact)
+    sources = [os.path.join(DEFAULT_CURRICULUM_DIR, rel) for _, rel in discover(DEFAULT_CURRICULUM_DIR)]
+    curriculum = CompiledCurriculum(artifact)
+    curriculum.module(MODULE_CODE)
+
+    def parse_sources():
+        for path in sources:
+            with open(path, 'rb') as f:
+                json.loads(f.read())
+
+    def open_and_lookup():
+        compiled = CompiledCurriculum(artifact)
+        compiled.module(MODULE_CODE)
+        compiled.close()
+
+    benches['curriculum.parse_json[all-files]'] = parse_sources
+    benches['curriculum.open_artifact[+1-module]'] = open_and_lookup
+    benches['curriculum.module[decoded]'] = lambda: curriculum.module(MODULE_CODE)
+    benches['curriculum.select[subject+stage]'] = \
+        lambda: curriculum.select(subject='Mathematics', stage='stage_primary')
+
+    # prerequisite graph: build once per process, then one O(modules) pass per student
+    graph = PrerequisiteGraph.from_curriculum(curriculum)
+    rng = random.Random(SEED)
+    student_mastery = {code: rng.random() for code in rng.sample(graph.codes, 40)}
+    benches['prerequisites.build[curriculum]'] = lambda: PrerequisiteGraph.from_curriculum(curriculum)
+    benches['prerequisites.recommend[40-states]'] = lambda: graph.recommend(student_mastery, 0.8)
+
+    # in-memory module search (the database-free fallback of /api/modules/search)
+    search_index = ModuleSearchIndex.from_curriculum(curriculum)
+    benches['module_search.build[curriculum]'] = lambda: ModuleSearchIndex.from_curriculum(curriculum)
+    benches['module_search.query[2-words]'] = lambda: search_index.search('решение уравнений')
+    benches['module_search.query[1-char-prefix]'] = lambda: search_index.search('a')
+
+    # the fallback builders don't touch the Groq client
+    generator = object.__new__(AILessonGenerator)
+    for lesson_type in ('concept', 'guided', 'independent'):
+        build = getattr(generator, f'_create_fallback_{lesson_type}_lesson')
+        benches[f'ai_generator.fallback_{lesson_type}'] = lambda build=build: build(MODULE_DATA, 'ru')
+
+    # LessonCache on every available storage backend: disk, and tmpfs when present
+    backends = {'disk': tmp_root}
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        backends['tmpfs'] = tempfile.mkdtemp(prefix='bench_cache_', dir='/dev/shm')
+    for backend, root in backends.items():
+        for size, blocks in CACHE_PAYLOAD_BLOCKS.items():
+            cache = LessonCache(os.path.join(root, f'cache_{size}'))
+            lesson = make_lesson(rng, blocks)
+            cache.save_lesson_to_cache(MODULE_CODE, 'concept', lesson)
+            benches[f'cache.get[{backend}-{size}]'] = lambda cache=cache: cache.get_cached_lesson(MODULE_CODE, 'concept')
+            benches[f'cache.save[{backend}-{size}]'] = \
+                lambda cache=cache, lesson=lesson: cache.save_lesson_to_cache(MODULE_CODE, 'guided', lesson)
+    return benches, [root for backend, root in backends.items() if backend != 'disk']
+
+
+def measure(func, repeats, min_time):
+    """Per-call seconds of each repeat; the loop count is calibrated to min_time per repeat."""
+    timer = timeit.Timer(func)
+    number = 1
+    while True:
+        if timer.timeit(number) >= min_time:
+            break
+        number *= 2
+    return [t / number for t in timer.repeat(repeat=repeats, number=number)], number
+
+
+# ---------- Baselines ----------
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+
+
+def compare(results, baseline, threshold):
+    """Rows of (name, baseline ns, current ns, ratio, regressed) for benchmarks present in both."""
+    rows = []
+    for name, current in results.items():
+        base = baseline['results'].get(name)
+        if not base:
+            continue
+        ratio = current['best_ns'] / base['best_ns']
+        rows.append((name, base['best_ns'], current['best_ns'], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--filter', help='run only benchmarks whose name contains this substring')
+    parser.add_argument('--repeats', type=int, default=7)
+    parser.add_argument('--min-time', type=float, default=0.05, help='seconds per repeat')
+    parser.add_argument('--quick', action='store_true', help='3 repeats of 0.01s (smoke run)')
+    parser.add_argument('--save', help='write results as a baseline JSON file')
+    parser.add_argument('--compare', help='baseline JSON file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15, help='allowed slowdown before failing (0.15 = 15%%)')
+    args = parser.parse_args()
+    if args.quick:
+        args.repeats, args.min_time = 3, 0.01
+
+    tmp_root = tempfile.mkdtemp(prefix='bench_cache_')
+    benches, extra_roots = build_benchmarks(tmp_root)
+    results = {}
+    print(f"{'benchmark':<48}{'best':>15}{'median':>15}")
+    try:
+        for name, func in benches.items():
+            if args.filter and args.filter not in name:
+                continue
+            times, number = measure(func, args.repeats, args.min_time)
+            results[name] = {
+                'best_ns': round(min(times) * 1e9, 1),
+                'median_ns': round(statistics.median(times) * 1e9, 1),
+                'loops': number,
+                'repeats': len(times),
+            }
+            print(f"{name:<48}{results[name]['best_ns'] / 1000:>12.2f} µs{results[name]['median_ns'] / 1000:>12.2f} µs")
+    finally:
+        for root in [tmp_root, *extra_roots]:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'format': BASELINE_FORMAT, 'environment': environment(), 'results': results}, f, indent=2)
+            f.write('\n')
+        print(f"✅ Baseline written to {args.save}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('format') != BASELINE_FORMAT:
+            print(f"❌ Unsupported baseline format: {baseline.get('format')}")
+            sys.exit(2)
+        env = baseline.get('environment', {})
+        print(f"\nvs baseline {env.get('commit')} (Python {env.get('python')}, {env.get('machine')}):")
+        rows = compare(results, baseline, args.threshold)
+        for name, base_ns, cur_ns, ratio, regressed in rows:
+            mark = '❌' if regressed else ('🚀' if ratio < 1 - args.threshold else '  ')
+            print(f"{mark} {name:<48}{base_ns / 1000:>10.2f} → {cur_ns / 1000:>8.2f} µs  ({ratio:.2f}x)")
+        regressions = [row for row in rows if row[4]]
+        if regressions:
+            print(f"❌ {len(regressions)} benchmark(s) slower than baseline by more than {args.threshold:.0%}")
+            sys.exit(1)
+        print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Benchmark: learning_state write throughput, JSONB+GIN layout vs typed columns.
+
+Builds two scratch tables in the configured database — the pre-008 layout
+(mastery_jsonb/counters_jsonb with GIN indexes) and the typed-column layout —
+seeds them with the same rows and replays the read-modify-write that
+POST /api/submissions performs on learning_state. Reports writes/sec and WAL
+bytes per write; the tables are dropped afterwards.
+
+Usage: python benchmarks/bench_learning_state_writes.py [--rows 20000] [--updates 5000]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from mastery_calculator import update_learning_mastery_v2
+from learning_state_store import MASTERY_COLUMNS, COUNTER_COLUMNS
+
+
+def get_db_connection():
+    """Get database connection from environment variables."""
+    return psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=os.getenv('DB_PORT', '5432'),
+        database=os.getenv('DB_NAME', 'ayaal_teacher'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', '')
+    )
+
+
+LEGACY_DDL = """
+    CREATE TABLE bench_ls_legacy (
+      id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+      student_id INT NOT NULL,
+      module_id INT NOT NULL,
+      mastery_jsonb JSONB NOT NULL DEFAULT '{"overall":0}'::jsonb,
+      counters_jsonb JSONB NOT NULL DEFAULT '{}'::jsonb,
+      next_recommended TEXT,
+      updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+      UNIQUE (student_id, module_id)
+    );
+    CREATE INDEX ON bench_ls_legacy (student_id, module_id);
+    CREATE INDEX ON bench_ls_legacy USING GIN (mastery_jsonb);
+    CREATE INDEX ON bench_ls_legacy USING GIN (counters_jsonb);
+"""
+
+TYPED_DDL = """
+    CREATE TABLE bench_ls_typed (
+      id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+      student_id INT NOT NULL,
+      module_id INT NOT NULL,
+      mastery_overall DOUBLE PRECISION NOT NULL DEFAULT 0,
+      mastery_concept DOUBLE PRECISION NOT NULL DEFAULT 0,
+      mastery_guided DOUBLE PRECISION NOT NULL DEFAULT 0,
+      mastery_independent DOUBLE PRECISION NOT NULL DEFAULT 0,
+      mastery_assessment DOUBLE PRECISION NOT NULL DEFAULT 0,
+      mastery_total_submissions INT,
+      mastery_updated_at TIMESTAMP,
+      count_concept INT NOT NULL DEFAULT 0,
+      count_guided INT NOT NULL DEFAULT 0,
+      count_independent INT NOT NULL DEFAULT 0,
+      count_assessment INT NOT NULL DEFAULT 0,
+      next_recommended TEXT,
+      updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+      UNIQUE (student_id, module_id)
+    );
+    CREATE INDEX ON bench_ls_typed (module_id, mastery_overall);
+"""
+
+MODULES_PER_STUDENT = 10
+LESSON_TYPES = ('concept', 'guided', 'independent', 'assessment')
+
+
+def seed(cur, rows):
+    """Insert the same (student, module) grid into both tables."""
+    students = max(1, rows // MODULES_PER_STUDENT)
+    cur.execute("""
+        INSERT INTO bench_ls_legacy (student_id, module_id)
+        SELECT s, m FROM generate_series(1, %s) s, generate_series(1, %s) m
+    """, (students, MODULES_PER_STUDENT))
+    cur.execute("""
+        INSERT INTO bench_ls_typed (student_id, module_id)
+        SELECT s, m FROM generate_series(1, %s) s, generate_series(1, %s) m
+    """, (students, MODULES_PER_STUDENT))
+    cur.execute("ANALYZE bench_ls_legacy")
+    cur.execute("ANALYZE bench_ls_typed")
+    return students
+
+
+def wal_lsn(cur):
+    cur.execute("SELECT pg_current_wal_lsn()")
+    return cur.fetchone()[0]
+
+
+def wal_bytes(cur, since):
+    cur.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), %s)", (since,))
+    return int(cur.fetchone()[0])
+
+
+def run_legacy(conn, keys):
+    with conn.cursor() as cur:
+        lsn = wal_lsn(cur)
+        start = time.perf_counter()
+        for n, (student_id, module_id, lesson_type, value) in enumerate(keys):
+            cur.execute("""
+                SELECT mastery_jsonb, counters_jsonb FROM bench_ls_legacy
+                WHERE student_id = %s AND module_id = %s
+            """, (student_id, module_id))
+            mastery, counters = cur.fetchone()
+            mastery = update_learning_mastery_v2(mastery, lesson_type, value, n)
+            counters[lesson_type] = counters.get(lesson_type, 0) + 1
+            cur.execute("""
+                UPDATE bench_ls_legacy
+                SET mastery_jsonb = %s, counters_jsonb = %s,
+                    next_recommended = %s, updated_at = now()
+                WHERE student_id = %s AND module_id = %s
+            """, (json.dumps(mastery), json.dumps(counters), lesson_type, student_id, module_id))
+            conn.commit()
+        elapsed = time.perf_counter() - start
+        return elapsed, wal_bytes(cur, lsn)
+
+
+def run_typed(conn, keys):
+    mastery_cols = list(MASTERY_COLUMNS.items())
+    counter_cols = list(COUNTER_COLUMNS.items())
+    select_cols = ", ".join(col for _, col in mastery_cols + counter_cols)
+    assignments = ", ".join(f"{col} = %s" for _, col in mastery_cols + counter_cols)
+    with conn.cursor() as cur:
+        lsn = wal_lsn(cur)
+        start = time.perf_counter()
+        for n, (student_id, module_id, lesson_type, value) in enumerate(keys):
+            cur.execute(f"""
+                SELECT {select_cols} FROM bench_ls_typed
+                WHERE student_id = %s AND module_id = %s
+            """, (student_id, module_id))
+            row = cur.fetchone()
+            mastery = {key: row[i] for i, (key, _) in enumerate(mastery_cols)}
+            counters = {key: row[len(mastery_cols) + i] for i, (key, _) in enumerate(counter_cols)}
+            mastery = update_learning_mastery_v2(mastery, lesson_type, value, n)
+            counters[lesson_type] += 1
+            cur.execute(f"""
+                UPDATE bench_ls_typed
+                SET {assignments}, mastery_total_submissions = %s, mastery_updated_at = now(),
+                    next_recommended = %s, updated_at = now()
+                WHERE student_id = %s AND module_id = %s
+            """, (
+                *[mastery[key] for key, _ in mastery_cols],
+                *[counters[key] for key, _ in counter_cols],
+                n, lesson_type, student_id, module_id
+            ))
+            conn.commit()
+        elapsed = time.perf_counter() - start
+        return elapsed, wal_bytes(cur, lsn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000, help='learning_state rows per table')
+    parser.add_argument('--updates', type=int, default=5000, help='submissions to replay')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS bench_ls_legacy, bench_ls_typed")
+            cur.execute(LEGACY_DDL)
+            cur.execute(TYPED_DDL)
+            students = seed(cur, args.rows)
+        conn.commit()
+
+        rng = random.Random(args.seed)
+        keys = [
+            (rng.randint(1, students), rng.randint(1, MODULES_PER_STUDENT),
+             rng.choice(LESSON_TYPES), round(rng.random(), 3))
+            for _ in range(args.updates)
+        ]
+
+        legacy_sec, legacy_wal = run_legacy(conn, keys)
+        typed_sec, typed_wal = run_typed(conn, keys)
+
+        n = len(keys)
+        print(f"learning_state rows: {students * MODULES_PER_STUDENT}, submissions replayed: {n}")
+        print(f"{'layout':<24}{'seconds':>10}{'writes/sec':>14}{'WAL B/write':>14}")
+        print(f"{'jsonb + GIN (before)':<24}{legacy_sec:>10.2f}{n / legacy_sec:>14.0f}{legacy_wal / n:>14.0f}")
+        print(f"{'typed columns (after)':<24}{typed_sec:>10.2f}{n / typed_sec:>14.0f}{typed_wal / n:>14.0f}")
+        print(f"speedup: {legacy_sec / typed_sec:.2f}x, WAL reduction: {legacy_wal / max(1, typed_wal):.2f}x")
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS bench_ls_legacy, bench_ls_typed")
+        conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
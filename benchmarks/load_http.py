@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+End-to-end HTTP load test of the API against a local Postgres.
+
+With --setup the database is (re)created, migrated from db/migrations,
+seeded with the curriculum (scripts/setup_database.py) and filled with
+synthetic parents, students, enrollments, learning_state and submission
+history. The API is then started in a subprocess with the offline LLM
+stand-in (AI_OFFLINE) and per-request statement counting
+(API_COUNT_STATEMENTS), and concurrent clients drive a weighted mix of
+/api/login, /api/next, /api/lessons/generate, /api/submissions and
+/api/mastery/<id>. For every concurrency level the harness reports
+throughput, p50/p95/p99 latency and SQL statements per request by route;
+running several levels gives the scaling curve.
+
+Usage:
+    python benchmarks/load_http.py --setup --students 2000
+    python benchmarks/load_http.py --clients 1,4,16 --duration 30 --out load.json
+    python benchmarks/load_http.py --url http://127.0.0.1:3000 --mix login=1,submit=10
+
+The target database is LOAD_DB_NAME (default ayaal_teacher_load), not the
+API's DB_NAME, so a shell set up for the API never points the harness at the
+development database. --setup drops and recreates it, and refuses any name
+that does not end in _load.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import signal
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import psycopg2
+from werkzeug.security import generate_password_hash
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+
+from statement_counter import STATEMENTS_HEADER
+
+
+LOAD_PASSWORD = 'loadtest-password'
+EMAIL_DOMAIN = 'loadtest.local'
+DEFAULT_MIX = {'login': 1, 'next': 4, 'generate': 2, 'submit': 6, 'mastery': 2}
+LESSON_TYPES = ('concept', 'guided', 'independent', 'assessment')
+
+
+def db_params(database=None):
+    return dict(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=os.getenv('DB_PORT', '5432'),
+        database=database or os.getenv('LOAD_DB_NAME', 'ayaal_teacher_load'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', '')
+    )
+
+
+# ---------- Setup ----------
+
+def recreate_database(name):
+    if not name.endswith('_load'):
+        raise RuntimeError(f"refusing to drop {name}: the load-test database name must end in _load")
+    conn = psycopg2.connect(**db_params('postgres'))
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE datname = %s AND pid <> pg_backend_pid()", (name,))
+            cur.execute(f'DROP DATABASE IF EXISTS "{name}"')
+            cur.execute(f"CREATE DATABASE \"{name}\" ENCODING 'UTF8' TEMPLATE template0")
+    finally:
+        conn.close()
+
+
+SEED_SQL = """
+    CREATE TEMP TABLE load_module AS
+    SELECT row_number() OVER (ORDER BY m.code) AS idx, m.id, m.subject_id, m.stage_id
+    FROM module m ORDER BY m.code LIMIT %(modules)s;
+
+    INSERT INTO app_user (email, password_hash, role, locale)
+    SELECT format('load-parent-%%s@{domain}', g), %(hash)s, 'parent', 'ru'
+    FROM generate_series(1, %(parents)s) g;
+
+    INSERT INTO app_user (email, password_hash, role, locale)
+    SELECT format('load-student-%%s@{domain}', g), %(hash)s, 'student', 'ru'
+    FROM generate_series(1, %(students)s) g;
+
+    CREATE TEMP TABLE load_student AS
+    SELECT substring(u.email FROM 'load-student-(\\d+)@')::int AS n, u.id AS user_id, gen_random_uuid() AS student_id
+    FROM app_user u WHERE u.email LIKE 'load-student-%%';
+
+    INSERT INTO student (id, user_id, parent_user_id, grade_hint)
+    SELECT ls.student_id, ls.user_id, p.id, 'load'
+    FROM load_student ls
+    JOIN app_user p ON p.email = format('load-parent-%%s@{domain}', 1 + (ls.n - 1) %% %(parents)s);
+
+    INSERT INTO parent_link (student_id, parent_user_id, relation)
+    SELECT s.id, s.parent_user_id, 'parent' FROM student s JOIN load_student ls ON ls.student_id = s.id;
+
+    -- every student studies one module, round-robin over the first N modules
+    CREATE TEMP TABLE load_assignment AS
+    SELECT ls.student_id, m.id AS module_id, m.subject_id, m.stage_id
+    FROM load_student ls
+    JOIN load_module m ON m.idx = 1 + (ls.n - 1) %% (SELECT count(*) FROM load_module);
+
+    INSERT INTO enrollment (student_id, subject_id, stage_id, curriculum_version)
+    SELECT student_id, subject_id, stage_id, '1.0.0' FROM load_assignment;
+
+    INSERT INTO learning_state (student_id, module_id, current_lesson_type, next_recommended)
+    SELECT student_id, module_id, 'concept', 'concept' FROM load_assignment;
+
+    INSERT INTO submission (student_id, module_id, lesson_id, task_id, kind, answer_jsonb, score, created_at)
+    SELECT a.student_id, a.module_id,
+           format('lesson_%%s_01', (ARRAY['concept','guided','independent','assessment'])[1 + g %% 4]),
+           format('task_%%s', g), 'practice', '{{}}'::jsonb, round(random()::numeric, 2),
+           now() - random() * interval '60 days'
+    FROM load_assignment a, generate_series(1, %(submissions)s) g;
+
+    ANALYZE;
+""".format(domain=EMAIL_DOMAIN)
+
+
+def setup(args):
+    name = db_params()['database']
+    print(f"🧱 Recreating database {name}")
+    recreate_database(name)
+    os.environ['DB_NAME'] = name
+
+    import setup_database
+    if not (setup_database.run_migrations() and setup_database.seed_database() and setup_database.import_modules()):
+        raise RuntimeError("database setup failed")
+
+    start = time.perf_counter()
+    conn = psycopg2.connect(**db_params())
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SEED_SQL, {
+                'modules': args.modules,
+                'students': args.students,
+                'parents': max(1, args.students // 2),
+                'submissions': args.submissions_per_student,
+                'hash': generate_password_hash(LOAD_PASSWORD),
+            })
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"🌱 Seeded {args.students} students, {args.students * args.submissions_per_student} submissions "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+def load_users():
+    """(user_id, email, module_code) of every synthetic student."""
+    conn = psycopg2.connect(**db_params())
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT u.id::text, u.email, m.code
+                FROM app_user u
+                JOIN student s ON s.user_id = u.id
+                JOIN learning_state ls ON ls.student_id = s.id
+                JOIN module m ON m.id = ls.module_id
+                WHERE u.email LIKE %s
+            """, (f"load-student-%@{EMAIL_DOMAIN}",))
+            return cur.fetchall()
+    finally:
+        conn.close()
+
+
+# ---------- API server ----------
+
+def start_server(port, llm_latency_ms):
+    params = db_params()
+    env = dict(
+        os.environ,
+        DB_NAME=params['database'], DB_HOST=params['host'], DB_PORT=str(params['port']),
+        DB_USER=params['user'], DB_PASSWORD=params['password'],
+        API_COUNT_STATEMENTS='1', AI_OFFLINE='1', AI_OFFLINE_LATENCY_MS=str(llm_latency_ms),
+        PYTHONPATH=ROOT,
+    )
+    # separate working directory so the lesson cache starts empty
+    workdir = tempfile.mkdtemp(prefix='load_api_')
+    proc = subprocess.Popen(
+        [sys.executable, '-c', f"import api; api.app.run(host='127.0.0.1', port={port}, threaded=True)"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"API exited: {proc.stderr.read().decode(errors='replace')[-2000:]}")
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/api/health')
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("API did not become healthy within 30s")
+
+
+# ---------- Load generation ----------
+
+def build_request(route, rng, user):
+    user_id, email, module_code = user
+    if route == 'login':
+        return 'POST', '/api/login', {'email': email, 'password': LOAD_PASSWORD}
+    if route == 'next':
+        return 'POST', '/api/next', {'student_id': user_id, 'module_code': module_code}
+    if route == 'generate':
+        return 'POST', '/api/lessons/generate', {
+            'module_code': module_code, 'student_id': user_id, 'use_ai': True,
+            'lesson_type': rng.choice(('concept', 'guided', 'independent')),
+        }
+    if route == 'submit':
+        lesson_type = rng.choice(LESSON_TYPES)
+        return 'POST', '/api/submissions', {
+            'student_id': user_id, 'module_code': module_code,
+            'lesson_id': f"lesson_{module_code}_{lesson_type}_01", 'task_id': f"task_{rng.randint(1, 20)}",
+            'kind': 'practice', 'score': round(rng.random(), 2),
+            'answer_jsonb': {'answer': rng.randint(0, 3)}, 'time_spent': rng.randint(60, 1500),
+        }
+    if route == 'mastery':
+        return 'GET', f'/api/mastery/{user_id}', None
+    raise ValueError(f"Unknown route: {route}")
+
+
+def client_loop(host, port, users, mix, stop_at, seed, samples):
+    rng = random.Random(seed)
+    routes, weights = list(mix), list(mix.values())
+    conn = http.client.HTTPConnection(host, port, timeout=60)
+    while time.perf_counter() < stop_at:
+        route = rng.choices(routes, weights)[0]
+        method, path, body = build_request(route, rng, rng.choice(users))
+        payload = json.dumps(body) if body is not None else None
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=payload, headers={'Content-Type': 'application/json'})
+            resp = conn.getresponse()
+            resp.read()
+            status, statements = resp.status, resp.getheader(STATEMENTS_HEADER)
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=60)
+            status, statements = 0, None
+        samples.append((route, status, time.perf_counter() - start,
+                        int(statements) if statements is not None else None))
+    conn.close()
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def summarize(samples, elapsed):
+    by_route = defaultdict(list)
+    for sample in samples:
+        by_route[sample[0]].append(sample)
+    by_route['ALL'] = samples
+
+    report = {}
+    for route, rows in by_route.items():
+        latencies = sorted(r[2] * 1000 for r in rows)
+        statements = [r[3] for r in rows if r[3] is not None]
+        report[route] = {
+            'requests': len(rows),
+            'errors': sum(1 for r in rows if not 200 <= r[1] < 300),
+            'rps': round(len(rows) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'statements_per_request': round(sum(statements) / len(statements), 2) if statements else None,
+        }
+    return report
+
+
+def run_level(url, users, clients, duration, mix, seed):
+    parsed = urlparse(url)
+    per_client = [[] for _ in range(clients)]
+    stop_at = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=client_loop, args=(parsed.hostname, parsed.port or 80, users, mix,
+                                                   stop_at, seed + i, per_client[i]), daemon=True)
+        for i in range(clients)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return summarize([s for samples in per_client for s in samples], elapsed)
+
+
+def print_level(clients, report):
+    print(f"\n👥 {clients} clients")
+    print(f"{'route':<10}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'stmts/req':>11}")
+    for route in sorted(report, key=lambda r: (r == 'ALL', r)):
+        r = report[route]
+        stmts = f"{r['statements_per_request']:.1f}" if r['statements_per_request'] is not None else '-'
+        print(f"{route:<10}{r['requests']:>10}{r['errors']:>8}{r['rps']:>10.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{stmts:>11}")
+
+
+def parse_mix(text):
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(','):
+        route, _, weight = part.partition('=')
+        if route not in DEFAULT_MIX:
+            raise ValueError(f"Unknown route in mix: {route} (choose from {', '.join(DEFAULT_MIX)})")
+        mix[route] = float(weight or 1)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP load test of the API against a local Postgres.")
+    parser.add_argument('--setup', action='store_true', help='recreate, migrate and seed the database first')
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--submissions-per-student', type=int, default=20)
+    parser.add_argument('--modules', type=int, default=20, help='modules the students are spread over')
+    parser.add_argument('--url', help='load an already running API instead of starting one')
+    parser.add_argument('--port', type=int, default=3100)
+    parser.add_argument('--clients', default='1,4,16', help='comma-separated concurrency levels')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds per concurrency level')
+    parser.add_argument('--mix', help=f"route weights, e.g. {','.join(f'{k}={v}' for k, v in DEFAULT_MIX.items())}")
+    parser.add_argument('--llm-latency-ms', type=float, default=0.0, help='simulated LLM latency of the offline stand-in')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help='write the report as JSON')
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+        levels = [int(c) for c in args.clients.split(',')]
+    except ValueError as e:
+        parser.error(str(e))
+
+    server = None
+    try:
+        if args.setup:
+            setup(args)
+        users = load_users()
+        if not users:
+            print("❌ No synthetic students found; run with --setup first")
+            sys.exit(1)
+
+        url = args.url
+        if not url:
+            server = start_server(args.port, args.llm_latency_ms)
+            url = f"http://127.0.0.1:{args.port}"
+        print(f"🚦 {url}: {len(users)} students, mix {mix}, {args.duration:.0f}s per level")
+
+        results = []
+        for clients in levels:
+            report = run_level(url, users, clients, args.duration, mix, args.seed)
+            print_level(clients, report)
+            results.append({'clients': clients, 'routes': report})
+    finally:
+        if server:
+            server.send_signal(signal.SIGINT)
+            try:
+                server.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    print("\n📈 Scaling curve")
+    print(f"{'clients':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for level in results:
+        total = level['routes']['ALL']
+        print(f"{level['clients']:>8}{total['rps']:>10.1f}{total['p50_ms']:>10.1f}"
+              f"{total['p95_ms']:>10.1f}{total['p99_ms']:>10.1f}{total['errors']:>8}")
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'database': db_params()['database'], 'students': len(users), 'mix': mix,
+                       'duration_sec': args.duration, 'levels': results}, f, indent=2)
+        print(f"✅ Report written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
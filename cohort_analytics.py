@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Class and cohort analytics over learning_state.
+
+A cohort is a set of students (app_user ids), the students enrolled in a
+subject/stage, or both. Its learning_state rows are read in one query and
+rolled up with NumPy, grouped by module:
+
+  * distribution of overall mastery (mean, quartiles, histogram, completed);
+  * mean per-lesson-type mastery;
+  * an objective heatmap: submissions are not tagged with objectives, so each
+    objective is scored with the lesson-type mastery that matches its Bloom
+    level (remember/understand -> concept, apply -> guided, analyze ->
+    independent, evaluate/create -> assessment);
+  * struggling students: below a threshold of overall mastery after at least
+    a few submissions, per module and across the cohort.
+"""
+
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from learning_state_store import COMPLETED_MASTERY, TRACKED_LESSON_TYPES
+
+
+HISTOGRAM_BINS = 10
+STRUGGLING_THRESHOLD = 0.4
+# untouched modules (no submissions yet) are not "struggling"
+STRUGGLING_MIN_SUBMISSIONS = 3
+STRUGGLING_LIMIT = 20
+
+BLOOM_LESSON_TYPE = {
+    'remember': 'concept',
+    'understand': 'concept',
+    'apply': 'guided',
+    'analyze': 'independent',
+    'evaluate': 'assessment',
+    'create': 'assessment',
+}
+
+
+class CohortRows(NamedTuple):
+    """learning_state of a cohort as column arrays, one entry per row."""
+
+    student_ids: np.ndarray   # (rows,) app_user ids, str
+    module_codes: np.ndarray  # (rows,) str
+    overall: np.ndarray       # (rows,)
+    by_type: np.ndarray       # (rows, 4) mastery per lesson type, TRACKED_LESSON_TYPES order
+    submissions: np.ndarray   # (rows,) total submissions, 0 when unknown
+
+
+def _cohort_filter(
+    student_ids: Optional[Sequence[str]],
+    subject_code: Optional[str],
+    stage_code: Optional[str],
+) -> tuple:
+    if not student_ids and not (subject_code and stage_code):
+        raise ValueError("A cohort needs student_ids or a subject and stage")
+    where, params = [], {}
+    if student_ids:
+        where.append("stud.user_id = ANY(%(student_ids)s::uuid[])")
+        params['student_ids'] = list(student_ids)
+    if subject_code and stage_code:
+        # subject/stage resolved first: the plan starts from the cohort's modules
+        # and a hashed set of enrolled students
+        where.append("""m.subject_id = (SELECT id FROM subject WHERE LOWER(code) = LOWER(%(subject)s))
+          AND m.stage_id = (SELECT id FROM stage WHERE LOWER(code) = LOWER(%(stage)s))
+          AND ls.student_id IN (
+            SELECT e.student_id FROM enrollment e
+            WHERE e.status = 'active'
+              AND e.subject_id = (SELECT id FROM subject WHERE LOWER(code) = LOWER(%(subject)s))
+              AND e.stage_id = (SELECT id FROM stage WHERE LOWER(code) = LOWER(%(stage)s))
+          )""")
+        params.update(subject=subject_code, stage=stage_code)
+    return " AND ".join(where), params
+
+
+def fetch_cohort_rows(
+    cur,
+    student_ids: Optional[Sequence[str]] = None,
+    subject_code: Optional[str] = None,
+    stage_code: Optional[str] = None,
+) -> CohortRows:
+    """All learning_state rows of the cohort in one query (plain tuple cursor)."""
+    where, params = _cohort_filter(student_ids, subject_code, stage_code)
+    cur.execute(f"""
+        SELECT stud.user_id::text, m.code,
+               ls.mastery_overall, ls.mastery_concept, ls.mastery_guided,
+               ls.mastery_independent, ls.mastery_assessment,
+               COALESCE(ls.mastery_total_submissions, 0)
+        FROM learning_state ls
+        JOIN student stud ON ls.student_id = stud.id
+        JOIN module m ON ls.module_id = m.id
+        WHERE {where}
+    """, params)
+    rows = cur.fetchall()
+    if not rows:
+        empty = np.empty(0)
+        return CohortRows(empty.astype(object), empty.astype(object), empty, np.empty((0, 4)), empty.astype(np.int64))
+    student, module, *values = zip(*rows)
+    values = np.array(values, dtype=np.float64)
+    return CohortRows(
+        student_ids=np.array(student, dtype=object),
+        module_codes=np.array(module, dtype=object),
+        overall=values[0],
+        by_type=values[1:5].T,
+        submissions=values[5].astype(np.int64),
+    )
+
+
+def fetch_module_objectives(cur, module_codes: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    """code -> {"title", "objectives"} for the modules in a cohort."""
+    cur.execute("SELECT code, title, objectives_jsonb FROM module WHERE code = ANY(%s)", (list(module_codes),))
+    return {code: {"title": title, "objectives": objectives or []} for code, title, objectives in cur.fetchall()}
+
+
+def _quantiles_by_group(values: np.ndarray, groups: np.ndarray, n_groups: int, qs: Sequence[float]) -> np.ndarray:
+    """(n_groups, len(qs)) quantiles (linear interpolation) of values per group."""
+    order = np.lexsort((values, groups))
+    sorted_values = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    out = np.zeros((n_groups, len(qs)))
+    for j, q in enumerate(qs):
+        pos = starts + q * np.maximum(counts - 1, 0)
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, starts + np.maximum(counts - 1, 0))
+        frac = pos - lo
+        out[:, j] = sorted_values[lo] * (1 - frac) + sorted_values[hi] * frac
+    return out
+
+
+def _ranked_ids(ids: np.ndarray, groups: np.ndarray, scores: np.ndarray, n_groups: int, limit: int) -> List[List[str]]:
+    """Per group, up to limit ids ordered by ascending score."""
+    order = np.lexsort((scores, groups))
+    counts = np.bincount(groups[order], minlength=n_groups)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return [ids[order[s:s + min(c, limit)]].tolist() for s, c in zip(starts, counts)]
+
+
+def cohort_rollup(
+    rows: CohortRows,
+    modules: Dict[str, Dict[str, Any]],
+    struggling_threshold: float = STRUGGLING_THRESHOLD,
+    struggling_limit: int = STRUGGLING_LIMIT,
+) -> Dict[str, Any]:
+    """Per-module distributions, objective heatmap and struggling students."""
+    module_codes, module_idx = np.unique(rows.module_codes.astype(str), return_inverse=True)
+    student_codes, student_idx = np.unique(rows.student_ids.astype(str), return_inverse=True)
+    n_modules, n_students = len(module_codes), len(student_codes)
+
+    counts = np.bincount(module_idx, minlength=n_modules)
+    safe_counts = np.maximum(counts, 1)
+    mean = np.bincount(module_idx, weights=rows.overall, minlength=n_modules) / safe_counts
+    completed = np.bincount(module_idx, weights=rows.overall >= COMPLETED_MASTERY, minlength=n_modules)
+    type_means = np.stack([
+        np.bincount(module_idx, weights=rows.by_type[:, t], minlength=n_modules) / safe_counts
+        for t in range(len(TRACKED_LESSON_TYPES))
+    ], axis=1)
+    quartiles = _quantiles_by_group(rows.overall, module_idx, n_modules, (0.25, 0.5, 0.75)) \
+        if len(rows.overall) else np.zeros((0, 3))
+    bins = np.minimum((np.clip(rows.overall, 0.0, 1.0) * HISTOGRAM_BINS).astype(np.int64), HISTOGRAM_BINS - 1)
+    histogram = np.bincount(module_idx * HISTOGRAM_BINS + bins, minlength=n_modules * HISTOGRAM_BINS) \
+        .reshape(n_modules, HISTOGRAM_BINS)
+
+    struggling = (rows.overall < struggling_threshold) & (rows.submissions >= STRUGGLING_MIN_SUBMISSIONS)
+    struggling_by_module = _ranked_ids(
+        rows.student_ids[struggling].astype(str), module_idx[struggling], rows.overall[struggling],
+        n_modules, struggling_limit,
+    )
+
+    module_stats = []
+    for i, code in enumerate(module_codes.tolist()):
+        module_stats.append({
+            "module_code": code,
+            "module_title": modules.get(code, {}).get("title"),
+            "students": int(counts[i]),
+            "mean": round(float(mean[i]), 3),
+            "p25": round(float(quartiles[i, 0]), 3),
+            "median": round(float(quartiles[i, 1]), 3),
+            "p75": round(float(quartiles[i, 2]), 3),
+            "completed": int(completed[i]),
+            "histogram": histogram[i].tolist(),
+            "by_lesson_type": {t: round(float(type_means[i, j]), 3) for j, t in enumerate(TRACKED_LESSON_TYPES)},
+            "struggling_students": struggling_by_module[i],
+        })
+
+    type_index = {t: j for j, t in enumerate(TRACKED_LESSON_TYPES)}
+    heatmap = []
+    for i, code in enumerate(module_codes.tolist()):
+        for objective in modules.get(code, {}).get("objectives", []):
+            lesson_type = BLOOM_LESSON_TYPE.get(objective.get("bloom"), 'guided')
+            heatmap.append({
+                "module_code": code,
+                "objective_code": objective.get("code"),
+                "bloom": objective.get("bloom"),
+                "lesson_type": lesson_type,
+                "mastery": round(float(type_means[i, type_index[lesson_type]]), 3),
+            })
+
+    # across the cohort: students struggling in the most modules, then lowest mean overall
+    student_modules = np.bincount(student_idx, minlength=n_students)
+    student_mean = np.bincount(student_idx, weights=rows.overall, minlength=n_students) / np.maximum(student_modules, 1)
+    student_struggling = np.bincount(student_idx, weights=struggling, minlength=n_students).astype(np.int64)
+    flagged = np.flatnonzero(student_struggling)
+    flagged = flagged[np.lexsort((student_mean[flagged], -student_struggling[flagged]))][:struggling_limit]
+    struggling_students = [{
+        "student_id": student_codes[s],
+        "modules": int(student_modules[s]),
+        "modules_struggling": int(student_struggling[s]),
+        "mean_overall": round(float(student_mean[s]), 3),
+    } for s in flagged.tolist()]
+
+    return {
+        "cohort": {
+            "students": n_students,
+            "learning_states": int(len(rows.overall)),
+            "mean_overall": round(float(rows.overall.mean()), 3) if len(rows.overall) else 0.0,
+            "students_struggling": int(np.count_nonzero(student_struggling)),
+        },
+        "modules": module_stats,
+        "objective_heatmap": heatmap,
+        "struggling": {
+            "threshold": struggling_threshold,
+            "min_submissions": STRUGGLING_MIN_SUBMISSIONS,
+            "students": struggling_students,
+        },
+    }
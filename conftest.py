@@ -0,0 +1,84 @@
+import csv
+import io
+
+import pytest
+
+
+class FakeDB:
+    """Database state shared by every connection from connect().
+
+    handler(sql, params) returns the rows a statement produces (rowcount is
+    their number); COPY ... FROM STDIN rows are parsed into copied. The next
+    `failures` statements raise, as on a lost connection.
+    """
+
+    def __init__(self, handler=None, failures=0):
+        self.handler = handler or (lambda sql, params: [])
+        self.failures = failures
+        self.executed = []
+        self.copied = []
+        self.commits = 0
+
+    def connect(self):
+        return FakeConnection(self)
+
+    def _fail(self):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("connection lost")
+
+
+class FakeConnection:
+    closed = 0
+
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        self.db.commits += 1
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rowcount = -1
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.db._fail()
+        self.db.executed.append((sql, params))
+        self.rows = list(self.db.handler(sql, params) or [])
+        self.rowcount = len(self.rows)
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def copy_expert(self, sql, buf):
+        self.db._fail()
+        rows = list(csv.reader(io.StringIO(buf.read())))
+        self.db.copied.extend(rows)
+        self.rowcount = len(rows)
+
+
+@pytest.fixture
+def fake_db():
+    """FakeDB factory: fake_db(handler=None, failures=0)."""
+    return FakeDB
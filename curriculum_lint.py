@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Curriculum lint: every module file and curriculum_*.json checked in one run.
+
+Per file (across worker processes once there is enough JSON to pay for them):
+  * JSON syntax and schema conformance (curriculum/schema/*.schema.json,
+    compiled through schema_registry);
+Across files:
+  * duplicate module ids, objective codes and curriculum ids;
+  * prerequisites that point to unknown modules, and prerequisite cycles;
+  * subjects that do not resolve in subject_registry.json;
+  * curriculum_index.json entries vs the curriculum files they name;
+  * curriculum stages vs module files (missing, moved or unlisted modules).
+
+Per-file results are cached by content hash (.curriculum_lint_cache.json by
+default); a file whose size and mtime, or failing that sha256, are unchanged
+is not parsed again. Cross-file checks are cheap and always rerun on the
+per-file summaries. The cache is dropped when a schema or LINT_VERSION
+changes.
+
+A finding is {"severity", "check", "file", "path", "message"}; severity is
+"error" (broken data the importer or API would trip over) or "warning".
+"""
+
+import os
+import json
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from prerequisite_graph import find_cycles
+from schema_registry import SCHEMA_FILES, registry, format_path
+
+
+LINT_VERSION = 1
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CURRICULUM_DIR = os.path.join(BASE_DIR, 'curriculum')
+DEFAULT_CACHE_PATH = os.path.join(BASE_DIR, '.curriculum_lint_cache.json')
+CACHE_FORMAT = 1
+# below this much JSON to lint (~25 us/KB in-process), starting worker processes
+# costs more than it saves; the current tree is under 1 MB
+PARALLEL_MIN_BYTES = 2 * 1024 * 1024
+
+FILE_SCHEMAS = {
+    'module': 'module',
+    'curriculum': 'curriculum',
+    'curriculum_index': 'curriculum_index',
+    'subject_registry': 'subject_registry',
+}
+STAGE_ORDER = {'stage_primary': 0, 'stage_lower_secondary': 1, 'stage_upper_secondary': 2, 'stage_advanced': 3}
+
+
+def finding(severity: str, check: str, file: str, path: str, message: str) -> Dict[str, str]:
+    return {"severity": severity, "check": check, "file": file, "path": path, "message": message}
+
+
+def keep_first_definition(modules: Dict[str, Any], module_id: str, definition: Any) -> bool:
+    """Add a module definition unless its id is already defined; False for a duplicate.
+
+    The first file in path order wins wherever modules are collected: the
+    lint, the compiled artifact (curriculum_store) and the database import
+    (module_import), so they all keep the same definition.
+    """
+    if module_id in modules:
+        return False
+    modules[module_id] = definition
+    return True
+
+
+# ---------- Discovery ----------
+
+def discover(curriculum_dir: str) -> List[Tuple[str, str]]:
+    """(kind, path relative to curriculum_dir) of every file to lint, in one directory walk."""
+    files = []
+    for entry in os.scandir(curriculum_dir):
+        if not entry.is_file() or not entry.name.endswith('.json'):
+            continue
+        if entry.name == 'curriculum_index.json':
+            files.append(('curriculum_index', entry.name))
+        elif entry.name == 'subject_registry.json':
+            files.append(('subject_registry', entry.name))
+        elif entry.name.startswith('curriculum_'):
+            files.append(('curriculum', entry.name))
+    modules_dir = os.path.join(curriculum_dir, 'modules')
+    for root, dirs, names in os.walk(modules_dir):
+        dirs.sort()
+        for name in names:
+            if name.endswith('.json'):
+                files.append(('module', os.path.relpath(os.path.join(root, name), curriculum_dir)))
+    return sorted(files, key=lambda f: f[1])
+
+
+# ---------- Per-file lint (runs in worker processes) ----------
+
+def _module_summary(module: Any, path: str) -> Optional[Dict[str, Any]]:
+    if not isinstance(module, dict) or not isinstance(module.get('id'), str):
+        return None
+    objectives = module.get('objectives') if isinstance(module.get('objectives'), list) else []
+    prerequisites = module.get('prerequisites') if isinstance(module.get('prerequisites'), list) else []
+    return {
+        "id": module['id'],
+        "path": path,
+        "subject": module.get('subject'),
+        "stage": module.get('stage'),
+        "prerequisites": [p for p in prerequisites if isinstance(p, str)],
+        "objectives": [o['code'] for o in objectives if isinstance(o, dict) and isinstance(o.get('code'), str)],
+    }
+
+
+def _curriculum_summary(data: Dict[str, Any]) -> Dict[str, Any]:
+    stages = []
+    for i, stage in enumerate(data.get('stages') or []):
+        if not isinstance(stage, dict):
+            continue
+        modules = [
+            {"id": m['id'], "path": f"stages[{i}].modules[{j}]"}
+            for j, m in enumerate(stage.get('modules') or [])
+            if isinstance(m, dict) and isinstance(m.get('id'), str)
+        ]
+        rules = stage.get('cluster_rules') if isinstance(stage.get('cluster_rules'), dict) else {}
+        mapped = []
+        for rule in rules.values():
+            if isinstance(rule, dict):
+                mapped += [rule['map_to']] if isinstance(rule.get('map_to'), str) else []
+                mapped += [c for c in rule.get('map_to_children') or [] if isinstance(c, str)]
+        stages.append({
+            "id": stage.get('id'),
+            "path": f"stages[{i}]",
+            "modules": modules,
+            "subjects": [s for s in stage.get('subjects') or [] if isinstance(s, str)],
+            "mapped_curricula": mapped,
+        })
+    return {"id": data.get('id'), "subject": data.get('subject'), "stages": stages}
+
+
+def _summary(kind: str, data: Any) -> Dict[str, Any]:
+    if kind == 'module':
+        modules = data if isinstance(data, list) else [data]
+        prefix = (lambda i: f"[{i}]") if isinstance(data, list) else (lambda i: "")
+        return {"modules": [s for i, m in enumerate(modules) if (s := _module_summary(m, prefix(i)))]}
+    if not isinstance(data, dict):
+        return {}
+    if kind == 'curriculum':
+        return _curriculum_summary(data)
+    if kind == 'curriculum_index':
+        return {"entries": [
+            dict(e, path=f"entries[{i}]") for i, e in enumerate(data.get('entries') or [])
+            if isinstance(e, dict) and isinstance(e.get('curriculum_id'), str)
+        ]}
+    if kind == 'subject_registry':
+        return {"subjects": [
+            {"code": s['code'], "path": f"subjects[{i}]",
+             "title": (s.get('titles') or {}).get('en') if isinstance(s.get('titles'), dict) else None,
+             "cluster_children": [c for c in s.get('cluster_children') or [] if isinstance(c, str)]}
+            for i, s in enumerate(data.get('subjects') or [])
+            if isinstance(s, dict) and isinstance(s.get('code'), str)
+        ]}
+    return {}
+
+
+def lint_file(kind: str, rel: str, content: bytes) -> Dict[str, Any]:
+    """Schema findings and the summary the cross-file checks need, for one file's bytes."""
+    result = {"kind": kind, "findings": [], "summary": {}}
+    try:
+        data = json.loads(content.decode('utf-8'))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        result["findings"].append(finding("error", "json", rel, "", str(e)))
+        return result
+
+    schema = registry.get(FILE_SCHEMAS[kind])
+    if kind == 'module' and isinstance(data, list):
+        instances = [(f"[{i}]", m) for i, m in enumerate(data)]
+    else:
+        instances = [("", data)]
+    for prefix, instance in instances:
+        for path, message in schema.iter_errors(instance):
+            location = format_path(path)
+            full = f"{prefix}.{location}" if prefix and location and not location.startswith('[') \
+                else prefix + location
+            result["findings"].append(finding("error", "schema", rel, full, message))
+    result["summary"] = _summary(kind, data)
+    return result
+
+
+def _lint_task(task: Tuple[str, str, bytes]) -> Dict[str, Any]:
+    return lint_file(*task)
+
+
+# ---------- Cache ----------
+
+def schema_fingerprint() -> str:
+    """Changes when LINT_VERSION or any curriculum schema changes."""
+    digest = hashlib.sha256(f"lint:{LINT_VERSION}".encode())
+    for name in sorted(set(FILE_SCHEMAS.values())):
+        with open(SCHEMA_FILES[name], 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class LintCache:
+    """rel path -> {size, mtime_ns, sha256, result}, valid for one schema fingerprint."""
+
+    def __init__(self, path: Optional[str], fingerprint: str):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    stored = json.load(f)
+                if stored.get('format') == CACHE_FORMAT and stored.get('fingerprint') == fingerprint:
+                    self.entries = stored.get('files', {})
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def lookup(self, rel: str, stat: os.stat_result) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(rel)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['result']
+        return None
+
+    def lookup_hash(self, rel: str, sha256: str) -> Optional[Dict[str, Any]]:
+        entry = self.entries.get(rel)
+        return entry['result'] if entry and entry['sha256'] == sha256 else None
+
+    def store(self, rel: str, stat: os.stat_result, sha256: str, result: Dict[str, Any]) -> None:
+        self.entries[rel] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha256, "result": result}
+
+    def save(self, keep: Iterable[str]) -> None:
+        if not self.path:
+            return
+        keep = set(keep)
+        payload = {
+            "format": CACHE_FORMAT,
+            "fingerprint": self.fingerprint,
+            "files": {rel: entry for rel, entry in self.entries.items() if rel in keep},
+        }
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+
+# ---------- Cross-file checks ----------
+
+def cross_check(results: Dict[str, Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Findings that need more than one file: ids, prerequisites, registry, index, curricula."""
+    out: List[Dict[str, str]] = []
+    by_kind: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+    for rel, result in sorted(results.items()):
+        by_kind.setdefault(result['kind'], []).append((rel, result['summary']))
+
+    # subject registry: codes and English titles resolve to a code
+    subjects: Dict[str, str] = {}
+    registry_files = by_kind.get('subject_registry', [])
+    for rel, summary in registry_files:
+        for s in summary.get('subjects', []):
+            if s['code'] in subjects:
+                out.append(finding("error", "duplicate_id", rel, s['path'], f"subject {s['code']!r} is listed twice"))
+            subjects[s['code']] = s['code']
+            if s['title']:
+                subjects.setdefault(s['title'], s['code'])
+    for rel, summary in registry_files:
+        for s in summary.get('subjects', []):
+            for child in s['cluster_children']:
+                if child not in subjects:
+                    out.append(finding("error", "registry", rel, s['path'],
+                                       f"cluster child {child!r} is not a registered subject"))
+
+    def resolve_subject(name, rel, path, what):
+        if not registry_files or name is None:
+            return name
+        code = subjects.get(name)
+        if code is None:
+            out.append(finding("warning", "registry", rel, path, f"{what} subject {name!r} is not in subject_registry"))
+        return code or name
+
+    # modules: duplicates, objective codes
+    modules: Dict[str, Dict[str, Any]] = {}
+    objective_owner: Dict[str, str] = {}
+    for rel, summary in by_kind.get('module', []):
+        for m in summary.get('modules', []):
+            if not keep_first_definition(modules, m['id'], dict(m, file=rel)):
+                first = modules[m['id']]
+                out.append(finding("error", "duplicate_id", rel, m['path'],
+                                   f"module {m['id']!r} is also defined in {first['file']}{first['path']}"))
+                continue
+            modules[m['id']]['subject_code'] = resolve_subject(m['subject'], rel, m['path'], "module")
+            for code in m['objectives']:
+                if code in objective_owner:
+                    out.append(finding("error", "duplicate_id", rel, m['path'],
+                                       f"objective {code!r} is also used by {objective_owner[code]}"))
+                else:
+                    objective_owner[code] = m['id']
+
+    # prerequisites: references, stage order, cycles
+    graph = {}
+    for module_id, m in modules.items():
+        graph[module_id] = []
+        for prereq in m['prerequisites']:
+            target = modules.get(prereq)
+            if target is None:
+                out.append(finding("error", "prerequisite", m['file'], m['path'],
+                                   f"{module_id}: unknown prerequisite {prereq!r}"))
+                continue
+            graph[module_id].append(prereq)
+            if STAGE_ORDER.get(target['stage'], -1) > STAGE_ORDER.get(m['stage'], 99):
+                out.append(finding("warning", "prerequisite", m['file'], m['path'],
+                                   f"{module_id} ({m['stage']}) requires {prereq} from a later stage ({target['stage']})"))
+    for cycle in find_cycles(graph):
+        first = modules[cycle[0]]
+        out.append(finding("error", "prerequisite_cycle", first['file'], first['path'],
+                           "prerequisite cycle (requires): " + " -> ".join(cycle + [cycle[0]])))
+
+    # curricula: duplicates, listed modules vs module files
+    curricula: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+    listed: Dict[str, str] = {}
+    for rel, summary in by_kind.get('curriculum', []):
+        cid = summary.get('id')
+        if not isinstance(cid, str):
+            continue
+        if cid in curricula:
+            out.append(finding("error", "duplicate_id", rel, "id", f"curriculum {cid!r} is also defined in {curricula[cid][0]}"))
+            continue
+        curricula[cid] = (rel, summary)
+        subject = resolve_subject(summary.get('subject'), rel, "subject", "curriculum")
+        for stage in summary['stages']:
+            for code in stage['subjects']:
+                resolve_subject(code, rel, stage['path'], "framework")
+            for m in stage['modules']:
+                if m['id'] in listed:
+                    out.append(finding("error", "duplicate_id", rel, m['path'],
+                                       f"module {m['id']!r} is already listed in {listed[m['id']]}"))
+                    continue
+                listed[m['id']] = rel
+                module = modules.get(m['id'])
+                if module is None:
+                    out.append(finding("error", "curriculum_module", rel, m['path'],
+                                       f"module {m['id']!r} has no module file"))
+                    continue
+                if module['stage'] != stage['id']:
+                    out.append(finding("error", "curriculum_module", rel, m['path'],
+                                       f"{m['id']} is in {stage['id']} here but {module['stage']} in {module['file']}"))
+                if subject and module['subject_code'] != subject:
+                    out.append(finding("error", "curriculum_module", rel, m['path'],
+                                       f"{m['id']} has subject {module['subject']!r}, curriculum has {summary['subject']!r}"))
+    for rel, summary in by_kind.get('curriculum', []):
+        for stage in summary['stages']:
+            for target in stage['mapped_curricula']:
+                if target not in curricula:
+                    out.append(finding("error", "curriculum_module", rel, stage['path'],
+                                       f"cluster rule maps to unknown curriculum {target!r}"))
+    if curricula:
+        for module_id, m in modules.items():
+            if module_id not in listed:
+                out.append(finding("warning", "curriculum_module", m['file'], m['path'],
+                                   f"{module_id} is not listed in any curriculum"))
+
+    # curriculum index vs curriculum files
+    indexed = set()
+    for rel, summary in by_kind.get('curriculum_index', []):
+        for entry in summary.get('entries', []):
+            cid, path = entry['curriculum_id'], entry['path']
+            indexed.add(cid)
+            if entry.get('subject_code') is not None and registry_files and entry['subject_code'] not in subjects:
+                out.append(finding("error", "index", rel, path, f"subject_code {entry['subject_code']!r} is not registered"))
+            if cid not in curricula:
+                out.append(finding("error", "index", rel, path, f"{cid} has no curriculum file"))
+                continue
+            curriculum_rel, curriculum = curricula[cid]
+            stages = [s['id'] for s in curriculum['stages']]
+            if entry.get('stages') != stages:
+                out.append(finding("error", "index", rel, path,
+                                   f"{cid} stages {entry.get('stages')} differ from {curriculum_rel}: {stages}"))
+            subject = subjects.get(curriculum.get('subject'), curriculum.get('subject'))
+            if curriculum.get('subject') and entry.get('subject_code') != subject:
+                out.append(finding("error", "index", rel, path,
+                                   f"{cid} subject_code {entry.get('subject_code')!r} differs from {curriculum_rel}: {subject!r}"))
+    if by_kind.get('curriculum_index'):
+        index_rel = by_kind['curriculum_index'][0][0]
+        for cid, (rel, summary) in curricula.items():
+            if cid not in indexed and summary.get('subject'):
+                out.append(finding("warning", "index", rel, "id", f"{cid} is not in {index_rel}"))
+    return out
+
+
+# ---------- Run ----------
+
+def lint_curriculum(
+    curriculum_dir: str = DEFAULT_CURRICULUM_DIR,
+    jobs: Optional[int] = None,
+    cache_path: Optional[str] = DEFAULT_CACHE_PATH,
+) -> Dict[str, Any]:
+    """Lint the tree; returns the machine-readable report."""
+    start = time.perf_counter()
+    jobs = jobs or os.cpu_count() or 1
+    cache = LintCache(cache_path, schema_fingerprint())
+    files = discover(curriculum_dir)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    todo: List[Tuple[str, str, bytes]] = []
+    pending: Dict[str, Tuple[os.stat_result, str]] = {}
+    for kind, rel in files:
+        full = os.path.join(curriculum_dir, rel)
+        stat = os.stat(full)
+        cached = cache.lookup(rel, stat)
+        if cached is not None and cached['kind'] == kind:
+            results[rel] = cached
+            continue
+        with open(full, 'rb') as f:
+            content = f.read()
+        sha256 = hashlib.sha256(content).hexdigest()
+        cached = cache.lookup_hash(rel, sha256)
+        if cached is not None and cached['kind'] == kind:
+            cache.store(rel, stat, sha256, cached)
+            results[rel] = cached
+            continue
+        todo.append((kind, rel, content))
+        pending[rel] = (stat, sha256)
+
+    parallel = jobs > 1 and len(todo) > 1 and sum(len(task[2]) for task in todo) >= PARALLEL_MIN_BYTES
+    if parallel:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            linted = list(pool.map(_lint_task, todo, chunksize=max(1, len(todo) // (jobs * 4))))
+    else:
+        linted = [_lint_task(task) for task in todo]
+    for (kind, rel, _), result in zip(todo, linted):
+        stat, sha256 = pending[rel]
+        cache.store(rel, stat, sha256, result)
+        results[rel] = result
+    cache.save(results)
+
+    findings = [f for result in results.values() for f in result['findings']] + cross_check(results)
+    findings.sort(key=lambda f: (f['file'], f['path'], f['check'], f['message']))
+    return {
+        "curriculum_dir": os.path.abspath(curriculum_dir),
+        "files": len(files),
+        "linted": len(todo),
+        "cached": len(files) - len(todo),
+        "jobs": jobs if parallel else 1,
+        "elapsed_sec": round(time.perf_counter() - start, 3),
+        "errors": sum(f['severity'] == 'error' for f in findings),
+        "warnings": sum(f['severity'] == 'warning' for f in findings),
+        "findings": findings,
+    }
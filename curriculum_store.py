@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+Compiled curriculum: the whole curriculum/ tree in one binary artifact.
+
+`compile_curriculum` reads every module file, curriculum_*.json,
+subject_registry.json and curriculum_index.json once and writes
+curriculum.bin: sorted fixed-size index tables (module code, subject code,
+stage, objective code) and one compact JSON payload per module and per
+document. `open_curriculum` maps the file read-only; lookups binary-search
+the tables in place and a module's JSON is decoded on first access only,
+so API workers and scripts share the page cache instead of each parsing
+~800 KB of JSON at start-up.
+
+Layout (little-endian): header, then sections addressed by (offset, length)
+from the header:
+
+    strings     UTF-8 keys referenced by (offset, length)
+    modules     _MODULE records sorted by code
+    subjects, stages, objectives, documents
+                _ENTRY records sorted by key; for the first three the value
+                is a run of uint16 module numbers in postings, for
+                documents a JSON payload
+    postings    uint16 module numbers
+    payloads    JSON
+
+The header carries the content hash of the sources (the curriculum
+version) and a stat signature, so a stale artifact is detected without
+reading the JSON. The file is replaced atomically; processes that mapped
+the old one keep a consistent view until they reopen.
+"""
+
+import os
+import json
+import mmap
+import time
+import struct
+import hashlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from curriculum_lint import DEFAULT_CURRICULUM_DIR, discover, keep_first_definition
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ARTIFACT_PATH = os.getenv('CURRICULUM_ARTIFACT', os.path.join(BASE_DIR, 'curriculum.bin'))
+
+MAGIC = b'AYCURRIC'
+FORMAT_VERSION = 1
+SECTIONS = ('strings', 'modules', 'subjects', 'stages', 'objectives', 'documents', 'postings', 'payloads')
+
+# magic, format, content sha256, stat signature, built_at, module count
+_HEADER = struct.Struct('<8sI32s32sdI')
+_SECTION = struct.Struct('<II')
+# code (strings offset, length), payload (offset, length)
+_MODULE = struct.Struct('<IHII')
+# key (strings offset, length), value (offset, count or length)
+_ENTRY = struct.Struct('<IHII')
+_POSTING = struct.Struct('<H')
+
+
+class CurriculumArtifactError(Exception):
+    """Missing, truncated or incompatible curriculum artifact."""
+    pass
+
+
+# ---------- Compile ----------
+
+def source_signature(curriculum_dir: str = DEFAULT_CURRICULUM_DIR) -> bytes:
+    """sha256 over (path, size, mtime) of every source file: cheap staleness check."""
+    digest = hashlib.sha256(f"format:{FORMAT_VERSION}".encode())
+    for _, rel in discover(curriculum_dir):
+        stat = os.stat(os.path.join(curriculum_dir, rel))
+        digest.update(f"{rel}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.digest()
+
+
+def _compact(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+
+class _Builder:
+    """Accumulates the sections of one artifact."""
+
+    def __init__(self):
+        self.strings = bytearray()
+        self.string_offsets: Dict[str, Tuple[int, int]] = {}
+        self.payloads = bytearray()
+        self.postings = bytearray()
+
+    def string(self, value: str) -> Tuple[int, int]:
+        if value not in self.string_offsets:
+            encoded = value.encode('utf-8')
+            self.string_offsets[value] = (len(self.strings), len(encoded))
+            self.strings += encoded
+        return self.string_offsets[value]
+
+    def payload(self, data: Any) -> Tuple[int, int]:
+        encoded = _compact(data)
+        offset = len(self.payloads)
+        self.payloads += encoded
+        return offset, len(encoded)
+
+    def posting_entries(self, groups: Dict[str, List[int]]) -> bytes:
+        out = bytearray()
+        for key in sorted(groups, key=lambda k: k.encode('utf-8')):
+            numbers = sorted(set(groups[key]))
+            offset = len(self.postings)
+            for number in numbers:
+                self.postings += _POSTING.pack(number)
+            out += _ENTRY.pack(*self.string(key), offset, len(numbers))
+        return bytes(out)
+
+
+def compile_curriculum(
+    curriculum_dir: str = DEFAULT_CURRICULUM_DIR,
+    output: str = DEFAULT_ARTIFACT_PATH,
+) -> Dict[str, Any]:
+    """Build the artifact from curriculum_dir and atomically replace output.
+
+    Modules are indexed by id; when an id is defined twice the first file
+    (in path order) wins (keep_first_definition, shared with the lint and
+    the database import).
+    """
+    start = time.perf_counter()
+    signature = source_signature(curriculum_dir)
+    content = hashlib.sha256(f"format:{FORMAT_VERSION}".encode())
+    documents: Dict[str, Any] = {}
+    modules: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+    duplicates = 0
+
+    for kind, rel in discover(curriculum_dir):
+        with open(os.path.join(curriculum_dir, rel), 'rb') as f:
+            raw = f.read()
+        content.update(f"{rel}\0{len(raw)}\0".encode())
+        content.update(raw)
+        data = json.loads(raw)
+        if kind != 'module':
+            documents[data.get('id') or os.path.splitext(os.path.basename(rel))[0]] = data
+            continue
+        for module in data if isinstance(data, list) else [data]:
+            if not isinstance(module, dict) or not module.get('id'):
+                continue
+            if not keep_first_definition(modules, module['id'], (rel, module)):
+                duplicates += 1
+
+    # subject codes and English titles resolve to a registry code
+    subject_codes: Dict[str, str] = {}
+    subject_titles: Dict[str, str] = {}
+    for subject in documents.get('subject_registry', {}).get('subjects', []):
+        subject_codes[subject['code']] = subject['code']
+        title = subject.get('titles', {}).get('en')
+        subject_titles[subject['code']] = title or subject['code']
+        if title:
+            subject_codes.setdefault(title, subject['code'])
+    stage_titles: Dict[str, str] = {}
+    for name, document in documents.items():
+        if not name.startswith('curriculum_') or name == 'curriculum_index':
+            continue
+        for stage in document.get('stages', []):
+            for listed in stage.get('modules', []):
+                if isinstance(listed, dict) and listed.get('id'):
+                    stage_titles.setdefault(listed['id'], stage.get('title'))
+
+    builder = _Builder()
+    codes = sorted(modules, key=lambda c: c.encode('utf-8'))
+    by_subject: Dict[str, List[int]] = {}
+    by_stage: Dict[str, List[int]] = {}
+    by_objective: Dict[str, List[int]] = {}
+    for number, code in enumerate(codes):
+        module = modules[code][1]
+        subject = subject_codes.get(module.get('subject'), module.get('subject') or '')
+        by_subject.setdefault(subject, []).append(number)
+        by_stage.setdefault(module.get('stage') or '', []).append(number)
+        for objective in module.get('objectives') or []:
+            if isinstance(objective, dict) and objective.get('code'):
+                by_objective.setdefault(objective['code'], []).append(number)
+
+    subject_entries = builder.posting_entries(by_subject)
+    stage_entries = builder.posting_entries(by_stage)
+    objective_entries = builder.posting_entries(by_objective)
+
+    module_records = bytearray()
+    for code in codes:
+        rel, module = modules[code]
+        subject = subject_codes.get(module.get('subject'), module.get('subject') or '')
+        info = {
+            'file': rel,
+            'subject_code': subject,
+            'subject_title': subject_titles.get(subject, module.get('subject')),
+            'stage_title': stage_titles.get(code),
+        }
+        module_records += _MODULE.pack(*builder.string(code), *builder.payload({'module': module, 'info': info}))
+
+    document_entries = bytearray()
+    for name in sorted(documents, key=lambda k: k.encode('utf-8')):
+        document_entries += _ENTRY.pack(*builder.string(name), *builder.payload(documents[name]))
+
+    sections = {
+        'strings': bytes(builder.strings),
+        'modules': bytes(module_records),
+        'subjects': subject_entries,
+        'stages': stage_entries,
+        'objectives': objective_entries,
+        'documents': bytes(document_entries),
+        'postings': bytes(builder.postings),
+        'payloads': bytes(builder.payloads),
+    }
+    offset = _HEADER.size + _SECTION.size * len(SECTIONS)
+    table = bytearray()
+    for name in SECTIONS:
+        table += _SECTION.pack(offset, len(sections[name]))
+        offset += len(sections[name])
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, content.digest(), signature, time.time(), len(codes))
+
+    tmp = f"{output}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(header)
+        f.write(table)
+        for name in SECTIONS:
+            f.write(sections[name])
+    os.replace(tmp, output)
+
+    return {
+        'path': output,
+        'version': content.hexdigest()[:16],
+        'modules': len(codes),
+        'duplicate_modules': duplicates,
+        'subjects': len(by_subject),
+        'stages': len(by_stage),
+        'objectives': len(by_objective),
+        'documents': len(documents),
+        'bytes': offset,
+        'elapsed_sec': round(time.perf_counter() - start, 4),
+    }
+
+
+# ---------- Read ----------
+
+class CompiledCurriculum:
+    """Read-only view of an artifact over mmap; payloads decode lazily."""
+
+    def __init__(self, path: str = DEFAULT_ARTIFACT_PATH):
+        self.path = path
+        try:
+            with open(path, 'rb') as f:
+                self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise CurriculumArtifactError(f"cannot map {path}: {e}") from e
+        if len(self._buf) < _HEADER.size + _SECTION.size * len(SECTIONS):
+            raise CurriculumArtifactError(f"{path} is truncated")
+        magic, fmt, content, signature, built_at, count = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise CurriculumArtifactError(f"{path} is not a format {FORMAT_VERSION} curriculum artifact")
+        self.version = content.hex()[:16]
+        self.signature = signature
+        self.built_at = built_at
+        self._sections = {
+            name: _SECTION.unpack_from(self._buf, _HEADER.size + i * _SECTION.size)
+            for i, name in enumerate(SECTIONS)
+        }
+        if max(off + length for off, length in self._sections.values()) > len(self._buf):
+            raise CurriculumArtifactError(f"{path} is truncated")
+        if self._sections['modules'][1] != count * _MODULE.size:
+            raise CurriculumArtifactError(f"{path} has a corrupt module table")
+        self._count = count
+        self._numbers: Dict[str, int] = {}
+        self._modules: Dict[int, Dict[str, Any]] = {}
+        self._documents: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, code: str) -> bool:
+        return self._module_number(code) is not None
+
+    def close(self) -> None:
+        self._buf.close()
+
+    # -- low level --
+
+    def _string(self, offset: int, length: int) -> bytes:
+        base = self._sections['strings'][0] + offset
+        return self._buf[base:base + length]
+
+    def _bisect(self, section: str, record: struct.Struct, key: bytes) -> Optional[tuple]:
+        base, length = self._sections[section]
+        lo, hi = 0, length // record.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            fields = record.unpack_from(self._buf, base + mid * record.size)
+            probe = self._string(fields[0], fields[1])
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return (mid,) + fields
+        return None
+
+    def _module_number(self, code: str) -> Optional[int]:
+        number = self._numbers.get(code)
+        if number is None:
+            found = self._bisect('modules', _MODULE, code.encode('utf-8'))
+            if found is None:
+                return None
+            number = self._numbers[code] = found[0]
+        return number
+
+    def _payload(self, offset: int, length: int) -> Any:
+        base = self._sections['payloads'][0] + offset
+        return json.loads(self._buf[base:base + length])
+
+    def _entry(self, number: int) -> Dict[str, Any]:
+        if number not in self._modules:
+            base = self._sections['modules'][0] + number * _MODULE.size
+            fields = _MODULE.unpack_from(self._buf, base)
+            self._modules[number] = self._payload(fields[2], fields[3])
+        return self._modules[number]
+
+    def _code(self, number: int) -> str:
+        fields = _MODULE.unpack_from(self._buf, self._sections['modules'][0] + number * _MODULE.size)
+        return self._string(fields[0], fields[1]).decode('utf-8')
+
+    def _postings(self, section: str, key: str) -> List[int]:
+        found = self._bisect(section, _ENTRY, key.encode('utf-8'))
+        if found is None:
+            return []
+        base = self._sections['postings'][0] + found[3]
+        return [_POSTING.unpack_from(self._buf, base + i * _POSTING.size)[0] for i in range(found[4])]
+
+    def _keys(self, section: str) -> List[str]:
+        base, length = self._sections[section]
+        keys = []
+        for i in range(length // _ENTRY.size):
+            fields = _ENTRY.unpack_from(self._buf, base + i * _ENTRY.size)
+            keys.append(self._string(fields[0], fields[1]).decode('utf-8'))
+        return keys
+
+    # -- modules --
+
+    def codes(self) -> List[str]:
+        """Every module code, sorted."""
+        return [self._code(number) for number in range(self._count)]
+
+    def module(self, code: str) -> Optional[Dict[str, Any]]:
+        """The module as defined in its source file, or None."""
+        number = self._module_number(code)
+        return None if number is None else self._entry(number)['module']
+
+    def module_info(self, code: str) -> Optional[Dict[str, Any]]:
+        """file, subject_code, subject_title and stage_title of a module, or None."""
+        number = self._module_number(code)
+        return None if number is None else self._entry(number)['info']
+
+    def select(
+        self,
+        subject: Optional[str] = None,
+        stage: Optional[str] = None,
+        objective: Optional[str] = None,
+    ) -> List[str]:
+        """Codes of modules matching every given filter (subject registry code, stage code, objective code)."""
+        selected: Optional[set] = None
+        for section, key in (('subjects', subject), ('stages', stage), ('objectives', objective)):
+            if key is None:
+                continue
+            numbers = set(self._postings(section, key))
+            selected = numbers if selected is None else selected & numbers
+        numbers = range(self._count) if selected is None else sorted(selected)
+        return [self._code(number) for number in numbers]
+
+    def iter_modules(self, codes: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Decoded modules, in code order unless codes are given."""
+        for code in (self.codes() if codes is None else codes):
+            module = self.module(code)
+            if module is not None:
+                yield module
+
+    def subjects(self) -> List[str]:
+        return self._keys('subjects')
+
+    def stages(self) -> List[str]:
+        return self._keys('stages')
+
+    # -- documents --
+
+    def document(self, name: str) -> Optional[Any]:
+        """subject_registry, curriculum_index or a curriculum by id (e.g. curriculum_math)."""
+        if name not in self._documents:
+            found = self._bisect('documents', _ENTRY, name.encode('utf-8'))
+            if found is None:
+                return None
+            self._documents[name] = self._payload(found[3], found[4])
+        return self._documents[name]
+
+    def documents(self) -> List[str]:
+        return self._keys('documents')
+
+    def is_stale(self, curriculum_dir: str = DEFAULT_CURRICULUM_DIR) -> bool:
+        """True when a source file was added, removed or touched since compilation."""
+        return source_signature(curriculum_dir) != self.signature
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'path': self.path,
+            'version': self.version,
+            'built_at': self.built_at,
+            'modules': self._count,
+            'decoded_modules': len(self._modules),
+            'bytes': len(self._buf),
+        }
+
+
+def open_curriculum(
+    path: str = DEFAULT_ARTIFACT_PATH,
+    curriculum_dir: Optional[str] = DEFAULT_CURRICULUM_DIR,
+) -> CompiledCurriculum:
+    """Map the artifact, compiling it first when missing, unreadable or stale.
+
+    Pass curriculum_dir=None to use an existing artifact as is (deployments
+    that ship curriculum.bin without the JSON sources).
+    """
+    if curriculum_dir is not None:
+        try:
+            compiled = CompiledCurriculum(path)
+            if not compiled.is_stale(curriculum_dir):
+                return compiled
+            compiled.close()
+        except CurriculumArtifactError:
+            pass
+        compile_curriculum(curriculum_dir, path)
+    return CompiledCurriculum(path)
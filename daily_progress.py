@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Daily progress rollups: student_daily_progress (migration 013).
+
+One row per (student, module, UTC day) with the submission count, score sum
+(mean = score_sum / scored_submissions), time spent and the overall mastery
+after the day's last submission. create_submission upserts the row inside
+its own transaction, so trend queries read the rollup instead of scanning
+submission.
+
+backfill() fills in past days that have no rollup row yet from submission
+(days before `until`, default: today, UTC). Rows that already exist were
+written by create_submission with the real time spent and mastery and are
+never touched, so the backfill can be re-run and never races the write path.
+Time spent is not stored with submissions and is backfilled with the API
+default; closing mastery of the filled days comes from a mastery_history
+replay run when one is given, and from learning_state for the last day of
+every (student, module).
+"""
+
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from mastery_batch import DEFAULT_TIME_SPENT
+
+
+_DAY = "(%s::timestamptz AT TIME ZONE 'UTC')::date"
+
+
+def record_submission(
+    cur,
+    student_id: str,
+    module_id: str,
+    created_at: datetime,
+    score: Optional[float],
+    time_spent: float,
+    closing_mastery: float,
+) -> None:
+    """Add one submission to its day's row (upsert)."""
+    cur.execute(f"""
+        INSERT INTO student_daily_progress (
+            student_id, module_id, day, submissions, scored_submissions,
+            score_sum, time_spent_seconds, closing_mastery
+        ) VALUES (%s, %s, {_DAY}, 1, %s, %s, %s, %s)
+        ON CONFLICT (student_id, module_id, day) DO UPDATE SET
+            submissions = student_daily_progress.submissions + 1,
+            scored_submissions = student_daily_progress.scored_submissions + EXCLUDED.scored_submissions,
+            score_sum = student_daily_progress.score_sum + EXCLUDED.score_sum,
+            time_spent_seconds = student_daily_progress.time_spent_seconds + EXCLUDED.time_spent_seconds,
+            closing_mastery = EXCLUDED.closing_mastery,
+            updated_at = now()
+    """, (
+        student_id, module_id, created_at,
+        0 if score is None else 1, float(score or 0.0), int(time_spent), closing_mastery
+    ))
+
+
+def _progress_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    scored = row['scored_submissions']
+    return {
+        "day": row['day'].isoformat(),
+        "submissions": int(row['submissions']),
+        "mean_score": round(float(row['score_sum']) / scored, 3) if scored else None,
+        "time_spent_seconds": int(row['time_spent_seconds']),
+    }
+
+
+def fetch_daily_progress(
+    cur,
+    user_id: str,
+    module_code: Optional[str] = None,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+) -> List[Dict[str, Any]]:
+    """Daily trend for a student (app_user id), oldest day first.
+
+    For one module each day carries its closing mastery; across all modules
+    days are summed and report how many modules were active instead.
+    """
+    where = ["p.student_id = (SELECT id FROM student WHERE user_id = %s)"]
+    params: List[Any] = [user_id]
+    if module_code:
+        where.append("p.module_id = (SELECT id FROM module WHERE code = %s)")
+        params.append(module_code)
+    if since:
+        where.append("p.day >= %s")
+        params.append(since)
+    if until:
+        where.append("p.day <= %s")
+        params.append(until)
+    where_sql = " AND ".join(where)
+
+    if module_code:
+        cur.execute(f"""
+            SELECT p.day, p.submissions, p.scored_submissions, p.score_sum,
+                   p.time_spent_seconds, p.closing_mastery
+            FROM student_daily_progress p
+            WHERE {where_sql}
+            ORDER BY p.day
+        """, params)
+        return [
+            dict(_progress_row(row), closing_mastery=row['closing_mastery'])
+            for row in cur.fetchall()
+        ]
+
+    cur.execute(f"""
+        SELECT p.day, sum(p.submissions) AS submissions,
+               sum(p.scored_submissions) AS scored_submissions, sum(p.score_sum) AS score_sum,
+               sum(p.time_spent_seconds) AS time_spent_seconds, count(*) AS modules
+        FROM student_daily_progress p
+        WHERE {where_sql}
+        GROUP BY p.day
+        ORDER BY p.day
+    """, params)
+    return [dict(_progress_row(row), modules=int(row['modules'])) for row in cur.fetchall()]
+
+
+def backfill(
+    conn,
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    student_ids: Optional[Sequence[str]] = None,
+    run_id: Optional[str] = None,
+) -> Dict[str, int]:
+    """Add the missing rollup rows for days in [since, until) from submission, in one transaction."""
+    until = until or datetime.now(timezone.utc).date()
+    params = {
+        'since': since, 'until': until, 'students': list(student_ids or []),
+        'run_id': run_id, 'time_spent': DEFAULT_TIME_SPENT,
+    }
+    # rows added by this backfill are the only ones without a closing mastery
+    where = ["p.day < %(until)s", "p.closing_mastery IS NULL"]
+    if since:
+        where.append("p.day >= %(since)s")
+    if student_ids:
+        where.append("p.student_id = ANY(%(students)s::uuid[])")
+    rollup_filter = " AND ".join(where)
+
+    with conn.cursor() as cur:
+        # created_at bounds in UTC so partition pruning applies to submission
+        cur.execute(f"""
+            INSERT INTO student_daily_progress (
+                student_id, module_id, day, submissions, scored_submissions,
+                score_sum, time_spent_seconds
+            )
+            SELECT student_id, module_id, day, count(*), count(score),
+                   COALESCE(sum(score), 0), count(*) * %(time_spent)s
+            FROM (
+                SELECT student_id, module_id, score, (created_at AT TIME ZONE 'UTC')::date AS day
+                FROM submission
+                WHERE created_at < (%(until)s::timestamp AT TIME ZONE 'UTC')
+                  {"AND created_at >= (%(since)s::timestamp AT TIME ZONE 'UTC')" if since else ""}
+                  {"AND student_id = ANY(%(students)s::uuid[])" if student_ids else ""}
+            ) s
+            GROUP BY student_id, module_id, day
+            ON CONFLICT (student_id, module_id, day) DO NOTHING
+        """, params)
+        inserted = cur.rowcount
+
+        from_history = 0
+        if run_id:
+            cur.execute(f"""
+                UPDATE student_daily_progress p
+                SET closing_mastery = h.mastery_overall
+                FROM (
+                    SELECT DISTINCT ON (student_id, module_id, (submitted_at AT TIME ZONE 'UTC')::date)
+                           student_id, module_id, (submitted_at AT TIME ZONE 'UTC')::date AS day, mastery_overall
+                    FROM mastery_history
+                    WHERE run_id = %(run_id)s
+                    ORDER BY student_id, module_id, (submitted_at AT TIME ZONE 'UTC')::date, submitted_at DESC
+                ) h
+                WHERE p.student_id = h.student_id AND p.module_id = h.module_id AND p.day = h.day
+                  AND {rollup_filter}
+            """, params)
+            from_history = cur.rowcount
+
+        # the latest day of each (student, module) closes at the current mastery
+        cur.execute(f"""
+            UPDATE student_daily_progress p
+            SET closing_mastery = ls.mastery_overall
+            FROM (
+                SELECT student_id, module_id, max(day) AS day
+                FROM student_daily_progress
+                GROUP BY student_id, module_id
+            ) last
+            JOIN learning_state ls ON ls.student_id = last.student_id AND ls.module_id = last.module_id
+            WHERE p.student_id = last.student_id AND p.module_id = last.module_id AND p.day = last.day
+              AND {rollup_filter}
+        """, params)
+        from_state = cur.rowcount
+    conn.commit()
+    return {
+        'inserted': inserted,
+        'closing_from_history': from_history,
+        'closing_from_learning_state': from_state,
+    }
@@ -0,0 +1,88 @@
+-- UP
+-- mastery/counters храним типизированными колонками вместо JSONB:
+-- каждый сабмит переписывает строку learning_state, а GIN-индексы на JSONB
+-- делали эту запись в разы дороже, хотя читаем мы только по ключам.
+BEGIN;
+
+ALTER TABLE learning_state
+  ADD COLUMN mastery_overall DOUBLE PRECISION NOT NULL DEFAULT 0,
+  ADD COLUMN mastery_concept DOUBLE PRECISION NOT NULL DEFAULT 0,
+  ADD COLUMN mastery_guided DOUBLE PRECISION NOT NULL DEFAULT 0,
+  ADD COLUMN mastery_independent DOUBLE PRECISION NOT NULL DEFAULT 0,
+  ADD COLUMN mastery_assessment DOUBLE PRECISION NOT NULL DEFAULT 0,
+  ADD COLUMN mastery_total_submissions INT,
+  ADD COLUMN mastery_updated_at TIMESTAMP,          -- mastery["last_updated"]
+  ADD COLUMN count_concept INT NOT NULL DEFAULT 0,
+  ADD COLUMN count_guided INT NOT NULL DEFAULT 0,
+  ADD COLUMN count_independent INT NOT NULL DEFAULT 0,
+  ADD COLUMN count_assessment INT NOT NULL DEFAULT 0;
+
+UPDATE learning_state SET
+  mastery_overall = COALESCE((mastery_jsonb->>'overall')::double precision, 0),
+  mastery_concept = COALESCE((mastery_jsonb->>'concept')::double precision, 0),
+  mastery_guided = COALESCE((mastery_jsonb->>'guided')::double precision, 0),
+  mastery_independent = COALESCE((mastery_jsonb->>'independent')::double precision, 0),
+  mastery_assessment = COALESCE((mastery_jsonb->>'assessment')::double precision, 0),
+  mastery_total_submissions = (mastery_jsonb->>'total_submissions')::int,
+  mastery_updated_at = (mastery_jsonb->>'last_updated')::timestamp,
+  count_concept = COALESCE((counters_jsonb->>'concept')::int, 0),
+  count_guided = COALESCE((counters_jsonb->>'guided')::int, 0),
+  count_independent = COALESCE((counters_jsonb->>'independent')::int, 0),
+  count_assessment = COALESCE((counters_jsonb->>'assessment')::int, 0);
+
+DROP INDEX IF EXISTS idx_learning_state_mastery_gin;
+DROP INDEX IF EXISTS idx_learning_state_counters_gin;
+-- дублирует UNIQUE (student_id, module_id)
+DROP INDEX IF EXISTS idx_learning_state_student_module;
+
+ALTER TABLE learning_state
+  DROP COLUMN mastery_jsonb,
+  DROP COLUMN counters_jsonb;
+
+-- дашборды: распределение mastery по модулю и «отстающие» ученики
+CREATE INDEX idx_learning_state_module_overall ON learning_state (module_id, mastery_overall);
+
+COMMIT;
+
+-- DOWN
+BEGIN;
+DROP INDEX IF EXISTS idx_learning_state_module_overall;
+
+ALTER TABLE learning_state
+  ADD COLUMN mastery_jsonb JSONB NOT NULL DEFAULT '{"overall":0}'::jsonb,
+  ADD COLUMN counters_jsonb JSONB NOT NULL DEFAULT '{}'::jsonb;
+
+UPDATE learning_state SET
+  mastery_jsonb = jsonb_strip_nulls(jsonb_build_object(
+    'overall', mastery_overall,
+    'concept', mastery_concept,
+    'guided', mastery_guided,
+    'independent', mastery_independent,
+    'assessment', mastery_assessment,
+    'total_submissions', mastery_total_submissions,
+    'last_updated', mastery_updated_at
+  )),
+  counters_jsonb = jsonb_build_object(
+    'concept', count_concept,
+    'guided', count_guided,
+    'independent', count_independent,
+    'assessment', count_assessment
+  );
+
+ALTER TABLE learning_state
+  DROP COLUMN mastery_overall,
+  DROP COLUMN mastery_concept,
+  DROP COLUMN mastery_guided,
+  DROP COLUMN mastery_independent,
+  DROP COLUMN mastery_assessment,
+  DROP COLUMN mastery_total_submissions,
+  DROP COLUMN mastery_updated_at,
+  DROP COLUMN count_concept,
+  DROP COLUMN count_guided,
+  DROP COLUMN count_independent,
+  DROP COLUMN count_assessment;
+
+CREATE INDEX IF NOT EXISTS idx_learning_state_student_module ON learning_state (student_id, module_id);
+CREATE INDEX IF NOT EXISTS idx_learning_state_mastery_gin ON learning_state USING GIN (mastery_jsonb);
+CREATE INDEX IF NOT EXISTS idx_learning_state_counters_gin ON learning_state USING GIN (counters_jsonb);
+COMMIT;
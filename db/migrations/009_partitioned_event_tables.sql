@@ -0,0 +1,180 @@
+-- UP
+-- submission и attempt — append-only журналы событий. Делаем их дешёвыми
+-- на запись:
+--   * id по времени (UUIDv7), чтобы вставки шли в «правый край» btree;
+--   * убираем GIN на answer_jsonb/payload_jsonb — по ним никто не ищет;
+--   * BRIN на created_at вместо тяжёлых btree для диапазонных выборок;
+--   * помесячное партиционирование по created_at.
+-- Существующие таблицы не копируются: они переименовываются и подключаются
+-- как партиция *_p_legacy (всё до начала следующего месяца). Новые месяцы
+-- создаёт scripts/manage_partitions.py; DEFAULT-партиция страхует вставки,
+-- если партицию вовремя не создали.
+BEGIN;
+
+-- UUIDv7: 48 бит unix-времени в мс + случайные биты из gen_random_uuid()
+CREATE OR REPLACE FUNCTION uuid_generate_v7()
+RETURNS UUID AS $$
+  SELECT encode(
+    set_bit(
+      set_bit(
+        overlay(uuid_send(gen_random_uuid())
+                placing substring(int8send(floor(extract(epoch FROM clock_timestamp()) * 1000)::bigint) FROM 3)
+                FROM 1 FOR 6),
+        52, 1),
+      53, 1),
+    'hex')::uuid;
+$$ LANGUAGE sql VOLATILE;
+
+-- Создаёт партицию <parent>_pYYYYMM на месяц month_start, если её ещё нет.
+-- Возвращает имя партиции или NULL, если месяц уже покрыт другой партицией
+-- либо в DEFAULT-партиции лежат строки за этот месяц.
+CREATE OR REPLACE FUNCTION ensure_monthly_partition(parent TEXT, month_start DATE)
+RETURNS TEXT AS $$
+DECLARE
+  part_name TEXT := format('%s_p%s', parent, to_char(month_start, 'YYYYMM'));
+  lower_bound TIMESTAMPTZ := date_trunc('month', month_start);
+  upper_bound TIMESTAMPTZ := date_trunc('month', month_start) + interval '1 month';
+  stray BOOLEAN := false;
+BEGIN
+  IF to_regclass(part_name) IS NOT NULL THEN
+    RETURN part_name;
+  END IF;
+
+  IF to_regclass(parent || '_p_default') IS NOT NULL THEN
+    EXECUTE format('SELECT EXISTS (SELECT 1 FROM %I WHERE created_at >= %L AND created_at < %L)',
+                   parent || '_p_default', lower_bound, upper_bound)
+      INTO stray;
+    IF stray THEN
+      RAISE NOTICE '%_p_default has rows for %, partition % not created',
+                   parent, to_char(month_start, 'YYYY-MM'), part_name;
+      RETURN NULL;
+    END IF;
+  END IF;
+
+  BEGIN
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                   part_name, parent, lower_bound, upper_bound);
+  EXCEPTION WHEN invalid_object_definition THEN
+    -- диапазон уже покрыт (например, партицией *_p_legacy)
+    RETURN NULL;
+  END;
+  RETURN part_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ---------- submission ----------
+
+ALTER TABLE parent_signoff DROP CONSTRAINT parent_signoff_submission_id_fkey;
+
+DROP INDEX IF EXISTS idx_submission_answer_gin;
+DROP INDEX IF EXISTS idx_submission_student_kind;
+
+ALTER TABLE submission RENAME TO submission_p_legacy;
+-- PK партиции строится заново как (id, created_at) при ATTACH
+ALTER TABLE submission_p_legacy DROP CONSTRAINT submission_pkey;
+-- FK партиции переиспользуются при ATTACH, освобождаем им имена для родителя
+ALTER TABLE submission_p_legacy RENAME CONSTRAINT submission_student_id_fkey TO submission_p_legacy_student_id_fkey;
+ALTER TABLE submission_p_legacy RENAME CONSTRAINT submission_module_id_fkey TO submission_p_legacy_module_id_fkey;
+ALTER TABLE submission_p_legacy RENAME CONSTRAINT submission_graded_by_fkey TO submission_p_legacy_graded_by_fkey;
+
+CREATE TABLE submission (LIKE submission_p_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+  PARTITION BY RANGE (created_at);
+ALTER TABLE submission ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+ALTER TABLE submission_p_legacy ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+ALTER TABLE submission ADD PRIMARY KEY (id, created_at);
+ALTER TABLE submission ADD FOREIGN KEY (student_id) REFERENCES student(id) ON DELETE CASCADE;
+ALTER TABLE submission ADD FOREIGN KEY (module_id) REFERENCES module(id) ON DELETE CASCADE;
+ALTER TABLE submission ADD FOREIGN KEY (graded_by) REFERENCES app_user(id);
+
+-- история ответов для mastery: WHERE student_id, module_id ORDER BY created_at DESC
+CREATE INDEX idx_submission_student_module_time ON submission (student_id, module_id, created_at);
+CREATE INDEX idx_submission_created_brin ON submission USING BRIN (created_at);
+
+-- ---------- attempt ----------
+
+DROP INDEX IF EXISTS idx_attempt_payload_gin;
+ALTER INDEX idx_attempt_student_time RENAME TO attempt_p_legacy_student_time_idx;
+
+ALTER TABLE attempt RENAME TO attempt_p_legacy;
+-- PK партиции строится заново как (id, created_at) при ATTACH
+ALTER TABLE attempt_p_legacy DROP CONSTRAINT attempt_pkey;
+ALTER TABLE attempt_p_legacy RENAME CONSTRAINT attempt_student_id_fkey TO attempt_p_legacy_student_id_fkey;
+ALTER TABLE attempt_p_legacy RENAME CONSTRAINT attempt_module_id_fkey TO attempt_p_legacy_module_id_fkey;
+
+CREATE TABLE attempt (LIKE attempt_p_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+  PARTITION BY RANGE (created_at);
+ALTER TABLE attempt ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+ALTER TABLE attempt_p_legacy ALTER COLUMN id SET DEFAULT uuid_generate_v7();
+ALTER TABLE attempt ADD PRIMARY KEY (id, created_at);
+ALTER TABLE attempt ADD FOREIGN KEY (student_id) REFERENCES student(id) ON DELETE CASCADE;
+ALTER TABLE attempt ADD FOREIGN KEY (module_id) REFERENCES module(id) ON DELETE CASCADE;
+
+CREATE INDEX idx_attempt_student_time ON attempt (student_id, created_at);
+CREATE INDEX idx_attempt_created_brin ON attempt USING BRIN (created_at);
+
+-- ---------- партиции ----------
+
+DO $$
+DECLARE
+  cutover TIMESTAMPTZ := date_trunc('month', now()) + interval '1 month';
+  parent TEXT;
+  i INT;
+BEGIN
+  FOREACH parent IN ARRAY ARRAY['submission', 'attempt'] LOOP
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (MINVALUE) TO (%L)',
+                   parent, parent || '_p_legacy', cutover);
+    EXECUTE format('CREATE TABLE %I PARTITION OF %I DEFAULT', parent || '_p_default', parent);
+    FOR i IN 0..2 LOOP
+      PERFORM ensure_monthly_partition(parent, (cutover + i * interval '1 month')::date);
+    END LOOP;
+  END LOOP;
+END $$;
+
+-- у партиционированной таблицы PK включает created_at, поэтому и FK составной
+ALTER TABLE parent_signoff ADD COLUMN submission_created_at TIMESTAMPTZ;
+UPDATE parent_signoff ps SET submission_created_at = s.created_at
+FROM submission s WHERE s.id = ps.submission_id;
+ALTER TABLE parent_signoff ALTER COLUMN submission_created_at SET NOT NULL;
+ALTER TABLE parent_signoff
+  ADD CONSTRAINT parent_signoff_submission_fkey
+  FOREIGN KEY (submission_id, submission_created_at)
+  REFERENCES submission (id, created_at) ON DELETE CASCADE;
+
+COMMIT;
+
+-- DOWN
+-- Обратно в обычные таблицы — только копированием данных.
+BEGIN;
+ALTER TABLE parent_signoff DROP CONSTRAINT parent_signoff_submission_fkey;
+
+ALTER TABLE submission RENAME TO submission_partitioned;
+CREATE TABLE submission (LIKE submission_partitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+ALTER TABLE submission ALTER COLUMN id SET DEFAULT gen_random_uuid();
+INSERT INTO submission SELECT * FROM submission_partitioned;
+DROP TABLE submission_partitioned;
+ALTER TABLE submission ADD PRIMARY KEY (id);
+ALTER TABLE submission ADD FOREIGN KEY (student_id) REFERENCES student(id) ON DELETE CASCADE;
+ALTER TABLE submission ADD FOREIGN KEY (module_id) REFERENCES module(id) ON DELETE CASCADE;
+ALTER TABLE submission ADD FOREIGN KEY (graded_by) REFERENCES app_user(id);
+CREATE INDEX idx_submission_student_kind ON submission (student_id, kind);
+CREATE INDEX idx_submission_answer_gin ON submission USING GIN (answer_jsonb);
+
+ALTER TABLE attempt RENAME TO attempt_partitioned;
+CREATE TABLE attempt (LIKE attempt_partitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+ALTER TABLE attempt ALTER COLUMN id SET DEFAULT gen_random_uuid();
+INSERT INTO attempt SELECT * FROM attempt_partitioned;
+DROP TABLE attempt_partitioned;
+ALTER TABLE attempt ADD PRIMARY KEY (id);
+ALTER TABLE attempt ADD FOREIGN KEY (student_id) REFERENCES student(id) ON DELETE CASCADE;
+ALTER TABLE attempt ADD FOREIGN KEY (module_id) REFERENCES module(id) ON DELETE CASCADE;
+CREATE INDEX idx_attempt_student_time ON attempt (student_id, created_at);
+CREATE INDEX idx_attempt_payload_gin ON attempt USING GIN (payload_jsonb);
+
+ALTER TABLE parent_signoff DROP COLUMN submission_created_at;
+ALTER TABLE parent_signoff
+  ADD CONSTRAINT parent_signoff_submission_id_fkey
+  FOREIGN KEY (submission_id) REFERENCES submission(id) ON DELETE CASCADE;
+
+DROP FUNCTION IF EXISTS ensure_monthly_partition(TEXT, DATE);
+DROP FUNCTION IF EXISTS uuid_generate_v7();
+COMMIT;
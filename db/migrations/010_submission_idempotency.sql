@@ -0,0 +1,31 @@
+-- UP
+-- Ключи идемпотентности для POST /api/submissions: клиент повторяет запрос
+-- при обрыве связи, и без ключа каждый повтор создаёт новый submission и
+-- повторно прогоняет пересчёт mastery. Храним ключ и исходный ответ;
+-- повтор с тем же ключом — одно чтение по PK.
+-- Отдельная таблица, потому что у партиционированной submission
+-- уникальный индекс обязан включать created_at.
+BEGIN;
+
+CREATE TABLE submission_idempotency (
+  student_id UUID NOT NULL REFERENCES student(id) ON DELETE CASCADE,
+  idempotency_key TEXT NOT NULL,
+  request_hash TEXT NOT NULL,                 -- sha256 тела запроса: тот же ключ с другим телом — ошибка клиента
+  submission_id UUID,
+  submission_created_at TIMESTAMPTZ,
+  response_jsonb JSONB,                       -- NULL, пока исходный запрос не закоммичен
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (student_id, idempotency_key),
+  FOREIGN KEY (submission_id, submission_created_at)
+    REFERENCES submission (id, created_at) ON DELETE CASCADE
+);
+
+-- очистка старых ключей: DELETE ... WHERE created_at < now() - interval '30 days'
+CREATE INDEX idx_submission_idempotency_created_brin ON submission_idempotency USING BRIN (created_at);
+
+COMMIT;
+
+-- DOWN
+BEGIN;
+DROP TABLE IF EXISTS submission_idempotency;
+COMMIT;
@@ -0,0 +1,46 @@
+-- UP
+-- Траектории mastery, воспроизведённые scripts/replay_mastery.py: один
+-- снимок состояния после каждого сабмита. Нужны для аудита и для сравнения
+-- конфигураций MasteryConfig; каждый прогон — отдельный run.
+BEGIN;
+
+CREATE TABLE mastery_replay_run (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  config_jsonb JSONB NOT NULL,                -- поля MasteryConfig прогона
+  started_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  finished_at TIMESTAMPTZ,
+  stats_jsonb JSONB NOT NULL DEFAULT '{}'::jsonb
+);
+
+-- пишется только COPY и читается по (run, ученик); без FK на student/module,
+-- чтобы запись была дешёвой, а история переживала удаление исходных строк
+CREATE TABLE mastery_history (
+  run_id UUID NOT NULL REFERENCES mastery_replay_run(id) ON DELETE CASCADE,
+  student_id UUID NOT NULL,
+  module_id UUID NOT NULL,
+  submission_id UUID NOT NULL,
+  submitted_at TIMESTAMPTZ NOT NULL,
+  lesson_type TEXT NOT NULL,
+  score NUMERIC,
+  lesson_mastery DOUBLE PRECISION NOT NULL,
+  mastery_overall DOUBLE PRECISION NOT NULL,
+  mastery_concept DOUBLE PRECISION NOT NULL,
+  mastery_guided DOUBLE PRECISION NOT NULL,
+  mastery_independent DOUBLE PRECISION NOT NULL,
+  mastery_assessment DOUBLE PRECISION NOT NULL,
+  count_concept INT NOT NULL,
+  count_guided INT NOT NULL,
+  count_independent INT NOT NULL,
+  count_assessment INT NOT NULL,
+  next_recommended TEXT NOT NULL
+);
+
+CREATE INDEX idx_mastery_history_run_student ON mastery_history (run_id, student_id, module_id, submitted_at);
+
+COMMIT;
+
+-- DOWN
+BEGIN;
+DROP TABLE IF EXISTS mastery_history;
+DROP TABLE IF EXISTS mastery_replay_run;
+COMMIT;
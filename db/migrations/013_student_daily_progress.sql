@@ -0,0 +1,26 @@
+-- UP
+-- Дневные сводки прогресса: графики за учебный год читают ~365 строк на
+-- модуль вместо тысяч сабмитов. Строку дня обновляет POST /api/submissions
+-- в той же транзакции; прошлые дни пересчитывает
+-- scripts/backfill_daily_progress.py. День — по UTC.
+BEGIN;
+
+CREATE TABLE student_daily_progress (
+  student_id UUID NOT NULL REFERENCES student(id) ON DELETE CASCADE,
+  module_id UUID NOT NULL REFERENCES module(id) ON DELETE CASCADE,
+  day DATE NOT NULL,
+  submissions INT NOT NULL DEFAULT 0,
+  scored_submissions INT NOT NULL DEFAULT 0,          -- сабмиты с оценкой
+  score_sum DOUBLE PRECISION NOT NULL DEFAULT 0,      -- средний балл = score_sum / scored_submissions
+  time_spent_seconds BIGINT NOT NULL DEFAULT 0,
+  closing_mastery DOUBLE PRECISION,                   -- overall после последнего сабмита дня
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (student_id, module_id, day)
+);
+
+COMMIT;
+
+-- DOWN
+BEGIN;
+DROP TABLE IF EXISTS student_daily_progress;
+COMMIT;
@@ -0,0 +1,30 @@
+-- UP
+-- Инкрементальная проверка целостности (db_integrity.py): по строке на
+-- таблицу с водяным знаком — до какой метки created_at/updated_at строки уже
+-- проверены — и последним результатом. GET /api/validate/database отдаёт
+-- готовый отчёт отсюда вместо полных anti-join сканов на каждый запрос.
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS integrity_check (
+  name TEXT PRIMARY KEY,                              -- learning_state, submission, module
+  watermark TIMESTAMPTZ,                              -- строки с меткой <= watermark уже проверены
+  counts_jsonb JSONB NOT NULL DEFAULT '{}'::jsonb,    -- {"orphaned_learning_states": 0, ...}
+  flagged_jsonb JSONB NOT NULL DEFAULT '{}'::jsonb,   -- id найденных строк по проверкам (не больше 1000)
+  full_scan_at TIMESTAMPTZ,                           -- последний полный проход
+  checked_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  duration_ms DOUBLE PRECISION
+);
+
+COMMIT;
+
+-- новые и изменённые строки learning_state без полного скана. Это единственный
+-- индекс по updated_at (индекс 012 начинается со student_id и не годится для
+-- updated_at > watermark по всей таблице; миграция 018 его удаляет). Строится
+-- CONCURRENTLY вне транзакции: в learning_state пишет каждый сабмит.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_learning_state_updated_at ON learning_state (updated_at);
+
+-- DOWN
+DROP INDEX CONCURRENTLY IF EXISTS idx_learning_state_updated_at;
+BEGIN;
+DROP TABLE IF EXISTS integrity_check;
+COMMIT;
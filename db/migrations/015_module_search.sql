@@ -0,0 +1,30 @@
+-- UP
+-- Полнотекстовый поиск по модулям (GET /api/modules/search, module_search.py).
+-- search_tsv собирается из названия (вес A), описания (B) и описаний целей из
+-- objectives_jsonb (C) двумя конфигурациями: russian стеммит и русские слова,
+-- и латиницу (asciiword → english_stem), simple хранит слова без изменений для
+-- префиксного поиска ("алгеб" → "алгебра"). Описание модулей заполняет
+-- scripts/import_modules.py.
+BEGIN;
+
+ALTER TABLE module ADD COLUMN description TEXT;
+
+ALTER TABLE module ADD COLUMN search_tsv TSVECTOR GENERATED ALWAYS AS (
+  setweight(to_tsvector('russian'::regconfig, coalesce(title, '')), 'A') ||
+  setweight(to_tsvector('simple'::regconfig, coalesce(title, '')), 'A') ||
+  setweight(to_tsvector('russian'::regconfig, coalesce(description, '')), 'B') ||
+  setweight(to_tsvector('simple'::regconfig, coalesce(description, '')), 'B') ||
+  setweight(to_tsvector('russian'::regconfig, jsonb_path_query_array(objectives_jsonb, '$[*].description')), 'C') ||
+  setweight(to_tsvector('simple'::regconfig, jsonb_path_query_array(objectives_jsonb, '$[*].description')), 'C')
+) STORED;
+
+CREATE INDEX idx_module_search_tsv ON module USING GIN (search_tsv);
+
+COMMIT;
+
+-- DOWN
+BEGIN;
+DROP INDEX IF EXISTS idx_module_search_tsv;
+ALTER TABLE module DROP COLUMN IF EXISTS search_tsv;
+ALTER TABLE module DROP COLUMN IF EXISTS description;
+COMMIT;
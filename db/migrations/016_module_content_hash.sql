@@ -0,0 +1,14 @@
+-- UP
+-- Инкрементальный импорт модулей (module_import.py): sha256 определения модуля
+-- в том виде, в каком его пишет scripts/import_modules.py. Модули с тем же
+-- хешем при повторном импорте не трогаются — ни updated_at, ни индексы.
+BEGIN;
+
+ALTER TABLE module ADD COLUMN content_hash TEXT;
+
+COMMIT;
+
+-- DOWN
+BEGIN;
+ALTER TABLE module DROP COLUMN IF EXISTS content_hash;
+COMMIT;
@@ -0,0 +1,30 @@
+-- UP
+-- Хранилище диагностических сессий (diagnostic_session_store.py): полное
+-- состояние сессии, чтобы продолжить её на любом воркере или после рестарта.
+-- version растёт с каждым ответом; запись с меньшей версией не затирает более
+-- новую, если сессию успели продолжить на другом воркере.
+-- migrate: lock_timeout=2s
+BEGIN;
+
+ALTER TABLE diagnostic_session ADD COLUMN IF NOT EXISTS state_jsonb JSONB;
+ALTER TABLE diagnostic_session ADD COLUMN IF NOT EXISTS version INT NOT NULL DEFAULT 0;
+ALTER TABLE diagnostic_session ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+COMMIT;
+
+-- Последняя сессия ученика при продолжении
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_diagnostic_session_student_updated
+  ON diagnostic_session (student_id, updated_at DESC);
+
+-- Ответы сессии (внешний ключ session_id не индексирован)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_diagnostic_item_result_session
+  ON diagnostic_item_result (session_id);
+
+-- DOWN
+DROP INDEX CONCURRENTLY IF EXISTS idx_diagnostic_item_result_session;
+DROP INDEX CONCURRENTLY IF EXISTS idx_diagnostic_session_student_updated;
+BEGIN;
+ALTER TABLE diagnostic_session DROP COLUMN IF EXISTS updated_at;
+ALTER TABLE diagnostic_session DROP COLUMN IF EXISTS version;
+ALTER TABLE diagnostic_session DROP COLUMN IF EXISTS state_jsonb;
+COMMIT;
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Incremental database integrity checks (migration 014).
+
+Each table is checked in one pass: a single query per table joins the
+parents once and counts every violation with FILTER, instead of one
+anti-join scan per rule. Tables with a created_at/updated_at column are
+checked incrementally. Only rows stamped after the stored watermark are
+scanned. Rows flagged earlier (up to MAX_FLAGGED ids per rule) are
+re-checked by primary key. So the counts stay exact while a run reads only
+new rows. A full pass runs the first time, when more rows were flagged than
+are kept, and every FULL_SCAN_INTERVAL: deleting a parent with foreign key
+triggers disabled, or a bulk load with back-dated timestamps, is only
+caught then.
+
+The watermark trails now() by WATERMARK_LAG, so rows from transactions that
+commit a little after their timestamp are not skipped. Runs take an advisory
+lock, so with several API workers only one of them checks at a time.
+
+IntegrityMonitor runs the checks on a background thread; GET
+/api/validate/database serves the last stored report (load_report) and
+only asks the monitor for an early run (trigger), never scanning itself.
+"""
+
+import json
+import time
+import atexit
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+
+FULL_SCAN_INTERVAL = timedelta(hours=24)
+WATERMARK_LAG = timedelta(minutes=5)
+MAX_FLAGGED = 1000
+# pg_try_advisory_xact_lock key: one integrity run at a time across workers
+ADVISORY_LOCK_KEY = 0x1a7e9c
+
+
+class TableCheck(NamedTuple):
+    """Rules evaluated in one pass over a table (aliased t)."""
+
+    name: str
+    from_sql: str
+    key: str                       # primary key expression, as text
+    timestamp: Optional[str]       # watermark column; None = always a full pass
+    rules: Tuple[Tuple[str, str], ...]  # (report key, SQL condition)
+
+
+TABLE_CHECKS = (
+    TableCheck(
+        name='learning_state',
+        from_sql="""learning_state t
+            LEFT JOIN student s ON t.student_id = s.id
+            LEFT JOIN module m ON t.module_id = m.id""",
+        key='t.id::text',
+        timestamp='t.updated_at',
+        rules=(
+            ('orphaned_learning_states', 's.id IS NULL'),
+            ('orphaned_modules_in_learning_state', 'm.id IS NULL'),
+        ),
+    ),
+    TableCheck(
+        name='submission',
+        from_sql="""submission t
+            LEFT JOIN module m ON t.module_id = m.id""",
+        key='t.id::text',
+        timestamp='t.created_at',
+        rules=(
+            ('orphaned_submissions', 'm.id IS NULL'),
+        ),
+    ),
+    # ~hundreds of rows: always a full pass
+    TableCheck(
+        name='module',
+        from_sql='module t',
+        key='t.id::text',
+        timestamp=None,
+        rules=(
+            ('invalid_jsonb_modules', "t.objectives_jsonb = '{}'::jsonb OR t.lesson_policy_jsonb = '{}'::jsonb"
+                                      " OR t.assessment_blueprint_jsonb = '{}'::jsonb"),
+        ),
+    ),
+)
+
+
+def _window_sql(check: TableCheck, incremental: bool) -> str:
+    """One row: per rule its count and (capped) flagged keys.
+
+    Only violating rows leave the join (WHERE c1 OR c2 ...), so with a single
+    rule the planner still picks an anti join, and the aggregates see few rows.
+    """
+    columns = []
+    for _, condition in check.rules:
+        columns.append(f"count(*) FILTER (WHERE {condition})")
+        columns.append(f"(array_agg({check.key}) FILTER (WHERE {condition}))[1:{MAX_FLAGGED}]")
+    where = " OR ".join(f"({condition})" for _, condition in check.rules)
+    if check.timestamp:
+        where = f"{check.timestamp} <= %(until)s AND ({where})"
+        if incremental:
+            where = f"{check.timestamp} > %(since)s AND " + where
+    return f"SELECT {', '.join(columns)} FROM {check.from_sql} WHERE {where}"
+
+
+def _recheck_sql(check: TableCheck) -> str:
+    """Rows flagged by an earlier run that the window does not cover."""
+    flags = ", ".join(f"({condition})" for _, condition in check.rules)
+    return f"""SELECT {check.key}, {flags} FROM {check.from_sql}
+        WHERE {check.key.replace('::text', '')} = ANY(%(keys)s::uuid[]) AND {check.timestamp} <= %(since)s"""
+
+
+def merge_results(
+    check: TableCheck,
+    window_row: tuple,
+    recheck_rows: List[tuple],
+) -> Tuple[Dict[str, int], Dict[str, List[str]]]:
+    """Counts and flagged keys per rule from the window scan and the re-checked old rows."""
+    counts, flagged = {}, {}
+    for i, (rule, _) in enumerate(check.rules):
+        window_count = window_row[2 * i] or 0
+        window_keys = list(window_row[2 * i + 1] or [])
+        still = [row[0] for row in recheck_rows if row[1 + i]]
+        counts[rule] = window_count + len(still)
+        flagged[rule] = (still + window_keys)[:MAX_FLAGGED]
+    return counts, flagged
+
+
+def _needs_full_pass(check: TableCheck, state: Optional[Dict[str, Any]], now: datetime, full: bool) -> bool:
+    if full or check.timestamp is None or state is None or state['watermark'] is None:
+        return True
+    if state['full_scan_at'] is None or now - state['full_scan_at'] >= FULL_SCAN_INTERVAL:
+        return True
+    # more violations than flagged keys kept: the old ones cannot be re-checked
+    return any(state['counts'].get(rule, 0) > len(state['flagged'].get(rule, [])) for rule, _ in check.rules)
+
+
+def _load_states(cur) -> Dict[str, Dict[str, Any]]:
+    cur.execute("""
+        SELECT name, watermark, counts_jsonb, flagged_jsonb, full_scan_at, checked_at, duration_ms
+        FROM integrity_check
+    """)
+    return {
+        row[0]: {
+            'watermark': row[1], 'counts': row[2] or {}, 'flagged': row[3] or {},
+            'full_scan_at': row[4], 'checked_at': row[5], 'duration_ms': row[6],
+        }
+        for row in cur.fetchall()
+    }
+
+
+def run_checks(conn, full: bool = False) -> Optional[Dict[str, Any]]:
+    """Run every table check (incremental where possible) and store the results.
+
+    Returns the new report, or None when another process holds the lock.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_try_advisory_xact_lock(%s), now()", (ADVISORY_LOCK_KEY,))
+        locked, now = cur.fetchone()
+        if not locked:
+            conn.rollback()
+            return None
+        states = _load_states(cur)
+        until = now - WATERMARK_LAG
+
+        for check in TABLE_CHECKS:
+            start = time.perf_counter()
+            state = states.get(check.name)
+            full_pass = _needs_full_pass(check, state, now, full)
+            params = {'until': until, 'since': None if full_pass else state['watermark']}
+
+            cur.execute(_window_sql(check, incremental=not full_pass), params)
+            window_row = cur.fetchone()
+            recheck_rows = []
+            if not full_pass:
+                keys = sorted({key for rule, _ in check.rules for key in state['flagged'].get(rule, [])})
+                if keys:
+                    cur.execute(_recheck_sql(check), dict(params, keys=keys))
+                    recheck_rows = cur.fetchall()
+            counts, flagged = merge_results(check, window_row, recheck_rows)
+
+            if check.timestamp is None:
+                watermark = None
+            elif full_pass or until > state['watermark']:
+                watermark = until
+            else:
+                watermark = state['watermark']
+            cur.execute("""
+                INSERT INTO integrity_check (
+                    name, watermark, counts_jsonb, flagged_jsonb, full_scan_at, checked_at, duration_ms
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (name) DO UPDATE SET
+                    watermark = EXCLUDED.watermark,
+                    counts_jsonb = EXCLUDED.counts_jsonb,
+                    flagged_jsonb = EXCLUDED.flagged_jsonb,
+                    full_scan_at = EXCLUDED.full_scan_at,
+                    checked_at = EXCLUDED.checked_at,
+                    duration_ms = EXCLUDED.duration_ms
+            """, (
+                check.name, watermark, json.dumps(counts), json.dumps(flagged),
+                now if full_pass else state['full_scan_at'], now,
+                round((time.perf_counter() - start) * 1000, 2),
+            ))
+        states = _load_states(cur)
+    conn.commit()
+    return _report(states)
+
+
+def _report(states: Dict[str, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not states:
+        return None
+    counts: Dict[str, int] = {}
+    checks = {}
+    for name, state in sorted(states.items()):
+        counts.update(state['counts'])
+        checks[name] = {
+            'checked_at': state['checked_at'].isoformat(),
+            'watermark': state['watermark'].isoformat() if state['watermark'] else None,
+            'full_scan_at': state['full_scan_at'].isoformat() if state['full_scan_at'] else None,
+            'full_pass': state['full_scan_at'] == state['checked_at'],
+            'duration_ms': state['duration_ms'],
+        }
+    return {
+        'checked_at': min(state['checked_at'] for state in states.values()).isoformat(),
+        'counts': counts,
+        'checks': checks,
+    }
+
+
+def load_report(cur) -> Optional[Dict[str, Any]]:
+    """Latest stored report, or None before the first run (plain tuple cursor)."""
+    return _report(_load_states(cur))
+
+
+def full_scan_counts(conn) -> Dict[str, int]:
+    """Counts of a full single-pass scan of every table, without touching stored state."""
+    counts: Dict[str, int] = {}
+    with conn.cursor() as cur:
+        cur.execute("SELECT now()")
+        until = cur.fetchone()[0]
+        for check in TABLE_CHECKS:
+            cur.execute(_window_sql(check, incremental=False), {'until': until})
+            check_counts, _ = merge_results(check, cur.fetchone(), [])
+            counts.update(check_counts)
+    return counts
+
+
+class IntegrityMonitor:
+    """Daemon thread running run_checks every interval seconds."""
+
+    thread_name = "integrity-monitor"
+
+    def __init__(self, connect: Callable[[], Any], interval: float = 300.0):
+        self._connect = connect
+        self.interval = interval
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {'runs': 0, 'skipped': 0, 'failed': 0, 'last_run_ms': 0.0, 'last_error': None}
+
+    def start(self) -> 'IntegrityMonitor':
+        if self.interval > 0 and not (self._thread and self._thread.is_alive()):
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def run_once(self, full: bool = False) -> Optional[Dict[str, Any]]:
+        """One run in the calling thread; None if another process was running the checks."""
+        start = time.perf_counter()
+        conn = None
+        try:
+            conn = self._connect()
+            report = run_checks(conn, full=full)
+        except Exception as e:
+            print(f"Warning: {self.thread_name} failed: {e}")
+            self._stats['failed'] += 1
+            self._stats['last_error'] = str(e)
+            return None
+        finally:
+            if conn is not None:
+                conn.close()
+        self._stats['runs' if report is not None else 'skipped'] += 1
+        self._stats['last_run_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        return report
+
+    def trigger(self) -> None:
+        """Run the checks soon on a background thread (a one-off one when the monitor is disabled)."""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                self._wake.set()
+                return
+            self._thread = threading.Thread(target=self.run_once, name=self.thread_name, daemon=True)
+            self._thread.start()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats['interval_sec'] = self.interval
+        stats['monitor_alive'] = bool(self._thread and self._thread.is_alive())
+        return stats
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.run_once()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+def create_integrity_monitor(connect: Callable[[], Any], interval: float = 300.0) -> IntegrityMonitor:
+    """Start a monitor (interval 0 disables it) that stops on interpreter shutdown."""
+    monitor = IntegrityMonitor(connect, interval).start()
+    atexit.register(monitor.stop)
+    return monitor
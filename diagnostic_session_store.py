@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Session stores for SmartDiagnosticSystem.
+
+A running diagnostic (profile, progress per subject, the questions asked so
+far) is a session object kept in a store instead of plain dicts:
+
+  * InMemorySessionStore: an LRU bounded by max_sessions whose sessions also
+    expire after idle_ttl seconds without access, so thousands of concurrent
+    diagnostics take bounded memory. Evicted sessions are gone.
+  * PostgresSessionStore: the same cache, plus write-behind persistence
+    (migration 017). Every change queues a snapshot of the session and the
+    answered item; a background writer (batch_writer.py) upserts the latest
+    snapshot per session into diagnostic_session and inserts the items into
+    diagnostic_item_result, one statement each per batch. A session missing
+    from the cache (evicted, restarted, started on another worker) is
+    resumed from its latest snapshot.
+
+Sessions are duck-typed: the store needs student_id, session_id, version and
+to_state(); SmartDiagnosticSystem rebuilds sessions from load() results.
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from batch_writer import BatchWriter, register_shutdown_drain
+
+
+DEFAULT_MAX_SESSIONS = int(os.getenv('DIAGNOSTIC_MAX_SESSIONS', 10000))
+DEFAULT_IDLE_TTL = float(os.getenv('DIAGNOSTIC_SESSION_TTL', 1800))
+
+
+class SessionSnapshot(NamedTuple):
+    """Full state of a session after a change, as written to diagnostic_session."""
+
+    session_id: str
+    student_id: str
+    version: int
+    record: Dict[str, Any]      # context/results/persona, as in export_session_record
+    state: Dict[str, Any]       # everything needed to resume the session
+    updated_at: datetime
+
+
+class ItemResult(NamedTuple):
+    """One answered question, as written to diagnostic_item_result."""
+
+    session_id: str
+    item_id: str
+    domain: str
+    level: int
+    answer: Dict[str, Any]
+    is_correct: Optional[bool]
+    time_spent_sec: Optional[int]
+    created_at: datetime
+
+
+class StoredSession(NamedTuple):
+    """The latest persisted snapshot of a student's session."""
+
+    session_id: str
+    version: int
+    state: Dict[str, Any]
+
+
+class InMemorySessionStore:
+    """LRU of sessions by student_id with an idle TTL; nothing is persisted."""
+
+    # save() needs the export_session_record of the session only when persistent
+    persistent = False
+
+    def __init__(
+        self,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        idle_ttl: float = DEFAULT_IDLE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # student_id -> (session, last access); oldest access first
+        self._sessions: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._stats = {'hits': 0, 'misses': 0, 'evicted': 0, 'expired': 0}
+
+    def get(self, student_id: str):
+        """Cached session of a student, or None (also when it has been idle too long)."""
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            entry = self._sessions.get(student_id)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._sessions[student_id] = (entry[0], now)
+            self._sessions.move_to_end(student_id)
+            self._stats['hits'] += 1
+            return entry[0]
+
+    def put(self, session) -> None:
+        """Cache a session, evicting the least recently used one over max_sessions."""
+        with self._lock:
+            now = self._clock()
+            self._sessions[session.student_id] = (session, now)
+            self._sessions.move_to_end(session.student_id)
+            self._expire(now)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._stats['evicted'] += 1
+
+    def save(self, session, record: Optional[Dict[str, Any]] = None, item: Optional[ItemResult] = None) -> None:
+        """Record a change of the session (and the item answered, if any)."""
+        session.version += 1
+        self.put(session)
+
+    def load(self, student_id: str) -> Optional[StoredSession]:
+        """Latest persisted session of a student; this store persists nothing."""
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['sessions'] = len(self._sessions)
+        stats['max_sessions'] = self.max_sessions
+        stats['idle_ttl'] = self.idle_ttl
+        return stats
+
+    def _expire(self, now: float) -> None:
+        # Entries are ordered by last access, so the idle ones are at the front
+        while self._sessions:
+            _, last_access = next(iter(self._sessions.values()))
+            if now - last_access <= self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+            self._stats['expired'] += 1
+
+
+def _uuid_or_none(value: Any) -> Optional[str]:
+    try:
+        return str(uuid.UUID(str(value)))
+    except ValueError:
+        return None
+
+
+UPSERT_SESSIONS_SQL = """
+    INSERT INTO diagnostic_session
+        (id, student_id, context_jsonb, results_jsonb, persona_jsonb, state_jsonb, version, updated_at)
+    SELECT s.id, s.student_id, s.context, s.results, s.persona, s.state, s.version, s.updated_at
+    FROM jsonb_to_recordset(%s::jsonb) AS s(
+        id UUID, student_id UUID, context JSONB, results JSONB, persona JSONB,
+        state JSONB, version INT, updated_at TIMESTAMPTZ)
+    JOIN student st ON st.id = s.student_id
+    ON CONFLICT (id) DO UPDATE SET
+        context_jsonb = EXCLUDED.context_jsonb,
+        results_jsonb = EXCLUDED.results_jsonb,
+        persona_jsonb = EXCLUDED.persona_jsonb,
+        state_jsonb = EXCLUDED.state_jsonb,
+        version = EXCLUDED.version,
+        updated_at = EXCLUDED.updated_at
+    WHERE diagnostic_session.version < EXCLUDED.version
+"""
+
+INSERT_ITEMS_SQL = """
+    INSERT INTO diagnostic_item_result
+        (session_id, item_id, domain, level, answer_jsonb, is_correct, time_spent_sec, created_at)
+    SELECT r.session_id, r.item_id, r.domain, r.level, r.answer, r.is_correct, r.time_spent_sec, r.created_at
+    FROM jsonb_to_recordset(%s::jsonb) AS r(
+        session_id UUID, item_id TEXT, domain TEXT, level INT, answer JSONB,
+        is_correct BOOLEAN, time_spent_sec INT, created_at TIMESTAMPTZ)
+    JOIN diagnostic_session ds ON ds.id = r.session_id
+"""
+
+LOAD_SESSION_SQL = """
+    SELECT id::text, version, state_jsonb
+    FROM diagnostic_session
+    WHERE student_id = %s AND state_jsonb IS NOT NULL
+    ORDER BY updated_at DESC
+    LIMIT 1
+"""
+
+
+class DiagnosticSessionWriter(BatchWriter):
+    """Writes queued snapshots and item results, each kind with one statement per batch."""
+
+    thread_name = "diagnostic-writer"
+    skipped_stat = 'dropped_unknown'
+
+    def _write_rows(self, cur, batch: List[Any]) -> int:
+        # Only the newest snapshot of a session in the batch is written
+        latest: Dict[str, SessionSnapshot] = {}
+        items = []
+        for event in batch:
+            if isinstance(event, SessionSnapshot):
+                current = latest.get(event.session_id)
+                if current is None or current.version < event.version:
+                    latest[event.session_id] = event
+            else:
+                items.append(event)
+
+        snapshots = len(batch) - len(items)
+        written = 0
+        if latest:
+            cur.execute(UPSERT_SESSIONS_SQL, (json.dumps([{
+                'id': s.session_id, 'student_id': s.student_id, 'version': s.version,
+                'context': s.record.get('context', {}), 'results': s.record.get('results'),
+                'persona': s.record.get('persona'), 'state': s.state,
+                'updated_at': s.updated_at.isoformat(),
+            } for s in latest.values()], ensure_ascii=False),))
+            # superseded snapshots count as written along with the newest one
+            written += snapshots - (len(latest) - max(cur.rowcount, 0))
+        if items:
+            cur.execute(INSERT_ITEMS_SQL, (json.dumps([
+                dict(item._asdict(), created_at=item.created_at.isoformat()) for item in items
+            ], ensure_ascii=False),))
+            written += max(cur.rowcount, 0)
+        return written
+
+
+class PostgresSessionStore(InMemorySessionStore):
+    """InMemorySessionStore with write-behind persistence and resume from the database.
+
+    Only sessions of students that exist in student (student_id is student.id)
+    are persisted: others stay in memory only. A snapshot rejected because the
+    write queue is full is covered by the next one, but the item result queued
+    with it is lost.
+
+    An active session is expected to stay on one worker (sticky routing); if
+    it moves anyway, the version check keeps the old worker's snapshots from
+    overwriting the newer ones.
+    """
+
+    persistent = True
+
+    def __init__(self, connect: Callable[[], Any], writer: Optional[DiagnosticSessionWriter] = None, **kwargs):
+        super().__init__(**kwargs)
+        self._connect = connect
+        self.writer = writer or DiagnosticSessionWriter(connect)
+        self._stats.update(loaded=0, not_persisted=0)
+
+    def save(self, session, record: Optional[Dict[str, Any]] = None, item: Optional[ItemResult] = None) -> None:
+        super().save(session, record, item)
+        student_id = _uuid_or_none(session.student_id)
+        if student_id is None:
+            with self._lock:
+                self._stats['not_persisted'] += 1
+            return
+        events = [SessionSnapshot(
+            session_id=session.session_id,
+            student_id=student_id,
+            version=session.version,
+            record=record or {},
+            state=session.to_state(),
+            updated_at=datetime.now(timezone.utc),
+        )]
+        if item is not None:
+            events.append(item)
+        self.writer.offer(events)
+
+    def load(self, student_id: str) -> Optional[StoredSession]:
+        """Latest snapshot of the student's session, after writing out what is still queued."""
+        student_id = _uuid_or_none(student_id)
+        if student_id is None:
+            return None
+        self.writer.flush()
+        conn = self._connect()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(LOAD_SESSION_SQL, (student_id,))
+                row = cur.fetchone()
+            conn.rollback()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        if isinstance(row, dict):
+            row = (row['id'], row['version'], row['state_jsonb'])
+        with self._lock:
+            self._stats['loaded'] += 1
+        return StoredSession(session_id=row[0], version=row[1], state=row[2])
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats['writer'] = self.writer.get_stats()
+        return stats
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+def create_session_store(connect: Optional[Callable[[], Any]] = None, **kwargs) -> InMemorySessionStore:
+    """Postgres-backed store that drains itself on shutdown, or an in-memory one without connect."""
+    if connect is None:
+        return InMemorySessionStore(**kwargs)
+    store = PostgresSessionStore(connect, **kwargs)
+    register_shutdown_drain(store.writer)
+    return store
@@ -5,7 +5,7 @@ import json
 from pathlib import Path
 from typing import Any
 
-from jsonschema import Draft7Validator
+from schema_registry import registry
 
 
 def load_json(path: str | Path) -> Any:
@@ -15,8 +15,13 @@ def load_json(path: str | Path) -> Any:
 
 
 def validate_sample(sample_path: str | Path, schema_path: str | Path) -> bool:
-    """Validate a diagnostic sample against the schema."""
-    schema = load_json(schema_path)
+    """Validate a diagnostic sample against the schema.
+
+    The schema is compiled once per file (see schema_registry); on failure the
+    jsonschema ValidationError of the first error is raised, as before.
+    """
+    compiled = registry.for_path(schema_path)
     sample = load_json(sample_path)
-    Draft7Validator(schema).validate(sample)
+    if not compiled.is_valid(sample):
+        compiled.draft7.validate(sample)
     return True
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Typed storage for learning_state mastery and counters.
+
+Mastery and counters live in plain columns (see migration 008); this module
+maps them to and from the dicts that mastery_calculator and the API use, so
+the JSON returned to clients keeps its shape.
+"""
+
+import uuid
+import base64
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+
+# Lesson types that have their own mastery/counter columns
+TRACKED_LESSON_TYPES = ('concept', 'guided', 'independent', 'assessment')
+
+MASTERY_COLUMNS = {
+    'overall': 'mastery_overall',
+    'concept': 'mastery_concept',
+    'guided': 'mastery_guided',
+    'independent': 'mastery_independent',
+    'assessment': 'mastery_assessment',
+}
+
+COUNTER_COLUMNS = {
+    'concept': 'count_concept',
+    'guided': 'count_guided',
+    'independent': 'count_independent',
+    'assessment': 'count_assessment',
+}
+
+_STATE_COLUMNS = (
+    list(MASTERY_COLUMNS.values())
+    + ['mastery_total_submissions', 'mastery_updated_at']
+    + list(COUNTER_COLUMNS.values())
+)
+
+# Column list for SELECTs that need to rebuild mastery/counters dicts
+LEARNING_STATE_COLUMNS = ", ".join(_STATE_COLUMNS)
+
+
+def learning_state_columns(alias: str) -> str:
+    """Same as LEARNING_STATE_COLUMNS, qualified with a table alias."""
+    return ", ".join(f"{alias}.{col}" for col in _STATE_COLUMNS)
+
+
+def mastery_from_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the mastery dict from a learning_state row."""
+    mastery = {key: float(row[col] or 0.0) for key, col in MASTERY_COLUMNS.items()}
+    if row.get('mastery_updated_at') is not None:
+        mastery['last_updated'] = row['mastery_updated_at'].isoformat()
+    if row.get('mastery_total_submissions') is not None:
+        mastery['total_submissions'] = int(row['mastery_total_submissions'])
+    return mastery
+
+
+def counters_from_row(row: Dict[str, Any]) -> Dict[str, int]:
+    """Build the counters dict from a learning_state row."""
+    return {key: int(row[col] or 0) for key, col in COUNTER_COLUMNS.items()}
+
+
+def _mastery_values(mastery: Dict[str, Any]) -> list:
+    values = [float(mastery.get(key, 0.0) or 0.0) for key in MASTERY_COLUMNS]
+    total = mastery.get('total_submissions')
+    values.append(int(total) if total is not None else None)
+    last_updated = mastery.get('last_updated')
+    if isinstance(last_updated, str):
+        last_updated = datetime.fromisoformat(last_updated)
+    values.append(last_updated)
+    return values
+
+
+def _counter_values(counters: Dict[str, int]) -> list:
+    return [int(counters.get(key, 0) or 0) for key in COUNTER_COLUMNS]
+
+
+def insert_learning_state(
+    cur,
+    student_id: str,
+    module_id: str,
+    current_lesson_type: Optional[str],
+    mastery: Dict[str, Any],
+    counters: Dict[str, int],
+    next_recommended: Optional[str],
+) -> Dict[str, Any]:
+    """Insert a learning_state row and return it (RETURNING *)."""
+    placeholders = ", ".join(["%s"] * (len(_STATE_COLUMNS) + 4))
+    cur.execute(f"""
+        INSERT INTO learning_state (
+            student_id, module_id, current_lesson_type,
+            {LEARNING_STATE_COLUMNS}, next_recommended
+        ) VALUES ({placeholders})
+        RETURNING *
+    """, (
+        student_id, module_id, current_lesson_type,
+        *_mastery_values(mastery), *_counter_values(counters), next_recommended
+    ))
+    return cur.fetchone()
+
+
+def update_learning_state(
+    cur,
+    student_id: str,
+    module_id: str,
+    mastery: Dict[str, Any],
+    counters: Dict[str, int],
+    next_recommended: Optional[str],
+) -> None:
+    """Overwrite mastery, counters and next_recommended for a learning_state row."""
+    assignments = ", ".join(f"{col} = %s" for col in _STATE_COLUMNS)
+    cur.execute(f"""
+        UPDATE learning_state
+        SET {assignments},
+            next_recommended = %s, updated_at = now()
+        WHERE student_id = %s AND module_id = %s
+    """, (
+        *_mastery_values(mastery), *_counter_values(counters),
+        next_recommended, student_id, module_id
+    ))
+
+
+# ---------- Per-student mastery overview ----------
+
+# Modules whose overall mastery reaches this are reported as completed
+COMPLETED_MASTERY = 0.8
+
+MASTERY_PAGE_SIZE = 50
+MASTERY_PAGE_MAX = 200
+
+
+def encode_mastery_cursor(module_id: Any) -> str:
+    """Opaque keyset cursor for the page after a student's module."""
+    return base64.urlsafe_b64encode(str(module_id).encode()).decode().rstrip('=')
+
+
+def decode_mastery_cursor(cursor: str) -> str:
+    """module_id from encode_mastery_cursor; ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        return str(uuid.UUID(raw))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _student_modules(
+    user_id: str,
+    subject_code: Optional[str],
+    stage_code: Optional[str],
+    with_titles: bool = False,
+) -> Tuple[str, list]:
+    """FROM/WHERE over a student's learning_state rows, optionally for one subject/stage.
+
+    module m, subject s and stage st are joined only when filtered on or when
+    with_titles asks for them.
+    """
+    # student resolved in a subquery so the UNIQUE (student_id, module_id) index keeps its order
+    joins = ["learning_state ls"]
+    where, params = ["ls.student_id = (SELECT id FROM student WHERE user_id = %s)"], [user_id]
+    if with_titles or subject_code or stage_code:
+        joins.append("JOIN module m ON ls.module_id = m.id")
+    if with_titles or subject_code:
+        joins.append("JOIN subject s ON m.subject_id = s.id")
+    if with_titles or stage_code:
+        joins.append("JOIN stage st ON m.stage_id = st.id")
+    if subject_code:
+        where.append("LOWER(s.code) = LOWER(%s)")
+        params.append(subject_code)
+    if stage_code:
+        where.append("LOWER(st.code) = LOWER(%s)")
+        params.append(stage_code)
+    return f"FROM {' '.join(joins)} WHERE {' AND '.join(where)}", params
+
+
+def fetch_mastery_summary(
+    cur,
+    user_id: str,
+    subject_code: Optional[str] = None,
+    stage_code: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Module count, average overall mastery and completed modules, aggregated in SQL."""
+    source, params = _student_modules(user_id, subject_code, stage_code)
+    cur.execute(f"""
+        SELECT count(*) AS total_modules,
+               COALESCE(avg(ls.mastery_overall), 0) AS average_mastery,
+               count(*) FILTER (WHERE ls.mastery_overall >= %s) AS completed_modules
+        {source}
+    """, [COMPLETED_MASTERY, *params])
+    row = cur.fetchone()
+    return {
+        "total_modules": int(row['total_modules']),
+        "average_mastery": round(float(row['average_mastery']), 3),
+        "completed_modules": int(row['completed_modules']),
+    }
+
+
+def fetch_mastery_page(
+    cur,
+    user_id: str,
+    limit: int = MASTERY_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    subject_code: Optional[str] = None,
+    stage_code: Optional[str] = None,
+) -> Tuple[list, Optional[str]]:
+    """One page of a student's learning_state rows, in module_id order.
+
+    Keyset pagination on module_id, which never changes for a row, so pages do
+    not shift while submissions update the student's modules (ordering by
+    updated_at would skip or repeat modules). Returns (rows, next_cursor),
+    where next_cursor is None on the last page.
+    """
+    source, params = _student_modules(user_id, subject_code, stage_code, with_titles=True)
+    if cursor:
+        source += " AND ls.module_id > %s"
+        params.append(decode_mastery_cursor(cursor))
+    cur.execute(f"""
+        SELECT
+            ls.id,
+            ls.module_id,
+            {learning_state_columns('ls')},
+            ls.next_recommended,
+            ls.updated_at,
+            m.code as module_code,
+            m.title as module_title,
+            s.title as subject_title,
+            st.title as stage_title
+        {source}
+        ORDER BY ls.module_id
+        LIMIT %s
+    """, [*params, limit + 1])
+    rows = cur.fetchall()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_mastery_cursor(rows[-1]['module_id'])
+
+
+def fetch_module_mastery(cur, user_id: str) -> Dict[str, float]:
+    """module code -> overall mastery for every learning_state row of a student."""
+    cur.execute("""
+        SELECT m.code AS module_code, ls.mastery_overall
+        FROM learning_state ls
+        JOIN module m ON ls.module_id = m.id
+        WHERE ls.student_id = (SELECT id FROM student WHERE user_id = %s)
+    """, (user_id,))
+    return {row['module_code']: float(row['mastery_overall'] or 0.0) for row in cur.fetchall()}
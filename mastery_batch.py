@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Vectorized bulk recomputation of learning_state mastery.
+
+Replays the submission history of every (student, module) the way
+create_submission does it, one submission after another, but with NumPy
+over whole arrays instead of a Python call per submission:
+
+  * lesson mastery (accuracy, speed, consistency, difficulty, spacing) is
+    computed for all submissions at once; the 20-submission history window
+    that create_submission reads becomes a (20 x rows) matrix;
+  * the per-type EMA is a recurrence, so it is evaluated position by
+    position, each step updating every (student, module) group at once.
+
+Results match MasteryCalculatorV2 up to float rounding. Two inputs are not
+stored with submissions and take the API defaults: time spent (300 s) and
+difficulty ("medium").
+"""
+
+import io
+import csv
+import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from mastery_calculator import (
+    MasteryCalculatorV2, MasteryConfig, OVERALL_WEIGHTS, DEFAULT_LESSON_MIX, DEFAULT_GATES
+)
+# Lesson types in code order ("unknown" has no mastery/counter columns) and
+# the SQL that classifies lesson_id the same way create_submission does
+from submission_records import LessonType, LESSON_TYPES, LESSON_TYPE_CODE_SQL, HISTORY_LIMIT
+
+
+TRACKED_TYPES = len(OVERALL_WEIGHTS)
+CONCEPT, GUIDED, INDEPENDENT, ASSESSMENT, UNKNOWN_TYPE = LessonType
+
+CONSISTENCY_WINDOW = 10
+SPACING_WINDOW = 10
+SPACING_SCORE_WINDOW = 5
+
+DEFAULT_TIME_SPENT = 300
+DEFAULT_DIFFICULTY = 'medium'
+
+
+class GroupResult(NamedTuple):
+    """Final state of one (student, module) after replaying its submissions."""
+
+    mastery: np.ndarray           # (groups, 4) per-type mastery, LESSON_TYPES order
+    overall: np.ndarray           # (groups,)
+    counters: np.ndarray          # (groups, 4)
+    total_submissions: np.ndarray  # (groups,)
+
+
+def _round3(x: np.ndarray) -> np.ndarray:
+    """round(x, 3) elementwise with Python's result.
+
+    np.round scales by 1000 and rounds half to even, which differs from
+    round() when the scaled value lands exactly on .5; those rare ties are
+    rounded by Python so batch and scalar results agree exactly.
+    """
+    x = np.asarray(x, dtype=float)
+    scaled = x * 1000
+    out = np.rint(scaled) / 1000
+    ties = np.flatnonzero(np.abs(scaled - np.trunc(scaled)) == 0.5)
+    if len(ties):
+        flat = out.reshape(-1)
+        flat[ties] = [round(float(v), 3) for v in x.reshape(-1)[ties]]
+    return out
+
+
+def _logistic(k: float, x: np.ndarray) -> np.ndarray:
+    return 1 / (1 + np.exp(-k * x))
+
+
+class BatchMasteryEngine:
+    """NumPy counterpart of MasteryCalculatorV2 for whole submission logs."""
+
+    def __init__(self, cfg: Optional[MasteryConfig] = None):
+        self.cfg = cfg or MasteryConfig()
+        self.calc = MasteryCalculatorV2(self.cfg)
+
+        tracked = LESSON_TYPES[:TRACKED_TYPES]
+        self._thresholds = np.array(
+            [self.cfg.accuracy_thresholds.get(t, 0.7) for t in LESSON_TYPES])
+        self._expected = np.array(
+            [self.cfg.expected_times.get(t, 600) for t in LESSON_TYPES], dtype=float)
+        self._weights = [(LESSON_TYPES.index(t), w) for t, w in OVERALL_WEIGHTS.items() if t in tracked]
+
+    # ---- Lesson mastery ----
+
+    def lesson_mastery(
+        self,
+        group: np.ndarray,
+        created_at: np.ndarray,
+        score: np.ndarray,
+        lesson_type: np.ndarray,
+        time_spent: Any = DEFAULT_TIME_SPENT,
+        difficulty: str = DEFAULT_DIFFICULTY,
+    ) -> np.ndarray:
+        """Lesson mastery of every submission.
+
+        Arrays are aligned and sorted by (group, created_at); group holds
+        consecutive integer ids, created_at is epoch seconds.
+        """
+        n = len(group)
+        window = np.minimum(self._positions(group) + 1, HISTORY_LIMIT)
+        offsets = np.arange(HISTORY_LIMIT)[:, None]
+        idx = np.where(offsets < window[None, :], np.arange(n)[None, :] - offsets, 0)
+        return self.lesson_mastery_window(
+            window, score[idx], lesson_type[idx], created_at[idx], time_spent, difficulty)
+
+    def lesson_mastery_window(
+        self,
+        window: np.ndarray,
+        win_score: np.ndarray,
+        win_type: np.ndarray,
+        win_time: np.ndarray,
+        time_spent: Any = DEFAULT_TIME_SPENT,
+        difficulty: str = DEFAULT_DIFFICULTY,
+    ) -> np.ndarray:
+        """Lesson mastery from history windows.
+
+        win_* are (HISTORY_LIMIT, n) and newest first: row 0 is the
+        submission being scored, row j the one j steps back; only the first
+        window[i] rows of column i are valid. This is the history list the
+        API passes to the scalar calculator, one column per submission.
+        """
+        n = len(window)
+        score, lesson_type = win_score[0], win_type[0]
+        time_spent = np.broadcast_to(np.asarray(time_spent, dtype=float), (n,))
+
+        acc = _round3(_logistic(12.0, score - self._thresholds[lesson_type]))
+        spd = self._speed(time_spent, lesson_type, difficulty)
+        cns = self._consistency(window, win_score, win_type)
+        dif = self.calc._score_difficulty(difficulty)
+        spc = self._spacing(window, win_score, win_time)
+
+        mastery = (
+            self.cfg.w_accuracy*acc +
+            self.cfg.w_speed*spd +
+            self.cfg.w_consistency*cns +
+            self.cfg.w_difficulty*dif +
+            self.cfg.w_spacing*spc
+        )
+        return _round3(np.clip(mastery, 0.0, 1.0))
+
+    @staticmethod
+    def _positions(group: np.ndarray) -> np.ndarray:
+        """0-based position of each row inside its group."""
+        n = len(group)
+        starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+        lengths = np.diff(np.r_[starts, n])
+        return np.arange(n) - np.repeat(starts, lengths)
+
+    def _speed(self, t_sec: np.ndarray, lesson_type: np.ndarray, difficulty: str) -> np.ndarray:
+        mult = self.cfg.difficulty_time_mult.get(difficulty, 1.0)
+        expected = self._expected[lesson_type] * mult
+        ratio = t_sec / np.maximum(1.0, expected)
+        spd = _round3(_logistic(6.0, 1.0 - ratio))
+        return np.where(t_sec < self.cfg.min_time_floor_sec, 0.2, spd)
+
+    def _consistency(self, window, win_score, win_type) -> np.ndarray:
+        n = len(window)
+        offsets = np.arange(HISTORY_LIMIT)[:, None]
+        same = (offsets < window[None, :]) & (win_type == win_type[0][None, :])
+
+        # the scalar keeps the last 10 matches of the newest-first list,
+        # i.e. the 10 oldest same-type submissions in the window
+        from_end = np.cumsum(same[::-1], axis=0)[::-1]
+        selected = same & (from_end <= CONSISTENCY_WINDOW)
+
+        alpha = 0.4
+        ewma = np.zeros(n)
+        streak = np.zeros(n, dtype=np.int64)
+        best_streak = np.zeros(n, dtype=np.int64)
+        for j in range(HISTORY_LIMIT):
+            sel = selected[j]
+            sc = win_score[j]
+            ewma = np.where(sel, alpha*sc + (1-alpha)*ewma, ewma)
+            streak = np.where(sel, np.where(sc >= 0.6, streak + 1, 0), streak)
+            np.maximum(best_streak, streak, out=best_streak)
+
+        bonus = np.minimum(0.15, 0.03 * best_streak)
+        return _round3(np.clip(ewma + bonus, 0.0, 1.0))
+
+    def _spacing(self, window, win_score, win_time) -> np.ndarray:
+        # The scalar looks at the tail of the newest-first history, i.e. the
+        # oldest submissions of the window: 10 for intervals, 5 for scores
+        cols = np.arange(len(window))
+        oldest = window - 1
+        span = np.minimum(SPACING_WINDOW, window)
+        newest_used = window - span
+        avg_interval = (win_time[newest_used, cols] - win_time[oldest, cols]) / np.maximum(span - 1, 1)
+
+        k = np.minimum(SPACING_SCORE_WINDOW, window)
+        score_sum = np.zeros(len(window))
+        for j in range(HISTORY_LIMIT):
+            score_sum += np.where((j >= window - k) & (j < window), win_score[j], 0.0)
+        avg_score = score_sum / k
+
+        optimal = self.cfg.spacing_base_sec * (0.8 + 0.6*avg_score)
+        with np.errstate(divide='ignore'):
+            ratio = avg_interval / np.maximum(1.0, optimal)
+            closeness = np.exp(-np.abs(np.log(ratio)))
+        spc = _round3(0.5 + 0.5*closeness)
+        return np.where(window < 3, 0.5, spc)
+
+    # ---- EMA replay ----
+
+    def replay(
+        self,
+        group: np.ndarray,
+        created_at: np.ndarray,
+        score: np.ndarray,
+        lesson_type: np.ndarray,
+        time_spent: Any = DEFAULT_TIME_SPENT,
+        difficulty: str = DEFAULT_DIFFICULTY,
+    ) -> GroupResult:
+        """Replay all submissions and return the final state per group."""
+        lesson_mastery = self.lesson_mastery(group, created_at, score, lesson_type, time_spent, difficulty)
+        pos = self._positions(group)
+        n_groups = int(group[-1]) + 1 if len(group) else 0
+        alpha = self._ema_alpha(np.minimum(pos + 1, HISTORY_LIMIT))
+
+        # EMA is sequential inside a group but independent across groups:
+        # step through positions, updating every group that has that position
+        mastery = np.zeros((n_groups, TRACKED_TYPES))
+        tracked = lesson_type < TRACKED_TYPES
+        order = np.argsort(pos, kind='stable')
+        bounds = np.r_[0, np.cumsum(np.bincount(pos))] if len(pos) else np.array([0])
+        for p in range(len(bounds) - 1):
+            rows = order[bounds[p]:bounds[p + 1]]
+            rows = rows[tracked[rows]]
+            g, t, a = group[rows], lesson_type[rows], alpha[rows]
+            mastery[g, t] = (1 - a) * mastery[g, t] + a * lesson_mastery[rows]
+
+        overall = self.overall(mastery)
+
+        counters = np.zeros((n_groups, TRACKED_TYPES), dtype=np.int64)
+        np.add.at(counters, (group[tracked], lesson_type[tracked]), 1)
+        sizes = np.bincount(group, minlength=n_groups)
+        return GroupResult(mastery, overall, counters, np.minimum(sizes, HISTORY_LIMIT))
+
+    def overall(self, mastery: np.ndarray) -> np.ndarray:
+        """Weighted overall of (n, 4) per-type mastery, as update_mastery_ema computes it."""
+        overall = np.zeros(len(mastery))
+        for t, w in self._weights:
+            overall = overall + mastery[:, t] * w
+        total_w = 0.0
+        for _, w in self._weights:
+            total_w += w
+        return _round3(overall / total_w)
+
+    def ema_step(self, mastery: np.ndarray, lesson_type: np.ndarray, lesson_mastery: np.ndarray,
+                 total_submissions: np.ndarray) -> None:
+        """One update_mastery_ema step for n rows of (n, 4) mastery, in place (tracked types only)."""
+        rows = np.flatnonzero(lesson_type < TRACKED_TYPES)
+        t, a = lesson_type[rows], self._ema_alpha(total_submissions[rows])
+        mastery[rows, t] = (1 - a) * mastery[rows, t] + a * lesson_mastery[rows]
+
+    def recommend_next(
+        self,
+        overall: np.ndarray,
+        counters: np.ndarray,
+        mix: Optional[Dict[str, float]] = None,
+        gates: Optional[Dict[str, int]] = None,
+    ) -> np.ndarray:
+        """recommend_next_lesson_type for n rows sharing one lesson mix; returns type codes."""
+        mix = mix or DEFAULT_LESSON_MIX
+        gates = gates or DEFAULT_GATES
+        keys = [LESSON_TYPES.index(k) for k in mix]
+        if any(k >= TRACKED_TYPES for k in keys):
+            raise ValueError(f"Lesson mix must only use {LESSON_TYPES[:TRACKED_TYPES]}: {list(mix)}")
+
+        # 1) base by mastery level, 2) gates
+        base = np.select([overall < 0.3, overall < 0.6, overall < 0.85],
+                         [CONCEPT, GUIDED, INDEPENDENT], ASSESSMENT)
+        no_concept = counters[:, CONCEPT] < gates["independent_min_concept"]
+        base = np.where(((base == INDEPENDENT) | (base == ASSESSMENT)) & no_concept, CONCEPT, base)
+        base = np.where((base == ASSESSMENT) & (counters[:, INDEPENDENT] < gates["assessment_min_independent"]),
+                        INDEPENDENT, base)
+
+        # 3) most underfed type of the mix (first one wins ties, like the stable sort)
+        total = counters[:, keys].sum(axis=1)
+        total = np.where(total == 0, 1, total)
+        deficits = np.stack([target - counters[:, k] / total for k, target in zip(keys, mix.values())])
+        underfed = np.asarray(keys)[np.argmax(deficits, axis=0)]
+
+        compatible = np.where(
+            base == ASSESSMENT,
+            np.isin(underfed, (ASSESSMENT, INDEPENDENT, GUIDED)),
+            ~((base == INDEPENDENT) & (underfed == CONCEPT)),
+        )
+        return np.where(compatible, underfed, base)
+
+    def _ema_alpha(self, n: np.ndarray) -> np.ndarray:
+        cfg = self.cfg
+        f = n / float(cfg.ema_warmup_n)
+        warm = cfg.ema_alpha_max*(1-f) + cfg.ema_alpha_min*f
+        alpha = np.where(n < cfg.ema_warmup_n, warm, cfg.ema_alpha_min)
+        return np.where(n <= 0, cfg.ema_alpha_max, alpha)
+
+    def next_recommended(self, result: GroupResult, mixes: List[Dict[str, float]]) -> List[str]:
+        """Next lesson type per group (scalar: it depends on each module's mix)."""
+        types = LESSON_TYPES[:TRACKED_TYPES]
+        recommendations = []
+        for i, mix in enumerate(mixes):
+            counters = dict(zip(types, result.counters[i].tolist()))
+            next_type, _ = self.calc.recommend_next_lesson_type(
+                {"overall": float(result.overall[i])}, mix, counters)
+            recommendations.append(next_type)
+        return recommendations
+
+
+# ---------- Database ----------
+
+FETCH_SUBMISSIONS_SQL = f"""
+    SELECT s.student_id::text, s.module_id::text,
+           extract(epoch FROM s.created_at)::float8,
+           COALESCE(s.score, 0)::float8,
+           {LESSON_TYPE_CODE_SQL}
+    FROM submission s
+    {{where}}
+    ORDER BY s.student_id, s.module_id, s.created_at
+"""
+
+
+def stream_submission_chunks(conn, chunk_rows: int = 200000, student_ids: Optional[List[str]] = None) -> Iterator[List[tuple]]:
+    """Yield submissions in (student, module, created_at) order, cut at group boundaries."""
+    where, params = "", None
+    if student_ids:
+        where, params = "WHERE s.student_id = ANY(%s::uuid[])", (student_ids,)
+
+    with conn.cursor(name='mastery_batch_submissions') as cur:
+        cur.itersize = chunk_rows
+        cur.execute(FETCH_SUBMISSIONS_SQL.format(where=where), params)
+        carry: List[tuple] = []
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if not rows:
+                break
+            rows = carry + rows
+            last_key = rows[-1][:2]
+            cut = len(rows)
+            while cut > 0 and rows[cut - 1][:2] == last_key:
+                cut -= 1
+            carry = rows[cut:]
+            if cut:
+                yield rows[:cut]
+        if carry:
+            yield carry
+
+
+def chunk_to_arrays(rows: List[tuple]) -> Tuple[List[Tuple[str, str]], np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Split fetched rows into group keys and aligned column arrays."""
+    students, modules, created_at, score, lesson_type = zip(*rows)
+    keys = list(zip(students, modules))
+    is_start = np.ones(len(keys), dtype=bool)
+    is_start[1:] = [keys[i] != keys[i - 1] for i in range(1, len(keys))]
+    group = np.cumsum(is_start) - 1
+    group_keys = [k for k, start in zip(keys, is_start) if start]
+    return (
+        group_keys, group,
+        np.asarray(created_at, dtype=float),
+        np.asarray(score, dtype=float),
+        np.asarray(lesson_type, dtype=np.int64),
+    )
+
+
+def load_module_mixes(conn) -> Dict[str, Dict[str, float]]:
+    """lesson_policy mix per module id (empty dict falls back to the default mix)."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT id::text, lesson_policy_jsonb FROM module")
+        return {module_id: (policy or {}).get('mix', {}) for module_id, policy in cur.fetchall()}
+
+
+def _write_chunk(cur, group_keys, result: GroupResult, recommendations: List[str]) -> int:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for i, (student_id, module_id) in enumerate(group_keys):
+        writer.writerow([
+            student_id, module_id,
+            *result.mastery[i].tolist(), float(result.overall[i]), int(result.total_submissions[i]),
+            *result.counters[i].tolist(), recommendations[i],
+        ])
+    buf.seek(0)
+    cur.execute("TRUNCATE mastery_recompute")
+    cur.copy_expert("COPY mastery_recompute FROM STDIN WITH (FORMAT csv)", buf)
+    cur.execute("""
+        UPDATE learning_state ls SET
+            mastery_concept = r.mastery_concept,
+            mastery_guided = r.mastery_guided,
+            mastery_independent = r.mastery_independent,
+            mastery_assessment = r.mastery_assessment,
+            mastery_overall = r.mastery_overall,
+            mastery_total_submissions = r.mastery_total_submissions,
+            mastery_updated_at = now(),
+            count_concept = r.count_concept,
+            count_guided = r.count_guided,
+            count_independent = r.count_independent,
+            count_assessment = r.count_assessment,
+            next_recommended = r.next_recommended,
+            updated_at = now()
+        FROM mastery_recompute r
+        WHERE ls.student_id = r.student_id AND ls.module_id = r.module_id
+    """)
+    return cur.rowcount
+
+
+def recompute_learning_state(
+    conn,
+    cfg: Optional[MasteryConfig] = None,
+    chunk_rows: int = 200000,
+    student_ids: Optional[List[str]] = None,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """Recompute mastery for every learning_state with submissions under cfg.
+
+    Writes are bulk (COPY into a temp table + one UPDATE per chunk) and the
+    whole run is one transaction; with dry_run nothing is written and the
+    stats describe how overall mastery would move.
+    """
+    engine = BatchMasteryEngine(cfg)
+    mixes = load_module_mixes(conn)
+    stats = {'submissions': 0, 'groups': 0, 'updated': 0, 'compute_sec': 0.0, 'write_sec': 0.0}
+    if dry_run:
+        stats['next_changed'] = 0
+    abs_delta_sum = 0.0
+    start = time.perf_counter()
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS mastery_recompute (
+              student_id UUID, module_id UUID,
+              mastery_concept DOUBLE PRECISION, mastery_guided DOUBLE PRECISION,
+              mastery_independent DOUBLE PRECISION, mastery_assessment DOUBLE PRECISION,
+              mastery_overall DOUBLE PRECISION, mastery_total_submissions INT,
+              count_concept INT, count_guided INT, count_independent INT, count_assessment INT,
+              next_recommended TEXT
+            ) ON COMMIT DROP
+        """)
+
+        for rows in stream_submission_chunks(conn, chunk_rows, student_ids):
+            t0 = time.perf_counter()
+            group_keys, group, created_at, score, lesson_type = chunk_to_arrays(rows)
+            result = engine.replay(group, created_at, score, lesson_type)
+            recommendations = engine.next_recommended(result, [mixes.get(m, {}) for _, m in group_keys])
+            t1 = time.perf_counter()
+
+            stats['submissions'] += len(rows)
+            stats['groups'] += len(group_keys)
+            stats['compute_sec'] += t1 - t0
+
+            if dry_run:
+                cur.execute("""
+                    SELECT student_id::text, module_id::text, mastery_overall, next_recommended
+                    FROM learning_state
+                    WHERE (student_id, module_id) IN (
+                        SELECT * FROM unnest(%s::uuid[], %s::uuid[]))
+                """, ([k[0] for k in group_keys], [k[1] for k in group_keys]))
+                current = {(r[0], r[1]): (r[2], r[3]) for r in cur.fetchall()}
+                for i, key in enumerate(group_keys):
+                    if key in current:
+                        abs_delta_sum += abs(float(result.overall[i]) - current[key][0])
+                        stats['next_changed'] += recommendations[i] != current[key][1]
+                        stats['updated'] += 1
+            else:
+                stats['updated'] += _write_chunk(cur, group_keys, result, recommendations)
+                stats['write_sec'] += time.perf_counter() - t1
+
+    if dry_run:
+        conn.rollback()
+        stats['mean_abs_overall_delta'] = round(abs_delta_sum / max(stats['updated'], 1), 4)
+    else:
+        conn.commit()
+    stats['total_sec'] = round(time.perf_counter() - start, 3)
+    stats['compute_sec'] = round(stats['compute_sec'], 3)
+    stats['write_sec'] = round(stats['write_sec'], 3)
+    return stats
@@ -5,8 +5,16 @@ from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import math
 
+from submission_records import SubmissionRecord, lesson_type_code, epoch_seconds
+
 # ---------- Конфиг ----------
 
+# Типы уроков с собственным mastery и их веса в overall
+OVERALL_WEIGHTS = {"concept": 0.3, "guided": 0.25, "independent": 0.25, "assessment": 0.2}
+# Целевой микс и гейты рекомендаций, если у модуля они не заданы
+DEFAULT_LESSON_MIX = {"concept": 0.3, "guided": 0.25, "independent": 0.25, "assessment": 0.2}
+DEFAULT_GATES = {"independent_min_concept": 1, "assessment_min_independent": 1}
+
 @dataclass
 class MasteryConfig:
     # Веса компонентов
@@ -58,12 +66,20 @@ class MasteryCalculatorV2:
     ) -> Tuple[float, Dict[str, float]]:
         """
         Возвращает (mastery, diagnostics)
+
+        История — список dict (score, created_at, lesson_type) или
+        SubmissionRecord; для записей используется быстрый путь без
+        обращений по ключам и разбора дат.
         """
         acc = self._score_accuracy(score, lesson_type)
         spd = self._score_speed(time_spent_sec, lesson_type, difficulty, student_speed_factor)
-        cns = self._score_consistency(submissions_history, lesson_type)
+        if submissions_history and isinstance(submissions_history[0], SubmissionRecord):
+            cns = self._consistency_records(submissions_history, lesson_type_code(lesson_type))
+            spc = self._spacing_records(submissions_history)
+        else:
+            cns = self._score_consistency(submissions_history, lesson_type)
+            spc = self._score_spacing(submissions_history)
         dif = self._score_difficulty(difficulty)
-        spc = self._score_spacing(submissions_history)
 
         mastery = (
             self.cfg.w_accuracy*acc +
@@ -95,13 +111,12 @@ class MasteryCalculatorV2:
         cur.setdefault("total_submissions", 0)
 
         alpha = self._ema_alpha(total_submissions)
-        cur[lesson_type] = (1 - alpha) * cur[lesson_type] + alpha * lesson_mastery_value
+        cur[lesson_type] = (1 - alpha) * cur.get(lesson_type, 0.0) + alpha * lesson_mastery_value
 
         # взвешенное среднее типов (можно подстроить под module.lesson_policy)
-        weights = {"concept": 0.3, "guided": 0.25, "independent": 0.25, "assessment": 0.2}
         overall = 0.0
         total_w = 0.0
-        for k, w in weights.items():
+        for k, w in OVERALL_WEIGHTS.items():
             overall += cur.get(k, 0.0) * w
             total_w += w
         cur["overall"] = round(overall / total_w if total_w else 0.0, 3)
@@ -121,8 +136,8 @@ class MasteryCalculatorV2:
         """
         overall = float(current_mastery.get("overall", 0.0))
         counters = counters or {}
-        mix = lesson_policy_mix or {"concept":0.3,"guided":0.25,"independent":0.25,"assessment":0.2}
-        gates = gates or {"independent_min_concept": 1, "assessment_min_independent": 1}
+        mix = lesson_policy_mix or DEFAULT_LESSON_MIX
+        gates = gates or DEFAULT_GATES
 
         # 1) базовая логика по мастерству
         if overall < 0.3:
@@ -215,37 +230,70 @@ class MasteryCalculatorV2:
     def _score_spacing(self, subs: List[Dict[str,Any]]) -> float:
         if len(subs) < 3:
             return 0.5
-        # берём последние N timestamps
+        # берём последние N timestamps (datetime из psycopg2, ISO-строки или epoch)
         ts = []
         for s in subs[-10:]:
-            t = s.get("created_at")
-            if isinstance(t, str):
-                try:
-                    ts.append(datetime.fromisoformat(t.replace("Z","+00:00")))
-                except Exception:
-                    pass
-            elif isinstance(t, (int, float)):
-                ts.append(datetime.fromtimestamp(t))
+            t = epoch_seconds(s.get("created_at"))
+            if t is not None:
+                ts.append(t)
         if len(ts) < 3:
             return 0.5
         ts.sort()
-        intervals = [(ts[i]-ts[i-1]).total_seconds() for i in range(1,len(ts))]
-        if not intervals:
-            return 0.5
+        intervals = [ts[i]-ts[i-1] for i in range(1,len(ts))]
         avg = sum(intervals)/len(intervals)
 
         # динамический оптимум: чем выше среднее мастерство по истории, тем длиннее интервал
         # грубо оценим по последним 5 score
         last_scores = [float(s.get("score",0)) for s in subs[-5:]]
         avg_score = sum(last_scores)/len(last_scores) if last_scores else 0.6
+        return self._spacing_score(avg, avg_score)
+
+    def _spacing_score(self, avg_interval: float, avg_score: float) -> float:
+        if avg_interval <= 0:
+            # все попытки в один момент: как в mastery_batch, exp(-|log 0|) = 0
+            return 0.5
         optimal = self.cfg.spacing_base_sec * (0.8 + 0.6*avg_score)  # примерно 0.8..1.4 * base
 
         # гладкая оценка вокруг оптимума
         # если avg == optimal → 1.0; в 2 раза чаще/реже → ~0.7
-        ratio = avg / max(1.0, optimal)
+        ratio = avg_interval / max(1.0, optimal)
         score = math.exp(-abs(math.log(ratio)))  # симметрично по отношению
         return round(0.5 + 0.5*score, 3)
 
+    # ---- Быстрый путь по SubmissionRecord ----
+
+    def _consistency_records(self, subs: List[SubmissionRecord], code: int) -> float:
+        # те же правила, что в _score_consistency
+        recent = [sc for sc, _, lt in subs if lt == code][-10:]
+        if not recent:
+            return 0.5
+        ewma = 0.0
+        streak = best_streak = 0
+        for sc in recent:
+            ewma = 0.4*sc + 0.6*ewma
+            if sc >= 0.6:
+                streak += 1
+                if streak > best_streak:
+                    best_streak = streak
+            else:
+                streak = 0
+        bonus = min(0.15, 0.03 * best_streak)
+        return round(max(0.0, min(1.0, ewma + bonus)), 3)
+
+    def _spacing_records(self, subs: List[SubmissionRecord]) -> float:
+        # те же правила, что в _score_spacing; сумма интервалов отсортированных
+        # меток равна разнице крайних
+        if len(subs) < 3:
+            return 0.5
+        # created_at=None пропускаем, как нераспознанные метки в _score_spacing
+        ts = [t for _, t, _ in subs[-10:] if t is not None]
+        if len(ts) < 3:
+            return 0.5
+        avg = (max(ts) - min(ts)) / (len(ts) - 1)
+        last = subs[-5:]
+        avg_score = sum(sc for sc, _, _ in last) / len(last)
+        return self._spacing_score(avg, avg_score)
+
     def _ema_alpha(self, n: int) -> float:
         # чем меньше данных, тем больше alpha (быстрее подстраивается)
         if n <= 0:
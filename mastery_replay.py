@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Exact replay of mastery trajectories with the scalar MasteryCalculatorV2.
+
+For each (student, module) the submission log is fed through the calculator
+one submission at a time, exactly as create_submission does it: the same
+20-submission newest-first history, the same EMA update and recommendation,
+and learning_state's round trip (only tracked types persist). Every step
+yields a snapshot, so the result is the full trajectory rather than only the
+final state (see mastery_batch.py for the vectorized final-state recompute).
+
+Students are sharded across a process pool; each worker streams its shard
+with a server-side cursor and writes snapshots to gzipped JSONL or COPYs
+them into mastery_history (migration 011).
+"""
+
+import io
+import os
+import csv
+import gzip
+import json
+import time
+from collections import deque
+from dataclasses import asdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import psycopg2
+
+from mastery_calculator import MasteryCalculatorV2, MasteryConfig
+from learning_state_store import MASTERY_COLUMNS, COUNTER_COLUMNS, TRACKED_LESSON_TYPES
+from submission_records import HISTORY_LIMIT, record_from_dict
+
+
+DEFAULT_TIME_SPENT = 300
+DEFAULT_DIFFICULTY = 'medium'
+
+FETCH_SHARD_SQL = """
+    SELECT s.id::text AS submission_id, s.student_id::text AS student_id,
+           s.module_id::text AS module_id, s.lesson_id, s.score, s.created_at
+    FROM submission s
+    WHERE s.student_id = ANY(%s::uuid[])
+    ORDER BY s.student_id, s.module_id, s.created_at
+"""
+
+HISTORY_COLUMNS = (
+    "run_id, student_id, module_id, submission_id, submitted_at, lesson_type, score, lesson_mastery, "
+    + ", ".join(MASTERY_COLUMNS.values()) + ", "
+    + ", ".join(COUNTER_COLUMNS.values()) + ", next_recommended"
+)
+
+
+def lesson_type_from_id(lesson_id: Optional[str]) -> str:
+    """Lesson type by lesson_id, as create_submission derives it."""
+    lesson_id = lesson_id or ''
+    for lesson_type in TRACKED_LESSON_TYPES:
+        if lesson_type in lesson_id:
+            return lesson_type
+    return 'unknown'
+
+
+def replay_module_log(
+    calc: MasteryCalculatorV2,
+    rows: Iterable[Dict[str, Any]],
+    mix: Optional[Dict[str, float]] = None,
+    time_spent: int = DEFAULT_TIME_SPENT,
+    difficulty: str = DEFAULT_DIFFICULTY,
+) -> Iterator[Dict[str, Any]]:
+    """Replay one (student, module) log in created_at order, yielding a snapshot per submission.
+
+    Rows need score, created_at and lesson_type; the history is kept as
+    SubmissionRecords, as the API fetches it.
+    """
+    mastery: Dict[str, Any] = {}
+    counters: Dict[str, int] = {}
+    history: deque = deque(maxlen=HISTORY_LIMIT)
+
+    for row in rows:
+        record = record_from_dict(row)
+        history.appendleft(record)  # newest first, like ORDER BY created_at DESC LIMIT 20
+        lesson_type = row['lesson_type']
+        score = record.score
+
+        lesson_mastery, _ = calc.lesson_mastery(list(history), lesson_type, time_spent, score, difficulty)
+        updated = calc.update_mastery_ema(mastery, lesson_type, lesson_mastery, len(history))
+        counters[lesson_type] = counters.get(lesson_type, 0) + 1
+        next_type, _ = calc.recommend_next_lesson_type(updated, mix or {}, counters)
+
+        # learning_state keeps only the tracked types between submissions
+        mastery = {key: updated.get(key, 0.0) for key in MASTERY_COLUMNS}
+        mastery['total_submissions'] = updated['total_submissions']
+        counters = {key: counters.get(key, 0) for key in COUNTER_COLUMNS}
+
+        yield {
+            'row': row,
+            'lesson_type': lesson_type,
+            'lesson_mastery': lesson_mastery,
+            'mastery': {key: mastery[key] for key in MASTERY_COLUMNS},
+            'counters': dict(counters),
+            'next_recommended': next_type,
+        }
+
+
+def _group_rows(rows: Iterable[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+    """Split rows ordered by (student, module) into per-group lists."""
+    group: List[Dict[str, Any]] = []
+    key = None
+    for row in rows:
+        row_key = (row['student_id'], row['module_id'])
+        if group and row_key != key:
+            yield group
+            group = []
+        key = row_key
+        group.append(row)
+    if group:
+        yield group
+
+
+def _iter_shard_rows(conn, student_ids: List[str], itersize: int) -> Iterator[Dict[str, Any]]:
+    with conn.cursor(name='mastery_replay_shard') as cur:
+        cur.itersize = itersize
+        cur.execute(FETCH_SHARD_SQL, (student_ids,))
+        columns = None
+        for values in cur:
+            if columns is None:
+                columns = [d[0] for d in cur.description]
+            row = dict(zip(columns, values))
+            row['lesson_type'] = lesson_type_from_id(row['lesson_id'])
+            yield row
+
+
+def _snapshot_json(snapshot: Dict[str, Any]) -> str:
+    row = snapshot['row']
+    return json.dumps({
+        'student_id': row['student_id'],
+        'module_id': row['module_id'],
+        'submission_id': row['submission_id'],
+        'created_at': row['created_at'].isoformat(),
+        'lesson_type': snapshot['lesson_type'],
+        'score': float(row['score']) if row['score'] is not None else None,
+        'lesson_mastery': snapshot['lesson_mastery'],
+        'mastery': snapshot['mastery'],
+        'counters': snapshot['counters'],
+        'next_recommended': snapshot['next_recommended'],
+    }, ensure_ascii=False)
+
+
+def _snapshot_csv_row(run_id: str, snapshot: Dict[str, Any]) -> list:
+    row = snapshot['row']
+    return [
+        run_id, row['student_id'], row['module_id'], row['submission_id'],
+        row['created_at'].isoformat(), snapshot['lesson_type'], row['score'], snapshot['lesson_mastery'],
+        *[snapshot['mastery'][key] for key in MASTERY_COLUMNS],
+        *[snapshot['counters'][key] for key in COUNTER_COLUMNS],
+        snapshot['next_recommended'],
+    ]
+
+
+def replay_shard(
+    shard: int,
+    student_ids: List[str],
+    conn_params: Dict[str, Any],
+    config: Dict[str, Any],
+    out_dir: Optional[str] = None,
+    run_id: Optional[str] = None,
+    itersize: int = 20000,
+    copy_rows: int = 20000,
+) -> Dict[str, Any]:
+    """Replay one shard of students (process pool worker).
+
+    Snapshots go to <out_dir>/trajectory-<shard>.jsonl.gz, or with run_id
+    into mastery_history; returns per-worker throughput stats.
+    """
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    calc = MasteryCalculatorV2(MasteryConfig(**config))
+    stats = {'shard': shard, 'pid': os.getpid(), 'students': len(student_ids), 'submissions': 0}
+
+    read_conn = psycopg2.connect(**conn_params)
+    write_conn = psycopg2.connect(**conn_params) if run_id else None
+    jsonl = gzip.open(os.path.join(out_dir, f"trajectory-{shard:03d}.jsonl.gz"), 'wt', compresslevel=1, encoding='utf-8') if out_dir else None
+    try:
+        with read_conn.cursor() as cur:
+            cur.execute("SELECT id::text, lesson_policy_jsonb FROM module")
+            mixes = {module_id: (policy or {}).get('mix', {}) for module_id, policy in cur.fetchall()}
+
+        buf, pending = io.StringIO(), 0
+        writer = csv.writer(buf)
+        for group in _group_rows(_iter_shard_rows(read_conn, student_ids, itersize)):
+            for snapshot in replay_module_log(calc, group, mixes.get(group[0]['module_id'])):
+                stats['submissions'] += 1
+                if jsonl:
+                    jsonl.write(_snapshot_json(snapshot) + '\n')
+                if write_conn:
+                    writer.writerow(_snapshot_csv_row(run_id, snapshot))
+                    pending += 1
+            if write_conn and pending >= copy_rows:
+                _copy_history(write_conn, buf)
+                buf, pending = io.StringIO(), 0
+                writer = csv.writer(buf)
+        if write_conn and pending:
+            _copy_history(write_conn, buf)
+        if write_conn:
+            write_conn.commit()
+    finally:
+        if jsonl:
+            jsonl.close()
+        read_conn.close()
+        if write_conn:
+            write_conn.close()
+
+    stats['wall_sec'] = round(time.perf_counter() - wall_start, 3)
+    stats['cpu_sec'] = round(time.process_time() - cpu_start, 3)
+    stats['per_sec'] = round(stats['submissions'] / stats['wall_sec'], 1) if stats['wall_sec'] else 0.0
+    return stats
+
+
+def _copy_history(conn, buf: io.StringIO) -> None:
+    buf.seek(0)
+    with conn.cursor() as cur:
+        cur.copy_expert(f"COPY mastery_history ({HISTORY_COLUMNS}) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def shard_students(student_ids: List[str], shards: int) -> List[List[str]]:
+    """Split students round-robin so heavy and light students spread evenly."""
+    return [student_ids[i::shards] for i in range(shards) if student_ids[i::shards]]
+
+
+def config_dict(cfg: MasteryConfig) -> Dict[str, Any]:
+    """MasteryConfig as a picklable / JSON-serializable dict."""
+    return asdict(cfg)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Simulation harness for tuning MasteryConfig.
+
+Generates a synthetic population with latent skill, learning rate, speed and
+study spacing, and drives every student through the lesson loop the API runs:
+lesson mastery -> EMA update -> next lesson recommendation -> the student
+takes the recommended lesson. Students are advanced in lockstep with the
+NumPy engine from mastery_batch, so a config is evaluated over 100k students
+in seconds; scalar=True drives MasteryCalculatorV2 itself, one student at a
+time, to check the vectorized path on small populations.
+
+The population and all noise are drawn from one seed independently of the
+config, so every config in a grid sees the same students (common random
+numbers) and differences between configs are not sampling noise.
+"""
+
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from mastery_calculator import MasteryCalculatorV2, MasteryConfig, DEFAULT_GATES
+from mastery_batch import (
+    BatchMasteryEngine, HISTORY_LIMIT, LESSON_TYPES, TRACKED_TYPES,
+    CONCEPT, INDEPENDENT, ASSESSMENT,
+)
+
+
+# Latent difficulty of each lesson type on the skill scale, and the time a
+# lesson really takes at speed 1.0 (independent of the config's expectations)
+TYPE_DIFFICULTY = np.array([-1.0, -0.3, 0.4, 1.0])
+TYPE_TRUE_SECONDS = np.array([300.0, 600.0, 900.0, 1200.0])
+
+
+@dataclass
+class PopulationConfig:
+    """Synthetic population and stopping rule."""
+
+    students: int = 100000
+    max_lessons: int = 80
+    mastery_target: float = 0.7    # overall at which a student counts as having mastered the module
+    skill_mean: float = -1.0
+    skill_sd: float = 0.8
+    learning_rate_median: float = 0.12
+    learning_rate_sigma: float = 0.5
+    speed_sigma: float = 0.35      # lognormal spread of the time multiplier
+    gap_hours_median: float = 24.0
+    gap_sigma: float = 0.8         # lognormal spread of per-student spacing habit
+    score_noise: float = 0.1
+    seed: int = 0
+
+
+class Population:
+    """Latent traits plus a noise stream shared by every simulated config."""
+
+    def __init__(self, pop: PopulationConfig):
+        self.pop = pop
+        rng = np.random.default_rng(pop.seed)
+        n = pop.students
+        self.skill = rng.normal(pop.skill_mean, pop.skill_sd, n)
+        self.learning_rate = pop.learning_rate_median * rng.lognormal(0.0, pop.learning_rate_sigma, n)
+        self.speed = rng.lognormal(0.0, pop.speed_sigma, n)
+        self.gap_sec = pop.gap_hours_median * 3600 * rng.lognormal(0.0, pop.gap_sigma, n)
+        self._noise_seed = int(rng.integers(2**32))
+
+    def noise(self):
+        """Fresh per-step noise generator (same sequence for every config)."""
+        return np.random.default_rng(self._noise_seed)
+
+
+def _step_noise(rng, n):
+    return rng.normal(0.0, 1.0, n), rng.lognormal(0.0, 0.2, n), rng.lognormal(0.0, 0.5, n)
+
+
+def _outcomes(population, skill, lesson_type, score_z, time_z, gap_z, rows):
+    """Score, time spent and gap until the lesson for the given students."""
+    b = TYPE_DIFFICULTY[lesson_type]
+    p = 1 / (1 + np.exp(-1.7 * (skill - b)))
+    score = np.round(np.clip(p + population.pop.score_noise * score_z, 0.0, 1.0), 2)
+    time_spent = np.round(TYPE_TRUE_SECONDS[lesson_type] * population.speed[rows] * np.exp(0.25 * (b - skill)) * time_z)
+    gap = np.maximum(60.0, np.round(population.gap_sec[rows] * gap_z))
+    return score, time_spent, gap
+
+
+def simulate(
+    cfg: MasteryConfig,
+    population: Population,
+    mix: Optional[Dict[str, float]] = None,
+    gates: Optional[Dict[str, int]] = None,
+    scalar: bool = False,
+) -> Dict[str, Any]:
+    """Run the lesson loop for the whole population under cfg and summarize it."""
+    start = time.perf_counter()
+    pop = population.pop
+    n = pop.students
+    engine = BatchMasteryEngine(cfg)
+    calc = MasteryCalculatorV2(cfg)
+    gates_used = gates or DEFAULT_GATES
+    rng = population.noise()
+
+    skill = population.skill.copy()
+    clock = np.full(n, 1.7e9)
+    win_score = np.zeros((HISTORY_LIMIT, n))
+    win_type = np.zeros((HISTORY_LIMIT, n), dtype=np.int64)
+    win_time = np.zeros((HISTORY_LIMIT, n))
+    mastery = np.zeros((n, TRACKED_TYPES))
+    counters = np.zeros((n, TRACKED_TYPES), dtype=np.int64)
+    overall = np.zeros(n)
+    states = [({}, {}) for _ in range(n)] if scalar else None
+
+    recommendation = engine.recommend_next(overall, counters, mix, gates)
+    previous = np.full(n, -1)
+    lessons_to_mastery = np.full(n, -1)
+    active = np.ones(n, dtype=bool)
+    oscillations = gate_violations = recommendations = 0
+
+    for step in range(pop.max_lessons):
+        score_z, time_z, gap_z = _step_noise(rng, n)
+        rows = np.flatnonzero(active)
+        if not len(rows):
+            break
+
+        lesson_type = recommendation[rows]
+        score, time_spent, gap = _outcomes(
+            population, skill[rows], lesson_type, score_z[rows], time_z[rows], gap_z[rows], rows)
+        clock[rows] += gap
+
+        # newest first, like the API's history query
+        for win, value in ((win_score, score), (win_type, lesson_type), (win_time, clock[rows])):
+            win[1:, rows] = win[:-1, rows]
+            win[0, rows] = value
+        window = np.full(len(rows), min(step + 1, HISTORY_LIMIT))
+
+        if scalar:
+            next_type = _scalar_step(calc, states, rows, window, win_score, win_type, win_time,
+                                     time_spent, mastery, counters, overall, mix, gates)
+        else:
+            lesson_mastery = engine.lesson_mastery_window(
+                window, win_score[:, rows], win_type[:, rows], win_time[:, rows], time_spent)
+            sub = mastery[rows]
+            engine.ema_step(sub, lesson_type, lesson_mastery, window)
+            mastery[rows] = sub
+            counters[rows, lesson_type] += 1
+            overall[rows] = engine.overall(sub)
+            next_type = engine.recommend_next(overall[rows], counters[rows], mix, gates)
+
+        # recommendation quality
+        recommendations += len(rows)
+        oscillations += int(np.sum((next_type == previous[rows]) & (next_type != lesson_type)))
+        no_concept = counters[rows, CONCEPT] < gates_used["independent_min_concept"]
+        no_independent = counters[rows, INDEPENDENT] < gates_used["assessment_min_independent"]
+        gate_violations += int(np.sum(
+            (((next_type == INDEPENDENT) | (next_type == ASSESSMENT)) & no_concept)
+            | ((next_type == ASSESSMENT) & no_independent)
+        ))
+        previous[rows] = lesson_type
+        recommendation[rows] = next_type
+
+        # learning: most effective when the lesson matches the student's level
+        b = TYPE_DIFFICULTY[lesson_type]
+        skill[rows] += population.learning_rate[rows] * np.exp(-0.5 * (skill[rows] - b) ** 2)
+
+        reached = rows[overall[rows] >= pop.mastery_target]
+        lessons_to_mastery[reached] = step + 1
+        active[reached] = False
+
+    return _summarize(lessons_to_mastery, overall, population, skill,
+                      oscillations, gate_violations, recommendations, time.perf_counter() - start)
+
+
+def _scalar_step(calc, states, rows, window, win_score, win_type, win_time,
+                 time_spent, mastery, counters, overall, mix, gates) -> np.ndarray:
+    """Same step through MasteryCalculatorV2, one student at a time."""
+    next_types = np.empty(len(rows), dtype=np.int64)
+    for k, i in enumerate(rows):
+        history = [
+            {"score": float(win_score[j, i]), "created_at": float(win_time[j, i]),
+             "lesson_type": LESSON_TYPES[win_type[j, i]]}
+            for j in range(int(window[k]))
+        ]
+        lesson_type = history[0]["lesson_type"]
+        state, state_counters = states[i]
+        value, _ = calc.lesson_mastery(history, lesson_type, float(time_spent[k]), history[0]["score"])
+        state = calc.update_mastery_ema(state, lesson_type, value, len(history))
+        state_counters[lesson_type] = state_counters.get(lesson_type, 0) + 1
+        next_type, _ = calc.recommend_next_lesson_type(state, mix or {}, state_counters, gates)
+        states[i] = (state, state_counters)
+
+        for t in range(TRACKED_TYPES):
+            mastery[i, t] = state[LESSON_TYPES[t]]
+            counters[i, t] = state_counters.get(LESSON_TYPES[t], 0)
+        overall[i] = state["overall"]
+        next_types[k] = LESSON_TYPES.index(next_type)
+    return next_types
+
+
+def _summarize(lessons_to_mastery, overall, population, skill,
+               oscillations, gate_violations, recommendations, elapsed) -> Dict[str, Any]:
+    reached = lessons_to_mastery[lessons_to_mastery > 0]
+    return {
+        'students': population.pop.students,
+        'reached_mastery': round(len(reached) / population.pop.students, 4),
+        'lessons_to_mastery_median': float(np.median(reached)) if len(reached) else None,
+        'lessons_to_mastery_p90': float(np.percentile(reached, 90)) if len(reached) else None,
+        'oscillation_rate': round(oscillations / max(recommendations, 1), 4),
+        'gate_violation_rate': round(gate_violations / max(recommendations, 1), 4),
+        'mean_final_overall': round(float(overall.mean()), 4),
+        'skill_correlation': round(float(np.corrcoef(overall, skill)[0, 1]), 4) if overall.std() else None,
+        'seconds': round(elapsed, 2),
+    }
+
+
+def config_grid(base: MasteryConfig, grid: Dict[str, List[Any]]) -> List[MasteryConfig]:
+    """All combinations of the grid values applied on top of base."""
+    configs = [asdict(base)]
+    for field, values in grid.items():
+        if field not in configs[0]:
+            raise ValueError(f"Unknown MasteryConfig field: {field}")
+        configs = [dict(c, **{field: v}) for c in configs for v in values]
+    return [MasteryConfig(**c) for c in configs]
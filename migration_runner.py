@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Apply db/migrations/*.sql to a live database without stalling writes.
+
+The UP section of a migration file is split into statements and grouped
+into steps:
+
+  * sql: consecutive ordinary statements, sent together as before (a
+    BEGIN ... COMMIT block in the file stays one transaction);
+  * standalone: CREATE/DROP INDEX CONCURRENTLY, REINDEX CONCURRENTLY and
+    VACUUM, which Postgres refuses inside a transaction block, each sent on
+    its own in autocommit. An index left INVALID by a failed concurrent
+    build is dropped before the build is retried;
+  * backfill: a statement marked with a `-- migrate: backfill` comment runs
+    in batches, each its own transaction, until it affects no rows. It gets
+    %(batch_size)s as a parameter (write %% for a literal %), e.g.
+
+        -- migrate: backfill batch_size=5000 sleep=0.05
+        UPDATE t SET c = 0 WHERE id IN (SELECT id FROM t WHERE c IS NULL LIMIT %(batch_size)s);
+
+Every step runs under lock_timeout (default 5s), so DDL waiting behind a
+long transaction gives up instead of queueing every writer behind its lock
+request; steps that can be repeated safely (a single statement or a single
+transaction) are retried with backoff when that happens. statement_timeout
+is off unless set. Both can be set per migration with a comment anywhere in
+the UP section:
+
+    -- migrate: lock_timeout=2s statement_timeout=10min retries=5
+
+A migration is recorded only after all of its steps succeed, while the steps
+themselves commit one by one. When a standalone or backfill step fails, the
+steps before it stay applied and the next run starts the migration over, so
+those steps must be safe to repeat: CREATE ... IF NOT EXISTS, ADD COLUMN IF
+NOT EXISTS and so on.
+
+Every step is timed; the runner returns a report per migration and stores
+the total duration in schema_migrations.
+"""
+
+import os
+import re
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import psycopg2
+from psycopg2 import errors
+
+
+DEFAULT_OPTIONS = {
+    'lock_timeout': os.getenv('MIGRATION_LOCK_TIMEOUT', '5s'),
+    'statement_timeout': os.getenv('MIGRATION_STATEMENT_TIMEOUT', '0'),
+    'retries': int(os.getenv('MIGRATION_RETRIES', '3')),
+    'retry_delay': float(os.getenv('MIGRATION_RETRY_DELAY', '1.0')),
+}
+BACKFILL_DEFAULTS = {'batch_size': 1000, 'sleep': 0.0}
+
+_DIRECTIVE = re.compile(r'^\s*--\s*migrate:\s*(.*)$', re.MULTILINE)
+_DOLLAR_TAG = re.compile(r'\$([A-Za-z_][A-Za-z0-9_]*)?\$')
+_STANDALONE = re.compile(
+    r'^(CREATE\s+(UNIQUE\s+)?INDEX\s+CONCURRENTLY|DROP\s+INDEX\s+CONCURRENTLY|REINDEX\b.*\bCONCURRENTLY|VACUUM)\b',
+    re.IGNORECASE | re.DOTALL,
+)
+_CONCURRENT_INDEX = re.compile(
+    r'^CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?("?[\w.]+"?)', re.IGNORECASE
+)
+_TX_START = re.compile(r'^(BEGIN|START\s+TRANSACTION)\b', re.IGNORECASE)
+_TX_END = re.compile(r'^(COMMIT|END|ROLLBACK)\b', re.IGNORECASE)
+
+
+class MigrationError(Exception):
+    """A migration file that cannot be planned or a step that failed for good."""
+
+
+class Step(NamedTuple):
+    kind: str                 # sql | standalone | backfill
+    sql: str
+    retryable: bool
+    options: Dict[str, Any]   # batch_size/sleep for backfill steps
+
+
+class MigrationPlan(NamedTuple):
+    name: str
+    options: Dict[str, Any]
+    steps: List[Step]
+
+
+def read_up_sql(path: str) -> str:
+    """The UP section of a migration file (the whole file when it has no -- UP/-- DOWN markers)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        raw = f.read()
+    if '-- UP' in raw and '-- DOWN' in raw:
+        return raw[raw.find('-- UP') + len('-- UP'):raw.find('-- DOWN')].strip()
+    return raw.strip()
+
+
+def split_statements(sql: str) -> List[str]:
+    """Statements of a script, split on top-level semicolons.
+
+    Quotes, dollar-quoted bodies and comments are skipped over; each
+    statement keeps the comments in front of it.
+    """
+    statements, start, i, n = [], 0, 0, len(sql)
+    while i < n:
+        c = sql[i]
+        if sql.startswith('--', i):
+            end = sql.find('\n', i)
+            i = n if end < 0 else end + 1
+            continue
+        if sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            i = n if end < 0 else end + 2
+            continue
+        if c in ("'", '"'):
+            j = i + 1
+            while True:
+                j = sql.find(c, j)
+                if j < 0 or not sql.startswith(c * 2, j):
+                    break
+                j += 2
+            i = n if j < 0 else j + 1
+            continue
+        if c == '$':
+            tag = _DOLLAR_TAG.match(sql, i)
+            if tag:
+                end = sql.find(tag.group(0), tag.end())
+                i = n if end < 0 else end + len(tag.group(0))
+                continue
+        if c == ';':
+            statements.append(sql[start:i].strip())
+            start = i + 1
+        i += 1
+    statements.append(sql[start:].strip())
+    return [s for s in statements if s]
+
+
+def _code(statement: str) -> str:
+    """A statement without its leading comments."""
+    return re.sub(r'^(\s*--[^\n]*\n|\s*/\*.*?\*/)*', '', statement + '\n', flags=re.DOTALL).strip()
+
+
+def _parse_options(text: str) -> Dict[str, Any]:
+    options: Dict[str, Any] = {}
+    for word in text.split():
+        key, _, value = word.partition('=')
+        if not value:
+            options[key] = True
+        elif key in ('retries', 'batch_size'):
+            options[key] = int(value)
+        elif key in ('retry_delay', 'sleep'):
+            options[key] = float(value)
+        else:
+            options[key] = value
+    return options
+
+
+def plan_migration(name: str, up_sql: str, defaults: Optional[Dict[str, Any]] = None) -> MigrationPlan:
+    """Steps of a migration's UP section; MigrationError for statements that cannot run where they are."""
+    options = dict(DEFAULT_OPTIONS, **(defaults or {}))
+    steps: List[Step] = []
+    group: List[str] = []
+    in_transaction = False
+    group_is_one_transaction = True
+
+    def flush():
+        nonlocal group, group_is_one_transaction
+        if group:
+            single = len(group) == 1 or (group_is_one_transaction and _TX_START.match(_code(group[0]))
+                                         and _TX_END.match(_code(group[-1])))
+            steps.append(Step('sql', ';\n'.join(group) + ';', bool(single), {}))
+        group, group_is_one_transaction = [], True
+
+    for statement in split_statements(up_sql):
+        directives = {}
+        for line in _DIRECTIVE.findall(statement):
+            directives.update(_parse_options(line))
+        backfill = directives.pop('backfill', False)
+        if not backfill:
+            options.update(directives)
+
+        code = _code(statement)
+        if not code:
+            continue
+        if _STANDALONE.match(code) or backfill:
+            if in_transaction:
+                raise MigrationError(f"{name}: '{' '.join(code.split()[:4])} ...' cannot run inside BEGIN ... COMMIT")
+            flush()
+            if backfill:
+                steps.append(Step('backfill', code, True, {
+                    key: directives.get(key, default) for key, default in BACKFILL_DEFAULTS.items()
+                }))
+            else:
+                steps.append(Step('standalone', code, True, {}))
+            continue
+
+        if _TX_START.match(code):
+            if group:
+                group_is_one_transaction = False
+            in_transaction = True
+        elif _TX_END.match(code):
+            in_transaction = False
+        elif not in_transaction:
+            group_is_one_transaction = False
+        group.append(statement)
+    flush()
+    return MigrationPlan(name, options, steps)
+
+
+def _set_timeouts(cur, options: Dict[str, Any]):
+    cur.execute("SELECT set_config('lock_timeout', %s, false), set_config('statement_timeout', %s, false)",
+                (str(options['lock_timeout']), str(options['statement_timeout'])))
+
+
+def _drop_invalid_index(cur, statement: str) -> bool:
+    """Drop the index a failed CREATE INDEX CONCURRENTLY left behind as INVALID."""
+    match = _CONCURRENT_INDEX.match(statement)
+    if not match:
+        return False
+    cur.execute("""
+        SELECT i.indexrelid::regclass::text
+        FROM pg_index i
+        WHERE i.indexrelid = to_regclass(%s) AND NOT i.indisvalid
+    """, (match.group(1),))
+    row = cur.fetchone()
+    if row is None:
+        return False
+    cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {row[0]}")
+    return True
+
+
+def _summary(sql: str) -> str:
+    line = ' '.join(_code(sql).split())
+    return line if len(line) <= 72 else line[:69] + '...'
+
+
+def run_step(conn, step: Step, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one step in autocommit; retried on lock timeouts when it is safe to repeat."""
+    report = {'kind': step.kind, 'statement': _summary(step.sql), 'sec': 0.0, 'rows': None, 'retries': 0}
+    start = time.perf_counter()
+    delay = options['retry_delay']
+    with conn.cursor() as cur:
+        _set_timeouts(cur, options)
+        while True:
+            try:
+                if step.kind == 'standalone':
+                    _drop_invalid_index(cur, step.sql)
+                    cur.execute(step.sql)
+                elif step.kind == 'backfill':
+                    report['rows'] = report['rows'] or 0
+                    report['batches'] = report.get('batches', 0)
+                    while True:
+                        cur.execute(step.sql, {'batch_size': step.options['batch_size']})
+                        report['batches'] += 1
+                        if cur.rowcount <= 0:
+                            break
+                        report['rows'] += cur.rowcount
+                        if step.options['sleep']:
+                            time.sleep(step.options['sleep'])
+                else:
+                    cur.execute(step.sql)
+                break
+            except psycopg2.Error as e:
+                # an explicit BEGIN in the step leaves the session in an aborted transaction
+                cur.execute("ROLLBACK")
+                lock_timeout = isinstance(e, errors.LockNotAvailable)
+                if not (lock_timeout and step.retryable and report['retries'] < options['retries']):
+                    raise
+                report['retries'] += 1
+                time.sleep(delay)
+                delay *= 2
+    report['sec'] = round(time.perf_counter() - start, 4)
+    return report
+
+
+def ensure_migrations_table(conn):
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    migration_name TEXT PRIMARY KEY,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            """)
+            cur.execute("ALTER TABLE schema_migrations ADD COLUMN IF NOT EXISTS duration_ms DOUBLE PRECISION")
+
+
+def applied_migrations(conn) -> set:
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT migration_name FROM schema_migrations")
+            return {row[0] for row in cur.fetchall()}
+
+
+def apply_migration(conn, path: str, defaults: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Run every step of a migration file and record it; returns its timing report."""
+    name = os.path.basename(path)
+    plan = plan_migration(name, read_up_sql(path), defaults)
+    report = {'name': name, 'options': plan.options, 'steps': [], 'sec': 0.0}
+    start = time.perf_counter()
+    prev_autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        for number, step in enumerate(plan.steps, 1):
+            try:
+                report['steps'].append(run_step(conn, step, plan.options))
+            except psycopg2.Error as e:
+                raise MigrationError(f"{name}, step {number} ({step.kind}: {_summary(step.sql)}): {e}") from e
+    finally:
+        conn.autocommit = prev_autocommit
+    report['sec'] = round(time.perf_counter() - start, 4)
+    with conn:
+        with conn.cursor() as cur:
+            cur.execute("INSERT INTO schema_migrations (migration_name, duration_ms) VALUES (%s, %s)",
+                        (name, report['sec'] * 1000))
+    return report
+
+
+def apply_migrations(conn, paths: List[str], defaults: Optional[Dict[str, Any]] = None, on_applied=None) -> List[Dict[str, Any]]:
+    """Apply the paths not in schema_migrations yet, in order; returns their reports."""
+    ensure_migrations_table(conn)
+    done = applied_migrations(conn)
+    reports = []
+    for path in paths:
+        if os.path.basename(path) in done:
+            continue
+        reports.append(apply_migration(conn, path, defaults))
+        if on_applied:
+            on_applied(reports[-1])
+    return reports
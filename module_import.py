@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Import curriculum modules from the JSON files into the module table.
+
+Every module definition is reduced to the row import_modules.py writes and
+hashed (sha256 of its canonical JSON, migration 016 stores it in
+module.content_hash). An import runs in phases, each timed:
+
+  * parse: module files are read and hashed, in worker processes when there
+    is enough JSON to make that pay off;
+  * preload: subject and stage ids and the stored hashes, one query each;
+  * stage: the rows to write are COPYed into a temporary table;
+  * merge: one INSERT ... SELECT ... ON CONFLICT writes them into module.
+
+Everything happens in one transaction. A full import writes every module;
+an incremental one only modules that are new or whose hash differs, so
+unchanged modules keep their updated_at and index entries. A dry run
+reports the incremental plan, with the changed fields of each changed
+module, and writes nothing.
+
+Modules present in the database but in no file are reported, never deleted.
+"""
+
+import io
+import os
+import csv
+import json
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from curriculum_lint import keep_first_definition
+
+
+# Bump when the row written for a module changes shape, so every module is re-imported once
+IMPORT_FORMAT = 1
+
+# below this much JSON (~35 us/KB in-process), worker processes cost more
+# than they save; the current tree is under 1 MB
+PARALLEL_MIN_BYTES = 2 * 1024 * 1024
+
+# Subject names used in module files -> subject.code
+SUBJECT_CODE_MAP = {
+    'Mathematics': 'Mathematics',
+    'English': 'English',
+    'Science': 'Science',
+    'Biology': 'Biology',
+    'Chemistry': 'Chemistry',
+    'Physics': 'Physics',
+    'ICT': 'ICT',
+    'Computer Science': 'ComputerScience',
+    'ComputerScience': 'ComputerScience',
+    'Global Perspectives': 'GlobalPerspectives',
+    'GlobalPerspectives': 'GlobalPerspectives',
+    'Art': 'Art',
+    'Business': 'Business',
+    'Economics': 'Economics',
+    'English Literature': 'EnglishLiterature',
+    'EnglishLiterature': 'EnglishLiterature',
+    'Further Mathematics': 'FurtherMathematics',
+    'FurtherMathematics': 'FurtherMathematics',
+    'Geography': 'Geography',
+    'History': 'History',
+    'Languages': 'Languages',
+    'Music': 'Music',
+    'Physical Education': 'PhysicalEducation',
+    'PE': 'PhysicalEducation'
+}
+
+# Compared field by field in a dry-run diff
+CONTENT_FIELDS = (
+    'subject_code', 'stage_code', 'title', 'description', 'recommended_hours',
+    'objectives', 'lesson_policy', 'assessment_blueprint', 'version', 'status',
+)
+
+
+class ModuleRow(NamedTuple):
+    """One module as written to the database, plus where it came from."""
+
+    code: str
+    subject_code: str
+    stage_code: str
+    title: str
+    description: Optional[str]
+    recommended_hours: Optional[int]
+    objectives: Any
+    lesson_policy: Any
+    assessment_blueprint: Any
+    version: str
+    status: str
+    content_hash: str
+    file: str
+
+
+def content_hash(content: Dict[str, Any]) -> str:
+    canonical = json.dumps([IMPORT_FORMAT, content], sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def module_row(module_data: Dict[str, Any], file: str) -> ModuleRow:
+    """Row for a module definition; ValueError for a subject name not in SUBJECT_CODE_MAP."""
+    subject_code = SUBJECT_CODE_MAP.get(module_data.get('subject', ''))
+    if not subject_code:
+        raise ValueError(f"unknown subject: {module_data.get('subject', '')}")
+    content = {
+        'subject_code': subject_code,
+        'stage_code': module_data.get('stage', ''),
+        'title': module_data['title'],
+        'description': module_data.get('description'),
+        'recommended_hours': module_data.get('recommended_hours'),
+        'objectives': module_data.get('objectives', []),
+        'lesson_policy': module_data.get('lesson_policy', {}),
+        'assessment_blueprint': module_data.get('assessment_blueprint', {}),
+        'version': module_data.get('version', '1.0.0'),
+        'status': 'active',
+    }
+    return ModuleRow(code=module_data['id'], **content, content_hash=content_hash(content), file=file)
+
+
+def read_module_file(path: str) -> Tuple[List[ModuleRow], List[Tuple[str, str]]]:
+    """Rows of one module file and (module id, reason) for the modules skipped."""
+    with open(path, 'r', encoding='utf-8') as f:
+        modules_data = json.load(f)
+    if not isinstance(modules_data, list):
+        modules_data = [modules_data]
+    rows, skipped = [], []
+    for module_data in modules_data:
+        try:
+            rows.append(module_row(module_data, path))
+        except (KeyError, ValueError) as e:
+            skipped.append((module_data.get('id'), str(e)))
+    return rows, skipped
+
+
+def read_modules(
+    paths: Iterable[str],
+    jobs: Optional[int] = None,
+) -> Tuple[Dict[str, ModuleRow], List[Tuple[str, str]], int, int]:
+    """Rows by code from files in the given order; of duplicate ids the first one is kept.
+
+    Pass the files sorted by path, so the same definition wins as in the lint
+    and curriculum.bin (keep_first_definition).
+
+    Returns (rows, skipped, duplicates, jobs used).
+    """
+    paths = list(paths)
+    jobs = jobs or os.cpu_count() or 1
+    parallel = jobs > 1 and len(paths) > 1 and sum(os.path.getsize(p) for p in paths) >= PARALLEL_MIN_BYTES
+    if parallel:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            parsed = list(pool.map(read_module_file, paths, chunksize=max(1, len(paths) // (jobs * 4))))
+    else:
+        parsed = [read_module_file(path) for path in paths]
+
+    rows: Dict[str, ModuleRow] = {}
+    skipped: List[Tuple[str, str]] = []
+    duplicates = 0
+    for file_rows, file_skipped in parsed:
+        skipped += file_skipped
+        for row in file_rows:
+            duplicates += not keep_first_definition(rows, row.code, row)
+    return rows, skipped, duplicates, jobs if parallel else 1
+
+
+def load_ids(cur, table: str) -> Dict[str, Any]:
+    """code -> id of subject or stage."""
+    cur.execute(f"SELECT code, id FROM {table}")
+    return dict(cur.fetchall())
+
+
+class ImportPlan(NamedTuple):
+    added: List[ModuleRow]
+    changed: List[ModuleRow]
+    unchanged: List[ModuleRow]
+    missing: List[str]                 # in the database, in no file
+    unresolved: List[Tuple[str, str]]  # (module id, reason): subject or stage not in the database
+
+
+def plan_import(cur, rows: Dict[str, ModuleRow], subject_ids: Dict[str, Any], stage_ids: Dict[str, Any]) -> ImportPlan:
+    """Compare rows against module.content_hash."""
+    cur.execute("SELECT code, content_hash FROM module")
+    stored = dict(cur.fetchall())
+    added, changed, unchanged, unresolved = [], [], [], []
+    for code in sorted(rows):
+        row = rows[code]
+        if row.subject_code not in subject_ids:
+            unresolved.append((code, f"subject not found: {row.subject_code}"))
+        elif row.stage_code not in stage_ids:
+            unresolved.append((code, f"stage not found: {row.stage_code}"))
+        elif code not in stored:
+            added.append(row)
+        elif stored[code] != row.content_hash:
+            changed.append(row)
+        else:
+            unchanged.append(row)
+    missing = sorted(code for code in stored if code not in rows)
+    return ImportPlan(added, changed, unchanged, missing, unresolved)
+
+
+def changed_fields(cur, rows: List[ModuleRow]) -> Dict[str, List[str]]:
+    """code -> content fields that differ from the stored module (empty: only the hash is new)."""
+    if not rows:
+        return {}
+    cur.execute("""
+        SELECT m.code, s.code, st.code, m.title, m.description, m.recommended_hours,
+               m.objectives_jsonb, m.lesson_policy_jsonb, m.assessment_blueprint_jsonb, m.version, m.status
+        FROM module m
+        JOIN subject s ON m.subject_id = s.id
+        JOIN stage st ON m.stage_id = st.id
+        WHERE m.code = ANY(%s)
+    """, ([row.code for row in rows],))
+    stored = {record[0]: dict(zip(CONTENT_FIELDS, record[1:])) for record in cur.fetchall()}
+    return {
+        row.code: [field for field in CONTENT_FIELDS if stored[row.code][field] != getattr(row, field)]
+        for row in rows if row.code in stored
+    }
+
+
+def _copy_value(value: Any) -> Any:
+    if value is None:
+        return r'\N'
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def write_modules(cur, rows: List[ModuleRow], subject_ids: Dict[str, Any], stage_ids: Dict[str, Any]) -> Dict[str, float]:
+    """COPY rows into a temporary table and merge them into module with one statement.
+
+    trg_module_updated (migration 006) stamps updated_at on every updated
+    row, whether it changed or not. Returns the seconds spent per phase.
+    """
+    phases = {'stage_sec': 0.0, 'merge_sec': 0.0}
+    if not rows:
+        return phases
+    start = time.perf_counter()
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow([_copy_value(value) for value in (
+            subject_ids[row.subject_code], stage_ids[row.stage_code], row.code, row.title, row.description,
+            row.recommended_hours, row.objectives, row.lesson_policy, row.assessment_blueprint,
+            row.version, row.status, row.content_hash,
+        )])
+    buf.seek(0)
+    cur.execute("""
+        CREATE TEMP TABLE module_import (
+            subject_id UUID, stage_id UUID, code TEXT, title TEXT, description TEXT, recommended_hours INT,
+            objectives_jsonb JSONB, lesson_policy_jsonb JSONB, assessment_blueprint_jsonb JSONB,
+            version TEXT, status TEXT, content_hash TEXT
+        ) ON COMMIT DROP
+    """)
+    cur.copy_expert(r"COPY module_import FROM STDIN WITH (FORMAT csv, NULL '\N')", buf)
+    phases['stage_sec'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cur.execute("""
+        INSERT INTO module (
+            subject_id, stage_id, code, title, description, recommended_hours,
+            objectives_jsonb, lesson_policy_jsonb, assessment_blueprint_jsonb,
+            version, status, content_hash
+        )
+        SELECT
+            subject_id, stage_id, code, title, description, recommended_hours,
+            objectives_jsonb, lesson_policy_jsonb, assessment_blueprint_jsonb,
+            version, status, content_hash
+        FROM module_import
+        ON CONFLICT (code) DO UPDATE SET
+            subject_id = EXCLUDED.subject_id,
+            stage_id = EXCLUDED.stage_id,
+            title = EXCLUDED.title,
+            description = EXCLUDED.description,
+            recommended_hours = EXCLUDED.recommended_hours,
+            objectives_jsonb = EXCLUDED.objectives_jsonb,
+            lesson_policy_jsonb = EXCLUDED.lesson_policy_jsonb,
+            assessment_blueprint_jsonb = EXCLUDED.assessment_blueprint_jsonb,
+            version = EXCLUDED.version,
+            status = EXCLUDED.status,
+            content_hash = EXCLUDED.content_hash
+    """)
+    phases['merge_sec'] = time.perf_counter() - start
+    return phases
+
+
+def import_modules(
+    conn,
+    paths: Iterable[str],
+    incremental: bool = True,
+    dry_run: bool = False,
+    jobs: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Import the modules of the given files in one transaction; returns the report."""
+    start = time.perf_counter()
+    rows, skipped, duplicates, jobs_used = read_modules(paths, jobs)
+    phases = {'parse_sec': time.perf_counter() - start}
+    with conn.cursor() as cur:
+        t = time.perf_counter()
+        subject_ids, stage_ids = load_ids(cur, 'subject'), load_ids(cur, 'stage')
+        plan = plan_import(cur, rows, subject_ids, stage_ids)
+        phases['preload_sec'] = time.perf_counter() - t
+        diff = changed_fields(cur, plan.changed) if dry_run else {}
+        to_write = [] if dry_run else plan.added + plan.changed + ([] if incremental else plan.unchanged)
+        phases.update(write_modules(cur, to_write, subject_ids, stage_ids))
+    t = time.perf_counter()
+    if dry_run:
+        conn.rollback()
+    else:
+        conn.commit()
+    phases['commit_sec'] = time.perf_counter() - t
+    db_sec = phases['preload_sec'] + phases['stage_sec'] + phases['merge_sec'] + phases['commit_sec']
+    return {
+        'modules': len(rows),
+        'added': [row.code for row in plan.added],
+        'changed': [row.code for row in plan.changed],
+        'diff': diff,
+        'unchanged': len(plan.unchanged),
+        'missing': plan.missing,
+        'skipped': skipped + plan.unresolved,
+        'duplicates': duplicates,
+        'written': len(to_write),
+        'jobs': jobs_used,
+        'phases': {name: round(sec, 4) for name, sec in phases.items()},
+        'db_sec': round(db_sec, 4),
+        'total_sec': round(time.perf_counter() - start, 4),
+    }
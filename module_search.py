@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Full-text search over modules: title, description and objective descriptions.
+
+Two backends answer the same query with the same result shape:
+
+  * Postgres (search_modules): module.search_tsv (migration 015) is a stored
+    tsvector with a GIN index. The title weighs A, the description B and the
+    objective descriptions C; each text is indexed with the russian
+    configuration (Russian stemming, and English stemming for Latin words) and
+    with simple (words as they are). Every query word must match, either
+    stemmed or as a prefix of an unstemmed word, so "алгеб" finds "Алгебра".
+  * ModuleSearchIndex: an inverted index built in memory from the compiled
+    curriculum, for when the database is unavailable or not migrated. It has
+    no stemmer: a query word matches the same word exactly, or any longer word
+    that starts with it at half the score.
+
+Ranks are comparable within one backend only.
+"""
+
+import math
+import re
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional
+
+
+SEARCH_LIMIT = 20
+SEARCH_MAX = 100
+# words beyond this are ignored
+MAX_TERMS = 8
+# tsvector weights A (title), B (description), C (objectives), as in ts_rank_cd
+FIELD_WEIGHTS = {'title': 1.0, 'description': 0.4, 'objectives': 0.2}
+PREFIX_SCORE = 0.5
+
+_WORD = re.compile(r'[^\W_]+')
+
+
+def search_terms(query: str) -> List[str]:
+    """Lower-cased words of a query, in order, without repeats."""
+    return list(dict.fromkeys(_WORD.findall(query.lower())))[:MAX_TERMS]
+
+
+def _term_query(terms: List[str]) -> tuple:
+    """tsquery SQL matching every term (stemmed or as a prefix), with its parameters."""
+    parts, params = [], []
+    for term in terms:
+        parts.append("(plainto_tsquery('russian', %s) || to_tsquery('simple', %s))")
+        params += [term, f"{term}:*"]
+    return " && ".join(parts), params
+
+
+def search_modules(
+    cur,
+    query: str,
+    subject_code: Optional[str] = None,
+    stage_code: Optional[str] = None,
+    limit: int = SEARCH_LIMIT,
+) -> List[Dict[str, Any]]:
+    """Best matching modules from module.search_tsv, highest rank first."""
+    terms = search_terms(query)
+    if not terms:
+        return []
+    tsquery, params = _term_query(terms)
+    where = ["m.search_tsv @@ q.query"]
+    if subject_code:
+        where.append("s.code = %s")
+        params.append(subject_code)
+    if stage_code:
+        where.append("st.code = %s")
+        params.append(stage_code)
+    cur.execute(f"""
+        SELECT
+            m.code AS module_code,
+            m.title,
+            m.description,
+            s.code AS subject,
+            st.code AS stage,
+            ts_rank_cd(m.search_tsv, q.query) AS rank
+        FROM module m
+        JOIN subject s ON m.subject_id = s.id
+        JOIN stage st ON m.stage_id = st.id
+        CROSS JOIN (SELECT {tsquery} AS query) q
+        WHERE {' AND '.join(where)}
+        ORDER BY rank DESC, m.code
+        LIMIT %s
+    """, [*params, limit])
+    return [{**row, 'rank': round(float(row['rank']), 4)} for row in cur.fetchall()]
+
+
+class ModuleSearchIndex:
+    """Inverted index: word -> {module number: weighted score}, plus a sorted vocabulary for prefixes."""
+
+    def __init__(self, modules: Iterable[Dict[str, Any]]):
+        self.modules: List[Dict[str, Any]] = []
+        self.postings: Dict[str, Dict[int, float]] = {}
+        for number, module in enumerate(modules):
+            self.modules.append(module)
+            fields = {
+                'title': module.get('title') or '',
+                'description': module.get('description') or '',
+                'objectives': ' '.join(o.get('description') or '' for o in module.get('objectives') or []),
+            }
+            for field, text in fields.items():
+                for word in _WORD.findall(text.lower()):
+                    docs = self.postings.setdefault(word, {})
+                    docs[number] = docs.get(number, 0.0) + FIELD_WEIGHTS[field]
+        self.vocabulary = sorted(self.postings)
+        self.idf = {word: math.log(1 + len(self.modules) / len(docs)) for word, docs in self.postings.items()}
+        self.version: Optional[str] = None
+
+    @classmethod
+    def from_curriculum(cls, curriculum) -> 'ModuleSearchIndex':
+        """From a CompiledCurriculum; subject is the registry code, as in the database."""
+        modules = []
+        for code in curriculum.codes():
+            module = curriculum.module(code)
+            modules.append({
+                'module_code': code,
+                'title': module.get('title'),
+                'description': module.get('description'),
+                'subject': curriculum.module_info(code)['subject_code'],
+                'stage': module.get('stage'),
+                'objectives': module.get('objectives') or [],
+            })
+        index = cls(modules)
+        index.version = curriculum.version
+        return index
+
+    def __len__(self) -> int:
+        return len(self.modules)
+
+    def _term_scores(self, term: str) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+        start = bisect_left(self.vocabulary, term)
+        for word in self.vocabulary[start:]:
+            if not word.startswith(term):
+                break
+            factor = self.idf[word] * (1.0 if word == term else PREFIX_SCORE)
+            for number, weight in self.postings[word].items():
+                scores[number] = max(scores.get(number, 0.0), weight * factor)
+        return scores
+
+    def search(
+        self,
+        query: str,
+        subject_code: Optional[str] = None,
+        stage_code: Optional[str] = None,
+        limit: int = SEARCH_LIMIT,
+    ) -> List[Dict[str, Any]]:
+        """Modules matching every query word, highest score first."""
+        total: Optional[Dict[int, float]] = None
+        for term in search_terms(query):
+            scores = self._term_scores(term)
+            if total is None:
+                total = scores
+            else:
+                total = {n: total[n] + s for n, s in scores.items() if n in total}
+            if not total:
+                return []
+        if total is None:
+            return []
+        results = []
+        for number, score in sorted(total.items(), key=lambda item: (-item[1], self.modules[item[0]]['module_code'])):
+            module = self.modules[number]
+            if subject_code and module['subject'] != subject_code:
+                continue
+            if stage_code and module['stage'] != stage_code:
+                continue
+            results.append({
+                'module_code': module['module_code'],
+                'title': module['title'],
+                'description': module['description'],
+                'subject': module['subject'],
+                'stage': module['stage'],
+                'rank': round(score, 4),
+            })
+            if len(results) == limit:
+                break
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "modules": len(self.modules),
+            "words": len(self.vocabulary),
+            "postings": sum(len(docs) for docs in self.postings.values()),
+        }
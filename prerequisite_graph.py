@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Module prerequisite graph with a precomputed transitive closure.
+
+Built once per process from the compiled curriculum (curriculum_store). Every
+module gets a number in topological order, and sets of modules are Python
+ints used as bitsets: `requires[i]` holds the direct prerequisites of module
+i and `ancestors[i]` all of them, transitively. Given the set of modules a
+student has mastered, the unlocked modules are a single pass of bitwise ANDs
+(O(modules)); closure queries such as "what is still missing before X" are
+one AND plus a scan of the result.
+
+Prerequisites naming modules that do not exist (the lint reports them as
+errors) can never be mastered: a module with one stays locked, and the
+unknown codes are listed by missing() and stats(). Modules on a prerequisite cycle cannot come first in any order;
+they are kept after the acyclic part and, like everything that requires
+them, are only unlocked once the whole cycle has been mastered.
+"""
+
+import heapq
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def find_cycles(graph: Dict[str, List[str]]) -> List[List[str]]:
+    """Strongly connected components with a cycle (Tarjan, iterative), each in a stable order."""
+    index, low, on_stack, stack, cycles = {}, {}, set(), [], []
+    counter = 0
+    for root in sorted(graph):
+        if root in index:
+            continue
+        work = [(root, iter(graph[root]))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, edges = work[-1]
+            advanced = False
+            for succ in edges:
+                if succ not in graph:
+                    continue
+                if succ not in index:
+                    index[succ] = low[succ] = counter
+                    counter += 1
+                    stack.append(succ)
+                    on_stack.add(succ)
+                    work.append((succ, iter(graph[succ])))
+                    advanced = True
+                    break
+                if succ in on_stack:
+                    low[node] = min(low[node], index[succ])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                if len(component) > 1 or node in graph[node]:
+                    cycles.append(cycle_path(graph, set(component)))
+    return sorted(cycles)
+
+
+def cycle_path(graph: Dict[str, List[str]], component: set) -> List[str]:
+    """A cycle through the smallest id of a strongly connected component, following edges."""
+    start = min(component)
+    parents = {start: None}
+    queue = [start]
+    for node in queue:
+        for succ in graph[node]:
+            if succ == start:
+                path = [node]
+                while parents[path[-1]] is not None:
+                    path.append(parents[path[-1]])
+                return path[::-1]
+            if succ in component and succ not in parents:
+                parents[succ] = node
+                queue.append(succ)
+    return sorted(component)
+
+
+def _bits(mask: int) -> Iterable[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class PrerequisiteGraph:
+    """Topologically numbered modules with direct and transitive prerequisite bitsets."""
+
+    def __init__(self, prerequisites: Dict[str, List[str]]):
+        graph = {code: [p for p in dict.fromkeys(reqs) if p in prerequisites]
+                 for code, reqs in prerequisites.items()}
+        self.unknown = {code: [p for p in reqs if p not in prerequisites]
+                        for code, reqs in prerequisites.items() if any(p not in prerequisites for p in reqs)}
+        self.cycles = find_cycles(graph)
+        self.version: Optional[str] = None
+
+        # Kahn's algorithm, smallest code first among the ready modules
+        dependents: Dict[str, List[str]] = {code: [] for code in graph}
+        pending = {code: len(reqs) for code, reqs in graph.items()}
+        for code, reqs in graph.items():
+            for prereq in reqs:
+                dependents[prereq].append(code)
+        ready = [code for code, n in pending.items() if n == 0]
+        heapq.heapify(ready)
+        order: List[str] = []
+        while ready:
+            code = heapq.heappop(ready)
+            order.append(code)
+            for dependent in dependents[code]:
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    heapq.heappush(ready, dependent)
+        self.acyclic = len(order)
+        order += sorted(code for code in graph if pending[code] > 0)
+
+        self.codes: List[str] = order
+        self.index: Dict[str, int] = {code: i for i, code in enumerate(order)}
+        self.requires: List[int] = [self.mask(graph[code]) for code in order]
+        # requires only holds known modules; modules with an unknown prerequisite never unlock
+        self.blocked = self.mask(self.unknown)
+
+        # closure in topological order; the cyclic tail needs a fixed point
+        ancestors = [0] * len(order)
+        for i in range(self.acyclic):
+            for p in _bits(self.requires[i]):
+                ancestors[i] |= (1 << p) | ancestors[p]
+        changed = True
+        while changed:
+            changed = False
+            for i in range(self.acyclic, len(order)):
+                closure = self.requires[i]
+                for p in _bits(self.requires[i]):
+                    closure |= ancestors[p]
+                if closure != ancestors[i]:
+                    ancestors[i], changed = closure, True
+        self.ancestors: List[int] = ancestors
+
+        # how many modules (transitively) wait on each one
+        self.dependent_count = [0] * len(order)
+        for closure in ancestors:
+            for p in _bits(closure):
+                self.dependent_count[p] += 1
+
+    @classmethod
+    def from_modules(cls, modules: Iterable[Dict[str, Any]]) -> 'PrerequisiteGraph':
+        prerequisites: Dict[str, List[str]] = {}
+        for module in modules:
+            prerequisites.setdefault(module['id'], list(module.get('prerequisites') or []))
+        return cls(prerequisites)
+
+    @classmethod
+    def from_curriculum(cls, curriculum) -> 'PrerequisiteGraph':
+        """From a CompiledCurriculum (decodes every module once)."""
+        graph = cls.from_modules(curriculum.iter_modules())
+        graph.version = curriculum.version
+        return graph
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def mask(self, codes: Iterable[str]) -> int:
+        """Bitset of the known codes among codes."""
+        mask = 0
+        for code in codes:
+            i = self.index.get(code)
+            if i is not None:
+                mask |= 1 << i
+        return mask
+
+    def decode(self, mask: int) -> List[str]:
+        """Codes of a bitset, in topological order."""
+        return [self.codes[i] for i in _bits(mask)]
+
+    def all_prerequisites(self, code: str) -> List[str]:
+        """Transitive prerequisites of a module, in topological order."""
+        return self.decode(self.ancestors[self.index[code]])
+
+    def unlocked(self, mastered: int) -> int:
+        """Modules whose direct prerequisites are all in mastered (whether mastered themselves or not)."""
+        free = ~mastered
+        unlocked = 0
+        for i, requires in enumerate(self.requires):
+            if not requires & free:
+                unlocked |= 1 << i
+        return unlocked & ~self.blocked
+
+    def missing(self, code: str, mastered: int) -> List[str]:
+        """Prerequisites of code, direct or not, that are not mastered yet, in topological order.
+
+        Unknown prerequisites (of code or of its prerequisites) come last.
+        """
+        closure = self.ancestors[self.index[code]]
+        unknown = [p for i in [*_bits(closure & self.blocked), self.index[code]]
+                   for p in self.unknown.get(self.codes[i], [])]
+        return self.decode(closure & ~mastered) + list(dict.fromkeys(unknown))
+
+    def recommend(
+        self,
+        mastery: Dict[str, float],
+        threshold: float,
+        candidates: Optional[int] = None,
+        limit: int = 10,
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        """Unlocked, not yet mastered modules to study next, best first.
+
+        mastery maps module code -> overall mastery. Modules already started
+        come first (highest mastery first), then the ones that most other
+        modules depend on, then topological order. candidates restricts the
+        result (e.g. to a subject/stage) without changing what counts as
+        mastered. Returns (modules, totals).
+        """
+        mastered = self.mask(code for code, value in mastery.items() if value >= threshold)
+        open_modules = self.unlocked(mastered) & ~mastered
+        if candidates is not None:
+            open_modules &= candidates
+        ranked = sorted(
+            _bits(open_modules),
+            key=lambda i: (-mastery.get(self.codes[i], 0.0), -self.dependent_count[i], i),
+        )
+        modules = []
+        for i in ranked[:limit]:
+            code = self.codes[i]
+            started = mastery.get(code, 0.0) > 0
+            modules.append({
+                "module_code": code,
+                "mastery": round(mastery.get(code, 0.0), 3),
+                "unlocks": self.dependent_count[i],
+                "prerequisites": self.decode(self.requires[i]),
+                "reason": "in_progress" if started else ("no_prerequisites" if not self.requires[i]
+                                                          else "prerequisites_mastered"),
+            })
+        totals = {
+            "mastered": bin(mastered if candidates is None else mastered & candidates).count('1'),
+            "unlocked": bin(open_modules).count('1'),
+        }
+        return modules, totals
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "modules": len(self.codes),
+            "edges": sum(bin(r).count('1') for r in self.requires),
+            "cycles": [cycle + [cycle[0]] for cycle in self.cycles],
+            "unknown_prerequisites": self.unknown,
+        }
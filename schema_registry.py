@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+JSON Schema registry: every schema is loaded and checked once per process.
+
+Each schema gets one Draft7Validator with a format checker, built when the
+schema is first needed and reused for every call afterwards, so requests do
+not pay for loading the file, check_schema() and building the validator.
+
+Usage:
+    from schema_registry import registry
+    ok, message = registry.validate('generated_lesson', lesson)
+    errors = registry.get('diagnostic').errors(session)
+"""
+
+import os
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from jsonschema import Draft7Validator, FormatChecker
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SCHEMA_FILES = {
+    # full curriculum lesson (curriculum/lesson/*.json)
+    'lesson': os.path.join(BASE_DIR, 'curriculum', 'lesson', 'lesson.schema.json'),
+    # lessons produced by AILessonGenerator / POST /api/lessons/generate
+    'generated_lesson': os.path.join(BASE_DIR, 'curriculum', 'lesson', 'generated_lesson.schema.json'),
+    # adaptive diagnostic session (templates/diagnostic_sample_*.json)
+    'diagnostic': os.path.join(BASE_DIR, 'templates', 'diagnostic.schema.json'),
+    # single diagnostic question
+    'diagnostic_item': os.path.join(BASE_DIR, 'curriculum', 'diagnostic', 'diagnostic.schema.json'),
+    # curriculum content, checked by curriculum_lint
+    'module': os.path.join(BASE_DIR, 'curriculum', 'schema', 'module.schema.json'),
+    'curriculum': os.path.join(BASE_DIR, 'curriculum', 'schema', 'curriculum.schema.json'),
+    'curriculum_index': os.path.join(BASE_DIR, 'curriculum', 'schema', 'curriculum_index.schema.json'),
+    'subject_registry': os.path.join(BASE_DIR, 'curriculum', 'schema', 'subject_registry.schema.json'),
+}
+
+_FORMAT_CHECKER = FormatChecker()
+
+# (path, message) pairs; path is a list of keys/indices from the root
+Error = Tuple[List[Union[str, int]], str]
+
+
+def format_path(path: List[Union[str, int]]) -> str:
+    """['blocks', 2, 'content'] -> 'blocks[2].content'."""
+    out = ''
+    for part in path:
+        if isinstance(part, int):
+            out += f'[{part}]'
+        else:
+            out += f'.{part}' if out else str(part)
+    return out
+
+
+class CompiledSchema:
+    """A loaded schema with its cached Draft7Validator."""
+
+    def __init__(self, name: str, schema: Dict[str, Any]):
+        Draft7Validator.check_schema(schema)
+        self.name = name
+        self.schema = schema
+        self.draft7 = Draft7Validator(schema, format_checker=_FORMAT_CHECKER)
+
+    def iter_errors(self, instance: Any) -> List[Error]:
+        """All (path, message) errors of an instance; empty when valid."""
+        return [(list(e.absolute_path), e.message) for e in self.draft7.iter_errors(instance)]
+
+    def errors(self, instance: Any) -> List[str]:
+        """Errors as 'path: message' strings."""
+        return [f"{format_path(path)}: {message}" if path else message
+                for path, message in self.iter_errors(instance)]
+
+    def is_valid(self, instance: Any) -> bool:
+        return self.draft7.is_valid(instance)
+
+    def validate(self, instance: Any) -> Tuple[bool, str]:
+        """(True, "Valid") or (False, first error), like the validation module."""
+        error = next(self.draft7.iter_errors(instance), None)
+        if error is None:
+            return True, "Valid"
+        path = list(error.absolute_path)
+        return False, f"{format_path(path)}: {error.message}" if path else error.message
+
+
+class SchemaRegistry:
+    """Schemas by name, loaded from SCHEMA_FILES (or register()) once per process."""
+
+    def __init__(self, files: Optional[Dict[str, str]] = None):
+        self._files = dict(SCHEMA_FILES if files is None else files)
+        self._compiled: Dict[str, CompiledSchema] = {}
+        self._by_path: Dict[Tuple[str, float], CompiledSchema] = {}
+        self._lock = threading.Lock()
+
+    def names(self) -> List[str]:
+        return sorted(set(self._files) | set(self._compiled))
+
+    def register(self, name: str, schema: Dict[str, Any]) -> CompiledSchema:
+        """Load an in-memory schema under a name (replaces any previous one)."""
+        compiled = CompiledSchema(name, schema)
+        with self._lock:
+            self._compiled[name] = compiled
+        return compiled
+
+    def get(self, name: str) -> CompiledSchema:
+        compiled = self._compiled.get(name)
+        if compiled is not None:
+            return compiled
+        if name not in self._files:
+            raise KeyError(f"Unknown schema: {name}")
+        with self._lock:
+            if name not in self._compiled:
+                self._compiled[name] = CompiledSchema(name, _load_json(self._files[name]))
+            return self._compiled[name]
+
+    def for_path(self, path: Union[str, os.PathLike]) -> CompiledSchema:
+        """Schema of an arbitrary file, reloaded when the file changes."""
+        path = os.path.abspath(os.fspath(path))
+        key = (path, os.path.getmtime(path))
+        compiled = self._by_path.get(key)
+        if compiled is None:
+            compiled = CompiledSchema(os.path.basename(path), _load_json(path))
+            with self._lock:
+                self._by_path = {k: v for k, v in self._by_path.items() if k[0] != path}
+                self._by_path[key] = compiled
+        return compiled
+
+    def warm(self) -> List[str]:
+        """Load every known schema now (at startup), so a broken one fails early."""
+        return [self.get(name).name for name in self._files]
+
+    def validate(self, name: str, instance: Any) -> Tuple[bool, str]:
+        return self.get(name).validate(instance)
+
+
+def _load_json(path: str) -> Any:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+registry = SchemaRegistry()
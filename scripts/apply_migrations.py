@@ -1,7 +1,37 @@
 #!/usr/bin/env python3
-import os, sys, glob
+"""
+Apply db/migrations/*.sql that are not in schema_migrations yet.
+
+Runs migration_runner.py: every step under lock_timeout (retried with
+backoff when a lock is not granted in time), CREATE INDEX CONCURRENTLY
+outside transactions, `-- migrate: backfill` statements in throttled
+batches, and a timing report per step at the end.
+
+Usage:
+    python scripts/apply_migrations.py db/migrations/
+    python scripts/apply_migrations.py db/migrations/ --lock-timeout 2s --statement-timeout 5min
+    python scripts/apply_migrations.py db/migrations/ --plan      # show the steps of pending migrations
+"""
+
+import os
+import sys
+import glob
+import argparse
+
 import psycopg2
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from migration_runner import (
+    MigrationError,
+    apply_migrations,
+    applied_migrations,
+    ensure_migrations_table,
+    plan_migration,
+    read_up_sql,
+)
+
+
 def get_db_connection():
     return psycopg2.connect(
         host=os.getenv('DB_HOST', 'localhost'),
@@ -11,99 +41,77 @@ def get_db_connection():
         password=os.getenv('DB_PASSWORD', '')
     )
 
-def read_up_sql(migration_file: str) -> str:
-    with open(migration_file, 'r', encoding='utf-8') as f:
-        raw = f.read()
-    if '-- UP' in raw and '-- DOWN' in raw:
-        up_start = raw.find('-- UP') + len('-- UP')
-        down_start = raw.find('-- DOWN')
-        up_sql = raw[up_start:down_start].strip()
-        print(f"DEBUG: Extracted UP SQL for {os.path.basename(migration_file)}: {up_sql[:100]}...")
-        return up_sql
-    return raw.strip()
-
-def create_migrations_table(cur):
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS schema_migrations (
-            migration_name TEXT PRIMARY KEY,
-            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
-        );
-    """)
-
-def is_migration_applied(cur, name: str) -> bool:
-    cur.execute("SELECT 1 FROM schema_migrations WHERE migration_name = %s", (name,))
-    return cur.fetchone() is not None
-
-def mark_migration_applied(cur, name: str):
-    cur.execute("INSERT INTO schema_migrations (migration_name) VALUES (%s)", (name,))
-
-def apply_migration(conn, migration_file: str):
-    name = os.path.basename(migration_file)
-    up_sql = read_up_sql(migration_file)
-    if not up_sql:
-        print(f"⚠️  Skipping empty migration: {name}")
-        return
-
-    print(f"Applying migration: {name}")
-    # Включаем autocommit на время выполнения файла, чтобы не конфликтовать с BEGIN/COMMIT внутри
-    prev_autocommit = conn.autocommit
-    conn.autocommit = True
-    try:
-        with conn.cursor() as cur:
-            cur.execute(up_sql)
-        print(f"✓ Successfully applied {name}")
-    except Exception as e:
-        print(f"✗ Error applying {name}: {e}")
-        # если часть файла была в явной транзакции, Postgres сам откатит из-за COMMIT не случился
-        raise
-    finally:
-        conn.autocommit = prev_autocommit
+
+def print_applied(report):
+    retries = sum(step['retries'] for step in report['steps'])
+    print(f"✓ Successfully applied {report['name']} in {report['sec'] * 1000:.1f} ms"
+          + (f" ({retries} lock timeout retries)" if retries else ""))
+
+
+def print_timing(reports):
+    print("\n⏱️  Timing:")
+    for report in reports:
+        print(f"   {report['name']:<44}{report['sec'] * 1000:>10.1f} ms   "
+              f"lock_timeout={report['options']['lock_timeout']} "
+              f"statement_timeout={report['options']['statement_timeout']}")
+        for step in report['steps']:
+            extra = f"  {step['rows']} rows in {step['batches']} batches" if step['kind'] == 'backfill' else ""
+            retries = f"  {step['retries']} retries" if step['retries'] else ""
+            print(f"      {step['kind']:<11}{step['sec'] * 1000:>10.1f} ms  {step['statement']}{extra}{retries}")
+
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python apply_migrations.py <migrations_directory>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Apply pending SQL migrations.")
+    parser.add_argument('migrations_dir')
+    parser.add_argument('--lock-timeout', help='default lock_timeout per step (default: 5s, MIGRATION_LOCK_TIMEOUT)')
+    parser.add_argument('--statement-timeout', help='default statement_timeout (default: off, MIGRATION_STATEMENT_TIMEOUT)')
+    parser.add_argument('--plan', action='store_true', help='print the steps of pending migrations and exit')
+    args = parser.parse_args()
 
-    migrations_dir = sys.argv[1]
-    files = sorted(glob.glob(os.path.join(migrations_dir, "*.sql")))
+    files = sorted(glob.glob(os.path.join(args.migrations_dir, "*.sql")))
     if not files:
-        print(f"No migration files found in {migrations_dir}")
+        print(f"No migration files found in {args.migrations_dir}")
         sys.exit(1)
+    defaults = {}
+    if args.lock_timeout:
+        defaults['lock_timeout'] = args.lock_timeout
+    if args.statement_timeout:
+        defaults['statement_timeout'] = args.statement_timeout
 
     print("Found migrations:")
     for f in files: print("  -", os.path.basename(f))
 
     try:
         conn = get_db_connection()
-        with conn:
-            with conn.cursor() as cur:
-                create_migrations_table(cur)
-
-        applied = 0
+        ensure_migrations_table(conn)
+        done = applied_migrations(conn)
         for path in files:
-            name = os.path.basename(path)
-            with conn:
-                with conn.cursor() as cur:
-                    if is_migration_applied(cur, name):
-                        print(f"⏭️  Skipping already applied: {name}")
-                        continue
-            # применяем сам файл
-            apply_migration(conn, path)
-            # фиксируем факт применения (отдельной транзакцией)
-            with conn:
-                with conn.cursor() as cur:
-                    mark_migration_applied(cur, name)
-            applied += 1
-
-        print(f"\n✅ Migration complete! Applied {applied} new migrations.")
-    except Exception as e:
+            if os.path.basename(path) in done:
+                print(f"⏭️  Skipping already applied: {os.path.basename(path)}")
+
+        if args.plan:
+            for path in files:
+                if os.path.basename(path) in done:
+                    continue
+                plan = plan_migration(os.path.basename(path), read_up_sql(path), defaults)
+                print(f"\n{plan.name}: {plan.options}")
+                for step in plan.steps:
+                    print(f"   {step.kind:<11}{'retryable' if step.retryable else '':<11}{' '.join(step.sql.split())[:80]}")
+            return
+
+        reports = apply_migrations(conn, files, defaults, on_applied=print_applied)
+        if reports:
+            print_timing(reports)
+        print(f"\n✅ Migration complete! Applied {len(reports)} new migrations.")
+    except (MigrationError, psycopg2.Error) as e:
         print(f"❌ Migration failed: {e}")
         sys.exit(1)
     finally:
         try:
             conn.close()
-        except:
+        except Exception:
             pass
 
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Fill in student_daily_progress (migration 013) for past days from submission.
+
+POST /api/submissions keeps the rollup current from the moment it is
+deployed; run this once after the migration for the history before that,
+and again after bulk loads. Only days before --until (default: today, UTC)
+that have no rollup row yet are added; existing rows keep the exact values
+the API wrote, so it is safe to re-run while the API is taking submissions.
+
+Usage:
+    python scripts/backfill_daily_progress.py
+    python scripts/backfill_daily_progress.py --since 2025-09-01 --run <mastery_replay_run id>
+    python scripts/backfill_daily_progress.py --student <student_id> [--student ...]
+
+Closing mastery of past days comes from a replay run (scripts/replay_mastery.py
+--to-table) when --run is given; otherwise only the latest day of every
+(student, module) gets it, from learning_state.
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from daily_progress import backfill
+
+
+def get_db_connection():
+    """Get database connection from environment variables."""
+    return psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=os.getenv('DB_PORT', '5432'),
+        database=os.getenv('DB_NAME', 'ayaal_teacher'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', '')
+    )
+
+
+def parse_day(value):
+    """Parse YYYY-MM-DD."""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got {value!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill in missing student_daily_progress days from submission.")
+    parser.add_argument('--since', type=parse_day, help='first day to fill in (default: all history)')
+    parser.add_argument('--until', type=parse_day, help='fill in days before this one (default: today, UTC)')
+    parser.add_argument('--student', action='append', dest='students', help='student.id to fill in (repeatable)')
+    parser.add_argument('--run', help='mastery_replay_run id for closing mastery of past days')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        conn = get_db_connection()
+        stats = backfill(conn, since=args.since, until=args.until, student_ids=args.students, run_id=args.run)
+    except Exception as e:
+        print(f"❌ Backfill failed: {e}")
+        sys.exit(1)
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+    print(f"✅ student_daily_progress backfilled in {time.perf_counter() - start:.1f}s")
+    for key, value in stats.items():
+        print(f"   {key:<28}{value:>12,}")
+
+
+if __name__ == "__main__":
+    main()
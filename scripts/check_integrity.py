@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Run the database integrity checks (db_integrity.py, migration 014) once.
+
+The API runs them in the background every INTEGRITY_CHECK_INTERVAL seconds;
+use this from cron when the monitor is disabled, or with --full after bulk
+loads and deletes (back-dated rows and removed parents are otherwise only
+caught by the daily full pass).
+
+Usage:
+    python scripts/check_integrity.py
+    python scripts/check_integrity.py --full
+    python scripts/check_integrity.py --stateless   # full scan, stored report untouched
+
+Exit status is 1 when any check finds problems.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from db_integrity import run_checks, full_scan_counts
+
+
+def get_db_connection():
+    """Get database connection from environment variables."""
+    return psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=os.getenv('DB_PORT', '5432'),
+        database=os.getenv('DB_NAME', 'ayaal_teacher'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', '')
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check database integrity.")
+    parser.add_argument('--full', action='store_true', help='scan every row instead of rows past the watermark')
+    parser.add_argument('--stateless', action='store_true', help='full scan without reading or storing state')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        conn = get_db_connection()
+        if args.stateless:
+            counts, checks = full_scan_counts(conn), {}
+        else:
+            report = run_checks(conn, full=args.full)
+            if report is None:
+                print("⏳ Another process is running the integrity checks")
+                sys.exit(0)
+            counts, checks = report['counts'], report['checks']
+    except Exception as e:
+        print(f"❌ Integrity check failed: {e}")
+        sys.exit(2)
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+    print(f"Integrity checks done in {time.perf_counter() - start:.2f}s")
+    for name, check in checks.items():
+        scope = 'full pass' if check['full_pass'] else f"incremental (last full pass {check['full_scan_at']})"
+        print(f"   {name:<16}{check['duration_ms']:>10,.1f} ms  {scope}")
+    for key, value in counts.items():
+        print(f"   {'❌' if value else '✅'} {key:<38}{value:>10,}")
+    sys.exit(1 if any(counts.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
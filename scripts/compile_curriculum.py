@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Compile curriculum/ into curriculum.bin (see curriculum_store.py).
+
+The API and scripts map the artifact instead of parsing the JSON tree; the
+API recompiles a stale artifact on start-up, so running this by hand is
+only needed for deployments that ship the artifact without the sources,
+or to check it in CI.
+
+Usage:
+    python scripts/compile_curriculum.py
+    python scripts/compile_curriculum.py --output /srv/ayaal/curriculum.bin
+    python scripts/compile_curriculum.py --check     # exit 1 if missing or stale
+"""
+
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from curriculum_lint import DEFAULT_CURRICULUM_DIR
+from curriculum_store import (
+    DEFAULT_ARTIFACT_PATH,
+    CompiledCurriculum,
+    CurriculumArtifactError,
+    compile_curriculum,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the curriculum JSON into one mmap-able artifact.")
+    parser.add_argument('--curriculum-dir', default=DEFAULT_CURRICULUM_DIR)
+    parser.add_argument('--output', default=DEFAULT_ARTIFACT_PATH)
+    parser.add_argument('--check', action='store_true', help='only report whether the artifact is up to date')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.curriculum_dir):
+        print(f"❌ Curriculum directory not found: {args.curriculum_dir}")
+        sys.exit(2)
+
+    if args.check:
+        try:
+            compiled = CompiledCurriculum(args.output)
+        except CurriculumArtifactError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        if compiled.is_stale(args.curriculum_dir):
+            print(f"❌ {args.output} (version {compiled.version}) is stale")
+            sys.exit(1)
+        print(f"✅ {args.output} is up to date (version {compiled.version}, {len(compiled)} modules)")
+        return
+
+    stats = compile_curriculum(args.curriculum_dir, args.output)
+    print(f"✅ Compiled {stats['path']} in {stats['elapsed_sec'] * 1000:.0f} ms")
+    for key in ('version', 'modules', 'subjects', 'stages', 'objectives', 'documents', 'bytes'):
+        print(f"   {key:<20}{stats[key]:>18,}" if isinstance(stats[key], int) else f"   {key:<20}{stats[key]:>18}")
+    if stats['duplicate_modules']:
+        print(f"⚠️  {stats['duplicate_modules']} duplicate module id(s) skipped; run scripts/lint_curriculum.py")
+
+
+if __name__ == "__main__":
+    main()
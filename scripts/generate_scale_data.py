@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Synthetic scale data for the learning schema, bulk-loaded with COPY.
+
+Reproduces production-sized tables locally so query plans can be checked:
+app_user, student, parent_link, enrollment, learning_state, submission and
+attempt. Modules are the codes from curriculum/modules (imported with
+import_modules.py). Activity is skewed: each student gets a lognormal
+activity weight, students progress through a geometric number of modules
+per enrollment, and submissions/attempts are spread over learning_state rows
+in proportion to activity, with earlier modules getting more of them.
+
+Rows are generated in NumPy chunks and streamed to COPY; ids are generated
+client-side (UUIDv7 by created_at for submission/attempt, as migration 009
+does), so nothing is read back. learning_state mastery is left at zero;
+run scripts/recompute_mastery.py afterwards to derive it from submissions.
+
+Usage:
+    python scripts/generate_scale_data.py --students 100000 --submissions 5000000 --attempts 5000000
+    python scripts/generate_scale_data.py --students 1000 --submissions 20000 --attempts 20000 --seed 7
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+from datetime import date
+
+import numpy as np
+import psycopg2
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from manage_partitions import add_months
+from curriculum_store import open_curriculum
+
+
+EMAIL_DOMAIN = 'scale.local'
+PASSWORD = 'scale-password'
+
+LESSON_TYPES = np.array(['concept', 'guided', 'independent', 'assessment'])
+LESSON_TYPE_P = [0.3, 0.25, 0.25, 0.2]
+KINDS = np.array(['practice', 'homework', 'assessment', 'project', 'lab'])
+KIND_P = [0.7, 0.15, 0.1, 0.03, 0.02]
+
+# id prefixes per entity so generated ids never collide across tables
+USER_TAG, STUDENT_TAG = 0x5ca1e001, 0x5ca1e002
+
+
+def get_db_connection():
+    """Get database connection from environment variables."""
+    return psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=os.getenv('DB_PORT', '5432'),
+        database=os.getenv('DB_NAME', 'ayaal_teacher'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', '')
+    )
+
+
+def curriculum_module_codes():
+    """Module codes defined in curriculum/modules (from the compiled curriculum)."""
+    return open_curriculum().codes()
+
+
+def load_modules(cur, codes):
+    """Imported modules grouped by (subject, stage), each group ordered by code."""
+    cur.execute("""
+        SELECT id::text, code, subject_id::text, stage_id::text
+        FROM module WHERE code = ANY(%s) ORDER BY subject_id, stage_id, code
+    """, (codes,))
+    groups = {}
+    for module_id, code, subject_id, stage_id in cur.fetchall():
+        groups.setdefault((subject_id, stage_id), []).append((module_id, code))
+    return groups
+
+
+# ---------- Formatting ----------
+
+def entity_ids(tag, run, index):
+    """Deterministic UUIDs (version 4 layout) for entity rows of one run."""
+    return [f"{tag:08x}-{run:04x}-4000-8000-{i:012x}" for i in index.tolist()]
+
+
+def uuid7(rng, created_ms):
+    """UUIDv7: 48-bit unix ms + random bits, like uuid_generate_v7()."""
+    n = len(created_ms)
+    a = rng.integers(0, 1 << 12, n).tolist()
+    b = rng.integers(0, 1 << 14, n).tolist()
+    c = rng.integers(0, 1 << 48, n).tolist()
+    return [f"{m >> 16:08x}-{m & 0xffff:04x}-7{x:03x}-{0x8000 | y:04x}-{z:012x}"
+            for m, x, y, z in zip(created_ms.tolist(), a, b, c)]
+
+
+def timestamps(created_ms):
+    return np.datetime_as_string(created_ms.astype('datetime64[ms]'), unit='ms', timezone='UTC').tolist()
+
+
+def copy_rows(cur, table, columns, rows):
+    """COPY text-format rows (tuples of already formatted strings)."""
+    buf = io.StringIO()
+    buf.write('\n'.join(map('\t'.join, rows)))
+    buf.write('\n')
+    buf.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buf)
+
+
+# ---------- Generation ----------
+
+class ScaleGenerator:
+    """Generates and COPYs one synthetic population."""
+
+    def __init__(self, cur, groups, args):
+        self.cur = cur
+        self.args = args
+        self.rng = np.random.default_rng(args.seed)
+        self.run = int(self.rng.integers(0, 1 << 16))
+        self.now_ms = int(time.time() * 1000)
+        self.window_ms = args.days * 86400 * 1000
+        self.group_keys = list(groups)
+        self.groups = [groups[k] for k in self.group_keys]
+        self.counts = {}
+        self.copy_seconds = {}
+
+    def _copy(self, table, columns, rows):
+        started = time.perf_counter()
+        copy_rows(self.cur, table, columns, rows)
+        self.counts[table] = self.counts.get(table, 0) + len(rows)
+        self.copy_seconds[table] = self.copy_seconds.get(table, 0.0) + time.perf_counter() - started
+
+    def users_and_students(self):
+        args, n = self.args, self.args.students
+        parents = max(1, int(n * args.parent_ratio / args.children_per_parent))
+        password_hash = generate_password_hash(PASSWORD)
+        created = timestamps(self.now_ms - self.rng.integers(0, self.window_ms, n + parents))
+
+        for start in range(0, n + parents, args.chunk_rows):
+            idx = np.arange(start, min(n + parents, start + args.chunk_rows))
+            ids = entity_ids(USER_TAG, self.run, idx)
+            rows = [
+                (uid, f"scale-{self.run:04x}-{i}@{EMAIL_DOMAIN}", password_hash,
+                 'student' if i < n else 'parent', 'ru', created[i])
+                for uid, i in zip(ids, idx.tolist())
+            ]
+            self._copy('app_user', ('id', 'email', 'password_hash', 'role', 'locale', 'created_at'), rows)
+
+        # a share of students has a parent; parents get several children
+        has_parent = self.rng.random(n) < args.parent_ratio
+        parent_of = n + self.rng.integers(0, parents, n)
+        for start in range(0, n, args.chunk_rows):
+            idx = np.arange(start, min(n, start + args.chunk_rows))
+            student_ids = entity_ids(STUDENT_TAG, self.run, idx)
+            user_ids = entity_ids(USER_TAG, self.run, idx)
+            parent_ids = entity_ids(USER_TAG, self.run, parent_of[idx])
+            linked = has_parent[idx].tolist()
+            self._copy('student', ('id', 'user_id', 'parent_user_id', 'grade_hint'), [
+                (sid, uid, pid if link else '\\N', 'synthetic')
+                for sid, uid, pid, link in zip(student_ids, user_ids, parent_ids, linked)
+            ])
+            links = [(sid, pid, 'parent') for sid, pid, link in zip(student_ids, parent_ids, linked) if link]
+            if links:
+                self._copy('parent_link', ('student_id', 'parent_user_id', 'relation'), links)
+
+    def enrollments(self):
+        """Enrollments and learning_state; returns arrays describing learning_state rows."""
+        args, n = self.args, self.args.students
+        g = len(self.groups)
+        per_student = np.minimum(g, 1 + self.rng.poisson(args.enrollments_mean - 1, n))
+
+        ls_student, ls_module, ls_position, ls_start = [], [], [], []
+        module_index = {}
+        self.module_ids = []
+        for modules in self.groups:
+            for module_id, _ in modules:
+                module_index[module_id] = len(self.module_ids)
+                self.module_ids.append(module_id)
+
+        for start in range(0, n, args.chunk_rows):
+            idx = np.arange(start, min(n, start + args.chunk_rows))
+            student_ids = entity_ids(STUDENT_TAG, self.run, idx)
+            # distinct (subject, stage) groups per student: first k of a random permutation
+            order = np.argsort(self.rng.random((len(idx), g)), axis=1)
+            started = self.now_ms - self.rng.integers(0, self.window_ms, (len(idx), g))
+            enroll_rows, ls_rows = [], []
+            for row, (i, sid) in enumerate(zip(idx.tolist(), student_ids)):
+                for k in range(per_student[i]):
+                    gi = int(order[row, k])
+                    subject_id, stage_id = self.group_keys[gi]
+                    started_ms = int(started[row, k])
+                    enroll_rows.append((sid, subject_id, stage_id, '1.0.0', started_ms))
+                    modules = self.groups[gi]
+                    reached = min(len(modules), int(self.rng.geometric(1 / args.modules_mean)))
+                    for pos in range(reached):
+                        module_id = modules[pos][0]
+                        ls_rows.append((sid, module_id, started_ms))
+                        ls_student.append(i)
+                        ls_module.append(module_index[module_id])
+                        ls_position.append(pos)
+                        ls_start.append(started_ms)
+
+            started_text = timestamps(np.array([r[4] for r in enroll_rows], dtype=np.int64))
+            self._copy('enrollment', ('student_id', 'subject_id', 'stage_id', 'curriculum_version', 'started_at'),
+                      [r[:4] + (ts,) for r, ts in zip(enroll_rows, started_text)])
+            lesson_type = self.rng.choice(LESSON_TYPES, len(ls_rows), p=LESSON_TYPE_P).tolist()
+            self._copy('learning_state', ('student_id', 'module_id', 'current_lesson_type', 'next_recommended'),
+                      [(sid, mid, lt, lt) for (sid, mid, _), lt in zip(ls_rows, lesson_type)])
+
+        return (np.array(ls_student), np.array(ls_module), np.array(ls_position), np.array(ls_start, dtype=np.int64))
+
+    def events(self, table, total, learning_state):
+        """Submissions or attempts over learning_state rows, weighted by activity."""
+        if total <= 0:
+            return
+        args = self.args
+        ls_student, ls_module, ls_position, ls_start = learning_state
+        activity = self.rng.lognormal(0.0, args.activity_sigma, args.students)
+        weight = activity[ls_student] * 0.7 ** ls_position
+        per_row = self.rng.multinomial(total, weight / weight.sum())
+
+        rows_of = np.repeat(np.arange(len(per_row)), per_row)
+        self.rng.shuffle(rows_of)  # interleave students like real traffic
+        for start in range(0, len(rows_of), args.chunk_rows):
+            ls = rows_of[start:start + args.chunk_rows]
+            n = len(ls)
+            begin = ls_start[ls]
+            created_ms = begin + (self.rng.random(n) * (self.now_ms - begin)).astype(np.int64)
+            student_ids = entity_ids(STUDENT_TAG, self.run, ls_student[ls])
+            module_ids = [self.module_ids[m] for m in ls_module[ls].tolist()]
+            lesson_types = self.rng.choice(LESSON_TYPES, n, p=LESSON_TYPE_P).tolist()
+            lesson_no = self.rng.integers(1, 4, n).tolist()
+            lesson_ids = [f"lesson_{t}_{k:02d}" for t, k in zip(lesson_types, lesson_no)]
+            # scores rise with module progress, clipped to [0, 1]
+            scores = np.clip(self.rng.normal(0.55 + 0.05 * np.minimum(ls_position[ls], 5), 0.2), 0, 1).round(2).astype(str).tolist()
+            ids, created = uuid7(self.rng, created_ms), timestamps(created_ms)
+            task = self.rng.integers(1, 21, n).tolist()
+
+            if table == 'submission':
+                kinds = self.rng.choice(KINDS, n, p=KIND_P).tolist()
+                self._copy('submission',
+                          ('id', 'student_id', 'module_id', 'lesson_id', 'task_id', 'kind', 'answer_jsonb', 'score', 'created_at'),
+                          [(i, s, m, l, f"task_{t}", k, f'{{"answer": {t % 4}}}', sc, c)
+                           for i, s, m, l, t, k, sc, c in zip(ids, student_ids, module_ids, lesson_ids, task, kinds, scores, created)])
+            else:
+                self._copy('attempt',
+                          ('id', 'student_id', 'module_id', 'lesson_id', 'interactive_id', 'payload_jsonb', 'score', 'created_at'),
+                          [(i, s, m, l, f"w{t}", f'{{"step": {t}}}', sc, c)
+                           for i, s, m, l, t, sc, c in zip(ids, student_ids, module_ids, lesson_ids, task, scores, created)])
+            print(f"   {table}: {self.counts[table]:,} rows", end='\r', flush=True)
+        print()
+
+
+def ensure_partitions(cur, days):
+    """Monthly partitions covering the generated created_at range."""
+    today = date.today()
+    month = add_months(date(today.year, today.month, 1), -(days // 28 + 1))
+    end = add_months(date(today.year, today.month, 1), 1)
+    while month < end:
+        for table in ('submission', 'attempt'):
+            cur.execute("SELECT ensure_monthly_partition(%s, %s)", (table, month))
+        month = add_months(month, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load synthetic scale data with COPY.")
+    parser.add_argument('--students', type=int, default=100000)
+    parser.add_argument('--submissions', type=int, default=5000000)
+    parser.add_argument('--attempts', type=int, default=5000000)
+    parser.add_argument('--days', type=int, default=180, help='history window')
+    parser.add_argument('--parent-ratio', type=float, default=0.6, help='share of students with a parent')
+    parser.add_argument('--children-per-parent', type=float, default=1.5)
+    parser.add_argument('--enrollments-mean', type=float, default=2.0, help='mean (subject, stage) enrollments per student')
+    parser.add_argument('--modules-mean', type=float, default=2.5, help='mean modules reached per enrollment')
+    parser.add_argument('--activity-sigma', type=float, default=1.0, help='lognormal skew of per-student activity')
+    parser.add_argument('--chunk-rows', type=int, default=200000)
+    parser.add_argument('--no-fk-checks', action='store_true',
+                        help='skip FK triggers while loading (session_replication_role=replica, superuser only)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        conn = get_db_connection()
+        with conn.cursor() as cur:
+            groups = load_modules(cur, curriculum_module_codes())
+            if not groups:
+                print("❌ No curriculum modules in the database; run scripts/import_modules.py first")
+                sys.exit(1)
+            cur.execute("SET synchronous_commit = off")
+            if args.no_fk_checks:
+                cur.execute("SET session_replication_role = replica")
+            ensure_partitions(cur, args.days)
+
+            gen = ScaleGenerator(cur, groups, args)
+            print(f"🏗️  Generating run {gen.run:04x}: {args.students:,} students over "
+                  f"{sum(len(m) for m in groups.values())} modules in {len(groups)} subject/stage groups")
+            gen.users_and_students()
+            learning_state = gen.enrollments()
+            gen.events('submission', args.submissions, learning_state)
+            gen.events('attempt', args.attempts, learning_state)
+            for table in ('app_user', 'student', 'parent_link', 'enrollment', 'learning_state', 'submission', 'attempt'):
+                cur.execute(f"ANALYZE {table}")
+        conn.commit()
+    except Exception as e:
+        print(f"❌ Generation failed: {e}")
+        sys.exit(1)
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+    elapsed = time.perf_counter() - start
+    total = sum(gen.counts.values())
+    print(f"✅ {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+    for table, count in gen.counts.items():
+        seconds = gen.copy_seconds[table]
+        print(f"   {table:<16}{count:>12,}   COPY {seconds:6.1f}s ({count / max(seconds, 1e-9):>9,.0f} rows/s)")
+    print("   learning_state mastery is zero; run scripts/recompute_mastery.py to derive it")
+
+
+if __name__ == "__main__":
+    main()
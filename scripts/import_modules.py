@@ -1,15 +1,28 @@
 #!/usr/bin/env python3
 """
 ETL script to import curriculum modules from JSON files into PostgreSQL.
+
+Usage:
+    python scripts/import_modules.py curriculum/modules/
+    python scripts/import_modules.py curriculum/modules/ --incremental   # only new/changed modules
+    python scripts/import_modules.py curriculum/modules/ --dry-run       # show what would change
+
+Files are parsed (in worker processes for large trees), then all modules
+are COPYed into a staging table and merged into module in one transaction
+(module_import.py). The incremental mode compares content hashes
+(migration 016) and leaves unchanged modules untouched.
 """
 
 import os
 import sys
-import json
+import argparse
 import psycopg2
-from psycopg2 import sql
 import glob
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from module_import import import_modules
+
 
 def get_db_connection():
     """Get database connection from environment variables."""
@@ -22,162 +35,70 @@ def get_db_connection():
     )
 
 
-def get_subject_id(cursor, subject_code):
-    """Get subject ID by code."""
-    cursor.execute("SELECT id FROM subject WHERE code = %s", (subject_code,))
-    result = cursor.fetchone()
-    if not result:
-        raise ValueError(f"Subject not found: {subject_code}")
-    return result[0]
-
-
-def get_stage_id(cursor, stage_code):
-    """Get stage ID by code."""
-    cursor.execute("SELECT id FROM stage WHERE code = %s", (stage_code,))
-    result = cursor.fetchone()
-    if not result:
-        raise ValueError(f"Stage not found: {stage_code}")
-    return result[0]
-
-
-def transform_module_data(module_data):
-    """Transform module JSON data to match database schema."""
-    return {
-        'code': module_data['id'],
-        'title': module_data['title'],
-        'recommended_hours': module_data.get('recommended_hours'),
-        'objectives_jsonb': json.dumps(module_data.get('objectives', [])),
-        'lesson_policy_jsonb': json.dumps(module_data.get('lesson_policy', {})),
-        'assessment_blueprint_jsonb': json.dumps(module_data.get('assessment_blueprint', {})),
-        'version': module_data.get('version', '1.0.0'),
-        'status': 'active'
-    }
-
-
-def import_module(cursor, module_data, subject_id, stage_id):
-    """Import a single module."""
-    transformed = transform_module_data(module_data)
-
-    cursor.execute("""
-        INSERT INTO module (
-            subject_id, stage_id, code, title, recommended_hours,
-            objectives_jsonb, lesson_policy_jsonb, assessment_blueprint_jsonb,
-            version, status
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        ON CONFLICT (code) DO UPDATE SET
-            title = EXCLUDED.title,
-            recommended_hours = EXCLUDED.recommended_hours,
-            objectives_jsonb = EXCLUDED.objectives_jsonb,
-            lesson_policy_jsonb = EXCLUDED.lesson_policy_jsonb,
-            assessment_blueprint_jsonb = EXCLUDED.assessment_blueprint_jsonb,
-            version = EXCLUDED.version,
-            status = EXCLUDED.status,
-            updated_at = now()
-    """, (
-        subject_id, stage_id, transformed['code'], transformed['title'],
-        transformed['recommended_hours'], transformed['objectives_jsonb'],
-        transformed['lesson_policy_jsonb'], transformed['assessment_blueprint_jsonb'],
-        transformed['version'], transformed['status']
-    ))
-
-    print(f"✓ Imported module: {transformed['code']}")
-
-
-def process_module_file(cursor, file_path):
-    """Process a single module JSON file."""
-    print(f"Processing: {file_path}")
-
-    with open(file_path, 'r', encoding='utf-8') as f:
-        modules_data = json.load(f)
-
-    if not isinstance(modules_data, list):
-        modules_data = [modules_data]
-
-    for module_data in modules_data:
-        try:
-            # Map subject names to codes
-            subject_name = module_data.get('subject', '')
-            subject_code_map = {
-                'Mathematics': 'Mathematics',
-                'English': 'English',
-                'Science': 'Science',
-                'Biology': 'Biology',
-                'Chemistry': 'Chemistry',
-                'Physics': 'Physics',
-                'ICT': 'ICT',
-                'Computer Science': 'ComputerScience',
-                'ComputerScience': 'ComputerScience',
-                'Global Perspectives': 'GlobalPerspectives',
-                'GlobalPerspectives': 'GlobalPerspectives',
-                'Art': 'Art',
-                'Business': 'Business',
-                'Economics': 'Economics',
-                'English Literature': 'EnglishLiterature',
-                'EnglishLiterature': 'EnglishLiterature',
-                'Further Mathematics': 'FurtherMathematics',
-                'FurtherMathematics': 'FurtherMathematics',
-                'Geography': 'Geography',
-                'History': 'History',
-                'Languages': 'Languages',
-                'Music': 'Music',
-                'Physical Education': 'PhysicalEducation',
-                'PE': 'PhysicalEducation'
-            }
-
-            subject_code = subject_code_map.get(subject_name)
-            if not subject_code:
-                print(f"⚠️  Skipping module {module_data.get('id')} - unknown subject: {subject_name}")
-                continue
-
-            # Get IDs
-            subject_id = get_subject_id(cursor, subject_code)
-            stage_id = get_stage_id(cursor, module_data.get('stage', ''))
-
-            # Import module
-            import_module(cursor, module_data, subject_id, stage_id)
-
-        except Exception as e:
-            print(f"✗ Error importing module {module_data.get('id')}: {e}")
-            continue
+def print_report(report, incremental, dry_run):
+    """Plan or result of an import, with timings per phase."""
+    diff = report['diff']
+    if dry_run:
+        for code in report['added']:
+            print(f"  + {code}")
+        for code in report['changed']:
+            print(f"  ~ {code}: {', '.join(diff.get(code) or ['content_hash'])}")
+        for code in report['missing']:
+            print(f"  - {code} (in the database only, kept)")
+    for module_id, reason in report['skipped']:
+        print(f"⚠️  Skipped module {module_id} - {reason}")
+    if report['duplicates']:
+        print(f"⚠️  {report['duplicates']} duplicate module id(s): the first file in path order wins, as in the lint and curriculum.bin")
+
+    title = '🔎 Dry run' if dry_run else ('✅ Incremental import complete' if incremental else '✅ Import complete')
+    print(f"\n{title}: {report['modules']} modules in files, "
+          f"{len(report['added'])} added, {len(report['changed'])} changed, {report['unchanged']} unchanged, "
+          f"{len(report['missing'])} only in the database; {report['written']} rows written")
+    phases = ', '.join(f"{name[:-4]} {sec * 1000:.1f} ms" for name, sec in report['phases'].items())
+    print(f"   {phases}")
+    print(f"   database {report['db_sec'] * 1000:.1f} ms, total {report['total_sec'] * 1000:.1f} ms, "
+          f"{report['jobs']} parse process(es)")
 
 
 def main():
     """Main ETL function."""
-    if len(sys.argv) != 2:
-        print("Usage: python import_modules.py <modules_directory>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Import curriculum modules into the module table.")
+    parser.add_argument('modules_dir', help='directory with module JSON files (searched recursively)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='write only new and changed modules (by content hash)')
+    parser.add_argument('--dry-run', action='store_true', help='show the incremental diff without writing')
+    parser.add_argument('--jobs', type=int, default=None, help='parse processes (default: CPU count)')
+    args = parser.parse_args()
 
-    modules_dir = sys.argv[1]
+    modules_dir = args.modules_dir
 
     if not os.path.exists(modules_dir):
         print(f"Modules directory not found: {modules_dir}")
         sys.exit(1)
 
     # Get all JSON files in modules directory recursively
-    module_files = glob.glob(os.path.join(modules_dir, "**", "*.json"), recursive=True)
+    module_files = sorted(glob.glob(os.path.join(modules_dir, "**", "*.json"), recursive=True))
 
     if not module_files:
         print(f"No module files found in {modules_dir}")
         sys.exit(1)
 
-    print(f"Found {len(module_files)} module files:")
-    for mf in module_files:
-        print(f"  - {os.path.relpath(mf, modules_dir)}")
+    incremental = args.incremental or args.dry_run
+    if not incremental:
+        print(f"Found {len(module_files)} module files:")
+        for mf in module_files:
+            print(f"  - {os.path.relpath(mf, modules_dir)}")
 
     # Connect to database
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Process each module file
-        total_modules = 0
-        for module_file in module_files:
-            process_module_file(cursor, module_file)
-            conn.commit()  # Commit after each file
-
-        print(f"\n✅ Import complete! Processed {len(module_files)} files.")
+        report = import_modules(conn, module_files, incremental=incremental, dry_run=args.dry_run, jobs=args.jobs)
+        print_report(report, incremental, args.dry_run)
+        if incremental:
+            return
 
         # Show summary
+        cursor = conn.cursor()
         cursor.execute("SELECT COUNT(*) FROM module")
         module_count = cursor.fetchone()[0]
         print(f"📊 Total modules in database: {module_count}")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Lint curriculum content: module files, curriculum_*.json, curriculum_index.json
+and subject_registry.json (see curriculum_lint.py for the checks).
+
+Usage:
+    python scripts/lint_curriculum.py
+    python scripts/lint_curriculum.py --format json > lint.json
+    python scripts/lint_curriculum.py --jobs 8 --no-cache --fail-on warning
+
+Exit status is 1 when there are findings at or above --fail-on (default: error).
+"""
+
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from curriculum_lint import lint_curriculum, DEFAULT_CURRICULUM_DIR, DEFAULT_CACHE_PATH
+
+
+def print_text(report):
+    """Findings grouped by file, then totals."""
+    current = None
+    for f in report['findings']:
+        if f['file'] != current:
+            current = f['file']
+            print(f"\n📄 {current}")
+        icon = "❌" if f['severity'] == 'error' else "⚠️ "
+        location = f" {f['path']}:" if f['path'] else ""
+        print(f"  {icon} [{f['check']}]{location} {f['message']}")
+
+    print(f"\n{'=' * 60}")
+    print(f"{report['files']} files ({report['linted']} linted, {report['cached']} from cache, "
+          f"{report['jobs']} job(s)) in {report['elapsed_sec']:.2f}s")
+    if report['errors'] or report['warnings']:
+        print(f"{'❌' if report['errors'] else '⚠️ '} {report['errors']} error(s), {report['warnings']} warning(s)")
+    else:
+        print("✅ Curriculum is consistent")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lint curriculum JSON files.")
+    parser.add_argument('--curriculum-dir', default=DEFAULT_CURRICULUM_DIR)
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--format', choices=('text', 'json'), default='text')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='content-hash cache file')
+    parser.add_argument('--no-cache', action='store_true', help='lint every file and leave the cache alone')
+    parser.add_argument('--fail-on', choices=('error', 'warning', 'never'), default='error')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.curriculum_dir):
+        print(f"❌ Curriculum directory not found: {args.curriculum_dir}")
+        sys.exit(2)
+
+    report = lint_curriculum(args.curriculum_dir, jobs=args.jobs, cache_path=None if args.no_cache else args.cache)
+
+    if args.format == 'json':
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print_text(report)
+
+    failing = {'error': report['errors'], 'warning': report['errors'] + report['warnings'], 'never': 0}
+    sys.exit(1 if failing[args.fail_on] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Partition maintenance for the time-partitioned event tables (submission, attempt).
+
+Migration 009 partitions both tables by month on created_at. Run `ensure`
+regularly (e.g. from cron) so next months' partitions exist before rows
+arrive; anything that lands without a partition goes to <table>_p_default.
+
+Usage:
+    python scripts/manage_partitions.py list
+    python scripts/manage_partitions.py ensure [--months-ahead 3]
+    python scripts/manage_partitions.py detach --before 2025-09 [--drop]
+"""
+
+import os
+import re
+import sys
+import argparse
+from datetime import date
+import psycopg2
+
+
+PARTITIONED_TABLES = ('submission', 'attempt')
+
+
+def get_db_connection():
+    """Get database connection from environment variables."""
+    return psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=os.getenv('DB_PORT', '5432'),
+        database=os.getenv('DB_NAME', 'ayaal_teacher'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', '')
+    )
+
+
+def add_months(month_start, n):
+    """Return the first day of the month n months after month_start."""
+    idx = month_start.year * 12 + (month_start.month - 1) + n
+    return date(idx // 12, idx % 12 + 1, 1)
+
+
+def parse_month(value):
+    """Parse YYYY-MM into the first day of that month."""
+    try:
+        year, month = value.split('-')
+        return date(int(year), int(month), 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM, got: {value}")
+
+
+def get_partitions(cur, table):
+    """List partitions of a table with bounds, estimated rows and size."""
+    cur.execute("""
+        SELECT c.relname,
+               pg_get_expr(c.relpartbound, c.oid) AS bound,
+               GREATEST(c.reltuples, 0)::bigint AS est_rows,
+               pg_total_relation_size(c.oid) AS size_bytes
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        ORDER BY c.relname
+    """, (table,))
+    return cur.fetchall()
+
+
+def default_partition_rows(cur, table):
+    """Count rows that fell into the DEFAULT partition."""
+    cur.execute(f"SELECT COUNT(*) FROM {table}_p_default")
+    return cur.fetchone()[0]
+
+
+def cmd_list(conn, args):
+    with conn.cursor() as cur:
+        for table in PARTITIONED_TABLES:
+            print(f"\n📦 {table}:")
+            for name, bound, est_rows, size_bytes in get_partitions(cur, table):
+                print(f"  {name:<28} {est_rows:>12} rows  {size_bytes / (1024 * 1024):>9.1f} MB  {bound}")
+            stray = default_partition_rows(cur, table)
+            if stray:
+                print(f"  ⚠️  {stray} rows in {table}_p_default — create partitions ahead of time")
+
+
+def cmd_ensure(conn, args):
+    first = date.today().replace(day=1)
+    months = [add_months(first, i) for i in range(args.months_ahead + 1)]
+    with conn.cursor() as cur:
+        for table in PARTITIONED_TABLES:
+            for month in months:
+                cur.execute("SELECT ensure_monthly_partition(%s, %s)", (table, month))
+                name = cur.fetchone()[0]
+                label = month.strftime('%Y-%m')
+                if name:
+                    print(f"✓ {table} {label}: {name}")
+                else:
+                    print(f"⏭️  {table} {label}: covered by another partition or rows in {table}_p_default")
+    conn.commit()
+
+
+def cmd_detach(conn, args):
+    cutoff = int(args.before.strftime('%Y%m'))
+    detached = 0
+    with conn.cursor() as cur:
+        for table in PARTITIONED_TABLES:
+            pattern = re.compile(rf"^{table}_p(\d{{6}})$")
+            for name, _, est_rows, _ in get_partitions(cur, table):
+                match = pattern.match(name)
+                if not match or int(match.group(1)) >= cutoff:
+                    continue
+                cur.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+                if args.drop:
+                    cur.execute(f"DROP TABLE {name}")
+                    print(f"🗑️  Dropped {name} (~{est_rows} rows)")
+                else:
+                    print(f"✓ Detached {name} (~{est_rows} rows), table kept for archiving")
+                detached += 1
+    conn.commit()
+    print(f"\n✅ {detached} partitions processed.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage monthly partitions of submission and attempt.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('list', help='show partitions, sizes and stray rows in DEFAULT')
+
+    ensure = sub.add_parser('ensure', help='create partitions for this month and the next N')
+    ensure.add_argument('--months-ahead', type=int, default=3)
+
+    detach = sub.add_parser('detach', help='detach monthly partitions older than a month')
+    detach.add_argument('--before', type=parse_month, required=True, help='YYYY-MM, exclusive')
+    detach.add_argument('--drop', action='store_true', help='drop detached partitions instead of keeping them')
+
+    args = parser.parse_args()
+    commands = {'list': cmd_list, 'ensure': cmd_ensure, 'detach': cmd_detach}
+
+    try:
+        conn = get_db_connection()
+        commands[args.command](conn, args)
+    except Exception as e:
+        print(f"❌ {args.command} failed: {e}")
+        sys.exit(1)
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Recompute learning_state mastery from submission history under a MasteryConfig.
+
+After changing MasteryConfig (weights, accuracy_thresholds, expected_times,
+...) existing learning_state rows still hold values computed under the old
+config. This replays every submission with the vectorized engine in
+mastery_batch.py and bulk-updates learning_state in one transaction.
+
+Usage:
+    python scripts/recompute_mastery.py --dry-run
+    python scripts/recompute_mastery.py --config mastery_config.json
+    python scripts/recompute_mastery.py --student <student_id> [--student ...]
+
+The config file holds MasteryConfig fields, e.g. {"w_accuracy": 0.5, "ema_alpha_min": 0.25}.
+"""
+
+import os
+import sys
+import json
+import argparse
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mastery_calculator import MasteryConfig
+from mastery_batch import recompute_learning_state
+
+
+def get_db_connection():
+    """Get database connection from environment variables."""
+    return psycopg2.connect(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=os.getenv('DB_PORT', '5432'),
+        database=os.getenv('DB_NAME', 'ayaal_teacher'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', '')
+    )
+
+
+def load_config(path):
+    """Build a MasteryConfig from a JSON file (default config if no path)."""
+    if not path:
+        return MasteryConfig()
+    with open(path, 'r', encoding='utf-8') as f:
+        return MasteryConfig(**json.load(f))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute learning_state mastery under a MasteryConfig.")
+    parser.add_argument('--config', help='JSON file with MasteryConfig fields')
+    parser.add_argument('--student', action='append', dest='students', help='student.id to recompute (repeatable)')
+    parser.add_argument('--chunk-rows', type=int, default=200000, help='submissions per vectorized chunk')
+    parser.add_argument('--dry-run', action='store_true', help='report changes without writing')
+    args = parser.parse_args()
+
+    try:
+        cfg = load_config(args.config)
+        conn = get_db_connection()
+        stats = recompute_learning_state(
+            conn, cfg, chunk_rows=args.chunk_rows, student_ids=args.students, dry_run=args.dry_run
+        )
+    except Exception as e:
+        print(f"❌ Recompute failed: {e}")
+        sys.exit(1)
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+    rate = stats['submissions'] / stats['compute_sec'] if stats['compute_sec'] else 0
+    print(f"{'🔎 Dry run' if args.dry_run else '✅ Recomputed'}: "
+          f"{stats['submissions']} submissions, {stats['groups']} student/module pairs, "
+          f"{stats['updated']} learning_state rows")
+    print(f"   compute {stats['compute_sec']}s ({rate:,.0f} submissions/s), "
+          f"write {stats['write_sec']}s, total {stats['total_sec']}s")
+    if args.dry_run:
+        print(f"   mean |Δ overall| = {stats['mean_abs_overall_delta']}, "
+              f"next_recommended changes: {stats['next_changed']}")
+
+
+if __name__ == "__main__":
+    main()
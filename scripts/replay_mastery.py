@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Replay mastery trajectories with the scalar MasteryCalculatorV2 in parallel.
+
+Students are sharded across a process pool; each worker streams its shard's
+submissions with a server-side cursor and emits one snapshot per submission
+(see mastery_replay.py). Output goes to gzipped JSONL files and/or a new
+run in mastery_history (migration 011).
+
+Usage:
+    python scripts/replay_mastery.py --out replay/ [--workers 8]
+    python scripts/replay_mastery.py --to-table --config mastery_config.json
+    python scripts/replay_mastery.py --out replay/ --student <student_id>
+"""
+
+import os
+import sys
+import json
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mastery_calculator import MasteryConfig
+from mastery_replay import replay_shard, shard_students, config_dict
+
+
+def get_conn_params():
+    """Connection parameters from environment variables (passed to workers)."""
+    return dict(
+        host=os.getenv('DB_HOST', 'localhost'),
+        port=os.getenv('DB_PORT', '5432'),
+        database=os.getenv('DB_NAME', 'ayaal_teacher'),
+        user=os.getenv('DB_USER', 'postgres'),
+        password=os.getenv('DB_PASSWORD', '')
+    )
+
+
+def load_config(path):
+    """Build a MasteryConfig from a JSON file (default config if no path)."""
+    if not path:
+        return MasteryConfig()
+    with open(path, 'r', encoding='utf-8') as f:
+        return MasteryConfig(**json.load(f))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay mastery trajectories over submission history.")
+    parser.add_argument('--out', help='directory for trajectory-<shard>.jsonl.gz files')
+    parser.add_argument('--to-table', action='store_true', help='write snapshots into mastery_history')
+    parser.add_argument('--config', help='JSON file with MasteryConfig fields')
+    parser.add_argument('--student', action='append', dest='students', help='student.id to replay (repeatable)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--shards-per-worker', type=int, default=4, help='smaller shards balance skewed students')
+    args = parser.parse_args()
+
+    if not args.out and not args.to_table:
+        parser.error("choose an output: --out DIR and/or --to-table")
+
+    conn_params = get_conn_params()
+    config = config_dict(load_config(args.config))
+    run_id = None
+
+    try:
+        conn = psycopg2.connect(**conn_params)
+        with conn.cursor() as cur:
+            if args.students:
+                student_ids = args.students
+            else:
+                cur.execute("SELECT id::text FROM student ORDER BY id")
+                student_ids = [row[0] for row in cur.fetchall()]
+            if args.to_table:
+                cur.execute("INSERT INTO mastery_replay_run (config_jsonb) VALUES (%s) RETURNING id::text",
+                            (json.dumps(config),))
+                run_id = cur.fetchone()[0]
+        conn.commit()
+        if args.out:
+            os.makedirs(args.out, exist_ok=True)
+
+        shards = shard_students(student_ids, max(1, args.workers * args.shards_per_worker))
+        print(f"🔁 Replaying {len(student_ids)} students in {len(shards)} shards on {args.workers} workers"
+              + (f", run {run_id}" if run_id else ""))
+
+        results = []
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = [
+                pool.submit(replay_shard, i, shard, conn_params, config, args.out, run_id)
+                for i, shard in enumerate(shards)
+            ]
+            for future in as_completed(futures):
+                results.append(future.result())
+
+        per_worker = defaultdict(lambda: {'submissions': 0, 'cpu_sec': 0.0, 'wall_sec': 0.0})
+        for r in results:
+            w = per_worker[r['pid']]
+            w['submissions'] += r['submissions']
+            w['cpu_sec'] += r['cpu_sec']
+            w['wall_sec'] += r['wall_sec']
+
+        total = sum(r['submissions'] for r in results)
+        wall = max((w['wall_sec'] for w in per_worker.values()), default=0.0)
+        stats = {
+            'students': len(student_ids),
+            'submissions': total,
+            'workers': len(per_worker),
+            'wall_sec': round(wall, 3),
+            'per_sec': round(total / wall, 1) if wall else 0.0,
+            'per_core_per_sec': {
+                str(pid): round(w['submissions'] / w['wall_sec'], 1) if w['wall_sec'] else 0.0
+                for pid, w in per_worker.items()
+            },
+        }
+
+        if run_id:
+            with conn.cursor() as cur:
+                cur.execute("UPDATE mastery_replay_run SET finished_at = now(), stats_jsonb = %s WHERE id = %s",
+                            (json.dumps(stats), run_id))
+            conn.commit()
+    except Exception as e:
+        print(f"❌ Replay failed: {e}")
+        sys.exit(1)
+    finally:
+        if 'conn' in locals():
+            conn.close()
+
+    print(f"✅ {total} snapshots, {stats['per_sec']:,.0f} submissions/s over {stats['workers']} workers")
+    for pid, rate in sorted(stats['per_core_per_sec'].items()):
+        print(f"   worker {pid}: {rate:,.0f} submissions/s")
+
+
+if __name__ == "__main__":
+    main()
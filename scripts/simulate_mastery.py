@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Evaluate MasteryConfig candidates on a synthetic student population.
+
+Every config in the grid runs against the same simulated students (see
+mastery_simulation.py) and is reported with lessons-to-mastery, oscillation
+of recommendations, gate violations and how well final overall tracks the
+latent skill. No database is needed.
+
+Usage:
+    python scripts/simulate_mastery.py
+    python scripts/simulate_mastery.py --grid grid.json --students 100000 --out results.json
+
+The grid file maps MasteryConfig fields to candidate values; all combinations
+are simulated, e.g. {"w_accuracy": [0.4, 0.5], "ema_alpha_min": [0.15, 0.25]}.
+"""
+
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mastery_calculator import MasteryConfig
+from mastery_simulation import PopulationConfig, Population, simulate, config_grid
+
+
+def load_json(path):
+    if not path:
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    defaults = PopulationConfig()
+    parser = argparse.ArgumentParser(description="Simulate MasteryConfig candidates on synthetic students.")
+    parser.add_argument('--grid', help='JSON file: {MasteryConfig field: [values, ...]}')
+    parser.add_argument('--config', help='JSON file with base MasteryConfig fields')
+    parser.add_argument('--mix', help='JSON file with the lesson mix, e.g. {"concept": 0.3, ...}')
+    parser.add_argument('--students', type=int, default=defaults.students)
+    parser.add_argument('--max-lessons', type=int, default=defaults.max_lessons)
+    parser.add_argument('--target', type=float, default=defaults.mastery_target, help='overall counted as mastered')
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+    parser.add_argument('--out', help='write results as JSON')
+    args = parser.parse_args()
+
+    try:
+        configs = config_grid(MasteryConfig(**load_json(args.config)), load_json(args.grid))
+        mix = load_json(args.mix) or None
+        population = Population(PopulationConfig(
+            students=args.students, max_lessons=args.max_lessons,
+            mastery_target=args.target, seed=args.seed,
+        ))
+    except Exception as e:
+        print(f"❌ Invalid input: {e}")
+        sys.exit(1)
+
+    grid_fields = list(load_json(args.grid))
+    print(f"🧪 {len(configs)} configs x {args.students} students, up to {args.max_lessons} lessons")
+
+    results = []
+    for cfg in configs:
+        metrics = simulate(cfg, population, mix=mix)
+        params = {field: getattr(cfg, field) for field in grid_fields}
+        results.append({'params': params, 'config': vars(cfg), **metrics})
+        print(f"   {json.dumps(params) if params else 'default'}: "
+              f"reached {metrics['reached_mastery']:.1%}, "
+              f"median {metrics['lessons_to_mastery_median']} / p90 {metrics['lessons_to_mastery_p90']} lessons, "
+              f"oscillation {metrics['oscillation_rate']:.2%}, gate violations {metrics['gate_violation_rate']:.2%}, "
+              f"skill corr {metrics['skill_correlation']} ({metrics['seconds']}s)")
+
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"✅ Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 """
 Script to verify consistency between curriculum files and module files.
 Checks if module IDs match between curriculum overview and detailed modules.
+For schema, prerequisite and index checks use scripts/lint_curriculum.py.
 """
 
 import os
@@ -73,7 +74,10 @@ def verify_consistency(curriculum_dir, modules_dir):
     curriculum_files = glob.glob(os.path.join(curriculum_dir, "curriculum_*.json"))
     
     total_issues = 0
-    
+
+    # All module files, read once for every curriculum
+    all_modules = get_module_files(modules_dir)
+
     for curriculum_file in curriculum_files:
         subject_name = os.path.basename(curriculum_file).replace('curriculum_', '').replace('.json', '')
         print(f"\n📚 Checking {subject_name.upper()}:")
@@ -85,9 +89,6 @@ def verify_consistency(curriculum_dir, modules_dir):
             print(f"  ⚠️  No modules found in curriculum file")
             continue
         
-        # Get all module files
-        all_modules = get_module_files(modules_dir)
-        
         issues = 0
         
         for module_info in curriculum_modules:
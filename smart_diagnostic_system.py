@@ -4,12 +4,20 @@
 Используется в ``ai_self_diagnostic`` для демонстрации того, как вопросы
 могут усложняться в зависимости от ответов ученика. Модуль не обращается
 к внешним сервисам и опирается только на стандартную библиотеку.
+
+Сессии диагностики хранятся в хранилище из ``diagnostic_session_store``:
+по умолчанию это ограниченный LRU в памяти, ``PostgresSessionStore``
+дополнительно сохраняет их в БД и продолжает сессию на любом воркере.
 """
 from __future__ import annotations
 
-from dataclasses import dataclass, field
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
 from enum import Enum
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional
+
+from diagnostic_session_store import InMemorySessionStore, ItemResult
 
 
 class DifficultyLevel(Enum):
@@ -65,12 +73,62 @@ class StudentProfile:
     dialogue_answers: List[str] = field(default_factory=list)
 
 
+@dataclass
+class DiagnosticSession:
+    """Сессия диагностики: профиль ученика и вопросы, ожидающие ответа."""
+
+    session_id: str
+    profile: StudentProfile
+    active_questions: Dict[str, Question] = field(default_factory=dict)
+    version: int = 0
+
+    @property
+    def student_id(self) -> str:
+        return self.profile.student_id
+
+    def to_state(self) -> Dict[str, Any]:
+        """JSON-совместимое состояние, из которого сессию можно восстановить."""
+        return {
+            "age": self.profile.age,
+            "subjects": {
+                subject: dict(asdict(progress), current_level=progress.current_level.value)
+                for subject, progress in self.profile.subjects.items()
+            },
+            "dialogue_answers": list(self.profile.dialogue_answers),
+            "active_questions": [
+                dict(asdict(q), difficulty_level=q.difficulty_level.value)
+                for q in self.active_questions.values()
+            ],
+        }
+
+    @classmethod
+    def from_state(
+        cls, session_id: str, student_id: str, version: int, state: Dict[str, Any]
+    ) -> "DiagnosticSession":
+        """Восстановить сессию из ``to_state``."""
+        profile = StudentProfile(
+            student_id=student_id,
+            age=state["age"],
+            subjects={
+                subject: SubjectProgress(
+                    **dict(progress, current_level=DifficultyLevel(progress["current_level"]))
+                )
+                for subject, progress in state["subjects"].items()
+            },
+            dialogue_answers=list(state.get("dialogue_answers", [])),
+        )
+        questions = [
+            Question(**dict(q, difficulty_level=DifficultyLevel(q["difficulty_level"])))
+            for q in state.get("active_questions", [])
+        ]
+        return cls(session_id, profile, {q.id: q for q in questions}, version)
+
+
 class SmartDiagnosticSystem:
     """Адаптивная диагностика с простыми правилами."""
 
-    def __init__(self):
-        self.profiles: Dict[str, StudentProfile] = {}
-        self.active_questions: Dict[Tuple[str, str], Question] = {}
+    def __init__(self, store: Optional[InMemorySessionStore] = None):
+        self.store = store if store is not None else InMemorySessionStore()
 
     # ------------------------------------------------------------------
     # Внутренние утилиты
@@ -81,6 +139,23 @@ class SmartDiagnosticSystem:
         idx = max(0, min(idx, len(LEVELS) - 1))
         return LEVELS[idx]
 
+    def _session(self, student_id: str) -> Optional[DiagnosticSession]:
+        """Сессия из кэша хранилища или, если её там нет, из БД."""
+        session = self.store.get(student_id)
+        if session is None:
+            stored = self.store.load(student_id)
+            if stored is None:
+                return None
+            session = DiagnosticSession.from_state(
+                stored.session_id, student_id, stored.version, stored.state
+            )
+            self.store.put(session)
+        return session
+
+    def _save(self, session: DiagnosticSession, item: Optional[ItemResult] = None) -> None:
+        record = self._session_record(session) if self.store.persistent else None
+        self.store.save(session, record, item)
+
     # ------------------------------------------------------------------
     # Публичный API
     def initialize_student_profile(
@@ -93,15 +168,22 @@ class SmartDiagnosticSystem:
             age=age,
             subjects={s: SubjectProgress() for s in subjects},
         )
-        self.profiles[student_id] = profile
+        self._save(DiagnosticSession(str(uuid.uuid4()), profile))
         return profile
 
+    def resume_session(self, student_id: str) -> Optional[StudentProfile]:
+        """Профиль незавершённой сессии ученика (из памяти или из БД), если она есть."""
+
+        session = self._session(student_id)
+        return session.profile if session else None
+
     def generate_next_question(self, student_id: str, subject: str) -> Optional[Question]:
         """Генерирует следующий вопрос для ученика."""
 
-        profile = self.profiles.get(student_id)
-        if not profile:
+        session = self._session(student_id)
+        if not session:
             raise ValueError("Unknown student_id")
+        profile = session.profile
         progress = profile.subjects.get(subject)
         if not progress:
             raise ValueError("Unknown subject")
@@ -123,7 +205,8 @@ class SmartDiagnosticSystem:
                 content=content,
                 target_age=profile.age,
             )
-            self.active_questions[(student_id, q_id)] = question
+            session.active_questions[q_id] = question
+            self._save(session)
             return question
 
         # Тестовый вопрос по предмету
@@ -166,7 +249,8 @@ class SmartDiagnosticSystem:
             content=content,
             target_age=target_age,
         )
-        self.active_questions[(student_id, q_id)] = question
+        session.active_questions[q_id] = question
+        self._save(session)
         return question
 
     def process_answer(
@@ -175,14 +259,18 @@ class SmartDiagnosticSystem:
         question_id: str,
         answer: Dict[str, Any],
         time_spent_sec: float,
-        profile: Optional[StudentProfile] = None,
     ) -> Dict[str, Any]:
-        """Обрабатывает ответ ученика и адаптирует сложность."""
+        """Обрабатывает ответ ученика и адаптирует сложность.
+
+        На каждый вопрос можно ответить один раз: после ответа он удаляется из
+        сессии, так что её состояние не растёт с числом ответов.
+        """
 
-        profile = profile or self.profiles.get(student_id)
-        if not profile:
+        session = self._session(student_id)
+        if not session:
             raise ValueError("Unknown student_id")
-        question = self.active_questions.get((student_id, question_id))
+        profile = session.profile
+        question = session.active_questions.pop(question_id, None)
         if not question:
             raise ValueError("Unknown question_id")
 
@@ -207,6 +295,16 @@ class SmartDiagnosticSystem:
         progress.current_level = new_level
         confidence = progress.correct_answers / max(progress.questions_asked, 1)
 
+        self._save(session, ItemResult(
+            session_id=session.session_id,
+            item_id=question.id,
+            domain=question.subject,
+            level=self._level_index(question.difficulty_level),
+            answer=answer,
+            is_correct=is_correct,
+            time_spent_sec=round(time_spent_sec),
+            created_at=datetime.now(timezone.utc),
+        ))
         return {
             "is_correct": is_correct,
             "confidence_score": round(confidence, 2),
@@ -216,10 +314,12 @@ class SmartDiagnosticSystem:
     def generate_learning_plan(self, student_id: str) -> Dict[str, Any]:
         """Формирует краткий план обучения."""
 
-        profile = self.profiles.get(student_id)
-        if not profile:
+        session = self._session(student_id)
+        if not session:
             raise ValueError("Unknown student_id")
+        return self._learning_plan(session.profile)
 
+    def _learning_plan(self, profile: StudentProfile) -> Dict[str, Any]:
         breakdown: Dict[str, Any] = {}
         level_sum = 0
         for subject, prog in profile.subjects.items():
@@ -279,12 +379,17 @@ class SmartDiagnosticSystem:
 
     def export_session_record(self, student_id: str) -> Dict[str, Any]:
         """Подготовить данные диагностики для сохранения в БД."""
-        profile = self.profiles.get(student_id)
-        if not profile:
+        session = self._session(student_id)
+        if not session:
             raise ValueError("Unknown student_id")
-        plan = self.generate_learning_plan(student_id)
+        return self._session_record(session)
+
+    def _session_record(self, session: DiagnosticSession) -> Dict[str, Any]:
+        profile = session.profile
+        plan = self._learning_plan(profile)
         return {
-            "student_id": student_id,
+            "student_id": profile.student_id,
+            "session_id": session.session_id,
             "context": {"age": profile.age},
             "results": plan["subject_breakdown"],
             "persona": {
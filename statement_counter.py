@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Per-request count of SQL statements, for load testing.
+
+CountingConnection is a psycopg2 connection factory whose cursors (whatever
+cursor_factory the caller asks for, e.g. RealDictCursor) count execute,
+executemany, callproc and COPY calls into a thread-local counter. The API
+starts the counter before each request and reports it in the
+X-DB-Statements response header when API_COUNT_STATEMENTS is set; the
+background writers run in their own threads and are not counted.
+"""
+
+import threading
+from typing import Dict, Optional
+
+from psycopg2.extensions import connection as _connection, cursor as _cursor
+
+
+STATEMENTS_HEADER = 'X-DB-Statements'
+
+_COUNTED_METHODS = ('execute', 'executemany', 'callproc', 'copy_expert', 'copy_from', 'copy_to')
+
+_local = threading.local()
+_cursor_classes: Dict[type, type] = {}
+_lock = threading.Lock()
+
+
+def start() -> None:
+    """Start counting statements issued by this thread."""
+    _local.count = 0
+
+
+def stop() -> Optional[int]:
+    """Stop counting and return the count (None if start() was not called)."""
+    count = getattr(_local, 'count', None)
+    _local.count = None
+    return count
+
+
+def _counted(method):
+    def wrapper(self, *args, **kwargs):
+        if getattr(_local, 'count', None) is not None:
+            _local.count += 1
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = method.__name__
+    return wrapper
+
+
+def _counting_cursor_class(base: type) -> type:
+    cls = _cursor_classes.get(base)
+    if cls is None:
+        with _lock:
+            cls = _cursor_classes.get(base)
+            if cls is None:
+                methods = {name: _counted(getattr(base, name)) for name in _COUNTED_METHODS}
+                cls = type(f"Counting{base.__name__}", (base,), methods)
+                _cursor_classes[base] = cls
+    return cls
+
+
+class CountingConnection(_connection):
+    """psycopg2 connection whose cursors count the statements they run."""
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get('cursor_factory') or self.cursor_factory or _cursor
+        kwargs['cursor_factory'] = _counting_cursor_class(base)
+        return super().cursor(*args, **kwargs)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Idempotency keys for POST /api/submissions (migration 010).
+
+A client that retries a submission with the same key gets the stored
+response of the first request back instead of a duplicate submission and a
+second mastery update. The key row is claimed inside the submission's
+transaction, so concurrent retries serialize on its primary key.
+"""
+
+import json
+import hashlib
+from typing import Dict, Any, Optional
+
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+def request_hash(data: Dict[str, Any]) -> str:
+    """Hash of the request body without the key itself."""
+    body = {k: v for k, v in data.items() if k != 'idempotency_key'}
+    return hashlib.sha256(json.dumps(body, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+def find_stored_response(cur, user_id: str, idempotency_key: str) -> Optional[Dict[str, Any]]:
+    """Look up a key by the student's app_user id (the id the API receives)."""
+    cur.execute("""
+        SELECT i.request_hash, i.response_jsonb
+        FROM submission_idempotency i
+        JOIN student s ON s.id = i.student_id
+        WHERE s.user_id = %s AND i.idempotency_key = %s
+    """, (user_id, idempotency_key))
+    return cur.fetchone()
+
+
+def claim_key(cur, student_id: str, idempotency_key: str, req_hash: str) -> bool:
+    """Claim a key for this transaction. False if another request already owns it.
+
+    If a concurrent transaction holds the key this blocks until it finishes,
+    so a False result means the stored response is committed and readable.
+    """
+    cur.execute("""
+        INSERT INTO submission_idempotency (student_id, idempotency_key, request_hash)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (student_id, idempotency_key) DO NOTHING
+        RETURNING idempotency_key
+    """, (student_id, idempotency_key, req_hash))
+    return cur.fetchone() is not None
+
+
+def store_response(
+    cur,
+    student_id: str,
+    idempotency_key: str,
+    submission: Dict[str, Any],
+    response: Dict[str, Any],
+) -> None:
+    """Attach the created submission and its response to a claimed key."""
+    cur.execute("""
+        UPDATE submission_idempotency
+        SET submission_id = %s, submission_created_at = %s, response_jsonb = %s
+        WHERE student_id = %s AND idempotency_key = %s
+    """, (
+        submission['id'], submission['created_at'],
+        json.dumps(response, ensure_ascii=False, default=str),
+        student_id, idempotency_key
+    ))
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Compact submission records for the mastery hot path.
+
+create_submission scores every submission against the 20 most recent ones.
+Fetched as RealDictRows, each history entry is a dict with string keys and a
+datetime that the calculator has to convert; here the history is read with a
+plain tuple cursor straight into SubmissionRecord tuples holding a float
+score, an epoch-seconds timestamp and an interned LessonType code, which
+MasteryCalculatorV2.lesson_mastery consumes without dict lookups or parsing.
+"""
+
+from datetime import datetime
+from enum import IntEnum
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+
+class LessonType(IntEnum):
+    """Lesson type codes; the order matches mastery_batch.LESSON_TYPES."""
+
+    CONCEPT = 0
+    GUIDED = 1
+    INDEPENDENT = 2
+    ASSESSMENT = 3
+    UNKNOWN = 4
+
+    @property
+    def label(self) -> str:
+        return self.name.lower()
+
+
+# Lesson type names in code order
+LESSON_TYPES = tuple(t.label for t in LessonType)
+LESSON_TYPE_CODES = {t.label: t for t in LessonType}
+_BY_CODE = tuple(LessonType)
+
+# Lesson type code by lesson_id, the same classification create_submission uses
+LESSON_TYPE_CODE_SQL = """
+    CASE
+        WHEN s.lesson_id LIKE '%%concept%%' THEN 0
+        WHEN s.lesson_id LIKE '%%guided%%' THEN 1
+        WHEN s.lesson_id LIKE '%%independent%%' THEN 2
+        WHEN s.lesson_id LIKE '%%assessment%%' THEN 3
+        ELSE 4
+    END
+"""
+
+# create_submission reads this many most recent submissions as history
+HISTORY_LIMIT = 20
+
+HISTORY_SQL = f"""
+    SELECT COALESCE(s.score, 0)::float8, EXTRACT(EPOCH FROM s.created_at)::float8,
+           {LESSON_TYPE_CODE_SQL}
+    FROM submission s
+    WHERE s.student_id = %s AND s.module_id = %s
+    ORDER BY s.created_at DESC
+    LIMIT %s
+"""
+
+
+class SubmissionRecord(NamedTuple):
+    """One history entry as the mastery calculator needs it."""
+
+    score: float
+    created_at: Optional[float]   # epoch seconds, None if unknown
+    lesson_type: LessonType
+
+
+def lesson_type_code(lesson_type: Optional[str]) -> LessonType:
+    """LessonType for a lesson type name ('unknown' for anything else)."""
+    return LESSON_TYPE_CODES.get(lesson_type, LessonType.UNKNOWN)
+
+
+def epoch_seconds(value: Any) -> Optional[float]:
+    """Epoch seconds from a datetime, an ISO string or a number (None if unparseable)."""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return None
+
+
+def record_from_dict(row: Dict[str, Any]) -> SubmissionRecord:
+    """SubmissionRecord from a history dict (score, created_at, lesson_type).
+
+    A missing or unparseable created_at becomes None; spacing skips it.
+    """
+    score = row.get("score")
+    return SubmissionRecord(
+        float(score) if score is not None else 0.0,
+        epoch_seconds(row.get("created_at")),
+        lesson_type_code(row.get("lesson_type")),
+    )
+
+
+def records_from_dicts(rows: Iterable[Dict[str, Any]]) -> List[SubmissionRecord]:
+    return [record_from_dict(row) for row in rows]
+
+
+def fetch_submission_history(conn, student_id: Any, module_id: Any, limit: int = HISTORY_LIMIT) -> List[SubmissionRecord]:
+    """Most recent submissions of a student in a module, newest first.
+
+    Uses a plain tuple cursor on conn, so it sees the caller's uncommitted
+    submission when called inside the same transaction.
+    """
+    with conn.cursor() as cur:
+        cur.execute(HISTORY_SQL, (student_id, module_id, limit))
+        return [
+            SubmissionRecord(score, created_at, _BY_CODE[code])
+            for score, created_at, code in cur.fetchall()
+        ]
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Buffered ingestion of interactive telemetry into the attempt table.
+
+Events are queued in memory and written by a background thread with COPY,
+either when a batch fills up or when the flush interval elapses. The buffer
+is bounded: when it is full new batches are rejected so callers can apply
+backpressure (HTTP 429) instead of growing memory or blocking requests.
+"""
+
+import io
+import csv
+import json
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from batch_writer import BatchWriter, register_shutdown_drain
+
+
+class AttemptEvent(NamedTuple):
+    """One interactive answer/telemetry event, as accepted from the API."""
+
+    user_id: str          # app_user.id of the student (as in the rest of the API)
+    module_code: str
+    lesson_id: Optional[str]
+    interactive_id: Optional[str]
+    payload: Dict[str, Any]
+    score: Optional[float]
+    created_at: datetime
+
+
+COPY_ATTEMPT_SQL = """
+    COPY attempt (student_id, module_id, lesson_id, interactive_id, payload_jsonb, score, created_at)
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+
+class TelemetryBuffer(BatchWriter):
+    """Bounded in-memory buffer flushed to attempt by a background writer."""
+
+    thread_name = "telemetry-writer"
+    skipped_stat = 'dropped_unknown'
+
+    def _write_rows(self, cur, batch: List[AttemptEvent]) -> int:
+        rows = self._resolve(cur, batch)
+        if rows:
+            buf = io.StringIO()
+            csv.writer(buf).writerows(rows)
+            buf.seek(0)
+            cur.copy_expert(COPY_ATTEMPT_SQL, buf)
+        return len(rows)
+
+    def _resolve(self, cur, batch: List[AttemptEvent]) -> List[tuple]:
+        """Map (user_id, module_code) to student/module ids with one query each."""
+        user_ids = list({e.user_id for e in batch})
+        module_codes = list({e.module_code for e in batch})
+
+        cur.execute("""
+            SELECT s.user_id::text, s.id FROM student s
+            WHERE s.user_id = ANY(%s::uuid[])
+        """, (user_ids,))
+        students = dict(cur.fetchall())
+
+        cur.execute("SELECT code, id FROM module WHERE code = ANY(%s)", (module_codes,))
+        modules = dict(cur.fetchall())
+
+        rows = []
+        for e in batch:
+            student_id = students.get(e.user_id.lower())
+            module_id = modules.get(e.module_code)
+            if not student_id or not module_id:
+                continue
+            rows.append((
+                student_id, module_id, e.lesson_id, e.interactive_id,
+                json.dumps(e.payload, ensure_ascii=False), e.score, e.created_at.isoformat()
+            ))
+        return rows
+
+
+def events_from_request(data: Dict[str, Any]) -> List[AttemptEvent]:
+    """Build AttemptEvents from a validated POST /api/telemetry/attempts body."""
+    now = datetime.now(timezone.utc)
+    events = []
+    for event in data['events']:
+        created_at = event.get('created_at')
+        events.append(AttemptEvent(
+            user_id=data['student_id'],
+            module_code=data['module_code'],
+            lesson_id=event.get('lesson_id', data.get('lesson_id')),
+            interactive_id=event.get('interactive_id'),
+            payload=event.get('payload', {}),
+            score=event.get('score'),
+            created_at=datetime.fromisoformat(created_at.replace("Z", "+00:00")) if created_at else now,
+        ))
+    return events
+
+
+def create_telemetry_buffer(connect: Callable[[], Any], **kwargs) -> TelemetryBuffer:
+    """Create a buffer that drains itself on interpreter shutdown."""
+    return register_shutdown_drain(TelemetryBuffer(connect, **kwargs))
@@ -0,0 +1,58 @@
+import json
+
+from audit_log import AuditLog
+
+KNOWN_ACTOR = "95ef01b7-ebfd-4320-a41b-9550e88551b5"
+
+
+def _actors(sql, params):
+    return [(KNOWN_ACTOR,)]
+
+
+def test_full_queue_drops_and_counts(fake_db):
+    log = AuditLog(fake_db(_actors).connect, max_buffer=1, batch_size=100, flush_interval=60)
+    assert log.record(KNOWN_ACTOR, 'register', 'app_user', KNOWN_ACTOR)
+    assert not log.record(KNOWN_ACTOR, 'register', 'app_user', KNOWN_ACTOR)
+    stats = log.get_stats()
+    assert stats["queue_depth"] == 1
+    assert stats["dropped"] == 1
+    log.close()
+
+
+def test_close_drains_and_nulls_unknown_actors(fake_db):
+    db = fake_db(_actors)
+    log = AuditLog(db.connect, batch_size=100, flush_interval=60)
+    log.record(KNOWN_ACTOR, 'create', 'submission', 'sub-1', {"score": 0.5})
+    log.record("7c9e6679-7425-40de-944b-e07fc1f90ae7", 'create', 'student', 'st-1')
+    log.record("not-a-uuid", 'create', 'enrollment', 'en-1')
+    log.close()
+
+    assert [row[0] for row in db.copied] == [KNOWN_ACTOR, "", ""]
+    assert [row[3] for row in db.copied] == ["sub-1", "st-1", "en-1"]
+    assert json.loads(db.copied[0][4]) == {"score": 0.5}
+    stats = log.get_stats()
+    assert stats["written"] == 3
+    assert stats["queue_depth"] == 0
+
+
+def test_failed_batch_is_retried_in_order_not_dropped(fake_db):
+    db = fake_db(_actors, failures=2)
+    log = AuditLog(db.connect, batch_size=2, flush_interval=60)
+    log.retry_backoff = 0.01
+    for entity_id in ("a", "b", "c"):
+        log.record(KNOWN_ACTOR, 'create', 'submission', entity_id)
+    log.close()
+
+    assert [row[3] for row in db.copied] == ["a", "b", "c"]
+    stats = log.get_stats()
+    assert (stats["written"], stats["dropped"], stats["retried"]) == (3, 0, 4)
+
+
+def test_close_counts_what_could_not_be_written(fake_db):
+    db = fake_db(_actors, failures=100)
+    log = AuditLog(db.connect, batch_size=100, flush_interval=60)
+    log.record(KNOWN_ACTOR, 'create', 'submission', 'sub-1')
+    log.flush()
+    assert log.get_stats()["queue_depth"] == 1 and log.get_stats()["dropped"] == 0
+    log.close(timeout=0.05)
+    assert log.get_stats()["dropped"] == 1 and not db.copied
@@ -0,0 +1,66 @@
+import statistics
+
+import numpy as np
+import pytest
+
+from cohort_analytics import CohortRows, cohort_rollup, fetch_cohort_rows
+
+
+def _rows(seed=5, students=40, modules=("module_a", "module_b", "module_c")):
+    rng = np.random.default_rng(seed)
+    student_ids, module_codes = [], []
+    for s in range(students):
+        for code in modules:
+            if rng.random() < 0.8:
+                student_ids.append(f"00000000-0000-4000-8000-{s:012d}")
+                module_codes.append(code)
+    n = len(student_ids)
+    return CohortRows(
+        student_ids=np.array(student_ids, dtype=object),
+        module_codes=np.array(module_codes, dtype=object),
+        overall=rng.random(n),
+        by_type=rng.random((n, 4)),
+        submissions=rng.integers(0, 10, n),
+    )
+
+
+def test_module_distributions_match_python():
+    rows = _rows()
+    modules = {"module_a": {"title": "A", "objectives": [
+        {"code": "A.1", "bloom": "remember"}, {"code": "A.2", "bloom": "create"}]}}
+    result = cohort_rollup(rows, modules, struggling_threshold=0.3, struggling_limit=5)
+
+    for stats in result["modules"]:
+        mask = rows.module_codes == stats["module_code"]
+        values = rows.overall[mask].tolist()
+        assert stats["students"] == len(values)
+        assert stats["mean"] == round(statistics.fmean(values), 3)
+        assert stats["median"] == round(float(np.median(values)), 3)
+        assert stats["p25"] == round(float(np.quantile(values, 0.25)), 3)
+        assert sum(stats["histogram"]) == len(values)
+        assert stats["completed"] == sum(v >= 0.8 for v in values)
+        struggling = sorted(
+            (o, s) for o, s, n in zip(rows.overall[mask], rows.student_ids[mask], rows.submissions[mask])
+            if o < 0.3 and n >= 3
+        )
+        assert stats["struggling_students"] == [s for _, s in struggling[:5]]
+
+    heatmap = {h["objective_code"]: h for h in result["objective_heatmap"]}
+    concept_mean = rows.by_type[rows.module_codes == "module_a", 0].mean()
+    assert heatmap["A.1"]["lesson_type"] == "concept"
+    assert heatmap["A.1"]["mastery"] == round(float(concept_mean), 3)
+    assert heatmap["A.2"]["lesson_type"] == "assessment"
+    assert result["cohort"]["students"] == len(set(rows.student_ids))
+
+
+def test_empty_cohort():
+    empty = CohortRows(np.empty(0, dtype=object), np.empty(0, dtype=object),
+                       np.empty(0), np.empty((0, 4)), np.empty(0, dtype=np.int64))
+    result = cohort_rollup(empty, {})
+    assert result["modules"] == [] and result["struggling"]["students"] == []
+    assert result["cohort"]["students"] == 0
+
+
+def test_cohort_requires_a_filter():
+    with pytest.raises(ValueError):
+        fetch_cohort_rows(None)
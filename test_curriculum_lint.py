@@ -0,0 +1,96 @@
+import json
+import os
+
+from curriculum_lint import lint_curriculum
+
+
+def _module(module_id, stage="stage_primary", prerequisites=(), objective=None):
+    return {
+        "id": module_id, "subject": "Mathematics", "stage": stage, "title": module_id,
+        "description": "", "recommended_hours": 10, "age_hint": [5, 11],
+        "prerequisites": list(prerequisites),
+        "objectives": [{"code": objective or f"{module_id}.1", "description": "", "bloom": "apply"}],
+        "assessment_blueprint": {"formative": [], "summative": []},
+        "lesson_policy": {"default_lesson_minutes": 30, "min_lessons": 1, "max_lessons": 2,
+                          "mix": {"concept": 0.5, "guided": 0.5}},
+        "resources": {}, "version": "1.0.0",
+    }
+
+
+def _write(root, rel, data):
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def _tree(root):
+    _write(root, "subject_registry.json", {"id": "subject_registry", "subjects": [
+        {"code": "Mathematics", "kind": "single", "titles": {"en": "Mathematics"}}]})
+    _write(root, "curriculum_index.json", {"id": "curriculum_index", "entries": [
+        {"curriculum_id": "curriculum_math", "subject_code": "Mathematics",
+         "stages": ["stage_primary", "stage_lower_secondary"], "version": "1.0.0"},
+        {"curriculum_id": "curriculum_gone", "subject_code": "Mathematics", "stages": [], "version": "1.0.0"}]})
+    _write(root, "curriculum_math.json", {"id": "curriculum_math", "title": "Math", "subject": "Mathematics",
+                                          "stages": [{"id": "stage_primary", "title": "P", "modules": [
+                                              {"id": "module_a", "title": "A"}, {"id": "module_missing", "title": "M"}]}]})
+    _write(root, "modules/math/stage_primary.json", [
+        _module("module_a", prerequisites=["module_c"]),
+        _module("module_b", prerequisites=["module_a", "module_nope"]),
+        _module("module_c", prerequisites=["module_b"], objective="module_a.1"),
+    ])
+    _write(root, "modules/math/stage_upper.json", [
+        dict(_module("module_a", stage="stage_upper_secondary"), recommended_hours="ten"),
+    ])
+
+
+def _checks(report):
+    return {(f["check"], f["severity"], f["message"]) for f in report["findings"]}
+
+
+def test_lint_finds_cross_file_problems(tmp_path):
+    _tree(str(tmp_path))
+    report = lint_curriculum(str(tmp_path), jobs=1, cache_path=None)
+    checks = _checks(report)
+
+    assert ("prerequisite_cycle", "error", "prerequisite cycle (requires): module_a -> module_c -> module_b -> module_a") in checks
+    assert ("prerequisite", "error", "module_b: unknown prerequisite 'module_nope'") in checks
+    assert ("schema", "error", "'ten' is not of type 'integer'") in checks
+    assert ("duplicate_id", "error", "objective 'module_a.1' is also used by module_a") in checks
+    assert any(c == "duplicate_id" and "module 'module_a' is also defined in" in m for c, _, m in checks)
+    assert ("curriculum_module", "error", "module 'module_missing' has no module file") in checks
+    assert ("index", "error", "curriculum_gone has no curriculum file") in checks
+    assert any(c == "index" and "stages" in m for c, _, m in checks)
+    assert ("curriculum_module", "warning", "module_b is not listed in any curriculum") in checks
+    schema_error = next(f for f in report["findings"] if f["check"] == "schema")
+    assert (schema_error["file"], schema_error["path"]) == ("modules/math/stage_upper.json", "[0].recommended_hours")
+
+
+def test_cache_skips_unchanged_files(tmp_path):
+    root, cache = str(tmp_path / "curriculum"), str(tmp_path / "cache.json")
+    _tree(root)
+    first = lint_curriculum(root, jobs=1, cache_path=cache)
+    second = lint_curriculum(root, jobs=1, cache_path=cache)
+    assert (first["linted"], second["linted"], second["cached"]) == (5, 0, 5)
+    assert second["findings"] == first["findings"]
+
+    _write(root, "modules/math/stage_upper.json", [_module("module_d")])
+    third = lint_curriculum(root, jobs=1, cache_path=cache)
+    assert third["linted"] == 1
+    assert not any(f["check"] == "schema" for f in third["findings"])
+
+
+def test_repository_curriculum_matches_schemas():
+    report = lint_curriculum(jobs=1, cache_path=None)
+    assert report["files"] > 50
+    assert [f for f in report["findings"] if f["check"] in ("json", "schema", "prerequisite_cycle")] == []
+
+
+def test_parallel_matches_serial(tmp_path, monkeypatch):
+    import curriculum_lint
+    _tree(str(tmp_path))
+    serial = lint_curriculum(str(tmp_path), jobs=1, cache_path=None)
+    monkeypatch.setattr(curriculum_lint, "PARALLEL_MIN_BYTES", 0)
+    parallel = lint_curriculum(str(tmp_path), jobs=2, cache_path=None)
+    assert parallel["jobs"] == 2
+    assert parallel["findings"] == serial["findings"]
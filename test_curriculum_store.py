@@ -0,0 +1,95 @@
+import json
+import os
+
+import pytest
+
+from curriculum_lint import DEFAULT_CURRICULUM_DIR, discover
+from curriculum_store import (
+    CompiledCurriculum,
+    CurriculumArtifactError,
+    compile_curriculum,
+    open_curriculum,
+)
+
+
+def _write(root, rel, data):
+    path = os.path.join(root, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def _module(module_id, subject, stage, objectives):
+    return {"id": module_id, "subject": subject, "stage": stage, "title": f"Модуль {module_id}",
+            "prerequisites": [], "objectives": [{"code": code} for code in objectives]}
+
+
+def _tree(root):
+    _write(root, "subject_registry.json", {"id": "subject_registry", "subjects": [
+        {"code": "ComputerScience", "kind": "single", "titles": {"en": "Computer Science"}},
+        {"code": "Mathematics", "kind": "single", "titles": {"en": "Mathematics"}}]})
+    _write(root, "curriculum_math.json", {"id": "curriculum_math", "subject": "Mathematics", "stages": [
+        {"id": "stage_primary", "title": "Primary", "modules": [{"id": "module_b"}]}]})
+    _write(root, "modules/math/stage_primary.json", [
+        _module("module_b", "Mathematics", "stage_primary", ["M.1", "SHARED"]),
+        _module("module_a", "Mathematics", "stage_lower_secondary", ["M.2"]),
+    ])
+    _write(root, "modules/cs/stage_primary.json", [
+        _module("module_c", "Computer Science", "stage_primary", ["SHARED"]),
+        _module("module_a", "Computer Science", "stage_primary", []),
+    ])
+
+
+def test_lookups_and_lazy_decoding(tmp_path):
+    root, artifact = str(tmp_path / "curriculum"), str(tmp_path / "curriculum.bin")
+    _tree(root)
+    stats = compile_curriculum(root, artifact)
+    assert (stats["modules"], stats["duplicate_modules"], stats["documents"]) == (3, 1, 2)
+
+    compiled = CompiledCurriculum(artifact)
+    assert compiled.codes() == ["module_a", "module_b", "module_c"]
+    assert compiled.stats()["decoded_modules"] == 0
+    # the first file in path order wins: modules/cs sorts before modules/math
+    assert compiled.module("module_a")["subject"] == "Computer Science"
+    assert compiled.module_info("module_b") == {
+        "file": os.path.join("modules", "math", "stage_primary.json"), "subject_code": "Mathematics",
+        "subject_title": "Mathematics", "stage_title": "Primary"}
+    assert compiled.module("module_b")["title"] == "Модуль module_b"
+    assert compiled.stats()["decoded_modules"] == 2
+    assert compiled.module("module_x") is None and "module_x" not in compiled
+
+    assert compiled.subjects() == ["ComputerScience", "Mathematics"]
+    assert compiled.select(subject="ComputerScience") == ["module_a", "module_c"]
+    assert compiled.select(stage="stage_primary", objective="SHARED") == ["module_b", "module_c"]
+    assert compiled.select(subject="Mathematics", stage="stage_advanced") == []
+    assert compiled.document("curriculum_math")["stages"][0]["title"] == "Primary"
+
+
+def test_open_recompiles_stale_artifact(tmp_path):
+    root, artifact = str(tmp_path / "curriculum"), str(tmp_path / "curriculum.bin")
+    _tree(root)
+    first = open_curriculum(artifact, root)
+    _write(root, "modules/math/stage_advanced.json", [_module("module_d", "Mathematics", "stage_advanced", [])])
+    assert first.is_stale(root)
+    second = open_curriculum(artifact, root)
+    assert "module_d" in second and second.version != first.version
+    # the old mapping still reads the artifact it opened
+    assert "module_d" not in first and first.module("module_b")["id"] == "module_b"
+
+    with open(artifact, "r+b") as f:
+        f.write(b"garbage!")
+    with pytest.raises(CurriculumArtifactError):
+        CompiledCurriculum(artifact)
+    assert "module_d" in open_curriculum(artifact, root)
+
+
+def test_repository_curriculum_round_trips(tmp_path):
+    compiled = open_curriculum(str(tmp_path / "curriculum.bin"), DEFAULT_CURRICULUM_DIR)
+    modules = {}
+    for kind, rel in discover(DEFAULT_CURRICULUM_DIR):
+        if kind == "module":
+            with open(os.path.join(DEFAULT_CURRICULUM_DIR, rel), encoding="utf-8") as f:
+                for module in json.load(f):
+                    modules.setdefault(module["id"], module)
+    assert compiled.codes() == sorted(modules)
+    assert all(compiled.module(code) == module for code, module in modules.items())
@@ -0,0 +1,74 @@
+from datetime import date, datetime, timezone
+
+from daily_progress import backfill, record_submission, fetch_daily_progress
+from validation import validate_api_request_progress_query
+
+
+class _FakeCursor:
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.executed.append((sql, params))
+        self.rowcount = 1
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_record_submission_counts_unscored_submissions():
+    cur = _FakeCursor()
+    created = datetime(2025, 3, 1, 23, 30, tzinfo=timezone.utc)
+    record_submission(cur, "s", "m", created, None, 240, 0.42)
+    record_submission(cur, "s", "m", created, 0.75, 300.0, 0.5)
+    assert cur.executed[0][1] == ("s", "m", created, 0, 0.0, 240, 0.42)
+    assert cur.executed[1][1] == ("s", "m", created, 1, 0.75, 300, 0.5)
+    assert "ON CONFLICT (student_id, module_id, day)" in cur.executed[0][0]
+
+
+def test_fetch_daily_progress_means():
+    cur = _FakeCursor([
+        {"day": date(2025, 3, 1), "submissions": 3, "scored_submissions": 2, "score_sum": 1.5,
+         "time_spent_seconds": 900, "closing_mastery": 0.4},
+        {"day": date(2025, 3, 2), "submissions": 1, "scored_submissions": 0, "score_sum": 0.0,
+         "time_spent_seconds": 300, "closing_mastery": 0.4},
+    ])
+    days = fetch_daily_progress(cur, "u", "module_math_numbers_primary", since=date(2025, 3, 1))
+    assert days == [
+        {"day": "2025-03-01", "submissions": 3, "mean_score": 0.75, "time_spent_seconds": 900, "closing_mastery": 0.4},
+        {"day": "2025-03-02", "submissions": 1, "mean_score": None, "time_spent_seconds": 300, "closing_mastery": 0.4},
+    ]
+    assert cur.executed[0][1] == ["u", "module_math_numbers_primary", date(2025, 3, 1)]
+
+
+def test_progress_query_validation():
+    student_id = "95ef01b7-ebfd-4320-a41b-9550e88551b5"
+    assert validate_api_request_progress_query(student_id, {"from": "2025-09-01", "to": "2026-06-30"})[0]
+    assert not validate_api_request_progress_query(student_id, {"from": "2025-09-31"})[0]
+    assert not validate_api_request_progress_query(student_id, {"from": "2026-01-02", "to": "2026-01-01"})[0]
+
+
+def test_backfill_only_adds_missing_days():
+    cur = _FakeCursor()
+
+    class _Conn:
+        def cursor(self):
+            return cur
+
+        def commit(self):
+            pass
+
+    stats = backfill(_Conn(), until=date(2025, 3, 2), run_id="run-1")
+    statements = [" ".join(sql.split()) for sql, _ in cur.executed]
+    assert not any(sql.startswith("DELETE") for sql in statements)
+    assert statements[0].startswith("INSERT") and statements[0].endswith("ON CONFLICT (student_id, module_id, day) DO NOTHING")
+    # closing mastery is only filled in on rows the write path did not write
+    assert all("p.closing_mastery IS NULL" in sql for sql in statements[1:]) and len(statements) == 3
+    assert stats == {"inserted": 1, "closing_from_history": 1, "closing_from_learning_state": 1}
@@ -0,0 +1,140 @@
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+
+import db_integrity
+from db_integrity import run_checks, WATERMARK_LAG
+
+
+class _FakeDB:
+    """integrity_check rows in memory; check queries answered from `windows` / `rechecks`."""
+
+    def __init__(self, now):
+        self.now = now
+        self.locked = False
+        self.state = {}
+        self.queries = []
+        # (table, incremental) -> window row; table -> recheck rows
+        self.windows = {}
+        self.rechecks = {}
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class _FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        db = self.db
+        if "pg_try_advisory_xact_lock" in sql:
+            self.result = [(not db.locked, db.now)]
+        elif sql.lstrip().startswith("INSERT INTO integrity_check"):
+            name, watermark, counts, flagged, full_scan_at, checked_at, duration = params
+            db.state[name] = (name, watermark, json.loads(counts), json.loads(flagged), full_scan_at, checked_at, duration)
+        elif "FROM integrity_check" in sql:
+            self.result = list(db.state.values())
+        else:
+            table = sql.split("FROM ", 1)[1].split()[0]
+            incremental = "> %(since)s" in sql
+            db.queries.append((table, "recheck" if "= ANY" in sql else incremental, params))
+            if "= ANY" in sql:
+                self.result = db.rechecks.get(table, [])
+            else:
+                empty = (0, None) * len(next(c for c in db_integrity.TABLE_CHECKS if c.name == table).rules)
+                self.result = [db.windows.get((table, incremental), empty)]
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+
+def test_first_run_is_full_then_incremental_with_recheck():
+    now = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+    db = _FakeDB(now)
+    db.windows[("learning_state", False)] = (2, ["a", "b"], 0, None)
+    report = run_checks(db)
+    assert report["counts"]["orphaned_learning_states"] == 2
+    assert report["checks"]["learning_state"]["full_pass"]
+    assert {q[:2] for q in db.queries} == {("learning_state", False), ("submission", False), ("module", False)}
+
+    # later: "a" was fixed, "b" is still orphaned, "c" is a new orphan past the watermark
+    db.now = now + timedelta(minutes=10)
+    db.queries = []
+    db.windows[("learning_state", True)] = (1, ["c"], 0, None)
+    db.rechecks["learning_state"] = [("b", True, False)]
+    report = run_checks(db)
+    assert report["counts"]["orphaned_learning_states"] == 2
+    assert not report["checks"]["learning_state"]["full_pass"]
+    assert db.state["learning_state"][3]["orphaned_learning_states"] == ["b", "c"]
+    assert db.state["learning_state"][1] == db.now - WATERMARK_LAG
+
+    window = next(q for q in db.queries if q[:2] == ("learning_state", True))
+    assert window[2] == {"since": now - WATERMARK_LAG, "until": db.now - WATERMARK_LAG}
+    recheck = next(q for q in db.queries if q[1] == "recheck")
+    assert recheck[2]["keys"] == ["a", "b"]
+    # nothing was flagged in submission: no recheck, only the window
+    assert ("submission", True) in {q[:2] for q in db.queries}
+    assert ("module", False) in {q[:2] for q in db.queries}
+
+
+def test_full_pass_when_flags_were_truncated_or_stale(monkeypatch):
+    now = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+    db = _FakeDB(now)
+    monkeypatch.setattr(db_integrity, "MAX_FLAGGED", 1)
+    db.windows[("submission", False)] = (3, ["x"])
+    run_checks(db)
+
+    db.now = now + timedelta(minutes=10)
+    db.queries = []
+    run_checks(db)
+    assert ("submission", False) in {q[:2] for q in db.queries}
+    assert ("learning_state", True) in {q[:2] for q in db.queries}
+
+    db.now = now + db_integrity.FULL_SCAN_INTERVAL
+    db.queries = []
+    run_checks(db)
+    assert ("learning_state", False) in {q[:2] for q in db.queries}
+
+
+def test_skipped_while_another_run_holds_the_lock():
+    db = _FakeDB(datetime(2026, 3, 1, tzinfo=timezone.utc))
+    db.locked = True
+    assert run_checks(db) is None
+    assert db.state == {} and db.queries == []
+
+
+def test_trigger_runs_the_checks_in_the_background():
+    calls = threading.Semaphore(0)
+
+    def connect():
+        calls.release()
+        raise RuntimeError("no database")
+
+    # disabled monitor: trigger starts a one-off run
+    monitor = db_integrity.IntegrityMonitor(connect, interval=0)
+    monitor.trigger()
+    assert calls.acquire(timeout=5)
+
+    # running monitor: trigger wakes it before the interval is up
+    monitor = db_integrity.IntegrityMonitor(connect, interval=3600).start()
+    assert calls.acquire(timeout=5)
+    monitor.trigger()
+    assert calls.acquire(timeout=5)
+    monitor.stop()
@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+from diagnostic_session_store import InMemorySessionStore, PostgresSessionStore
+from smart_diagnostic_system import DifficultyLevel, SmartDiagnosticSystem
+
+STUDENT = "d5b33305-f81b-4570-91ea-30f4ee55482a"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class DiagnosticTables:
+    """diagnostic_session rows by id, as the upsert would leave them; items as inserted."""
+
+    def __init__(self):
+        self.sessions = {}
+        self.items = []
+
+    def __call__(self, sql, params):
+        if sql.lstrip().startswith("INSERT INTO diagnostic_session"):
+            upserted = []
+            for row in json.loads(params[0]):
+                stored = self.sessions.get(row["id"])
+                if stored is None or stored["version"] < row["version"]:
+                    self.sessions[row["id"]] = row
+                    upserted.append(row)
+            return upserted
+        if sql.lstrip().startswith("INSERT INTO diagnostic_item_result"):
+            rows = [r for r in json.loads(params[0]) if r["session_id"] in self.sessions]
+            self.items += rows
+            return rows
+        rows = [r for r in self.sessions.values() if r["student_id"] == params[0]]
+        latest = max(rows, key=lambda r: r["updated_at"], default=None)
+        return [(latest["id"], latest["version"], latest["state"])] if latest else []
+
+
+def test_lru_bound_and_idle_ttl():
+    clock = FakeClock()
+    store = InMemorySessionStore(max_sessions=2, idle_ttl=60, clock=clock)
+    system = SmartDiagnosticSystem(store)
+    for student_id in ("a", "b", "c"):
+        system.initialize_student_profile(student_id, 10, ["Mathematics"])
+    assert store.get("a") is None and store.get("b") and store.get("c")
+
+    clock.now = 30
+    system.generate_next_question("b", "Mathematics")
+    clock.now = 80
+    assert store.get("c") is None and store.get("b")
+    stats = store.get_stats()
+    assert (stats["sessions"], stats["evicted"], stats["expired"]) == (1, 1, 1)
+
+
+def test_session_state_round_trip():
+    system = SmartDiagnosticSystem()
+    system.initialize_student_profile("s1", 12, ["Mathematics", "English"])
+    q = system.generate_next_question("s1", "Mathematics")
+    system.process_answer("s1", q.id, {"answer": "люблю задачи!"}, 6)
+    system.generate_next_question("s1", "Mathematics")
+    session = system.store.get("s1")
+    # answered questions leave the session and cannot be answered twice
+    assert [question["id"] for question in session.to_state()["active_questions"]] == ["Mathematics_1"]
+    with pytest.raises(ValueError):
+        system.process_answer("s1", q.id, {"answer": "ещё раз"}, 1)
+
+    restored = type(session).from_state(session.session_id, "s1", session.version,
+                                        json.loads(json.dumps(session.to_state())))
+    assert restored == session
+    assert restored.profile.subjects["Mathematics"].current_level == DifficultyLevel.ELEMENTARY
+
+
+def test_write_behind_batches_and_resume_on_another_worker(fake_db):
+    tables = DiagnosticTables()
+    db = fake_db(tables)
+    worker_a = SmartDiagnosticSystem(PostgresSessionStore(db.connect))
+    worker_a.initialize_student_profile(STUDENT, 10, ["Mathematics"])
+    worker_a.initialize_student_profile("not-a-uuid", 10, ["Mathematics"])
+    for _ in range(3):
+        q = worker_a.generate_next_question(STUDENT, "Mathematics")
+        worker_a.process_answer(STUDENT, q.id, {"answer": q.content["correct_answer"]}, 4.4)
+    assert not db.executed
+
+    worker_a.store.writer.flush()
+    # 7 snapshots collapse into one upsert, 3 items into one insert
+    assert len(db.executed) == 2
+    (row,) = tables.sessions.values()
+    assert row["version"] == 7 and row["results"]["Mathematics"]["questions_asked"] == 3
+    assert [(i["item_id"], i["level"], i["time_spent_sec"]) for i in tables.items] == [
+        ("Mathematics_dialogue_0", 0, 4), ("Mathematics_1", 1, 4), ("Mathematics_2", 2, 4)]
+    assert worker_a.store.get_stats()["not_persisted"] == 1
+
+    worker_b = SmartDiagnosticSystem(PostgresSessionStore(db.connect))
+    q = worker_b.generate_next_question(STUDENT, "Mathematics")
+    assert q.id == "Mathematics_3" and q.difficulty_level == DifficultyLevel.ADVANCED
+    worker_b.process_answer(STUDENT, q.id, {"answer": "wrong"}, 2)
+    worker_b.store.writer.flush()
+    assert row["id"] in tables.sessions and tables.sessions[row["id"]]["version"] == 9
+    assert worker_b.store.get_stats()["loaded"] == 1
+
+    # a stale snapshot from the first worker does not overwrite the resumed session
+    q = worker_a.generate_next_question(STUDENT, "Mathematics")
+    worker_a.store.writer.flush()
+    assert tables.sessions[row["id"]]["version"] == 9
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+import pytest
+
+from learning_state_store import (
+    encode_mastery_cursor,
+    decode_mastery_cursor,
+    mastery_from_row,
+    counters_from_row,
+    _mastery_values,
+    _counter_values,
+    _STATE_COLUMNS,
+)
+
+
+def _row(mastery, counters):
+    return dict(zip(_STATE_COLUMNS, _mastery_values(mastery) + _counter_values(counters)))
+
+
+def test_mastery_and_counters_round_trip():
+    mastery = {
+        "overall": 0.42, "concept": 0.9, "guided": 0.5, "independent": 0.1, "assessment": 0.0,
+        "last_updated": "2024-01-03T10:00:00", "total_submissions": 7,
+    }
+    counters = {"concept": 2, "guided": 1, "independent": 0, "assessment": 0}
+    row = _row(mastery, counters)
+    assert isinstance(row["mastery_updated_at"], datetime)
+    assert mastery_from_row(row) == mastery
+    assert counters_from_row(row) == counters
+
+
+def test_empty_state_defaults_to_zeros():
+    row = _row({}, {})
+    assert mastery_from_row(row) == {
+        "overall": 0.0, "concept": 0.0, "guided": 0.0, "independent": 0.0, "assessment": 0.0,
+    }
+    assert counters_from_row(row) == {"concept": 0, "guided": 0, "independent": 0, "assessment": 0}
+
+
+def test_mastery_cursor_round_trip():
+    module_id = "5ca1e001-7922-4000-8000-000000014079"
+    cursor = encode_mastery_cursor(module_id)
+    assert "=" not in cursor
+    assert decode_mastery_cursor(cursor) == module_id
+    with pytest.raises(ValueError):
+        decode_mastery_cursor("zzz")
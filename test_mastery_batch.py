@@ -0,0 +1,42 @@
+import numpy as np
+
+from mastery_batch import BatchMasteryEngine, HISTORY_LIMIT, LESSON_TYPES, TRACKED_TYPES
+from mastery_calculator import MasteryCalculatorV2, MasteryConfig
+from mastery_replay import replay_module_log
+
+
+def _synthetic_log(seed=7, groups=40):
+    rng = np.random.default_rng(seed)
+    group, created_at, score, lesson_type = [], [], [], []
+    for g in range(groups):
+        n = int(rng.integers(1, 45))
+        t = 1.7e9 + np.cumsum(rng.exponential(36 * 3600, n))
+        group += [g] * n
+        created_at += t.tolist()
+        score += rng.uniform(0, 1, n).round(2).tolist()
+        lesson_type += rng.integers(0, len(LESSON_TYPES), n).tolist()
+    return np.array(group), np.array(created_at), np.array(score), np.array(lesson_type)
+
+
+def test_batch_replay_matches_scalar_calculator():
+    cfg = MasteryConfig(w_accuracy=0.5, w_speed=0.15, ema_alpha_min=0.25,
+                        accuracy_thresholds={"concept": 0.55, "guided": 0.7, "independent": 0.75, "assessment": 0.9})
+    calc = MasteryCalculatorV2(cfg)
+    engine = BatchMasteryEngine(cfg)
+    group, created_at, score, lesson_type = _synthetic_log()
+
+    lesson_values = engine.lesson_mastery(group, created_at, score, lesson_type)
+    result = engine.replay(group, created_at, score, lesson_type)
+
+    for g in range(group.max() + 1):
+        rows = np.flatnonzero(group == g)
+        log = [{"score": score[i], "created_at": created_at[i], "lesson_type": LESSON_TYPES[lesson_type[i]]}
+               for i in rows]
+        snapshots = list(replay_module_log(calc, log))
+        np.testing.assert_allclose(lesson_values[rows], [s["lesson_mastery"] for s in snapshots], atol=1e-9)
+        final = snapshots[-1]
+        for t in range(TRACKED_TYPES):
+            assert abs(result.mastery[g, t] - final["mastery"][LESSON_TYPES[t]]) < 1e-9
+            assert result.counters[g, t] == final["counters"][LESSON_TYPES[t]]
+        assert abs(result.overall[g] - final["mastery"]["overall"]) < 1e-9
+        assert result.total_submissions[g] == min(len(rows), HISTORY_LIMIT)
@@ -0,0 +1,37 @@
+import pytest
+
+from mastery_calculator import MasteryConfig
+from mastery_simulation import PopulationConfig, Population, simulate, config_grid
+
+
+def _without_timing(metrics):
+    return {k: v for k, v in metrics.items() if k != 'seconds'}
+
+
+def test_vectorized_simulation_matches_scalar_calculator():
+    cfg = MasteryConfig(w_accuracy=0.5, w_speed=0.15, ema_alpha_min=0.25)
+    population = Population(PopulationConfig(students=150, max_lessons=40, mastery_target=0.6, seed=11))
+    mix = {"concept": 0.1, "guided": 0.2, "independent": 0.3, "assessment": 0.4}
+
+    vectorized = simulate(cfg, population, mix=mix)
+    scalar = simulate(cfg, population, mix=mix, scalar=True)
+
+    assert _without_timing(vectorized) == _without_timing(scalar)
+    assert vectorized['reached_mastery'] > 0
+
+
+def test_population_is_shared_across_configs():
+    population = Population(PopulationConfig(students=500, max_lessons=10, seed=5))
+    first = simulate(MasteryConfig(), population)
+    again = simulate(MasteryConfig(), population)
+    assert _without_timing(first) == _without_timing(again)
+
+
+def test_config_grid_is_cartesian_product():
+    configs = config_grid(MasteryConfig(), {"w_accuracy": [0.4, 0.5], "ema_alpha_min": [0.1, 0.2, 0.3]})
+    assert len(configs) == 6
+    assert {(c.w_accuracy, c.ema_alpha_min) for c in configs} == {
+        (a, e) for a in (0.4, 0.5) for e in (0.1, 0.2, 0.3)
+    }
+    with pytest.raises(ValueError):
+        config_grid(MasteryConfig(), {"no_such_field": [1]})
@@ -0,0 +1,114 @@
+import pytest
+from psycopg2 import errors
+
+import migration_runner
+from migration_runner import MigrationError, Step, plan_migration, run_step, split_statements
+
+
+class _FakeConn:
+    """Records statements; the first `lock_failures` executions of the step SQL time out on a lock."""
+
+    def __init__(self, lock_failures=0, rowcounts=(), invalid_index=None):
+        self.lock_failures = lock_failures
+        self.rowcounts = list(rowcounts)
+        self.invalid_index = invalid_index
+        self.executed = []
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+
+class _FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = -1
+        self.result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        conn = self.conn
+        conn.executed.append((" ".join(sql.split()), params))
+        if "set_config" in sql or sql == "ROLLBACK" or sql.startswith("DROP INDEX"):
+            return
+        if "FROM pg_index" in sql:
+            self.result = (conn.invalid_index,) if conn.invalid_index else None
+            conn.invalid_index = None
+            return
+        if conn.lock_failures:
+            conn.lock_failures -= 1
+            raise errors.LockNotAvailable("canceling statement due to lock timeout")
+        if conn.rowcounts:
+            self.rowcount = conn.rowcounts.pop(0)
+
+    def fetchone(self):
+        return self.result
+
+
+OPTIONS = dict(migration_runner.DEFAULT_OPTIONS, retries=2, retry_delay=0)
+
+
+def test_split_statements_skips_quotes_dollar_bodies_and_comments():
+    sql = """
+        -- intro; not a statement
+        INSERT INTO t VALUES ('a;b', 'it''s');
+        CREATE FUNCTION f() RETURNS trigger AS $body$ BEGIN NEW.x := 1; RETURN NEW; END; $body$ LANGUAGE plpgsql;
+        /* block; comment */ SELECT "odd;name" FROM t;
+    """
+    statements = split_statements(sql)
+    assert len(statements) == 3
+    assert statements[0].startswith("-- intro; not a statement") and statements[0].endswith("'it''s')")
+    assert "RETURN NEW; END; $body$" in statements[1]
+    assert statements[2].endswith('SELECT "odd;name" FROM t')
+
+
+def test_plan_groups_steps_and_reads_directives():
+    plan = plan_migration("x.sql", """
+        -- migrate: lock_timeout=2s retries=5
+        BEGIN;
+        ALTER TABLE t ADD COLUMN c INT;
+        COMMIT;
+        CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_t_c ON t(c);
+        -- migrate: backfill batch_size=500
+        UPDATE t SET c = 0 WHERE id IN (SELECT id FROM t WHERE c IS NULL LIMIT %(batch_size)s);
+        ALTER TABLE t ALTER COLUMN c SET DEFAULT 0;
+        ANALYZE t;
+    """, {"statement_timeout": "1min"})
+    assert (plan.options["lock_timeout"], plan.options["retries"], plan.options["statement_timeout"]) == ("2s", 5, "1min")
+    assert [(step.kind, step.retryable) for step in plan.steps] == [
+        ("sql", True), ("standalone", True), ("backfill", True), ("sql", False)]
+    assert plan.steps[2].options == {"batch_size": 500, "sleep": 0.0}
+    assert "batch_size" not in plan.options
+
+    with pytest.raises(MigrationError, match="cannot run inside BEGIN"):
+        plan_migration("y.sql", "BEGIN; CREATE INDEX CONCURRENTLY i ON t(c); COMMIT;")
+
+
+def test_lock_timeouts_are_retried_and_invalid_index_dropped(monkeypatch):
+    monkeypatch.setattr(migration_runner.time, "sleep", lambda sec: None)
+    conn = _FakeConn(lock_failures=2, invalid_index="idx_t_c")
+    report = run_step(conn, Step("standalone", "CREATE INDEX CONCURRENTLY idx_t_c ON t(c)", True, {}), OPTIONS)
+    assert report["retries"] == 2
+    statements = [sql for sql, _ in conn.executed]
+    assert statements.count("ROLLBACK") == 2
+    assert statements.count("DROP INDEX CONCURRENTLY IF EXISTS idx_t_c") == 1
+    assert statements[-1] == "CREATE INDEX CONCURRENTLY idx_t_c ON t(c)"
+
+    # a step with several transactions is not repeated, and neither is a third lock timeout
+    with pytest.raises(errors.LockNotAvailable):
+        run_step(_FakeConn(lock_failures=1), Step("sql", "ALTER TABLE t ADD c INT; ANALYZE t;", False, {}), OPTIONS)
+    with pytest.raises(errors.LockNotAvailable):
+        run_step(_FakeConn(lock_failures=3), Step("sql", "ALTER TABLE t ADD c INT;", True, {}), OPTIONS)
+
+
+def test_backfill_runs_batches_until_no_rows():
+    conn = _FakeConn(rowcounts=[500, 500, 120, 0])
+    step = Step("backfill", "UPDATE t SET c = 0 WHERE id IN (SELECT id FROM t LIMIT %(batch_size)s)", True,
+                {"batch_size": 500, "sleep": 0.0})
+    report = run_step(conn, step, OPTIONS)
+    assert (report["rows"], report["batches"]) == (1120, 4)
+    assert [params for sql, params in conn.executed if sql.startswith("UPDATE")] == [{"batch_size": 500}] * 4
@@ -0,0 +1,125 @@
+import csv
+import json
+
+import module_import
+from module_import import CONTENT_FIELDS, import_modules, module_row, read_modules
+
+
+def _module(module_id, title="Title", **extra):
+    return {"id": module_id, "subject": "Mathematics", "stage": "stage_primary", "title": title,
+            "objectives": [{"code": "M.1", "description": "Считать до 10"}], **extra}
+
+
+def _write(path, modules):
+    path.write_text(json.dumps(modules, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+
+class _FakeDB:
+    """module rows as {code: (content_hash, stored content)}; records the COPYed rows and the merge."""
+
+    def __init__(self, modules):
+        self.modules = modules
+        self.copied = []
+        self.statements = []
+        self.committed = False
+
+    def cursor(self):
+        return _FakeCursor(self)
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+
+class _FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if "FROM subject" in sql and "JOIN" not in sql:
+            self.result = [("Mathematics", "subject-1")]
+        elif "FROM stage" in sql:
+            self.result = [("stage_primary", "stage-1")]
+        elif "content_hash FROM module" in sql:
+            self.result = [(code, stored[0]) for code, stored in self.db.modules.items()]
+        elif "WHERE m.code = ANY" in sql:
+            self.result = [(code, *self.db.modules[code][1]) for code in params[0]]
+        else:
+            self.db.statements.append(" ".join(sql.split()))
+
+    def copy_expert(self, sql, buf):
+        self.db.copied += list(csv.reader(buf))
+
+    def fetchall(self):
+        return self.result
+
+
+def test_hash_ignores_key_order_and_tracks_content():
+    a = module_row(_module("m1", recommended_hours=10), "a.json")
+    b = module_row(dict(reversed(list(_module("m1", recommended_hours=10).items()))), "b.json")
+    assert a.content_hash == b.content_hash
+    assert module_row(_module("m1", recommended_hours=12), "a.json").content_hash != a.content_hash
+
+
+def test_first_file_wins_and_unknown_subjects_are_skipped(tmp_path):
+    # same rule as the lint and curriculum.bin: the first definition in path order is kept
+    first = _write(tmp_path / "a.json", [_module("m1", "First"), {**_module("m2"), "subject": "Astrology"}])
+    second = _write(tmp_path / "b.json", [_module("m1", "Second")])
+    rows, skipped, duplicates, jobs = read_modules([first, second])
+    assert rows["m1"].title == "First" and rows["m1"].file == first
+    assert skipped == [("m2", "unknown subject: Astrology")] and duplicates == 1 and jobs == 1
+
+
+def test_parallel_parse_matches_serial(tmp_path, monkeypatch):
+    paths = [_write(tmp_path / f"{i}.json", [_module(f"m{i}"), _module("m_shared", f"From {i}")]) for i in range(4)]
+    serial = read_modules(paths, jobs=1)
+    monkeypatch.setattr(module_import, "PARALLEL_MIN_BYTES", 0)
+    parallel = read_modules(paths, jobs=2)
+    assert parallel[3] == 2
+    assert parallel[:3] == serial[:3] and parallel[0]["m_shared"].title == "From 0"
+
+
+def test_incremental_plan_diff_and_write(tmp_path):
+    path = _write(tmp_path / "m.json", [
+        _module("m_same"), _module("m_changed", "New title"), _module("m_new"),
+        {**_module("m_stage"), "stage": "stage_unknown"},
+    ])
+    same = module_row(_module("m_same"), path)
+    stored_changed = module_row(_module("m_changed", "Old title"), path)
+    content = lambda row: tuple(getattr(row, field) for field in CONTENT_FIELDS)
+    db = _FakeDB({
+        "m_same": (same.content_hash, content(same)),
+        "m_changed": (stored_changed.content_hash, content(stored_changed)),
+        "m_gone": ("x", None),
+    })
+
+    report = import_modules(db, [path], dry_run=True)
+    assert (report["added"], report["changed"], report["unchanged"]) == (["m_new"], ["m_changed"], 1)
+    assert report["diff"] == {"m_changed": ["title"]}
+    assert report["missing"] == ["m_gone"]
+    assert report["skipped"] == [("m_stage", "stage not found: stage_unknown")]
+    assert db.copied == [] and db.statements == [] and not db.committed
+
+    report = import_modules(db, [path])
+    assert report["written"] == 2 and db.committed
+    assert set(report["phases"]) == {"parse_sec", "preload_sec", "stage_sec", "merge_sec", "commit_sec"}
+    assert [row[:5] for row in db.copied] == [
+        ["subject-1", "stage-1", "m_new", "Title", r"\N"], ["subject-1", "stage-1", "m_changed", "New title", r"\N"]]
+    assert json.loads(db.copied[0][6]) == [{"code": "M.1", "description": "Считать до 10"}]
+    create, merge = db.statements
+    assert create.startswith("CREATE TEMP TABLE module_import")
+    assert merge.startswith("INSERT INTO module") and "FROM module_import ON CONFLICT (code) DO UPDATE" in merge
+
+    # a full import rewrites the unchanged module as well
+    db.copied = []
+    assert import_modules(db, [path], incremental=False)["written"] == 3 and len(db.copied) == 3
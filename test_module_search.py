@@ -0,0 +1,62 @@
+from curriculum_lint import DEFAULT_CURRICULUM_DIR
+from curriculum_store import open_curriculum
+from module_search import ModuleSearchIndex, search_modules, search_terms
+
+
+def _module(code, title, description="", objectives=(), subject="Mathematics", stage="stage_primary"):
+    return {"module_code": code, "title": title, "description": description, "subject": subject, "stage": stage,
+            "objectives": [{"code": f"{code}.{i}", "description": text} for i, text in enumerate(objectives)]}
+
+
+def _index():
+    return ModuleSearchIndex([
+        _module("module_algebra", "Algebra (expressions, equations)", "Алгебра: уравнения и неравенства",
+                stage="stage_lower_secondary"),
+        _module("module_numbers", "Numbers and Counting", "Счёт до 100", ["Решать простые уравнения"]),
+        _module("module_research", "Artist Studies", "Исследование художников",
+                ["Проводить исследования художников"], subject="Art", stage="stage_advanced"),
+    ])
+
+
+def test_terms_are_words_without_repeats():
+    assert search_terms("  Алгебра, algebra_2 АЛГЕБРА!  ") == ["алгебра", "algebra", "2"]
+    assert search_terms("--") == []
+
+
+def test_index_ranks_title_over_objectives_and_matches_prefixes():
+    index = _index()
+    assert [m["module_code"] for m in index.search("уравнения")] == ["module_algebra", "module_numbers"]
+    assert [m["module_code"] for m in index.search("equat")] == ["module_algebra"]
+    # every word must match
+    assert [m["module_code"] for m in index.search("исследование художников")] == ["module_research"]
+    assert index.search("исследование algebra") == []
+    assert index.search("уравнения", subject_code="Mathematics", stage_code="stage_primary")[0]["module_code"] \
+        == "module_numbers"
+    assert len(index.search("уравнения", limit=1)) == 1
+    assert set(index.search("artist")[0]) == {"module_code", "title", "description", "subject", "stage", "rank"}
+
+
+class _Cursor:
+    def execute(self, sql, params):
+        self.sql, self.params = sql, params
+
+    def fetchall(self):
+        return [{"module_code": "module_algebra", "title": "Algebra", "description": None,
+                 "subject": "Mathematics", "stage": "stage_primary", "rank": 0.123456}]
+
+
+def test_database_query_ands_stemmed_or_prefix_terms():
+    cur = _Cursor()
+    rows = search_modules(cur, "Алгеб equations", subject_code="Mathematics", limit=5)
+    assert rows[0]["rank"] == 0.1235
+    assert cur.sql.count("plainto_tsquery('russian', %s) || to_tsquery('simple', %s)") == 2
+    assert cur.params == ["алгеб", "алгеб:*", "equations", "equations:*", "Mathematics", 5]
+    assert search_modules(cur, "?!", limit=5) == []
+
+
+def test_repository_curriculum_index(tmp_path):
+    compiled = open_curriculum(str(tmp_path / "curriculum.bin"), DEFAULT_CURRICULUM_DIR)
+    index = ModuleSearchIndex.from_curriculum(compiled)
+    assert len(index) == len(compiled) and index.version == compiled.version
+    results = index.search("photosynthesis")
+    assert results and all(m["subject"] == "Biology" for m in results)
@@ -0,0 +1,74 @@
+from curriculum_lint import DEFAULT_CURRICULUM_DIR
+from curriculum_store import open_curriculum
+from prerequisite_graph import PrerequisiteGraph, find_cycles
+
+
+def _graph():
+    # a -> b -> d, a -> c -> d, e is free-standing, f names a module that does not exist
+    return PrerequisiteGraph({
+        "d": ["b", "c"],
+        "b": ["a"],
+        "c": ["a", "a"],
+        "a": [],
+        "e": [],
+        "f": ["e", "module_missing"],
+    })
+
+
+def test_topological_order_and_closure():
+    graph = _graph()
+    assert graph.codes == ["a", "b", "c", "d", "e", "f"]
+    assert graph.acyclic == len(graph) and graph.cycles == []
+    assert graph.unknown == {"f": ["module_missing"]}
+    assert graph.all_prerequisites("d") == ["a", "b", "c"]
+    assert graph.all_prerequisites("a") == []
+    assert graph.dependent_count[graph.index["a"]] == 3
+    assert graph.stats()["edges"] == 5
+
+    mastered = graph.mask(["a", "b"])
+    assert graph.decode(graph.unlocked(mastered)) == ["a", "b", "c", "e"]
+    assert graph.missing("d", mastered) == ["c"]
+    # f needs a module that does not exist, so it never unlocks
+    everything = graph.mask(graph.codes)
+    assert graph.decode(graph.unlocked(everything)) == ["a", "b", "c", "d", "e"]
+    assert graph.missing("f", everything) == ["module_missing"]
+    assert graph.missing("f", 0) == ["e", "module_missing"]
+
+
+def test_recommend_ranks_started_then_most_depended_on():
+    graph = _graph()
+    mastery = {"a": 0.9, "c": 0.4, "e": 0.1, "module_not_in_curriculum": 1.0}
+    modules, totals = graph.recommend(mastery, threshold=0.8)
+    assert [m["module_code"] for m in modules] == ["c", "e", "b"]
+    assert [m["reason"] for m in modules] == ["in_progress", "in_progress", "prerequisites_mastered"]
+    assert modules[0]["prerequisites"] == ["a"] and modules[0]["unlocks"] == 1
+    assert totals == {"mastered": 1, "unlocked": 3}
+
+    modules, totals = graph.recommend({}, threshold=0.8, candidates=graph.mask(["d", "e", "f"]), limit=5)
+    assert [m["module_code"] for m in modules] == ["e"] and modules[0]["reason"] == "no_prerequisites"
+    assert totals == {"mastered": 0, "unlocked": 1}
+
+
+def test_cycles_are_reported_and_stay_locked():
+    graph = PrerequisiteGraph({"a": [], "x": ["y", "a"], "y": ["x"], "z": ["y"], "s": ["s"]})
+    assert graph.cycles == find_cycles({"a": [], "x": ["y", "a"], "y": ["x"], "z": ["y"], "s": ["s"]})
+    assert graph.cycles == [["s"], ["x", "y"]]
+    assert graph.codes[:graph.acyclic] == ["a"]
+    assert graph.all_prerequisites("z") == ["a", "x", "y"]
+    assert graph.decode(graph.unlocked(graph.mask(["a", "x"]))) == ["a", "y"]
+    assert "z" in graph.decode(graph.unlocked(graph.mask(["a", "x", "y"])))
+
+
+def test_repository_curriculum_is_acyclic(tmp_path):
+    compiled = open_curriculum(str(tmp_path / "curriculum.bin"), DEFAULT_CURRICULUM_DIR)
+    graph = PrerequisiteGraph.from_curriculum(compiled)
+    assert graph.version == compiled.version
+    assert graph.cycles == [] and len(graph) == len(compiled)
+    position = graph.index
+    for code in graph.codes:
+        for prereq in compiled.module(code).get("prerequisites") or []:
+            if prereq in position:
+                assert position[prereq] < position[code]
+    # modules whose prerequisites are missing from the curriculum stay locked
+    modules, _ = graph.recommend({}, threshold=0.8, limit=len(graph))
+    assert not {m["module_code"] for m in modules} & set(graph.unknown)
@@ -0,0 +1,70 @@
+import copy
+import json
+import os
+
+import schema_registry
+import validation
+from schema_registry import SCHEMA_FILES, SchemaRegistry, registry
+
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_one_validator_per_schema_with_format_checking(monkeypatch):
+    built = []
+    real = schema_registry.Draft7Validator
+
+    def counting_validator(schema, **kwargs):
+        built.append(kwargs.get("format_checker"))
+        return real(schema, **kwargs)
+
+    counting_validator.check_schema = real.check_schema
+    monkeypatch.setattr(schema_registry, "Draft7Validator", counting_validator)
+    schemas = SchemaRegistry(files={"diagnostic": SCHEMA_FILES["diagnostic"]})
+    sample = _load("templates/diagnostic_sample_10yo.json")
+    for _ in range(3):
+        assert schemas.validate("diagnostic", sample) == (True, "Valid")
+        assert schemas.get("diagnostic").is_valid(sample)
+    assert len(built) == 1 and built[0] is not None
+
+    dates = schemas.register("dates", {"type": "string", "format": "date"})
+    assert dates.is_valid("2024-02-29") and not dates.is_valid("2024-02-30")
+    assert dates.validate("yesterday") == (False, "'yesterday' is not a 'date'")
+
+
+def test_generated_lesson_rules():
+    lesson = {"id": "l1", "type": "concept", "title": "T", "locale": "ru-RU", "blocks": [
+        {"type": "theory", "content": "text"},
+        {"type": "interactive", "content": {"type": "mcq"}},
+    ]}
+    assert validation.validate_lesson_json(lesson) == (True, "Valid")
+
+    bad = copy.deepcopy(lesson)
+    bad["blocks"][1]["content"] = {"question": "?"}
+    assert validation.validate_lesson_json(bad) == (False, "blocks[1].content: 'type' is a required property")
+    for field, value in (("type", "lecture"), ("locale", "russian"), ("blocks", [])):
+        assert not validation.validate_lesson_json(dict(lesson, **{field: value}))[0]
+    assert not validation.validate_lesson_json({k: v for k, v in lesson.items() if k != "id"})[0]
+
+
+def test_validator_is_built_once(tmp_path):
+    assert registry.get("diagnostic") is registry.get("diagnostic")
+    schemas = SchemaRegistry(files={})
+    compiled = schemas.register("any_of", {"anyOf": [{"type": "string"}, {"type": "integer"}]})
+    assert compiled.is_valid(3) and not compiled.is_valid(1.5)
+
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps({"type": "integer"}))
+    first = schemas.for_path(path)
+    assert schemas.for_path(path) is first and first.draft7 is schemas.for_path(path).draft7
+    path.write_text(json.dumps({"type": "string"}))
+    os.utime(path, (0, 0))
+    assert schemas.for_path(path).is_valid("x")
+
+
+def test_validate_request_dispatch():
+    assert validation.validate_request("telemetry", {"events": "nope"})[0] is False
+    assert validation.validate_request("diagnostic", _load("templates/diagnostic_sample_10yo.json")) == (True, "Valid")
+    assert validation.validate_request("no_such_thing", {}) == (False, "Unknown validator: no_such_thing")
@@ -0,0 +1,27 @@
+from submission_idempotency import request_hash
+from validation import validate_api_request_submission, validate_idempotency_key
+
+
+BODY = {
+    "student_id": "95ef01b7-ebfd-4320-a41b-9550e88551b5",
+    "module_code": "module_math_numbers_primary",
+    "lesson_id": "lesson_module_math_numbers_primary_concept_01",
+    "task_id": "task_practice_1",
+    "kind": "practice",
+    "score": 0.8,
+}
+
+
+def test_request_hash_ignores_key_and_field_order():
+    reordered = dict(reversed(list(BODY.items())))
+    assert request_hash(BODY) == request_hash(dict(reordered, idempotency_key="k1"))
+    assert request_hash(BODY) != request_hash(dict(BODY, score=0.9))
+
+
+def test_idempotency_key_validation():
+    assert validate_idempotency_key("retry-1")
+    assert not validate_idempotency_key("")
+    assert not validate_idempotency_key("x" * 256)
+    assert not validate_idempotency_key(42)
+    assert validate_api_request_submission(dict(BODY, idempotency_key="k1"))[0]
+    assert not validate_api_request_submission(dict(BODY, idempotency_key=""))[0]
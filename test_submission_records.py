@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from mastery_calculator import MasteryCalculatorV2, MasteryConfig
+from submission_records import (
+    LessonType, LESSON_TYPES, SubmissionRecord, records_from_dicts, fetch_submission_history
+)
+
+
+def _history(seed=3, n=20):
+    rng = np.random.default_rng(seed)
+    start = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    created = [start + timedelta(seconds=int(s)) for s in np.cumsum(rng.integers(3600, 4 * 86400, n))]
+    rows = [
+        {"score": round(float(rng.uniform()), 2), "created_at": t,
+         "lesson_type": LESSON_TYPES[int(rng.integers(0, len(LESSON_TYPES)))]}
+        for t in created
+    ]
+    return rows[::-1]  # newest first, like the API's history query
+
+
+def test_spacing_uses_datetime_timestamps():
+    calc = MasteryCalculatorV2()
+    rows = _history()
+    _, diag = calc.lesson_mastery(rows, "guided", 300, 0.7)
+    assert diag["spacing"] != 0.5
+    iso = [dict(r, created_at=r["created_at"].isoformat()) for r in rows]
+    assert calc.lesson_mastery(iso, "guided", 300, 0.7) == calc.lesson_mastery(rows, "guided", 300, 0.7)
+
+
+def test_record_fast_path_matches_dict_history():
+    calc = MasteryCalculatorV2(MasteryConfig(w_spacing=0.2, w_consistency=0.2, w_accuracy=0.35))
+    for seed in range(30):
+        rows = _history(seed, n=1 + seed % 20)
+        records = records_from_dicts(rows)
+        assert isinstance(records[0].lesson_type, LessonType)
+        for lesson_type in LESSON_TYPES:
+            assert calc.lesson_mastery(records, lesson_type, 450, 0.8) == \
+                calc.lesson_mastery(rows, lesson_type, 450, 0.8)
+
+
+def test_fetch_builds_records_from_tuples(fake_db):
+    db = fake_db(lambda sql, params: [(0.9, 1.7e9 + 10, 3), (0.4, 1.7e9, 0)])
+    records = fetch_submission_history(db.connect(), "s", "m")
+    assert records == [SubmissionRecord(0.9, 1.7e9 + 10, LessonType.ASSESSMENT),
+                       SubmissionRecord(0.4, 1.7e9, LessonType.CONCEPT)]
+    assert records[1].lesson_type is LessonType.CONCEPT
+    assert db.executed[0][1] == ("s", "m", 20)
+
+
+def test_equal_and_missing_timestamps_match_batch():
+    from mastery_batch import BatchMasteryEngine
+    from mastery_replay import replay_module_log
+
+    calc = MasteryCalculatorV2(MasteryConfig(w_spacing=0.2))
+    rows = [{"score": s, "created_at": 1.7e9, "lesson_type": "guided"} for s in (0.9, 0.6, 0.8, 0.7)]
+    _, diag = calc.lesson_mastery(rows, "guided", 300, 0.7)
+    assert diag["spacing"] == 0.5
+    assert calc.lesson_mastery(records_from_dicts(rows), "guided", 300, 0.7) == \
+        calc.lesson_mastery(rows, "guided", 300, 0.7)
+
+    # rows are oldest first here, as the replay and the batch engine take them
+    scalar = [snapshot["lesson_mastery"] for snapshot in replay_module_log(calc, rows)]
+    batch = BatchMasteryEngine(calc.cfg).lesson_mastery(
+        np.zeros(4, dtype=int), np.full(4, 1.7e9), np.array([r["score"] for r in rows]),
+        np.full(4, LESSON_TYPES.index("guided")))
+    np.testing.assert_allclose(batch, scalar, atol=1e-9)
+
+    missing = [dict(r, created_at=None) for r in rows[:2]] + rows[2:]
+    assert calc.lesson_mastery(records_from_dicts(missing), "guided", 300, 0.7) == \
+        calc.lesson_mastery(missing, "guided", 300, 0.7)
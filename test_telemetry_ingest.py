@@ -0,0 +1,38 @@
+from datetime import datetime, timezone
+
+from telemetry_ingest import AttemptEvent, TelemetryBuffer
+
+
+def _lookup(sql, params):
+    if "FROM student" in sql:
+        return [("u1", "student-1")]
+    return [("module_math", "module-1")]
+
+
+def _event(user_id="u1", module_code="module_math", n=0):
+    return AttemptEvent(user_id, module_code, "lesson_1", f"w{n}", {"n": n}, 0.5,
+                        datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+
+def test_bounded_buffer_rejects_whole_batch_when_full(fake_db):
+    buffer = TelemetryBuffer(fake_db(_lookup).connect, max_buffer=3, batch_size=100, flush_interval=60)
+    assert buffer.offer([_event(n=0), _event(n=1)])
+    assert not buffer.offer([_event(n=2), _event(n=3)])
+    stats = buffer.get_stats()
+    assert stats["accepted"] == 2
+    assert stats["rejected"] == 2
+    buffer.close()
+
+
+def test_close_drains_buffer_with_copy_and_drops_unknown_ids(fake_db):
+    db = fake_db(_lookup)
+    buffer = TelemetryBuffer(db.connect, batch_size=100, flush_interval=60)
+    buffer.offer([_event(n=0), _event(n=1), _event(module_code="module_unknown")])
+    buffer.close()
+
+    assert [row[3] for row in db.copied] == ["w0", "w1"]
+    assert db.copied[0][:2] == ["student-1", "module-1"]
+    stats = buffer.get_stats()
+    assert stats["written"] == 2
+    assert stats["dropped_unknown"] == 1
+    assert stats["buffered"] == 0
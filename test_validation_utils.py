@@ -9,3 +9,21 @@ def test_validate_uuid_accepts_uppercase():
 def test_validate_uuid_rejects_invalid():
     assert not validation.validate_uuid('not-a-uuid')
     assert not validation.validate_uuid('123')
+
+
+def test_validate_mastery_query():
+    student_id = '95ef01b7-ebfd-4320-a41b-9550e88551b5'
+    assert validation.validate_api_request_mastery_query(student_id, {})[0]
+    assert validation.validate_api_request_mastery_query(
+        student_id, {'limit': '20', 'subject': 'math', 'stage': 'primary', 'summary_only': 'true'})[0]
+    assert not validation.validate_api_request_mastery_query('nope', {})[0]
+    assert not validation.validate_api_request_mastery_query(student_id, {'limit': '500'})[0]
+    assert not validation.validate_api_request_mastery_query(student_id, {'summary_only': 'maybe'})[0]
+
+
+def test_code_validator():
+    for value, valid in (("Mathematics", True), ("stage_1-a", True), ("x" * 65, False),
+                         ("a b", False), ("", False), (1, False), (None, False)):
+        assert validation.validate_code(value) == valid, value
+    assert validation.validate_api_request_cohort({"subject_code": "a b", "stage_code": "s"}) == (
+        False, "Invalid subject_code: a b")
@@ -6,8 +6,12 @@ Provides comprehensive validation for API inputs, lessons, and data integrity.
 
 import re
 import json
+from datetime import datetime
 from typing import Dict, List, Any, Tuple, Optional
 
+from schema_registry import registry
+from db_integrity import full_scan_counts
+
 
 class ValidationError(Exception):
     """Custom validation error."""
@@ -26,6 +30,11 @@ def validate_email(email: str) -> bool:
     return bool(re.match(email_pattern, email))
 
 
+def validate_idempotency_key(key: Any) -> bool:
+    """Validate a client-supplied idempotency key."""
+    return isinstance(key, str) and 0 < len(key) <= 255
+
+
 def validate_module_code(module_code: str) -> bool:
     """Validate module code format."""
     # Should start with 'module_' and contain only valid characters
@@ -38,6 +47,15 @@ def validate_lesson_type(lesson_type: str) -> bool:
     return lesson_type in valid_types
 
 
+# subject/stage codes in query parameters and request bodies
+_CODE_PATTERN = re.compile(r'^[a-zA-Z0-9_-]{1,64}$')
+
+
+def validate_code(code: Any) -> bool:
+    """Validate a subject or stage code."""
+    return isinstance(code, str) and bool(_CODE_PATTERN.match(code))
+
+
 def validate_locale(locale: str) -> bool:
     """Validate locale format."""
     return bool(re.match(r'^[a-z]{2}(-[A-Z]{2})?$', locale))
@@ -138,57 +156,120 @@ def validate_api_request_submission(data: Dict[str, Any]) -> Tuple[bool, str]:
             except (TypeError, ValueError):
                 return False, "answer_jsonb must be JSON serializable"
 
+        # Validate idempotency_key if provided
+        if 'idempotency_key' in data and not validate_idempotency_key(data['idempotency_key']):
+            return False, "idempotency_key must be a non-empty string of at most 255 characters"
+
         return True, "Valid"
 
     except Exception as e:
         return False, f"Validation error: {str(e)}"
 
 
-def validate_lesson_json(lesson_data: Dict[str, Any]) -> Tuple[bool, str]:
-    """Validate lesson JSON structure."""
+def validate_api_request_telemetry(data: Dict[str, Any], max_events: int = 500) -> Tuple[bool, str]:
+    """Validate a batch of interactive telemetry events."""
     try:
-        # Required fields for our simplified lessons
-        required_fields = ['id', 'type', 'title', 'locale', 'blocks']
+        required_fields = ['student_id', 'module_code', 'events']
+
+        # Check required fields
         for field in required_fields:
-            if field not in lesson_data:
+            if field not in data:
                 return False, f"Missing required field: {field}"
 
-        # Validate lesson type
-        if not validate_lesson_type(lesson_data['type']):
-            return False, f"Invalid lesson type: {lesson_data['type']}"
+        # Validate module_code
+        if not validate_module_code(data['module_code']):
+            return False, f"Invalid module_code format: {data['module_code']}"
+
+        # Validate student_id (UUID)
+        if not validate_uuid(data['student_id']):
+            return False, f"Invalid student_id format: {data['student_id']}"
+
+        events = data['events']
+        if not isinstance(events, list) or not events:
+            return False, "events must be a non-empty list"
+        if len(events) > max_events:
+            return False, f"Too many events in one batch: {len(events)} (max {max_events})"
+
+        for i, event in enumerate(events):
+            if not isinstance(event, dict):
+                return False, f"Event {i} must be an object"
+            if 'payload' in event and not isinstance(event['payload'], dict):
+                return False, f"Event {i} payload must be an object"
+            if event.get('score') is not None:
+                try:
+                    score = float(event['score'])
+                    if not (0.0 <= score <= 1.0):
+                        return False, f"Event {i} score must be between 0.0 and 1.0, got: {score}"
+                except (ValueError, TypeError):
+                    return False, f"Event {i} has invalid score format: {event['score']}"
+            if event.get('created_at') is not None:
+                try:
+                    datetime.fromisoformat(str(event['created_at']).replace("Z", "+00:00"))
+                except ValueError:
+                    return False, f"Event {i} has invalid created_at: {event['created_at']}"
+
+        return True, "Valid"
+
+    except Exception as e:
+        return False, f"Validation error: {str(e)}"
 
-        # Validate locale
-        if not validate_locale(lesson_data['locale']):
-            return False, f"Invalid locale format: {lesson_data['locale']}"
 
-        # Validate blocks
-        if not isinstance(lesson_data['blocks'], list):
-            return False, "Blocks must be a list"
+def validate_api_request_mastery_query(student_id: str, args: Dict[str, Any], max_limit: int = 200) -> Tuple[bool, str]:
+    """Validate path and query parameters of GET /api/mastery/<student_id>."""
+    try:
+        # Validate student_id (UUID)
+        if not validate_uuid(student_id):
+            return False, f"Invalid student_id format: {student_id}"
 
-        if len(lesson_data['blocks']) == 0:
-            return False, "Lesson must have at least one block"
+        if args.get('limit') is not None:
+            try:
+                limit = int(args['limit'])
+            except (ValueError, TypeError):
+                return False, f"Invalid limit: {args['limit']}"
+            if not (1 <= limit <= max_limit):
+                return False, f"limit must be between 1 and {max_limit}, got: {limit}"
 
-        valid_block_types = ['theory', 'example', 'instruction', 'interactive']
+        for field in ('subject', 'stage'):
+            value = args.get(field)
+            if value is not None and not validate_code(value):
+                return False, f"Invalid {field} code: {value}"
 
-        for i, block in enumerate(lesson_data['blocks']):
-            if not isinstance(block, dict):
-                return False, f"Block {i} must be an object"
+        summary_only = args.get('summary_only')
+        if summary_only is not None and summary_only.lower() not in ('1', '0', 'true', 'false'):
+            return False, f"summary_only must be true or false, got: {summary_only}"
 
-            if 'type' not in block:
-                return False, f"Block {i} missing 'type' field"
+        return True, "Valid"
 
-            if 'content' not in block:
-                return False, f"Block {i} missing 'content' field"
+    except Exception as e:
+        return False, f"Validation error: {str(e)}"
 
-            if block['type'] not in valid_block_types:
-                return False, f"Block {i} has invalid type: {block['type']}. Must be one of: {valid_block_types}"
 
-            # Validate content based on type
-            if block['type'] == 'interactive':
-                if not isinstance(block['content'], dict):
-                    return False, f"Block {i} interactive content must be an object"
-                if 'type' not in block['content']:
-                    return False, f"Block {i} interactive content missing 'type' field"
+def validate_api_request_next_modules(student_id: str, args: Dict[str, Any], max_limit: int = 100) -> Tuple[bool, str]:
+    """Validate path and query parameters of GET /api/students/<student_id>/next-modules."""
+    try:
+        if not validate_uuid(student_id):
+            return False, f"Invalid student_id format: {student_id}"
+
+        if args.get('limit') is not None:
+            try:
+                limit = int(args['limit'])
+            except (ValueError, TypeError):
+                return False, f"Invalid limit: {args['limit']}"
+            if not (1 <= limit <= max_limit):
+                return False, f"limit must be between 1 and {max_limit}, got: {limit}"
+
+        if args.get('threshold') is not None:
+            try:
+                threshold = float(args['threshold'])
+            except (ValueError, TypeError):
+                return False, f"Invalid threshold: {args['threshold']}"
+            if not (0.0 < threshold <= 1.0):
+                return False, f"threshold must be in (0, 1], got: {threshold}"
+
+        for field in ('subject', 'stage'):
+            value = args.get(field)
+            if value is not None and not validate_code(value):
+                return False, f"Invalid {field} code: {value}"
 
         return True, "Valid"
 
@@ -196,6 +277,138 @@ def validate_lesson_json(lesson_data: Dict[str, Any]) -> Tuple[bool, str]:
         return False, f"Validation error: {str(e)}"
 
 
+def validate_api_request_module_search(args: Dict[str, Any], max_limit: int = 100) -> Tuple[bool, str]:
+    """Validate query parameters of GET /api/modules/search."""
+    try:
+        query = args.get('q')
+        if not query or not query.strip():
+            return False, "Missing required parameter: q"
+        if len(query) > 200:
+            return False, f"q is too long: {len(query)} characters, at most 200"
+        if not re.search(r'[^\W_]', query):
+            return False, "q must contain at least one word"
+
+        if args.get('limit') is not None:
+            try:
+                limit = int(args['limit'])
+            except (ValueError, TypeError):
+                return False, f"Invalid limit: {args['limit']}"
+            if not (1 <= limit <= max_limit):
+                return False, f"limit must be between 1 and {max_limit}, got: {limit}"
+
+        if args.get('source') is not None and args['source'] not in ('db', 'index'):
+            return False, f"source must be 'db' or 'index', got: {args['source']}"
+
+        for field in ('subject', 'stage'):
+            value = args.get(field)
+            if value is not None and not validate_code(value):
+                return False, f"Invalid {field} code: {value}"
+
+        return True, "Valid"
+
+    except Exception as e:
+        return False, f"Validation error: {str(e)}"
+
+
+def validate_api_request_progress_query(student_id: str, args: Dict[str, Any]) -> Tuple[bool, str]:
+    """Validate path and query parameters of GET /api/progress/<student_id>/daily."""
+    try:
+        # Validate student_id (UUID)
+        if not validate_uuid(student_id):
+            return False, f"Invalid student_id format: {student_id}"
+
+        if args.get('module_code') is not None and not validate_module_code(args['module_code']):
+            return False, f"Invalid module_code format: {args['module_code']}"
+
+        days = {}
+        for field in ('from', 'to'):
+            if args.get(field) is not None:
+                try:
+                    days[field] = datetime.strptime(args[field], '%Y-%m-%d').date()
+                except ValueError:
+                    return False, f"{field} must be a date (YYYY-MM-DD), got: {args[field]}"
+        if len(days) == 2 and days['from'] > days['to']:
+            return False, "from must not be after to"
+
+        return True, "Valid"
+
+    except Exception as e:
+        return False, f"Validation error: {str(e)}"
+
+
+def validate_api_request_cohort(data: Dict[str, Any], max_students: int = 10000) -> Tuple[bool, str]:
+    """Validate a cohort analytics request: student_ids and/or subject_code + stage_code."""
+    try:
+        student_ids = data.get('student_ids')
+        has_enrollment = bool(data.get('subject_code')) and bool(data.get('stage_code'))
+        if not student_ids and not has_enrollment:
+            return False, "Provide student_ids or both subject_code and stage_code"
+        if bool(data.get('subject_code')) != bool(data.get('stage_code')):
+            return False, "subject_code and stage_code must be given together"
+
+        if student_ids is not None:
+            if not isinstance(student_ids, list):
+                return False, "student_ids must be a list"
+            if len(student_ids) > max_students:
+                return False, f"Too many students in one cohort: {len(student_ids)} (max {max_students})"
+            for student_id in student_ids:
+                if not isinstance(student_id, str) or not validate_uuid(student_id):
+                    return False, f"Invalid student_id format: {student_id}"
+
+        for field in ('subject_code', 'stage_code'):
+            value = data.get(field)
+            if value is not None and not validate_code(value):
+                return False, f"Invalid {field}: {value}"
+
+        if data.get('struggling_threshold') is not None:
+            try:
+                threshold = float(data['struggling_threshold'])
+                if not (0.0 <= threshold <= 1.0):
+                    return False, f"struggling_threshold must be between 0.0 and 1.0, got: {threshold}"
+            except (ValueError, TypeError):
+                return False, f"Invalid struggling_threshold: {data['struggling_threshold']}"
+
+        if data.get('struggling_limit') is not None:
+            limit = data['struggling_limit']
+            if not isinstance(limit, int) or isinstance(limit, bool) or not (1 <= limit <= 500):
+                return False, f"struggling_limit must be an integer between 1 and 500, got: {limit}"
+
+        return True, "Valid"
+
+    except Exception as e:
+        return False, f"Validation error: {str(e)}"
+
+
+def validate_lesson_json(lesson_data: Dict[str, Any], schema: str = 'generated_lesson') -> Tuple[bool, str]:
+    """Validate lesson JSON against a registry schema (generated lessons by default)."""
+    try:
+        return registry.validate(schema, lesson_data)
+    except KeyError:
+        return False, f"Unknown schema: {schema}"
+    except Exception as e:
+        return False, f"Validation error: {str(e)}"
+
+
+REQUEST_VALIDATORS = {
+    'generate_lesson': validate_api_request_generate_lesson,
+    'next_lesson': validate_api_request_next_lesson,
+    'submission': validate_api_request_submission,
+    'telemetry': validate_api_request_telemetry,
+    'cohort': validate_api_request_cohort,
+}
+
+
+def validate_request(kind: str, data: Any) -> Tuple[bool, str]:
+    """Single entry point: a request body validator or any registry schema by name."""
+    validator = REQUEST_VALIDATORS.get(kind)
+    if validator is not None:
+        return validator(data)
+    try:
+        return registry.validate(kind, data)
+    except KeyError:
+        return False, f"Unknown validator: {kind}"
+
+
 def validate_module_data(module_data: Dict[str, Any]) -> Tuple[bool, str]:
     """Validate module data structure."""
     try:
@@ -260,50 +473,12 @@ def validate_learning_state_data(data: Dict[str, Any]) -> Tuple[bool, str]:
 
 
 def validate_database_integrity(conn) -> Dict[str, str]:
-    """Validate database integrity and return report."""
-    report = {}
+    """Validate database integrity and return report.
 
+    One full single-pass scan per table (see db_integrity); the API serves
+    the incrementally maintained report from the integrity_check table.
+    """
     try:
-        with conn.cursor() as cur:
-            # Check for orphaned records
-            cur.execute("""
-                SELECT COUNT(*) FROM learning_state ls
-                LEFT JOIN student s ON ls.student_id = s.id
-                WHERE s.id IS NULL
-            """)
-            orphaned_learning_states = cur.fetchone()[0]
-
-            cur.execute("""
-                SELECT COUNT(*) FROM learning_state ls
-                LEFT JOIN module m ON ls.module_id = m.id
-                WHERE m.id IS NULL
-            """)
-            orphaned_modules = cur.fetchone()[0]
-
-            cur.execute("""
-                SELECT COUNT(*) FROM submission s
-                LEFT JOIN module m ON s.module_id = m.id
-                WHERE m.id IS NULL
-            """)
-            orphaned_submissions = cur.fetchone()[0]
-
-            # Check for invalid JSONB (simplified check)
-            cur.execute("""
-                SELECT COUNT(*) FROM module
-                WHERE objectives_jsonb::text = '{}'::text
-                   OR lesson_policy_jsonb::text = '{}'::text
-                   OR assessment_blueprint_jsonb::text = '{}'::text
-            """)
-            invalid_jsonb = cur.fetchone()[0]
-
-            report = {
-                "orphaned_learning_states": orphaned_learning_states,
-                "orphaned_modules_in_learning_state": orphaned_modules,
-                "orphaned_submissions": orphaned_submissions,
-                "invalid_jsonb_modules": invalid_jsonb
-            }
-
+        return full_scan_counts(conn)
     except Exception as e:
-        report["error"] = str(e)
-
-    return report
+        return {"error": str(e)}